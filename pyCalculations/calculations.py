@@ -58,6 +58,7 @@ from lineout import lineout
 import fit
 from fieldtracer import static_field_tracer, static_field_tracer_3d
 from fieldtracer import dynamic_field_tracer
-from non_maxwellianity import epsilon_M
+from fieldtracer import trace_field_lines, trace_field_lines_parallel, FieldLines, TRACE_MAX_ITERATIONS, TRACE_STOP_CONDITION, TRACE_INVALID_FIELD
+from non_maxwellianity import epsilon_M, epsilon_M_batch
 from null_lines import LMN_null_lines_FOTE
 from interpolator_amr import AMRInterpolator, supported_amr_interpolators
@@ -179,9 +179,347 @@ def static_field_tracer( vlsvReader, x0, max_iterations, dx, direction='+', bvar
 
    return points
 
-# fg tracing for static_field_tracer_3d
-def fg_trace(vlsvReader, fg, seed_coords, max_iterations, dx, multiplier, stop_condition, centering = None ):
+# Termination reasons of the lines traced by trace_field_lines
+TRACE_MAX_ITERATIONS = 0  # max_iterations points traced
+TRACE_STOP_CONDITION = 1  # stop_condition returned True at the last point
+TRACE_INVALID_FIELD = 2   # field undefined (e.g. out of domain) or zero ahead of the last point
+
+class FgFieldSampler(object):
+   ''' Trilinear interpolation of a face- or edge-centered vector variable on the field solver grid.
+       The staggering is accounted for per component. Values outside of the grid are nan.
+
+       :param vlsvReader:  An open vlsv file, for the extent of the grid
+       :param fg:          Field solver grid array [dimx,dimy,dimz,3]
+       :param centering:   'face' or 'edge'
+   '''
+   def __init__(self, vlsvReader, fg, centering):
+      if centering not in ('face', 'edge'):
+         raise ValueError("Unsupported centering for fg tracing: " + str(centering))
+      self.fg = fg
+      extent = vlsvReader.get_fsgrid_mesh_extent()
+      self.sizes = np.array(fg.shape[0:3])
+      self.mins = np.array(extent[0:3], dtype=float)
+      self.dcell = (np.array(extent[3:6], dtype=float) - self.mins)/self.sizes
+      # Per component, offset of the first value from the low corner of the grid in cells
+      stagger = np.eye(3) if centering == 'face' else 1 - np.eye(3)
+      self.origins = 0.5 - 0.5*stagger
+
+   def __call__(self, points):
+      values = np.empty((points.shape[0], 3))
+      for c in range(3):
+         s = (points - self.mins[np.newaxis,:])/self.dcell[np.newaxis,:] - self.origins[c][np.newaxis,:]
+         valid = np.all(((s >= 0) & (s <= self.sizes - 1)) | (self.sizes == 1), axis=1)
+         s[~np.isfinite(s)] = 0
+         i0 = np.clip(np.floor(s).astype(np.int64), 0, np.maximum(self.sizes - 2, 0))
+         t = np.where(self.sizes == 1, 0, s - i0)
+         i1 = np.minimum(i0 + 1, self.sizes - 1)
+         values[:,c] = 0
+         for ix, wx in ((i0[:,0], 1 - t[:,0]), (i1[:,0], t[:,0])):
+            for iy, wy in ((i0[:,1], 1 - t[:,1]), (i1[:,1], t[:,1])):
+               for iz, wz in ((i0[:,2], 1 - t[:,2]), (i1[:,2], t[:,2])):
+                  values[:,c] += wx*wy*wz*self.fg[ix,iy,iz,c]
+         values[~valid,c] = np.nan
+      return values
+
+class VgFieldSampler(object):
+   ''' Linear interpolation of a vg vector variable, through an interpolation plan of the sampled points
+       on the whole-grid values held in the variable cache of the reader. Values outside of the domain are nan.
+
+       :param vlsvReader:  An open vlsv file
+       :param vg:          Name of the vg variable
+   '''
+   def __init__(self, vlsvReader, vg):
+      self.vlsvReader = vlsvReader
+      self.vg = vg
+      if (vg, "pass") not in vlsvReader.variable_cache:
+         vlsvReader.read_variable_to_cache(vg)
+
+   def __call__(self, points):
+      with warnings.catch_warnings():
+         # Leaving the domain ends the trace, it is no reason for a warning
+         warnings.simplefilter("ignore", UserWarning)
+         plan = pt.vlsvfile.InterpolationPlan(self.vlsvReader, points)
+         return np.reshape(plan.apply(self.vg), (-1,3))
+
+def _grid_var_kind(grid_var, centering=None):
+   ''' Classifies grid_var as 'fg' (name or array), 'vg' (name) or 'callable', and sets the centering of fg_b and fg_e.
+   '''
+   if isinstance(grid_var, str):
+      for part in grid_var.split("/"):
+         if part.startswith("fg"):
+            if part == 'fg_b':
+               centering = 'face'
+            elif part == 'fg_e':
+               centering = 'edge'
+            return 'fg', centering
+         elif part.startswith("vg"):
+            return 'vg', None
+      raise ValueError("Please give a valid string (eg. 'vg_b_vol')")
+   elif isinstance(grid_var, np.ndarray):
+      if grid_var.ndim!=4 or grid_var.shape[-1]!=3:
+         raise ValueError("Checking array supplied in grid_var keyword: fg.shape[-1]={} (expected: 3), fg.ndim={} (expected: 4)".format(grid_var.shape[-1], grid_var.ndim))
+      return 'fg', centering
+   elif callable(grid_var):
+      return 'callable', None
+   raise TypeError("Unrecognized grid_var keyword data (expect string, numpy.ndarray or callable)")
+
+def get_field_sampler(vlsvReader, grid_var, centering=None):
+   ''' Returns a sampler of the vector field grid_var for trace_field_lines.
+
+       :param vlsvReader:  An open vlsv file
+       :param grid_var:    Name of a vg or fg variable, an fg array [dimx,dimy,dimz,3], or a callable
+                           returning the field at an (N,3) array of points, which is returned as is
+       :param centering:   'face' or 'edge' for fg arrays, set automatically for 'fg_b' and 'fg_e'
+   '''
+   kind, centering = _grid_var_kind(grid_var, centering)
+   if kind == 'fg':
+      fg = vlsvReader.read_variable(grid_var) if isinstance(grid_var, str) else grid_var
+      return FgFieldSampler(vlsvReader, fg, centering)
+   elif kind == 'vg':
+      return VgFieldSampler(vlsvReader, grid_var)
+   return grid_var
+
+# Dormand-Prince 5(4) coefficients
+_dp_a = [[],
+         [1/5],
+         [3/40, 9/40],
+         [44/45, -56/15, 32/9],
+         [19372/6561, -25360/2187, 64448/6561, -212/729],
+         [9017/3168, -355/33, 46732/5247, 49/176, -5103/18656],
+         [35/384, 0, 500/1113, 125/192, -2187/6784, 11/84]]
+_dp_error = np.array([35/384 - 5179/57600, 0, 500/1113 - 7571/16695, 125/192 - 393/640,
+                      -2187/6784 + 92097/339200, 11/84 - 187/2100, -1/40])
+
+class FieldLines(object):
+   ''' Field lines traced by :func:`trace_field_lines`.
+
+       lines        List of (npoints[i],3) arrays of the points of each line, starting at the seed
+       npoints      Number of points of each line
+       termination  Reason the tracing of each line stopped: TRACE_MAX_ITERATIONS, TRACE_STOP_CONDITION or TRACE_INVALID_FIELD
+       endpoints    (N,3) array of the last point of each line
+   '''
+   def __init__(self, line_indices, points, termination):
+      order = np.argsort(line_indices, kind="stable")
+      self.npoints = np.bincount(line_indices, minlength=len(termination))
+      self.points = points[order]
+      self.termination = termination
+      self.lines = np.split(self.points, np.cumsum(self.npoints)[:-1])
+      self.endpoints = self.points[np.cumsum(self.npoints) - 1]
+
+   def __len__(self):
+      return len(self.termination)
+
+   def to_array(self, length=None):
+      ''' Returns the lines as an (N,length,3) array, padded with nan.
+
+          :param length: Number of points per line, defaults to the longest line
+      '''
+      if length is None:
+         length = np.amax(self.npoints)
+      starts = np.cumsum(self.npoints) - self.npoints
+      line_index = np.repeat(np.arange(len(self)), self.npoints)
+      point_index = np.arange(len(self.points)) - np.repeat(starts, self.npoints)
+      keep = point_index < length
+      array = np.full((len(self), length, 3), np.nan)
+      array[line_index[keep], point_index[keep], :] = self.points[keep]
+      return array
+
+def trace_field_lines(vlsvReader, seed_coords, max_iterations, dx, direction='+', grid_var='vg_b_vol', method='rk4',
+                      stop_condition=None, centering=None, tolerance=None, min_dx=None):
+   ''' Traces field lines of a static vector field from all seeds at once.
+
+       Lines are integrated along the unit vector of the field with steps of length dx. Only the lines that are
+       still being traced are advanced and sampled on each iteration, so lines that have stopped cost nothing.
+
+       :param vlsvReader:      An open vlsv file
+       :param seed_coords:     (N,3) numpy array of seed points
+       :param max_iterations:  Maximum number of points per line, including the seed
+       :param dx:              Step length [m]. Maximum and initial step length for method 'rk45'
+       :param direction:       '+' or '-', follow the field in the plus or minus direction
+       :param grid_var:        Name of a vg or fg variable, an fg array or a field sampler, see :func:`get_field_sampler`
+       :param method:          Integrator: 'euler', 'rk4' or 'rk45' (adaptive Dormand-Prince)
+       :param stop_condition:  Function (vlsvReader, points) returning a boolean array, True for points where tracing stops
+                               (the point is kept as the last point of the line). Defaults to no condition.
+       :param centering:       'face' or 'edge' for fg arrays
+       :param tolerance:       Error tolerance per step for 'rk45' [m], default 1e-3*dx
+       :param min_dx:          Minimum step length for 'rk45' [m], default 1e-3*dx
+       :returns:               :class:`FieldLines`
+
+       .. code-block:: python
+
+          # Example: end points of field lines for a connectivity map
+          lines = trace_field_lines(f, seeds, 10000, 1e5, grid_var='fg_b', method='rk45', stop_condition=my_stop)
+          closed = lines.termination == TRACE_STOP_CONDITION
+   '''
+   if direction not in ('+', '-'):
+      raise ValueError("direction should be '+' or '-'")
+   if method not in ('euler', 'rk4', 'rk45'):
+      raise ValueError("Unknown integration method " + str(method))
+   sampler = get_field_sampler(vlsvReader, grid_var, centering)
+   multiplier = -1 if direction == '-' else 1
+   tolerance = 1e-3*dx if tolerance is None else tolerance
+   min_dx = 1e-3*dx if min_dx is None else min_dx
+
+   def unit_vectors(points):
+      values = sampler(points)
+      magnitude = np.linalg.norm(values, axis=1, keepdims=True)
+      with np.errstate(invalid='ignore', divide='ignore'):
+         units = multiplier*values/magnitude
+      return units, np.all(np.isfinite(units), axis=1)
+
+   seed_coords = np.atleast_2d(np.asarray(seed_coords, dtype=float))
+   nseeds = seed_coords.shape[0]
+   termination = np.full(nseeds, TRACE_MAX_ITERATIONS, dtype=np.int64)
+   npoints = np.ones(nseeds, dtype=np.int64)
+   steps = np.full(nseeds, float(dx))
+   # The traced points are appended as (line index, point) chunks, one per iteration, and sorted by line in the end
+   traced_lines = [np.arange(nseeds)]
+   traced_points = [seed_coords]
+
+   # The active set: the lines still traced, their last points and the field direction there
+   active = np.arange(nseeds)
+   positions = seed_coords
+   k1, valid = unit_vectors(positions)
+   termination[~valid] = TRACE_INVALID_FIELD
+   active, positions, k1 = active[valid], positions[valid], k1[valid]
+   if max_iterations <= 1:
+      active = active[:0]
+
+   while len(active) > 0:
+      h = steps[active][:,np.newaxis]
+      valid = np.ones(len(active), dtype=bool)
+      accepted = valid
+      if method == 'euler':
+         new_positions = positions + h*k1
+      elif method == 'rk4':
+         k2, v2 = unit_vectors(positions + 0.5*h*k1)
+         k3, v3 = unit_vectors(positions + 0.5*h*k2)
+         k4, v4 = unit_vectors(positions + h*k3)
+         valid = v2 & v3 & v4
+         new_positions = positions + h*(k1 + 2*k2 + 2*k3 + k4)/6
+      else:
+         k = [k1]
+         for a in _dp_a[1:]:
+            stage, v = unit_vectors(positions + h*sum(aj*kj for aj, kj in zip(a, k) if aj != 0))
+            k.append(stage)
+            valid &= v
+         new_positions = positions + h*sum(aj*kj for aj, kj in zip(_dp_a[-1], k) if aj != 0)
+         error = np.amax(np.abs(h*sum(ej*kj for ej, kj in zip(_dp_error, k) if ej != 0)), axis=1)
+         with np.errstate(invalid='ignore', divide='ignore'):
+            factor = np.clip(0.9*(tolerance/error)**0.2, 0.2, 5.0)
+         factor[~np.isfinite(factor)] = 5.0
+         accepted = (error <= tolerance) | (h[:,0] <= min_dx)
+         steps[active] = np.clip(h[:,0]*factor, min_dx, dx)
+
+      # Lines with an undefined field on the step end at their current point
+      termination[active[~valid]] = TRACE_INVALID_FIELD
+      advance = valid & accepted
+      stay = valid & ~accepted
+      advanced = active[advance]
+      new_positions = new_positions[advance]
+      traced_lines.append(advanced)
+      traced_points.append(new_positions)
+      npoints[advanced] += 1
+
+      if method == 'rk45':
+         new_k1 = k[-1][advance]
+         new_valid = np.all(np.isfinite(new_k1), axis=1)
+      else:
+         new_k1, new_valid = unit_vectors(new_positions)
+      if stop_condition is not None:
+         stopped = np.asarray(stop_condition(vlsvReader, new_positions), dtype=bool)
+      else:
+         stopped = np.zeros(len(advanced), dtype=bool)
+      termination[advanced[~stopped & ~new_valid]] = TRACE_INVALID_FIELD
+      termination[advanced[stopped]] = TRACE_STOP_CONDITION
+      go_on = ~stopped & new_valid & (npoints[advanced] < max_iterations)
 
+      active = np.concatenate((advanced[go_on], active[stay]))
+      positions = np.concatenate((new_positions[go_on], positions[stay]))
+      k1 = np.concatenate((new_k1[go_on], k1[stay]))
+
+   return FieldLines(np.concatenate(traced_lines), np.concatenate(traced_points), termination)
+
+def trace_field_lines_parallel(vlsvReader, seed_coords, max_iterations, dx, direction='+', grid_var='vg_b_vol', method='rk4',
+                               stop_condition=None, centering=None, tolerance=None, min_dx=None, processes=None,
+                               chunk_size=None, temp_dir=None):
+   ''' Traces field lines like :func:`trace_field_lines`, with the seeds partitioned across a pool of worker processes.
+
+       The field is read once, written to a temporary .npy file and memory-mapped by the workers, so that all
+       workers share one copy of it through the page cache instead of receiving a pickled copy each. The workers
+       open the file by name for the mesh. Lines are returned in the order of the seeds.
+
+       :param processes:    Number of worker processes, default is the number of cores
+       :param chunk_size:   Number of seeds per task, default splits the seeds in 4 tasks per process for load balancing
+       :param temp_dir:     Directory of the temporary field file, e.g. /dev/shm; defaults to the system temporary directory
+       :returns:            :class:`FieldLines`
+
+       The remaining parameters are those of :func:`trace_field_lines`. stop_condition and callable grid_var have to
+       be picklable, i.e. functions defined at module level.
+   '''
+   from multiprocessing import Pool, cpu_count
+   import os
+   import tempfile
+
+   kind, centering = _grid_var_kind(grid_var, centering)
+   seed_coords = np.atleast_2d(np.asarray(seed_coords, dtype=float))
+   nseeds = seed_coords.shape[0]
+   processes = cpu_count() if processes is None else processes
+   if chunk_size is None:
+      chunk_size = max(1, int(np.ceil(nseeds/(4*processes))))
+
+   field_file = None
+   try:
+      if kind == 'callable':
+         field = grid_var
+      else:
+         if isinstance(grid_var, str):
+            values = vlsvReader.read_variable(grid_var)
+         else:
+            values = grid_var
+         handle, field_file = tempfile.mkstemp(suffix=".npy", dir=temp_dir)
+         with os.fdopen(handle, "wb") as fptr:
+            np.save(fptr, np.ascontiguousarray(values))
+         field = field_file
+
+      tasks = [(seed_coords[start:start+chunk_size], max_iterations, dx, direction, method, stop_condition, tolerance, min_dx)
+               for start in range(0, nseeds, chunk_size)]
+      with Pool(processes, initializer=_init_tracer_worker,
+                initargs=(vlsvReader.file_name, kind, grid_var if kind == 'vg' else None, field, centering)) as pool:
+         results = pool.map(_trace_worker, tasks)
+   finally:
+      if field_file is not None:
+         os.remove(field_file)
+
+   line_indices = np.repeat(np.arange(nseeds), np.concatenate([npoints for npoints, _, _ in results]))
+   return FieldLines(line_indices, np.concatenate([points for _, points, _ in results]),
+                     np.concatenate([termination for _, _, termination in results]))
+
+_worker_tracer = None
+
+def _init_tracer_worker(file_name, kind, name, field, centering):
+   global _worker_tracer
+   reader = pt.vlsvfile.VlsvReader(file_name)
+   if kind == 'callable':
+      sampler = field
+   else:
+      values = np.load(field, mmap_mode='r')
+      if kind == 'fg':
+         sampler = FgFieldSampler(reader, values, centering)
+      else:
+         reader.variable_cache[(name, "pass")] = values
+         sampler = VgFieldSampler(reader, name)
+   _worker_tracer = (reader, sampler)
+
+def _trace_worker(task):
+   seed_coords, max_iterations, dx, direction, method, stop_condition, tolerance, min_dx = task
+   reader, sampler = _worker_tracer
+   lines = trace_field_lines(reader, seed_coords, max_iterations, dx, direction=direction, grid_var=sampler, method=method,
+                             stop_condition=stop_condition, tolerance=tolerance, min_dx=min_dx)
+   return lines.npoints, lines.points, lines.termination
+
+# fg tracing for static_field_tracer_3d
+def fg_trace(vlsvReader, fg, seed_coords, max_iterations, dx, multiplier, stop_condition, centering = None, method = 'euler' ):
 
    # Read field grid variable (denoted 'fg_*' in .vlsv files, no '_vol' suffix)
    # (standardizes input by redefining fg as a numpy array)
@@ -198,103 +536,25 @@ def fg_trace(vlsvReader, fg, seed_coords, max_iterations, dx, multiplier, stop_c
       elif fg.ndim!=4 or fg.shape[-1]!=3:
          raise ValueError("Checking array supplied in fg keyword: fg[-1]={} (expected: 3), fg.ndim={} (expected: 4)".format(fg[-1], fg.ndim))
 
-
-   # Create x, y, and z coordinates:
-   xsize = fg.shape[0]
-   ysize = fg.shape[1]
-   zsize = fg.shape[2]
-   xmin = vlsvReader.read_parameter('xmin')
-   xmax = vlsvReader.read_parameter('xmax')
-   ymin = vlsvReader.read_parameter('ymin')
-   ymax = vlsvReader.read_parameter('ymax')
-   zmin = vlsvReader.read_parameter('zmin')
-   zmax = vlsvReader.read_parameter('zmax')
-   sizes = np.array([xsize, ysize, zsize])
-   maxs = np.array([xmax, ymax, zmax])
-   mins = np.array([xmin, ymin, zmin])
-   dcell = (maxs - mins)/(sizes.astype('float'))
-   x = np.arange(mins[0], maxs[0], dcell[0]) + 0.5*dcell[0]
-   y = np.arange(mins[1], maxs[1], dcell[1]) + 0.5*dcell[1]
-   z = np.arange(mins[2], maxs[2], dcell[2]) + 0.5*dcell[2]
-
    if centering is None:
       logging.info("centering keyword not set! Aborting.")
       return False
-  
-   # Create grid interpolation object for vector field (V). Feed the object the component data and locations of measurements.
-   if centering == 'face':
-      interpolator_V_0 = interpolate.RegularGridInterpolator((x-0.5*dcell[0], y, z), fg[:,:,:,0], bounds_error = False, fill_value = np.nan)
-      interpolator_V_1 = interpolate.RegularGridInterpolator((x, y-0.5*dcell[1], z), fg[:,:,:,1], bounds_error = False, fill_value = np.nan)
-      interpolator_V_2 = interpolate.RegularGridInterpolator((x, y, z-0.5*dcell[2]), fg[:,:,:,2], bounds_error = False, fill_value = np.nan)
-   elif centering == 'edge':
-      interpolator_V_0 = interpolate.RegularGridInterpolator((x, y-0.5*dcell[1], z-0.5*dcell[2]), fg[:,:,:,0], bounds_error = False, fill_value = np.nan)
-      interpolator_V_1 = interpolate.RegularGridInterpolator((x-0.5*dcell[0], y, z-0.5*dcell[2]), fg[:,:,:,1], bounds_error = False, fill_value = np.nan)
-      interpolator_V_2 = interpolate.RegularGridInterpolator((x-0.5*dcell[0], y-0.5*dcell[1], z), fg[:,:,:,2], bounds_error = False, fill_value = np.nan)
-
-   interpolators = [interpolator_V_0, interpolator_V_1, interpolator_V_2]
-
-   # Trace vector field lines
-   points = seed_coords
-   points_traced = np.full((seed_coords.shape[0], max_iterations, 3), np.nan)
-
-   points_traced[:, 0,:] = seed_coords
-   mask_update = np.ones(seed_coords.shape[0], dtype = bool)
-
-   # points_traced = [np.array(seed_coords)]              # iteratively append traced trajectories to this list
-   # points = points_traced[0]
-   # N = len(list(seed_coords))
-   V_unit = np.zeros([seed_coords.shape[0], 3])
-   for i in range(1, max_iterations):
-      V_unit[:, 0] = interpolators[0](points)
-      V_unit[:, 1] = interpolators[1](points)
-      V_unit[:, 2] = interpolators[2](points)
-      V_mag = np.linalg.norm(V_unit, axis=(1))
-      V_unit = V_unit / V_mag[np.newaxis,:]
-      new_points = points + multiplier*V_unit * dx
-      points_traced[mask_update,i,:] = new_points[mask_update,:]
-
-      mask_update[stop_condition(vlsvReader, new_points)] = False
-      points = new_points
-      # points_traced[~mask_update, i, :] = points_traced[~mask_update, i-1, :]
-      
-   return points_traced
+
+   sampler = FgFieldSampler(vlsvReader, fg, centering)
+   lines = trace_field_lines(vlsvReader, seed_coords, max_iterations, dx, direction='-' if multiplier < 0 else '+',
+                             grid_var=sampler, method=method, stop_condition=stop_condition)
+   return lines.to_array(max_iterations)
 
 
 # vg tracing for static_field_tracer_3d
-def vg_trace(vlsvReader, vg, seed_coords, max_iterations, dx, multiplier, stop_condition):
+def vg_trace(vlsvReader, vg, seed_coords, max_iterations, dx, multiplier, stop_condition, method = 'euler'):
    # Search for the unique coordinates in the given seeds only
    unique_seed_coords,indices = np.unique(seed_coords, axis = 0, return_inverse = True)    # indice here is to reverse the coords order to initial
-   n_unique_seeds = unique_seed_coords.shape[0]
-   points_traced_unique = np.zeros((n_unique_seeds, max_iterations, 3))
-      
-   def find_unit_vector(vg, coord):
-      val_at_point = vlsvReader.read_interpolated_variable(vg,coord)
-      if val_at_point.ndim == 1:
-         val_at_point = val_at_point[np.newaxis, :]
-      val_mag = np.linalg.norm(val_at_point, axis = 1, keepdims = True)
-      return val_at_point/val_mag
-      
-   unique_seed_coords,indices = np.unique(seed_coords, axis = 0, return_inverse = True)    # indice here is to reverse the coords order to initial
-   n_unique_seeds = unique_seed_coords.shape[0]
-   points_traced_unique = np.full((n_unique_seeds, max_iterations, 3),np.nan)
 
-   Re = 6371000
-   mask_update = np.ones((n_unique_seeds,),dtype = bool) # A mask to determine if the points are still needed to trace further
-   points_traced_unique[:, 0, :] = unique_seed_coords
-
-
-   for i in range(1, max_iterations):
-
-      var_unit = find_unit_vector(vg, points_traced_unique[:, i-1, :])
-      next_points = points_traced_unique[:, i-1, :] + multiplier * dx * var_unit
-
-      points_traced_unique[mask_update,i,:] = next_points[mask_update,:]
-      # distances = np.linalg.norm(points_traced_unique[:,i,:],axis = 1)
-      mask_update[stop_condition(vlsvReader, points_traced_unique[:,i,:])] = False
-
-      # points_traced_unique[~mask_update, i, :] = points_traced_unique[~mask_update, i-1, :]
-
-   points_traced = points_traced_unique[indices,:,:]
+   sampler = VgFieldSampler(vlsvReader, vg)
+   lines = trace_field_lines(vlsvReader, unique_seed_coords, max_iterations, dx, direction='-' if multiplier < 0 else '+',
+                             grid_var=sampler, method=method, stop_condition=stop_condition)
+   points_traced = lines.to_array(max_iterations)[np.reshape(indices, -1),:,:]
    return points_traced
 
 # Default stop tracing condition for the vg tracing, (No stop until max_iteration)
@@ -306,9 +566,10 @@ def default_stopping_condition(vlsvReader, points):
    return (x < xmin)|(x > xmax) | (y < ymin)|(y > ymax) | (z < zmin)|(z > zmax)
    # return np.full((points.shape[0]), False)
 
-def static_field_tracer_3d( vlsvReader, seed_coords, max_iterations, dx, direction='+', grid_var = 'vg_b_vol', stop_condition = default_stopping_condition, centering = None ):
+def static_field_tracer_3d( vlsvReader, seed_coords, max_iterations, dx, direction='+', grid_var = 'vg_b_vol', stop_condition = default_stopping_condition, centering = None, method = 'euler', processes = 1 ):
    ''' static_field_tracer_3d() integrates along the (static) field-grid vector field to calculate a final position. 
-      Code uses forward Euler method to conduct the tracing.
+      Code uses forward Euler method to conduct the tracing by default, see keyword method.
+      For the termination reason of each line use trace_field_lines().
       Based on Analysator's static_field_tracer()
       :Inputs:
        
@@ -351,6 +612,11 @@ def static_field_tracer_3d( vlsvReader, seed_coords, max_iterations, dx, directi
                               If keyword fg == 'fg_b', then centering = 'face' (overriding input)
                               If keyword fg == 'fg_e', then centering = 'edge' (overriding input)
 
+      keyword method:        Integrator, 'euler' (default), 'rk4' or 'rk45' (adaptive step length, at most dx), see trace_field_lines()
+
+      keyword processes:     Number of worker processes to partition the seeds across, None for one per core [default 1]
+                              See trace_field_lines_parallel(), stop_condition has to be defined at module level.
+
       EXAMPLE:            vlsvobj = pytools.vlsvfile.VlsvReader(vlsvfile) 
                           fg_b = vlsvobj.read_variable('fg_b')
                           traces = static_field_tracer_3d( vlsvobj, [[5e7,0,0], [0,0,5e7]], 10, 1e5, direction='+', fg = fg_b )
@@ -372,8 +638,6 @@ def static_field_tracer_3d( vlsvReader, seed_coords, max_iterations, dx, directi
             break
          elif part.startswith("vg"):   
             vg = grid_var   
-            # neighbors_vg = vlsvReader.read_variable_to_cache("vg_regular_interp_neighbors")
-            vg_cache = vlsvReader.read_variable_to_cache(vg)
             break
       else:
          raise ValueError("Please give a valid string (eg. 'vg_b_vol')")
@@ -381,25 +645,29 @@ def static_field_tracer_3d( vlsvReader, seed_coords, max_iterations, dx, directi
       #   fg is already an ndarray
       if not isinstance(grid_var, np.ndarray):
          raise TypeError("Keyword parameter grid_var does not seem to be a string nor a numpy ndarray.")
-      elif fg.ndim!=4 or fg.shape[-1]!=3:
-         raise ValueError("Checking array supplied in grid_var keyword: fg[-1]={} (expected: 3), fg.ndim={} (expected: 4)".format(fg[-1], fg.ndim))
-      else:
-         raise TypeError("Unrecognized grid_var keyword data (expect string or numpy.ndarray)")
+      elif grid_var.ndim!=4 or grid_var.shape[-1]!=3:
+         raise ValueError("Checking array supplied in grid_var keyword: fg.shape[-1]={} (expected: 3), fg.ndim={} (expected: 4)".format(grid_var.shape[-1], grid_var.ndim))
+      fg = grid_var
          
    # Recursion (trace in both directions and concatenate the results)
    if direction == '+-':
-      backward = static_field_tracer_3d(vlsvReader, seed_coords, max_iterations, dx, direction='-', grid_var = grid_var, stop_condition = default_stopping_condition, centering = centering)
+      backward = static_field_tracer_3d(vlsvReader, seed_coords, max_iterations, dx, direction='-', grid_var = grid_var, stop_condition = stop_condition, centering = centering, method = method, processes = processes)
       # backward.reverse()
-      forward = static_field_tracer_3d(vlsvReader, seed_coords, max_iterations, dx, direction='+', grid_var = grid_var, stop_condition = default_stopping_condition, centering = centering)
+      forward = static_field_tracer_3d(vlsvReader, seed_coords, max_iterations, dx, direction='+', grid_var = grid_var, stop_condition = stop_condition, centering = centering, method = method, processes = processes)
       return np.concatenate((backward[:,::-1,:],forward[:, 1:, :]), axis = 1)
 
    multiplier = -1 if direction == '-' else 1   
+
+   if processes is None or processes > 1:
+      lines = trace_field_lines_parallel(vlsvReader, seed_coords, max_iterations, dx, direction=direction, grid_var=grid_var,
+                                         method=method, stop_condition=stop_condition, centering=centering, processes=processes)
+      return lines.to_array(max_iterations)
    
    if fg is not None:
-      points_traced = fg_trace(vlsvReader, fg, seed_coords, max_iterations, dx, multiplier, stop_condition, centering )
+      points_traced = fg_trace(vlsvReader, fg, seed_coords, max_iterations, dx, multiplier, stop_condition, centering, method )
    
    elif vg is not None:
-      points_traced = vg_trace(vlsvReader, vg, seed_coords, max_iterations, dx, multiplier, stop_condition)
+      points_traced = vg_trace(vlsvReader, vg, seed_coords, max_iterations, dx, multiplier, stop_condition, method)
 
 
    return points_traced       # list for fg; 3d numpy array(N,maxiterations,3) for vg
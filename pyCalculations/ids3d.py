@@ -1,21 +1,64 @@
 import numpy as np
 import logging
 
-# finds the cell ids which are needed to plot a 2d cut through out of a 3d mesh # WARNING! works only if cellids is sorted
-def ids3d(cellids, depth, reflevel,
-          xsize, ysize, zsize,
-          xmin=None, xmax=None,
-          ymin=None, ymax=None,
-          zmin=None, zmax=None):
-
-  # is the cut in x, y or z direction
-  if xmin != None and xmax != None:
-    imin = xmin; imax = xmax; size = xsize; sett = 0
-  elif ymin != None and ymax != None:
-    imin = ymin; imax = ymax; size = ysize; sett = 1
-  elif zmin != None and zmax != None:
-    imin = zmin; imax = zmax; size = zsize; sett = 2
-
+def _cell_indices(cellids, reflevel, xsize, ysize, zsize):
+  ''' Refinement levels and 1-based x, y and z indices of cells on their refinement level, and a mask of
+      the cells on levels up to reflevel.
+  '''
+  cellids = np.asarray(cellids, dtype=np.int64)
+  cells = int(xsize*ysize*zsize)
+  # cellsums[i] = the number of cells up to refinement level i
+  cellsums = np.cumsum([cells*8**i for i in range(reflevel+1)], dtype=np.int64)
+  levels = np.searchsorted(cellsums, cellids, side='left')
+  valid = (cellids > 0) & (levels <= reflevel)
+  levels = np.minimum(levels, reflevel)
+  local = cellids - (cellsums[levels] - cells*8**levels.astype(np.int64)) - 1
+  nx = xsize*2**levels
+  ny = ysize*2**levels
+  x = local % nx + 1 # goes from 1 to NX
+  y = (local // nx) % ny + 1 # goes from 1 to NY
+  z = local // (nx*ny) + 1 # goes from 1 to NZ
+  return levels, (x, y, z), valid
+
+def _pixel_map(levels, coordinates, sizes, reflevel):
+  ''' Maps the pixels of the finest-level grid to the cells covering them.
+
+      :param levels:      Refinement levels of the cells
+      :param coordinates: 1-based indices of the cells along each axis of the grid
+      :param sizes:       Number of level 0 cells along each axis of the grid
+      :returns: index of the covering cell of every pixel, and a mask of the pixels no cell covers (or None)
+  '''
+  dims = tuple(int(size*2**reflevel) for size in sizes)
+  ncells = len(levels)
+  pixels = np.zeros(dims, dtype=np.int32 if ncells < 2**31 else np.int64)
+  covered = np.zeros(dims, dtype=bool)
+  ndim = len(dims)
+  for i in range(reflevel+1):
+    cells = np.nonzero(levels == i)[0]
+    if len(cells) == 0:
+      continue
+    # every cell covers a block of 2**(reflevel-i) pixels along each axis
+    width = 2**(reflevel-i)
+    offsets = np.arange(width)
+    block = []
+    for d in range(ndim):
+      shape = [1]*(ndim+1)
+      shape[d+1] = width
+      block.append(((coordinates[d][cells] - 1)*width).reshape([len(cells)] + [1]*ndim) + offsets.reshape(shape))
+    block = tuple(block)
+    pixels[block] = cells.reshape([len(cells)] + [1]*ndim)
+    covered[block] = True
+  return pixels, (None if np.all(covered) else ~covered)
+
+def _rasterize(data, pixels, empty):
+  ''' Gathers the data of the cells onto their pixels, pixels without a cell are 0.
+  '''
+  dpoints = np.asarray(data)[pixels].astype(np.float64, copy=False)
+  if empty is not None:
+    dpoints[empty] = 0
+  return dpoints
+
+def _slice_depths(depth, reflevel, imin, imax, size):
   # find the cut through depths (index) for each refinement level
   pro = depth/(imax-imin)
   depths = []
@@ -25,206 +68,143 @@ def ids3d(cellids, depth, reflevel,
       logging.info("depth error, depth = " +str(depth) +"; i = "+str(i))
       depth -= 1
     depths.append(depth)
+  return np.array(depths, dtype=np.int64)
+
+def _slice_axis(xsize, ysize, zsize, xmin, xmax, ymin, ymax, zmin, zmax):
+  # is the cut in x, y or z direction
+  if xmin is not None and xmax is not None:
+    return 0, xmin, xmax, xsize
+  elif ymin is not None and ymax is not None:
+    return 1, ymin, ymax, ysize
+  elif zmin is not None and zmax is not None:
+    return 2, zmin, zmax, zsize
+
+# finds the cell ids which are needed to plot a 2d cut through out of a 3d mesh # WARNING! works only if cellids is sorted
+def ids3d(cellids, depth, reflevel,
+          xsize, ysize, zsize,
+          xmin=None, xmax=None,
+          ymin=None, ymax=None,
+          zmin=None, zmax=None):
+
+  sett, imin, imax, size = _slice_axis(xsize, ysize, zsize, xmin, xmax, ymin, ymax, zmin, zmax)
+  depths = _slice_depths(depth, reflevel, imin, imax, size)
 
   #############
   # find the ids
-  length = 0
-  cellids = np.array(cellids)
-  idlist = np.array([]); indexlist = np.array([])
+  cellids = np.asarray(cellids)
   cells = int(xsize*ysize*zsize); cellsum = cells; cellsumII = 0 # cellsum = (the number of cells up to refinement
   # level i); cellsumII = (the number of cells up to refinement level i-1)
+  indexlist = []
   for i in range(reflevel+1):
-    # cell ids at the refinement level i
-    ids = cellids[(cellsumII < cellids) & (cellids <= cellsum)]
-
-    # compute every cell ids x, y and z coordinates
-    z = (ids - cellsumII - 1)//(xsize*ysize*4**i) +1 # goes from 1 to NZ
-    #z = np.where(np.isclose(z, z.astype(int)), z, z + 1)
-    z = z.astype(int)
+    # the cellids are sorted, so the cells of refinement level i are a contiguous range
+    start, end = np.searchsorted(cellids, [cellsumII, cellsum], side='right')
+    ids = cellids[start:end].astype(np.int64) - cellsumII - 1
 
-    # cellsumB = (cellsumII + the number of ids up to the coordinate z in the refinement level i)
-    cellsumB = ((z-1)*xsize*ysize*4**i).astype(int) + cellsumII
-
-    y = (ids - cellsumB - 1)//(xsize*2**i) +1 # goes from 1 to NY
-    #y = np.where(y - y.astype(int) == 0, y, y + 1)
-    y = y.astype(int)
-
-    cellsumC = ((y-1)*xsize*2**i)
-    x = (ids - cellsumB - cellsumC).astype(int) # goes from 1 to NX
-
-    # checks is the cut throughs normal in x, y or z direction
+    # the index of every cell along the normal of the cut, from 1 to N
     if sett == 0:
-      xyz = x
+      xyz = ids % (xsize*2**i) + 1
     elif sett == 1:
-      xyz = y
+      xyz = (ids // (xsize*2**i)) % (ysize*2**i) + 1
     elif sett == 2:
-      xyz = z
+      xyz = ids // (xsize*ysize*4**i) + 1
 
-    # finds the needed elements to create the asked cut throuhg and puts the results in the indexlist and the idlist
-    elements = xyz == depths[i]
-    indexlist = np.append(indexlist, np.arange(length, length+len(xyz))[elements])
-    idlist = np.append(idlist, ids[elements])
+    # finds the needed elements to create the asked cut through
+    indexlist.append(start + np.nonzero(xyz == depths[i])[0])
 
     # update these values to match refinement level i+1
-    length += len(xyz)
     cellsumII = cellsum
     cellsum += cells*8**(i+1)
   # returns a list of ids (idlist) and a equivalent list of indices (indexlist)
-  return idlist.astype(int), indexlist.astype(int)
+  indexlist = np.concatenate(indexlist)
+  return cellids[indexlist].astype(int), indexlist.astype(int)
 
 # creates 2d grid for ploting
 def idmesh3d(idlist, data, reflevel, xsize, ysize, zsize, xyz, datadimension):
-  # is the cut in x, y or z direction
-  if xyz == 0:
-    dims = np.array([ysize, zsize]) * 2**reflevel
-  elif xyz == 1:
-    dims = np.array([xsize, zsize]) * 2**reflevel
-  elif xyz == 2:
-    dims = np.array([xsize, ysize]) * 2**reflevel
-  dims = dims.astype(int)
-
   # datadimension is None for scalar,
   # N for vector, and (N,M) for tensor data
-  if datadimension is None:
-    dpoints = np.zeros(dims)
-  elif np.ndim(datadimension) == 0:
-    dpoints = np.zeros(np.append(dims, datadimension).astype(int))
-  elif np.ndim(datadimension) == 1:
-    dpoints = np.zeros(np.append(dims, (datadimension[0], datadimension[1])).astype(int))
-  else:
+  if np.ndim(datadimension) > 1:
     logging.info("Error finding data dimension in idmesh3d")
     return -1
-
-  ######################
-  # create the plot grid
-  cells = int(xsize*ysize*zsize)
-  cellsum = cells # the number of cells up to refinement level i
-  cellsumII = 0 # the number of cells up to refinement level i-1
-  for i in range(reflevel+1):
-    # the cell ids and the data at the refinement level i
-    ids = idlist[(cellsumII < idlist) & (idlist <= cellsum)]
-    if datadimension is None:
-      dat = data[(cellsumII < idlist) & (idlist <= cellsum)]
-    elif np.ndim(datadimension) == 0:
-      dat = data[(cellsumII < idlist) & (idlist <= cellsum),:]
-    elif np.ndim(datadimension) == 1:
-      dat = data[(cellsumII < idlist) & (idlist <= cellsum),:,:]
-
-    # compute every cell ids x, y and z coordinates
-    z = (ids - cellsumII - 1)//(xsize*ysize*4**i) +1 # goes from 1 to NZ
-    #z = np.where(np.isclose(z, z.astype(int)), z, z + 1)
-    z = z.astype(int)
-
-    # cellsumB = (cellsumII + the number of ids up to the coordinate z in the refinement level i)
-    cellsumB = ((z-1)*xsize*ysize*4**i).astype(int) + cellsumII
-
-    y = (ids - cellsumB - 1)//(xsize*2**i) +1 # goes from 1 to NY
-    #y = np.where(y - y.astype(int) == 0, y, y + 1)
-    y = y.astype(int)
-
-    cellsumC = ((y-1)*xsize*2**i)
-    x = (ids - cellsumB - cellsumC).astype(int) # goes from 1 to NX
-
-    # gets the correct coordinate values and the widths for the plot
-    if xyz == 0:
-      a = y
-      b = z
-    elif xyz == 1:
-      a = x
-      b = z
-    elif xyz == 2:
-      a = x
-      b = y
-
-    # inserts the data values into dpoints
-    # Broadcasting magic for vectorization! Not quite a oneliner
-    # Skipping the declaration is actually faster but looks like hot garbage
-    coords = np.add(((np.stack((a, b)) - 1) * 2**(reflevel - i))[:, :, np.newaxis], np.array(np.meshgrid(np.arange(2**(reflevel-i)), np.arange(2**(reflevel-i)))).reshape(2, 1, -1))
-    dpoints[coords[0,:,:], coords[1, :, :]] = dat[:, np.newaxis]
-    #dpoints[np.add(((np.stack((a, b)) - 1) * 2**(reflevel - i))[:, :, np.newaxis], np.array(np.meshgrid(np.arange(2**(reflevel-i)), np.arange(2**(reflevel-i)))).reshape(2, 1, -1))[0,:,:], np.add(((np.stack((a, b)) - 1) * 2**(reflevel - i))[:, :, np.newaxis], np.array(np.meshgrid(np.arange(2**(reflevel-i)), np.arange(2**(reflevel-i)))).reshape(2, 1, -1))[1, :, :]] = dat[:, np.newaxis]
-    #for j in range(2**(reflevel-i)):
-    #  for k in range(2**(reflevel-i)):
-    #    if datadimension is None:
-    #      dpoints[(a - 1) * 2**(reflevel - i) + j, (b - 1) * 2**(reflevel - i) + k - 1] = dat
-    #    elif np.ndim(datadimension) == 0:
-    #      dpoints[(a - 1) * 2**(reflevel - i) + j - 1, (b - 1) * 2**(reflevel - i) + k - 1, :] = dat
-    #    elif np.ndim(datadimension) == 1:
-    #      dpoints[(a - 1) * 2**(reflevel - i) + j - 1, (b - 1) * 2**(reflevel - i) + k - 1, :, :] = dat
-
-    # update these values to match refinement level i+1
-    cellsumII = cellsum
-    cellsum += cells*8**(i+1)
-
-  return np.swapaxes(dpoints, 0, 1)
+  levels, coordinates, valid = _cell_indices(idlist, reflevel, xsize, ysize, zsize)
+  sizes = (xsize, ysize, zsize)
+  # plot grid axes (b, a): the two axes in the plane of the cut
+  a, b = [d for d in range(3) if d != xyz]
+  cells = np.nonzero(valid)[0]
+  pixels, empty = _pixel_map(levels[cells], (coordinates[b][cells], coordinates[a][cells]), (sizes[b], sizes[a]), reflevel)
+  return _rasterize(np.asarray(data)[cells], pixels, empty)
 
 # creates 3d grid for ploting
 def idmesh3d2(idlist, data, reflevel, xsize, ysize, zsize, datadimension):
-  # is the cut in x, y or z direction
-  dims = np.array([xsize, ysize, zsize]) * 2**reflevel
-  dims = dims.astype(int)
-  
   # datadimension is None for scalar,
   # N for vector, and (N,M) for tensor data
-  if datadimension is None:
-    dpoints = np.zeros(dims)
-  elif np.ndim(datadimension) == 0:
-    dpoints = np.zeros(np.append(dims, datadimension).astype(int))
-  elif np.ndim(datadimension) == 1:
-    dpoints = np.zeros(np.append(dims, (datadimension[0], datadimension[1])).astype(int))
-  else:
+  if np.ndim(datadimension) > 1:
     logging.info("Error finding data dimension in idmesh3d")
     return -1
-
-  ######################
-  # create the plot grid
-  cells = int(xsize*ysize*zsize)
-  cellsum = cells # the number of cells up to refinement level i
-  cellsumII = 0 # the number of cells up to refinement level i-1
-  for i in range(reflevel+1):
-    # the cell ids and the data at the refinement level i
-    ids = idlist[(cellsumII < idlist) & (idlist <= cellsum)]
-    if datadimension is None:
-      dat = data[(cellsumII < idlist) & (idlist <= cellsum)]
-    elif np.ndim(datadimension) == 0:
-      dat = data[(cellsumII < idlist) & (idlist <= cellsum),:]
-    elif np.ndim(datadimension) == 1:
-      dat = data[(cellsumII < idlist) & (idlist <= cellsum),:,:]
-
-    # compute every cell ids x, y and z coordinates
-    z = (ids - cellsumII - 1)//(xsize*ysize*4**i) +1 # goes from 1 to NZ
-    #z = np.where(np.isclose(z, z.astype(int)), z, z + 1)
-    z = z.astype(int)
-
-    # cellsumB = (cellsumII + the number of ids up to the coordinate z in the refinement level i)
-    cellsumB = ((z-1)*xsize*ysize*4**i).astype(int) + cellsumII
-
-    y = (ids - cellsumB - 1)//(xsize*2**i) +1 # goes from 1 to NY
-    #y = np.where(y - y.astype(int) == 0, y, y + 1)
-    y = y.astype(int)
-
-    cellsumC = ((y-1)*xsize*2**i)
-    x = (ids - cellsumB - cellsumC).astype(int) # goes from 1 to NX
-
-    # inserts the data values into dpoints
-    # Broadcasting magic for vectorization! Not quite a oneliner
-    # Skipping the declaration is actually faster but looks like hot garbage
-    coords = np.add(((np.stack((x, y, z)) - 1) * 2**(reflevel - i))[:, :, np.newaxis], np.array(np.meshgrid(np.arange(2**(reflevel-i)), np.arange(2**(reflevel-i)), np.arange(2**(reflevel-i)))).reshape(3, 1, -1))
-    dpoints[coords[0, :, :], coords[1, :, :], coords[2, :, :]] = dat[:, np.newaxis]
-    #dpoints[np.add(((np.stack((a, b)) - 1) * 2**(reflevel - i))[:, :, np.newaxis], np.array(np.meshgrid(np.arange(2**(reflevel-i)), np.arange(2**(reflevel-i)))).reshape(2, 1, -1))[0,:,:], np.add(((np.stack((a, b)) - 1) * 2**(reflevel - i))[:, :, np.newaxis], np.array(np.meshgrid(np.arange(2**(reflevel-i)), np.arange(2**(reflevel-i)))).reshape(2, 1, -1))[1, :, :]] = dat[:, np.newaxis]
-    #for j in range(2**(reflevel-i)):
-    #  for k in range(2**(reflevel-i)):
-    #    if datadimension is None:
-    #      dpoints[(a - 1) * 2**(reflevel - i) + j, (b - 1) * 2**(reflevel - i) + k - 1] = dat
-    #    elif np.ndim(datadimension) == 0:
-    #      dpoints[(a - 1) * 2**(reflevel - i) + j - 1, (b - 1) * 2**(reflevel - i) + k - 1, :] = dat
-    #    elif np.ndim(datadimension) == 1:
-    #      dpoints[(a - 1) * 2**(reflevel - i) + j - 1, (b - 1) * 2**(reflevel - i) + k - 1, :, :] = dat
-
-    # update these values to match refinement level i+1
-    cellsumII = cellsum
-    cellsum += cells*8**(i+1)
-
-  return dpoints #np.swapaxes(dpoints, 0, 1)
+  levels, coordinates, valid = _cell_indices(idlist, reflevel, xsize, ysize, zsize)
+  cells = np.nonzero(valid)[0]
+  pixels, empty = _pixel_map(levels[cells], [c[cells] for c in coordinates], (xsize, ysize, zsize), reflevel)
+  return _rasterize(np.asarray(data)[cells], pixels, empty)
+
+class SlicePlan(object):
+  ''' The cells of a 2d cut through a 3d AMR mesh and the pixels they cover on the finest-level plotting grid.
+
+      The plan is built once per mesh and cut, after which rasterizing a scalar, vector or tensor
+      variable onto the plotting grid is a single gather.
+
+      :param cellids:  Sorted cellids of the mesh
+      :param depth:    Distance of the cut from the lower boundary of the domain
+      :param reflevel: Refinement level of the plotting grid
+      :param xsize, ysize, zsize: Number of level 0 cells
+      :param xmin, xmax, ymin, ymax, zmin, zmax: Extent of the domain along the normal of the cut, as in ids3d
+      :param order:    Permutation sorting the cellids of the file (see CellIdIndex.order), needed for rasterize
+
+      .. code-block:: python
+
+         plan = ids3d.get_slice_plan(f, 2, abs(zmin), reflevel)
+         rhomap = plan.rasterize(f.read_variable("proton/vg_rho"))
+  '''
+  def __init__(self, cellids, depth, reflevel, xsize, ysize, zsize,
+               xmin=None, xmax=None, ymin=None, ymax=None, zmin=None, zmax=None, order=None):
+    self.reflevel = reflevel
+    self.xyz = _slice_axis(xsize, ysize, zsize, xmin, xmax, ymin, ymax, zmin, zmax)[0]
+    self.idlist, self.indexlist = ids3d(cellids, depth, reflevel, xsize, ysize, zsize,
+                                        xmin=xmin, xmax=xmax, ymin=ymin, ymax=ymax, zmin=zmin, zmax=zmax)
+    levels, coordinates, valid = _cell_indices(self.idlist, reflevel, xsize, ysize, zsize)
+    sizes = (xsize, ysize, zsize)
+    a, b = [d for d in range(3) if d != self.xyz]
+    # pixels[j,i] is the index in idlist of the cell covering the pixel, self.empty the pixels no cell covers
+    self.pixels, self.empty = _pixel_map(levels, (coordinates[b], coordinates[a]), (sizes[b], sizes[a]), reflevel)
+    self.shape = self.pixels.shape
+    self.file_pixels = None if order is None else np.asarray(order)[self.indexlist][self.pixels]
+
+  def rasterize(self, data):
+    ''' Rasterizes the data of all cells, in file order, onto the plotting grid.
+
+        :param data: Array with the cells on the first axis, e.g. from read_variable
+        :returns: Array of shape self.shape + data.shape[1:], zero outside the cells of the cut
+    '''
+    return _rasterize(data, self.file_pixels, self.empty)
+
+  def rasterize_cells(self, data):
+    ''' Rasterizes the data of the cells of the cut, ordered as idlist, onto the plotting grid.
+    '''
+    return _rasterize(data, self.pixels, self.empty)
+
+def get_slice_plan(vlsvReader, xyz, depth, reflevel):
+  ''' Returns the SlicePlan of a cut of the file, shared by all files with the same mesh.
+
+      :param vlsvReader: VlsvReader of the file
+      :param xyz:        Normal of the cut, 0, 1 or 2 for x, y or z
+      :param depth:      Distance of the cut from the lower boundary of the domain
+      :param reflevel:   Refinement level of the plotting grid
+  '''
+  [xsize, ysize, zsize] = [int(size) for size in vlsvReader.get_spatial_mesh_size()]
+  extent = vlsvReader.get_spatial_mesh_extent()
+  bounds = {"xyz"[xyz]+"min": extent[xyz], "xyz"[xyz]+"max": extent[xyz+3]}
+  def build():
+    index = vlsvReader.get_cellid_index()
+    return SlicePlan(index.sorted_cellids, depth, reflevel, xsize, ysize, zsize, order=index.order, **bounds)
+  return vlsvReader.get_mesh_structure(("slice_plan", xyz, depth, reflevel), build, ordered=True)
 
 # find the highest refinement level
 def refinement_level(xsize, ysize, zsize, bigid):
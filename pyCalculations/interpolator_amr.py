@@ -1,7 +1,6 @@
 from scipy.spatial import Delaunay
 import numpy as np
 from scipy.interpolate import LinearNDInterpolator
-from operator import itemgetter
 # from time import time
 import warnings
 import logging
@@ -16,6 +15,13 @@ except Exception as e:
       def __init__(self, pts, vals, **kwargs):
          raise importerror #Exception("Module load error")
    
+try:
+   from numba import njit, prange
+   numba_available = True
+except ImportError:
+   numba_available = False
+   prange = range
+
 
 
 # With values fi at hexahedral vertices and trilinear basis coordinates ksi,
@@ -98,56 +104,145 @@ def df(ksii, fii):
    res = np.stack((d0,d1,d2),axis = -1)
    return res
 
+# Closed-form solution of a stack of 3x3 systems A x = b through the adjugate of A.
+# Singular systems give non-finite solutions.
+def solve3(A, b):
+   a00, a01, a02 = A[:,0,0], A[:,0,1], A[:,0,2]
+   a10, a11, a12 = A[:,1,0], A[:,1,1], A[:,1,2]
+   a20, a21, a22 = A[:,2,0], A[:,2,1], A[:,2,2]
+   c00 = a11*a22 - a12*a21
+   c01 = a12*a20 - a10*a22
+   c02 = a10*a21 - a11*a20
+   with np.errstate(divide='ignore', invalid='ignore'):
+      inv_det = 1.0/(a00*c00 + a01*c01 + a02*c02)
+      x = np.empty_like(b)
+      x[:,0] = (c00*b[:,0] + (a02*a21 - a01*a22)*b[:,1] + (a01*a12 - a02*a11)*b[:,2])*inv_det
+      x[:,1] = (c01*b[:,0] + (a00*a22 - a02*a20)*b[:,1] + (a02*a10 - a00*a12)*b[:,2])*inv_det
+      x[:,2] = (c02*b[:,0] + (a01*a20 - a00*a21)*b[:,1] + (a00*a11 - a01*a10)*b[:,2])*inv_det
+   return x
+
+# Point-by-point Newton iteration, compiled with Numba when it is available. Same iteration and
+# stopping rules as the vectorized find_ksi, the result is written to ksi (n,3).
+def _find_ksi_points(p, v_coords, tol, maxiters, ksi):
+   for n in prange(p.shape[0]):
+      ksi[n,0] = np.nan
+      ksi[n,1] = np.nan
+      ksi[n,2] = np.nan
+      x = 0.5
+      y = 0.5
+      z = 0.5
+      for it in range(maxiters+1):
+         mx = 1-x
+         my = 1-y
+         mz = 1-z
+         r0 = -p[n,0]
+         r1 = -p[n,1]
+         r2 = -p[n,2]
+         j00 = 0.0; j01 = 0.0; j02 = 0.0
+         j10 = 0.0; j11 = 0.0; j12 = 0.0
+         j20 = 0.0; j21 = 0.0; j22 = 0.0
+         for k in range(8):
+            wx = x if k & 1 else mx
+            wy = y if k & 2 else my
+            wz = z if k & 4 else mz
+            sx = 1.0 if k & 1 else -1.0
+            sy = 1.0 if k & 2 else -1.0
+            sz = 1.0 if k & 4 else -1.0
+            N = wx*wy*wz
+            dx = sx*wy*wz
+            dy = wx*sy*wz
+            dz = wx*wy*sz
+            vx = v_coords[n,k,0]
+            vy = v_coords[n,k,1]
+            vz = v_coords[n,k,2]
+            r0 += N*vx
+            r1 += N*vy
+            r2 += N*vz
+            j00 += dx*vx; j01 += dy*vx; j02 += dz*vx
+            j10 += dx*vy; j11 += dy*vy; j12 += dz*vy
+            j20 += dx*vz; j21 += dy*vz; j22 += dz*vz
+         if it > 0:
+            bounded = np.sqrt(x*x + y*y + z*z) <= 1e2
+            if bounded and np.sqrt(r0*r0 + r1*r1 + r2*r2) < tol:
+               ksi[n,0] = x
+               ksi[n,1] = y
+               ksi[n,2] = z
+               break
+            if not bounded:
+               break
+         if it == maxiters:
+            break
+         c00 = j11*j22 - j12*j21
+         c01 = j12*j20 - j10*j22
+         c02 = j10*j21 - j11*j20
+         det = j00*c00 + j01*c01 + j02*c02
+         if det == 0.0:
+            break
+         x -= (c00*r0 + (j02*j21 - j01*j22)*r1 + (j01*j12 - j02*j11)*r2)/det
+         y -= (c01*r0 + (j00*j22 - j02*j20)*r1 + (j02*j10 - j00*j12)*r2)/det
+         z -= (c02*r0 + (j01*j20 - j00*j21)*r1 + (j00*j11 - j01*j10)*r2)/det
+
+if numba_available:
+   _find_ksi_points = njit(parallel=True, cache=True)(_find_ksi_points)
+
 # For hexahedral vertices verts and point p, find the trilinear basis coordinates ksi
 # that interpolate the coordinates of verts to the tolerance tol.
 # This is an iterative procedure. Return nans in case of no convergence.
-def find_ksi(p, v_coords, tol= .1, maxiters = 200):
-   p = np.atleast_2d(p)
-   v_coords = np.atleast_3d(v_coords)
-   ksi0 = np.full_like(p, 0.5)
-   J = df(ksi0, v_coords)
-   # logging.info("J", J)
-   ksi_n = ksi0
-   ksi_n1 = np.full_like(ksi0, np.nan)
-   f_n =  f(ksi_n,v_coords)
-   # logging.info(f_n.shape, p.shape)
-   # logging.info(f_n)
-   f_n = f_n - p
-
-   resolved = np.full((p.shape[0],),False, dtype=bool)
-   diverged = np.full((p.shape[0],),False, dtype=bool)
-   
-   for i in range(maxiters):
-      
-      J[~resolved,:,:] = df(ksi_n[~resolved,:], v_coords[~resolved,:,:])
-      f_n[~resolved,:] = f(ksi_n[~resolved,:],v_coords[~resolved,:,:])-p[~resolved,:]
-      step = np.linalg.solve(J[~resolved,:,:], -f_n[~resolved,:])
-      ksi_n1[~resolved,:] = step + ksi_n[~resolved,:] # r_(n+1) 
-      ksi_n[~resolved,:] = ksi_n1[~resolved,:]
-      
-      resolved[~resolved] = (np.linalg.norm(f(ksi_n1[~resolved,:],v_coords[~resolved,:,:]) - p[~resolved,:],axis=1) < tol)
-      resolved[~resolved] = np.linalg.norm(ksi_n1[~resolved,:],axis=1) > 1e2 # Don't bother if the solution is diverging either, set to nans later
-         # convergence = True
-      if np.all(resolved):
+# Newton iteration on the active points only: points are removed from the batch as soon as they
+# converge or diverge (|ksi| > 1e2), and the 3x3 systems are solved in closed form.
+# use_numba: None uses the compiled point-by-point solver if Numba is available.
+def find_ksi(p, v_coords, tol= .1, maxiters = 200, use_numba = None):
+   p = np.atleast_2d(np.asarray(p, dtype=float))
+   v_coords = np.asarray(v_coords, dtype=float)
+   if v_coords.ndim == 2:
+      v_coords = v_coords[np.newaxis,:,:]
+   ksi = np.full_like(p, np.nan)
+
+   if use_numba is None:
+      use_numba = numba_available
+   if use_numba:
+      if not numba_available:
+         raise ImportError("use_numba requires Numba")
+      _find_ksi_points(np.ascontiguousarray(p), np.ascontiguousarray(v_coords), float(tol), int(maxiters), ksi)
+      return ksi
+
+   # x(ksi) - p = c0 + c1 k0 + c2 k1 + c3 k2 + c4 k0 k1 + c5 k0 k2 + c6 k1 k2 + c7 k0 k1 k2
+   v = v_coords
+   coeffs = np.stack((v[:,0] - p, v[:,1]-v[:,0], v[:,2]-v[:,0], v[:,4]-v[:,0],
+                      v[:,3]-v[:,2]-v[:,1]+v[:,0], v[:,5]-v[:,4]-v[:,1]+v[:,0], v[:,6]-v[:,4]-v[:,2]+v[:,0],
+                      v[:,7]-v[:,6]-v[:,5]-v[:,3]+v[:,4]+v[:,2]+v[:,1]-v[:,0]), axis=0)
+
+   active = np.arange(p.shape[0])
+   ksi_a = np.full_like(p, 0.5)
+   J = np.empty((p.shape[0],3,3))
+   for i in range(maxiters+1):
+      x, y, z = ksi_a[:,0,np.newaxis], ksi_a[:,1,np.newaxis], ksi_a[:,2,np.newaxis]
+      residual = coeffs[0] + coeffs[1]*x + coeffs[2]*y + coeffs[3]*z + (coeffs[4]*y + coeffs[5]*z + coeffs[7]*y*z)*x + coeffs[6]*y*z
+      if i > 0:
+         # Don't bother if the solution is diverging either, nans for those
+         diverged = ~(np.einsum('ij,ij->i', ksi_a, ksi_a) <= 1e4)
+         converged = (np.einsum('ij,ij->i', residual, residual) < tol*tol) & ~diverged
+         ksi[active[converged]] = ksi_a[converged]
+         done = converged | diverged
+         if np.any(done):
+            keep = ~done
+            active = active[keep]
+            if len(active) == 0:
+               break
+            coeffs = coeffs[:,keep]
+            ksi_a = ksi_a[keep]
+            residual = residual[keep]
+            J = J[:len(active)]
+            x, y, z = ksi_a[:,0,np.newaxis], ksi_a[:,1,np.newaxis], ksi_a[:,2,np.newaxis]
+      if i == maxiters:
          break
-         # diverged = np.linalg.norm(ksi_n1,axis=1) > 1e2
-         # ksi_n1[diverged,:] = np.nan
-         # # logging.info("All converged in ", i, "iterations")
-         # return ksi_n1
-      
+      J[:,:,0] = coeffs[1] + coeffs[4]*y + coeffs[5]*z + coeffs[7]*y*z
+      J[:,:,1] = coeffs[2] + coeffs[4]*x + coeffs[6]*z + coeffs[7]*x*z
+      J[:,:,2] = coeffs[3] + coeffs[5]*x + coeffs[6]*y + coeffs[7]*x*y
+      ksi_a = ksi_a + solve3(J, -residual)
+
+   return ksi
 
-   if np.all(resolved):
-      # logging.info("Converged after ", i, "iterations")
-      diverged = np.linalg.norm(ksi_n1,axis=1) > 1e2
-      ksi_n1[diverged,:] = np.nan
-      return ksi_n1
-   else:
-      # warnings.warn("Generalized trilinear interpolation did not converge for " + str(np.sum(~convergence)) + " points. Nans inbound.")
-      diverged = np.linalg.norm(ksi_n1,axis=1) > 1e2
-      ksi_n1[diverged,:] = np.nan
-      ksi_n1[~resolved,:] = np.nan
-      return ksi_n1
-      
 class HexahedralTrilinearInterpolator(object):
    ''' Class for doing general hexahedral interpolation, including degenerate hexahedra (...eventually).
    '''
@@ -172,7 +267,8 @@ class HexahedralTrilinearInterpolator(object):
          #    duals.append(d)
          #    ksis.append(ksi)
          duals, ksis = self.reader.get_dual(pts, cellids)
-         duals_corners = np.array(itemgetter(*duals)(self.reader._VlsvReader__dual_cells))
+         duals_corners = self.reader.get_dual_cells(duals)
+         duals_corners[np.any(np.isnan(ksis),axis=1),:] = 1 # no dual found, values are nan anyway
          fi = self.reader.read_variable(self.var, duals_corners.reshape(-1), operator=self.operator)
          if(fi.ndim == 2):
             val_len = fi.shape[1]
@@ -201,14 +297,14 @@ class HexahedralTrilinearInterpolator(object):
             if dual is None:
                vals.append(np.nan)
             else:
-               # dual_corners = self.reader._VlsvReader__dual_cells[dual]
+               # dual_corners = self.reader.get_dual_cells([dual])[0]
                dual_corners = duals_corners[i]
                fp = f(ksi, self.reader.read_variable(self.var, np.array(dual_corners), operator=self.operator)[np.newaxis,:])
                vals.append(fp)
          return np.array(vals)
       else:
          dual, ksi = self.reader.get_dual(pt)
-         dual_corners = self.__dual_cells[dual]
+         dual_corners = self.reader.get_dual_cells([dual])[0]
          fp = f(ksi, self.reader.read_variable(self.var, np.array(dual_corners), operator=self.operator)[np.newaxis,:])
          return fp
 
@@ -68,27 +68,26 @@ def vlsv_intpol_points(vlsvReader,points,varlist,operator="pass",interpolation_o
       logging.info("ERROR: len(points) = 0")
       return
    header = "x y z cellid " # header string
+   # The interpolation stencils of the points are shared by all the variables
+   if interpolation_order==1:
+      plan = vlsvReader.get_interpolation_plan(points, method="linear")
+   else:
+      plan = vlsvReader.get_interpolation_plan(points, method="nearest")
+   crds=np.array(plan.coordinates, dtype=float) # coordinates
+   cellids=np.zeros((N_points,1)) # cell ids
+   cellids[:,0] = plan.closest_cellids
+   outside = cellids[:,0] == 0 # coordinates of a point out of domain
    for i in range(N_vars): # loop variable list
       var = varlist[i]
       if vlsvReader.check_variable(var) == False:
          logging.info("ERROR: variable " + var + " does not exist in file " + vlsvReader.file_name)
          return
-      dim=len(np.atleast_1d(vlsvReader.read_interpolated_variable(var,points[0],operator))) # variable dimensions
+      values=np.reshape(plan.apply(var,operator), (N_points,-1))
+      dim=values.shape[1] # variable dimensions
       if dim <= 0:
          logging.info("ERROR: bad variable dimension (dim=" + str(dim) + ")")
          return
-      values=np.zeros((N_points,dim))
-      crds=np.zeros((N_points,3)) # coordinates
-      cellids=np.zeros((N_points,1)) # cell ids
-      for j in range(N_points):
-         cellids[j] = vlsvReader.get_cellid(points[j])
-         if cellids[j] == 0: # coordinates of a point out of domain
-            values[j]=np.ones(dim)*np.nan
-         elif interpolation_order==1:
-            values[j]=vlsvReader.read_interpolated_variable(var,points[j],operator)
-         elif interpolation_order==0:
-            values[j]=vlsvReader.read_variable(var,cellids[j],operator)
-         crds[j]=points[j]
+      values[outside]=np.nan
       if i==0:
          res=values
       else:
@@ -6,160 +6,363 @@ import logging
 
 import random
 
+# g_M^p is summed over the empty velocity cells where it is above exp(-_empty_space_cutoff) times its peak
+_empty_space_cutoff = 60.0
+# number of velocity cells at which the model is evaluated at once
+_empty_space_chunk = 2**20
+
+# names of velocity moments in the bulk file
+_moment_names = {"n":"/vg_rho", "v0":"/vg_v", "v0_para":"/vg_v_parallel", "v0_perp":"/vg_v_perpendicular",
+                 "T":"/vg_temperature", "T_perp":"/vg_t_perpendicular", "T_para":"/vg_t_parallel"}
+
 def epsilon_M(f,cell,pop="proton",m=m_p, bulk=None, B=None,
                 model="bimaxwellian",
                 normorder=1, norm=2, threshold=0,
-                dummy=None):
+                dummy=None, sparse=True):
 
     ''' Calculates the 'non-maxwellianity' parameter for a distribution function f_i and its corresponding Maxwellian g_M.
-    
+
     :param f:           VlsvReader containing VDF data
     :param cell:        CellID for the queried cell
 
     :kword pop:         Population to calculate the parameter for
     :kword m:           Species mass (default: m_p)
-    :kword bulk:        Bulk file name to use for moments (if available and needed)
+    :kword bulk:        Bulk file name or VlsvReader to use for moments (if available and needed)
     :kword B:           Optional, user-given magnetic field vector for a bimaxwellian model distribution
     :kword model:       VDF model to be used. Available models "maxwellian", "bimaxwellian" (default)
     :kword normorder:   Norm used for model-data distance measure (default: 1)
     :kword norm:        Constant norm (default 2, see below)
     :kword threshold:   Disregard vspace cells under this threshold [0]
     :kword dummy:       If not None, generate dummy data for e.g. integration.
+    :kword sparse:      If True (default), evaluate the model only over the stored velocity blocks and the
+                        empty velocity cells around the model distribution, leaving out the cells where the
+                        model is negligible. If False, evaluate the model over the whole velocity mesh.
 
     :returns:           scalar, non-Maxwellianity parameter for given model and norm
 
     The definition is given by Graham et al. (2021):
-    (1/2n) * integral(\\|f_i - g_M\\|) d^3v    
-    
+    (1/2n) * integral(\\|f_i - g_M\\|) d^3v
+
     valued between 0 (bi-Maxwellian) and 1 (complete deviation from a bi-Maxwellian).
-    
-    NOTE that this is different to the definition by Greco et al. (2012):
-    (1/n) * sqrt(integral((f_i - g_M)^2) d^3v)    
-    
-    examples comparing these two definitions can be found in Settino et al. (2021).
 
+    NOTE that this is different to the definition by Greco et al. (2012):
+    (1/n) * sqrt(integral((f_i - g_M)^2) d^3v)
 
+    examples comparing these two definitions can be found in Settino et al. (2021).
 
-    
+    .. seealso:: :func:`epsilon_M_batch` for whole files
     '''
     if dummy is not None:
         warnings.warn("Generating dummy value for non-Maxwellianity!")
         return random.random()
     # try getting the distribution from the given cell
-    size = f.get_velocity_mesh_size(pop)
-    distribution = np.zeros(4 * 4 * 4 * int(size[0]) * int(size[1]) * int(size[2]))
     try:
-        D = f.read_velocity_cells(cell, pop)
-        D_keys = list(D.keys())
-        D_vals = list(D.values())
-        distribution[D_keys] = D_vals
-        distribution[distribution<threshold] = 0
+        blocks, D_vals, vs = f.read_velocity_cells_array(cell, pop)
+        D_vals = D_vals.ravel()
     except:
         warnings.warn("Could not get VDF from bulk file!")
         return -1
-     # calculate non-maxwellianity
-
-    # names of velocity moments in the bulk file
-    n_name = pop+'/vg_rho'         
-    v_name = pop+'/vg_v'
-    v_para_name = pop+'/vg_v_parallel'
-    v_perp_name = pop+'/vg_v_perpendicular'
-    T_name = pop+'/vg_temperature'
-    T_perp_name = pop+'/vg_t_perpendicular'
-    T_para_name = pop+'/vg_t_parallel'
+    if len(blocks) == 0:
+        warnings.warn("Could not get VDF from bulk file!")
+        return -1
 
-    dV = np.prod(f.get_velocity_mesh_dv(pop))
-    # generate a velocity space 
-    vids = np.arange(4 * 4 * 4 * int(size[0]) * int(size[1]) * int(size[2]))
-    v = f.get_velocity_cell_coordinates(vids, pop)
-    vs = f.get_velocity_cell_coordinates(vids[D_keys],pop)
+    if bulk is not None and not isinstance(bulk, pt.vlsvfile.VlsvReader):
+        bulk = pt.vlsvfile.VlsvReader(bulk)
 
     if B is None:
-        try:
-            logging.info("No B vector given, trying a restart reducer from " + f.file_name)
-            B = f.read_variable("B",cellids=cell)
-        except:
-            logging.info("No restart B found, trying for vg_b_vol from " + f.file_name)
-            try:
-                B = f.read_variable("vg_b_vol",cellids=cell)
-            except:
-                logging.info("No vg_b_vol available either")
-        if bulk is not None and B is None:
-            try:
-                logging.info("Trying to load vg_b_vol from given bulk file "+bulk)
-                bulkfile_for_moments_reader=pt.vlsvfile.VlsvReader(bulk)
-                B = bulkfile_for_moments_reader.read_variable("vg_b_vol",cellids=cell)
-            except:
-                logging.info("Could not load vg_b_vol from bulk file "+bulk)
+        B = _read_B(f, bulk, [cell])
         if B is None:
             warnings.warn("No B found, cannot proceed at cellid "+str(cell))
             return -1
+    B = np.reshape(np.asarray(B, dtype=float), (1,3))
 
+    moments = None
     if bulk is not None:
-        try:
-            # get velocity moments from bulk file
-            bulkfile_for_moments_reader=pt.vlsvfile.VlsvReader(bulk)
-            n = bulkfile_for_moments_reader.read_variable(n_name,cellids=cell)
-            v0 = bulkfile_for_moments_reader.read_variable(v_name,cellids=cell)
-            v0_para = bulkfile_for_moments_reader.read_variable(v_para_name,cellids=cell)
-            v0_perp = bulkfile_for_moments_reader.read_variable(v_perp_name,cellids=cell)
-
-            T = bulkfile_for_moments_reader.read_variable(T_name,cellids=cell)
-            T_para = bulkfile_for_moments_reader.read_variable(T_para_name,cellids=cell)
-            T_perp = bulkfile_for_moments_reader.read_variable(T_perp_name,cellids=cell)
-            # Generate a parallel-perpedicular coordinate basis and corresponding velocity array
-            bhat = B/np.linalg.norm(B)
-            vperp2hat = np.cross(bhat,v0)/np.linalg.norm(np.cross(bhat,v0))
-            vperp1hat = np.cross(vperp2hat, bhat)/np.linalg.norm(np.cross(vperp2hat,bhat))
-
-            calc_moments = False
+        moments = _read_moments(bulk, pop, [cell])
 
-        except:
-            logging.info("Could not get moments from bulk file " + bulk + ". Calculating them from the VDF..")
-            calc_moments = True
+    dV = np.prod(f.get_velocity_mesh_dv(pop))
+    starts = np.zeros(1, dtype=np.int64)
+    params = _model_parameters(D_vals, vs, starts, dV, B, moments, m)
+     # calculate non-maxwellianity
+    if sparse:
+        return _epsilon_M_sparse(D_vals, vs, starts, dV, params, m, model, normorder, norm, threshold, _velocity_mesh(f, pop))[0]
+
+    # generate the whole velocity space
+    size = f.get_velocity_mesh_size(pop)
+    WID = f.get_WID()
+    distribution = np.zeros(WID**3 * int(size[0]) * int(size[1]) * int(size[2]))
+    WID3 = WID**3
+    distribution[(blocks.astype(np.int64)[:,np.newaxis]*WID3 + np.arange(WID3)).ravel()] = D_vals
+    distribution[distribution<threshold] = 0
+    v = f.get_velocity_cell_coordinates(np.arange(len(distribution)), pop)
+    model_f = _model_f(v, np.zeros(len(v), dtype=np.int64), params, m, model)
+
+    n = params[0][0]
+    epsilon = np.linalg.norm(distribution - model_f, ord=normorder)
+    epsilon *= dV / (norm * n)
+
+    return epsilon
+
+def epsilon_M_batch(reader, cellids=None, pop="proton", m=m_p, bulk=None, B=None,
+                    model="bimaxwellian", normorder=1, norm=2, threshold=0,
+                    chunk_cells=256, processes=1):
+
+    ''' Calculates the 'non-maxwellianity' parameter (see :func:`epsilon_M`) for many cells of a file.
+
+    The magnetic field and the bulk moments of all cells are read in one go, the VDFs are read
+    chunk_cells cells at a time and the model distribution is only evaluated over the stored
+    velocity blocks and the empty velocity cells where it is not negligible.
+
+    :param reader:      VlsvReader or file name of a file containing VDF data
+    :kword cellids:     CellIDs to process (default: every cell with a VDF for the population)
+    :kword pop:         Population to calculate the parameter for
+    :kword m:           Species mass (default: m_p)
+    :kword bulk:        Bulk file name or VlsvReader to use for moments (if available)
+    :kword B:           Optional, user-given magnetic field, a single vector or one vector per cell
+    :kword model:       VDF model to be used. Available models "maxwellian", "bimaxwellian" (default)
+    :kword normorder:   Norm used for model-data distance measure (default: 1)
+    :kword norm:        Constant norm (default 2)
+    :kword threshold:   Disregard vspace cells under this threshold [0]
+    :kword chunk_cells: Number of cells whose VDFs are read and processed at once
+    :kword processes:   Number of worker processes, None for one per CPU (default: 1)
+
+    :returns:           tuple (cellids, epsilon), where epsilon is -1 for cells that could not be processed
+
+    .. code-block:: python
+
+       f = pt.vlsvfile.VlsvReader("bulk.0001000.vlsv")
+       cellids, eps = pt.calculations.epsilon_M_batch(f, processes=8)
+    '''
+    if not isinstance(reader, pt.vlsvfile.VlsvReader):
+        reader = pt.vlsvfile.VlsvReader(reader)
+    if bulk is not None and not isinstance(bulk, pt.vlsvfile.VlsvReader):
+        bulk = pt.vlsvfile.VlsvReader(bulk)
+    if cellids is None:
+        cellids = reader.read(mesh="SpatialGrid", tag="CELLSWITHBLOCKS", name=pop)
+    cellids = np.atleast_1d(cellids)
+    epsilon = np.full(len(cellids), -1.0)
+    if len(cellids) == 0:
+        return cellids, epsilon
+
+    if B is None:
+        B = _read_B(reader, bulk, cellids)
+        if B is None:
+            warnings.warn("No B found, cannot proceed")
+            return cellids, epsilon
+    B = np.array(np.broadcast_to(np.asarray(B, dtype=float), (len(cellids),3)))
+
+    moments = None
+    if bulk is not None:
+        moments = _read_moments(bulk, pop, cellids)
+
+    tasks = []
+    for start in range(0, len(cellids), chunk_cells):
+        chunk = slice(start, start+chunk_cells)
+        chunk_moments = None if moments is None else {name:values[chunk] for name, values in moments.items()}
+        tasks.append((cellids[chunk], B[chunk], chunk_moments, pop, m, model, normorder, norm, threshold))
+
+    if processes is None or processes > 1:
+        from multiprocessing import Pool
+        with Pool(processes, initializer=_init_worker, initargs=(reader,)) as pool:
+            results = pool.map(_epsilon_M_worker, tasks)
     else:
-        calc_moments = True
-
-    # calculate moments from VDF if bulk is None, or moments could not be fetched from the bulk file
-    if calc_moments:
-        n = np.sum(np.array(D_vals))*dV
-        v0 = np.average(vs, axis=0,weights=np.array(D_vals)*dV)
-        # Generate a parallel-perpedicular coordinate basis and corresponding velocity array
-        bhat = B/np.linalg.norm(B)
-        vperp2hat = np.cross(bhat,v0)/np.linalg.norm(np.cross(bhat,v0))
-        vperp1hat = np.cross(vperp2hat, bhat)/np.linalg.norm(np.cross(vperp2hat,bhat))
-        
-        R = np.array([bhat, vperp1hat, vperp2hat])
-        vsb = np.matmul(R,vs.T).T
-        vsb_mean = np.matmul(R,v0.T).T
-        v0_para = vsb_mean[0]
-        v0_perp = vsb_mean[1]
-
-        P_diag = m * np.sum((vsb - vsb_mean) * (vsb - vsb_mean) * np.array(D_vals)[:,np.newaxis],axis=0) * dV
-        T = np.sum(P_diag) / (3.0 * n * k)
-        T_para = P_diag[0] / (n * k)
-        T_perp = (P_diag[1] + P_diag[2]) / (2.0 * n * k)
-        
-    R = np.array([bhat, vperp1hat, vperp2hat])
-    vb_mean = np.matmul(R,v0.T).T
-    vb = np.matmul(R,v.T).T
-    
-    vT_para = np.sqrt(2 * k * T_para / m)
-     
+        results = [_epsilon_M_chunk(reader, *task) for task in tasks]
+
+    return cellids, np.concatenate(results)
+
+_worker_reader = None
+
+def _init_worker(reader):
+    global _worker_reader
+    _worker_reader = reader
+
+def _epsilon_M_worker(task):
+    return _epsilon_M_chunk(_worker_reader, *task)
+
+def _epsilon_M_chunk(reader, cellids, B, moments, pop, m, model, normorder, norm, threshold):
+    ''' Calculates epsilon_M for a chunk of cells with one batched VDF read.
+    '''
+    epsilon = np.full(len(cellids), -1.0)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        cells = reader.read_velocity_cells_array(cellids, pop)
+    counts = np.array([values.size for _, values, _ in cells], dtype=np.int64)
+    valid = (counts > 0) & np.all(np.isfinite(B), axis=-1) & (np.linalg.norm(B, axis=-1) > 0)
+    if not np.any(valid):
+        return epsilon
+
+    D_vals = np.concatenate([cells[i][1].ravel() for i in np.flatnonzero(valid)])
+    vs = np.concatenate([cells[i][2] for i in np.flatnonzero(valid)])
+    starts = np.zeros(np.count_nonzero(valid), dtype=np.int64)
+    starts[1:] = np.cumsum(counts[valid])[:-1]
+    if moments is not None:
+        moments = {name:values[valid] for name, values in moments.items()}
+
+    dV = np.prod(reader.get_velocity_mesh_dv(pop))
+    params = _model_parameters(D_vals, vs, starts, dV, B[valid], moments, m)
+    epsilon[valid] = _epsilon_M_sparse(D_vals, vs, starts, dV, params, m, model, normorder, norm, threshold,
+                                        _velocity_mesh(reader, pop))
+    return epsilon
+
+def _read_B(f, bulk, cellids):
+    ''' Reads the magnetic field of the given cells, first from f and then from the bulk file.
+        Returns an array of shape (len(cellids), 3) or None.
+    '''
+    readers = [(f, "B"), (f, "vg_b_vol")]
+    if bulk is not None:
+        readers.append((bulk, "vg_b_vol"))
+    for reader, name in readers:
+        try:
+            B = reader.read_variable(name, cellids=cellids)
+            return np.reshape(np.asarray(B, dtype=float), (len(cellids),3))
+        except:
+            logging.info("No " + name + " found in " + reader.file_name)
+    return None
+
+def _read_moments(bulk, pop, cellids):
+    ''' Reads the velocity moments of the given cells from a bulk file, or returns None if
+        they are not available.
+    '''
+    try:
+        moments = {name:np.asarray(bulk.read_variable(pop+suffix, cellids=cellids), dtype=float)
+                   for name, suffix in _moment_names.items()}
+        moments["v0"] = np.reshape(moments["v0"], (len(cellids),3))
+        for name in moments:
+            if name != "v0":
+                moments[name] = np.reshape(moments[name], (len(cellids),))
+        return moments
+    except:
+        logging.info("Could not get moments from bulk file " + bulk.file_name + ". Calculating them from the VDF..")
+        return None
+
+def _model_parameters(D_vals, vs, starts, dV, B, moments, m):
+    ''' Returns the model distribution parameters (n, v0, R, v0_para, v0_perp, T, T_para, T_perp)
+        of every cell. The values and velocities of the cells are stored one after another in
+        D_vals and vs, starting at the indices starts. R is the rotation to the field-aligned
+        basis (bhat, vperp1hat, vperp2hat). Moments are taken from the moments dictionary if
+        given, and calculated from the VDF otherwise.
+    '''
+    # Generate a parallel-perpedicular coordinate basis
+    def basis(v0):
+        bhat = B/np.linalg.norm(B, axis=-1)[:,np.newaxis]
+        vperp2hat = np.cross(bhat,v0)
+        vperp2hat /= np.linalg.norm(vperp2hat, axis=-1)[:,np.newaxis]
+        vperp1hat = np.cross(vperp2hat, bhat)
+        vperp1hat /= np.linalg.norm(vperp1hat, axis=-1)[:,np.newaxis]
+        return np.stack((bhat, vperp1hat, vperp2hat), axis=1)
+
+    if moments is not None:
+        R = basis(moments["v0"])
+        return (moments["n"], moments["v0"], R, moments["v0_para"], moments["v0_perp"],
+                moments["T"], moments["T_para"], moments["T_perp"])
+
+    seg = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, len(D_vals))))
+    f_sum = np.add.reduceat(D_vals, starts)
+    n = f_sum*dV
+    v0 = np.add.reduceat(vs*D_vals[:,np.newaxis], starts, axis=0) / f_sum[:,np.newaxis]
+    R = basis(v0)
+    vsb = np.einsum("nij,nj->ni", R[seg], vs)
+    vsb_mean = np.einsum("nij,nj->ni", R, v0)
+
+    P_diag = m * np.add.reduceat((vsb - vsb_mean[seg])**2 * D_vals[:,np.newaxis], starts, axis=0) * dV
+    T = np.sum(P_diag, axis=-1) / (3.0 * n * k)
+    T_para = P_diag[:,0] / (n * k)
+    T_perp = (P_diag[:,1] + P_diag[:,2]) / (2.0 * n * k)
+    return n, v0, R, vsb_mean[:,0], vsb_mean[:,1], T, T_para, T_perp
+
+def _model_f(v, seg, params, m, model):
+    ''' Evaluates the model distribution of cell seg[i] at the velocity v[i].
+    '''
+    n, v0, R, v0_para, v0_perp, T, T_para, T_perp = params
     # generate a maxwellian distribution
     if model == "maxwellian":
-        v_sq = np.sum((v - v0) * (v - v0), axis=-1)
-        model_f = n * (0.5 * m / (np.pi * k * T)) ** 1.5 * np.exp(-0.5 * m * v_sq / (k * T))
+        v_sq = np.sum((v - v0[seg])**2, axis=-1)
+        return n[seg] * (0.5 * m / (np.pi * k * T[seg])) ** 1.5 * np.exp(-0.5 * m * v_sq / (k * T[seg]))
     elif model == "bimaxwellian": # Graham et al 2021
-        model_f = n * T_para / (np.pi**1.5 * vT_para**3 * T_perp) * np.exp(
-        -(vb[:,0] - v0_para)**2/vT_para**2
-        -((vb[:,1] - v0_perp)**2 + vb[:,2]**2)/(vT_para**2 * (T_perp/T_para))
+        vb = np.einsum("nij,nj->ni", R[seg], v)
+        vT_para = np.sqrt(2 * k * T_para / m)[seg]
+        T_ratio = (T_perp/T_para)[seg]
+        return n[seg] / (np.pi**1.5 * vT_para**3 * T_ratio) * np.exp(
+        -(vb[:,0] - v0_para[seg])**2/vT_para**2
+        -((vb[:,1] - v0_perp[seg])**2 + vb[:,2]**2)/(vT_para**2 * T_ratio)
         )
     else:
         raise NameError("Unknown VDF model '"+model+"', aborting")
 
-    epsilon = np.linalg.norm(distribution - model_f, ord=normorder)
-    epsilon *= dV / (norm * n)
+def _velocity_mesh(f, pop):
+    ''' Returns the velocity mesh geometry (vmin, dv, WID, ncells) of the population, where ncells is
+        the number of velocity cells along each axis.
+    '''
+    WID = f.get_WID()
+    return (f.get_velocity_mesh_extent(pop)[:3], f.get_velocity_mesh_dv(pop), WID,
+            f.get_velocity_mesh_size(pop).astype(np.int64)*WID)
 
-    return epsilon
+def _empty_space_sum(vs, starts, params, m, model, p, mesh):
+    ''' Sum of g_M^p over the velocity cells without stored data for every cell.
+        The model is evaluated over the cells of the mesh around its centre where g_M^p is above
+        exp(-_empty_space_cutoff) times its peak value, excluding the stored cells. The cells outside
+        this box add less than the double precision rounding error to the sum.
+    '''
+    n, v0, R, v0_para, v0_perp, T, T_para, T_perp = params
+    vmin, dv, WID, ncells = mesh
+    # centre and variance along the mesh axes of the model distribution
+    if model == "maxwellian":
+        centre = v0
+        variance = np.repeat((2 * k * T / m)[:,np.newaxis], 3, axis=1)
+    elif model == "bimaxwellian":
+        vT_para2 = 2 * k * T_para / m
+        vT_perp2 = vT_para2 * T_perp / T_para
+        centre = np.einsum("nji,nj->ni", R, np.stack((v0_para, v0_perp, np.zeros(len(n))), axis=-1))
+        variance = np.einsum("nji,nj->ni", R**2, np.stack((vT_para2, vT_perp2, vT_perp2), axis=-1))
+    else:
+        raise NameError("Unknown VDF model '"+model+"', aborting")
+    halfwidth = np.sqrt(_empty_space_cutoff / p * variance)
+    with np.errstate(invalid="ignore"):
+        lo = np.clip(np.floor((centre - halfwidth - vmin) / dv), 0, ncells)
+        hi = np.clip(np.floor((centre + halfwidth - vmin) / dv) + 1, 0, ncells)
+    # grid indices of the stored cells, the coordinates are cell centres
+    stored_index = np.floor((vs - vmin) / dv).astype(np.int64)
+    ends = np.append(starts[1:], len(vs))
+
+    empty = np.zeros(len(starts))
+    for i in range(len(starts)):
+        if not (np.all(np.isfinite(lo[i])) and np.all(np.isfinite(hi[i]))):
+            empty[i] = np.nan
+            continue
+        lo_i = lo[i].astype(np.int64)
+        shape = hi[i].astype(np.int64) - lo_i
+        if np.any(shape <= 0):
+            continue
+        # velocity cell centres as in VlsvReader.get_velocity_cell_coordinates
+        axes = []
+        for d in range(3):
+            g = np.arange(lo_i[d], lo_i[d] + shape[d])
+            axes.append((g // WID) * dv[d] * WID + vmin[d] + (g % WID + 0.5) * dv[d])
+        local = stored_index[starts[i]:ends[i]] - lo_i
+        inside = np.all((local >= 0) & (local < shape), axis=-1)
+        stored = np.zeros(shape, dtype=bool)
+        stored[tuple(local[inside].T)] = True
+        slab = max(1, _empty_space_chunk // (shape[1] * shape[2]))
+        for x in range(0, shape[0], slab):
+            v = np.stack(np.meshgrid(axes[0][x:x+slab], axes[1], axes[2], indexing="ij"), axis=-1).reshape(-1,3)
+            model_f = _model_f(v, np.full(len(v), i), params, m, model)
+            empty[i] += np.sum(model_f[~stored[x:x+slab].ravel()]**p)
+    return empty
 
+def _epsilon_M_sparse(D_vals, vs, starts, dV, params, m, model, normorder, norm, threshold, mesh):
+    ''' Non-maxwellianity of every cell, evaluating the model only over the stored velocity cells
+        and the part of the empty velocity space where it is not negligible. Empty velocity space
+        contributes |0 - g_M|^p.
+    '''
+    if not (np.isfinite(normorder) and normorder > 0):
+        raise ValueError("Sparse non-maxwellianity needs a finite positive normorder, use sparse=False")
+    seg = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, len(D_vals))))
+    model_f = _model_f(vs, seg, params, m, model)
+    distribution = np.where(D_vals < threshold, 0, D_vals)
+
+    p = normorder
+    stored = np.add.reduceat(np.abs(distribution - model_f)**p, starts)
+    empty = _empty_space_sum(vs, starts, params, m, model, p, mesh)
+    epsilon = (stored + empty)**(1.0/p)
+    epsilon *= dV / (norm * params[0])
+    return epsilon
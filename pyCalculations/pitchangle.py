@@ -161,12 +161,11 @@ def pitch_angles( vlsvReader,
       vcutoffmax = np.inf
 
    # Read the velocity cells:
-   velocity_cell_data = vlsvReader.read_velocity_cells(cellid, pop=pop)
-   vcellids = list(velocity_cell_data.keys())
-   avgs = list(velocity_cell_data.values())
+   velocity_blocks, avgs, v = vlsvReader.read_velocity_cells_array(cellid, pop=pop)
+   avgs = avgs.ravel()
 
    # Transform to a frame
-   v = vlsvReader.get_velocity_cell_coordinates(vcellids, pop=pop) - frame
+   v = v - frame
 
    # Get the angles:
    v_norms = np.linalg.norm(v,axis=-1)
@@ -190,7 +189,7 @@ def pitch_angles( vlsvReader,
 
    # Clip negative avgs to zero
    # (Some elements may be negative due to ghost cell propagation effects)
-   avgs = np.array(avgs).clip(min=0) * dv3
+   avgs = avgs.clip(min=0) * dv3
 
    # Mask off cells below threshold
    cond1 = (v_norms > vcutoff)
@@ -52,22 +52,54 @@ def rotateArrayTensorToVector( Tensor, vector ):
 
       :param Tensor:          n x 3 x 3 element array (n  3x3 Tensors to be rotated)
       :param vector:          n x 3 element array (n Vectors for creating the rotation matrix)
-      :returns: n x 3 x 3 element array of rotated tensors
+      :returns: n x 3 x 3 element array of rotated tensors, masked where the vector is zero
+
+      .. seealso:: :func:`rotation_array_matrix_to_z`
    '''
-   vector_u = np.cross(vector, np.array([0.,0.,1.])[np.newaxis,:])
-   vector_u_len = np.ma.masked_less_equal(np.linalg.norm(vector_u, axis=-1), 0)
-   vector_u = np.ma.divide(vector_u, vector_u_len[:,np.newaxis])
-   vector_len = np.ma.masked_less_equal(np.linalg.norm(vector, axis=-1), 0)
-   vector_n = np.ma.divide(vector,vector_len[:,np.newaxis])
-   angle = np.arccos(vector_n[:,2])
-   # A unit vector version of the given vector
-   R = rotation_array_matrix( vector_u, angle )
+   Tensor = np.asarray(Tensor).reshape(-1,3,3)
+   R, invalid = rotation_array_matrix_to_z(vector)
    # Rotate Tensor
-   # matmul requires numpy 1.10 or newer. Can use einsum instead.
-   #Tensor_rotated = np.matmul(np.matmul(R,Tensor),np.transpose(R,(0,2,1)) )
-   Tensor_rotated = np.einsum('...ij,...jk', np.einsum('...ij,...jk',R,Tensor),np.transpose(R,(0,2,1)) )
+   Tensor_rotated = np.ma.masked_array(np.matmul(np.matmul(R,Tensor), np.transpose(R,(0,2,1))))
+   if np.any(invalid):
+      Tensor_rotated[invalid] = np.ma.masked
    return Tensor_rotated
 
+def rotation_array_matrix_to_z( vector ):
+   '''
+      Creates the rotation matrices that rotate the given vectors onto the z-axis around the axis
+      vector x z. The matrices are built in closed form from the unit vectors b, without evaluating
+      any trigonometric functions:
+
+         R = [[c + by^2/(1+c), -bx by/(1+c),   -bx],
+              [-bx by/(1+c),   c + bx^2/(1+c), -by],
+              [bx,             by,              c ]],   c = bz
+
+      Vectors pointing along -z are rotated by pi around the x-axis.
+
+      :param vector:          n x 3 element array of vectors
+      :returns: (n x 3 x 3 array of rotation matrices, boolean array marking zero vectors)
+   '''
+   vector = np.asarray(vector, dtype=float).reshape(-1,3)
+   vector_len = np.linalg.norm(vector, axis=-1)
+   invalid = ~(vector_len > 0)
+   b = vector / np.where(invalid, 1, vector_len)[:,np.newaxis]
+   bx, by, c = b[:,0], b[:,1], b[:,2]
+   antiparallel = ~(c > -1)
+   k = 1.0 / np.where(antiparallel, 1, 1 + c)
+   R = np.empty((len(b),3,3))
+   R[:,0,0] = c + by*by*k
+   R[:,0,1] = -bx*by*k
+   R[:,0,2] = -bx
+   R[:,1,0] = R[:,0,1]
+   R[:,1,1] = c + bx*bx*k
+   R[:,1,2] = -by
+   R[:,2,0] = bx
+   R[:,2,1] = by
+   R[:,2,2] = c
+   R[antiparallel] = np.diag([1.,-1.,-1.])
+   R[invalid] = np.identity(3)
+   return R, invalid
+
 def rotateVectorToVector( vector1, vector2 ):
    ''' Applies rotation matrix that would rotate vector2 to z-axis on vector1 and then returns the rotated vector1
 
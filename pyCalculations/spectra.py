@@ -60,17 +60,14 @@ def get_spectrum_energy(vlsvReader,
       fMin = vlsvReader.read_variable(population+'/vg_effectivesparsitythreshold',cid)
 
    #logging.info('Cell ' + str(cid).zfill(9))
-   velcells = vlsvReader.read_velocity_cells(cid, population)
-   V = vlsvReader.get_velocity_cell_coordinates(list(velcells.keys()), pop=population)
+   velblocks, f, V = vlsvReader.read_velocity_cells_array(cid, population)
    V2 = np.sum(np.square(V),1)
    JtoeV = 1/1.60217662e-19
    Ekin = 0.5*mass*V2*JtoeV
-   f = list(zip(*velcells.items()))
-
 
    # check that velocity space has cells - still return a zero histogram in the same shape
-   if(len(f) > 0):
-      f = np.asarray(f[1])
+   if(len(velblocks) > 0):
+      f = f.ravel()
    else:
       return (False,np.zeros(nBins), EkinBinEdges)
    ii_f = np.where(np.logical_and(f >= fMin, Ekin > 0))
@@ -123,7 +120,7 @@ def get_spectrum_energy(vlsvReader,
    #Ekin[Ekin > max(EkinBinEdges)] = max(EkinBinEdges)
 
    # compute histogram
-   (nhist,edges) = np.histogram(Ekin,bins=EkinBinEdges,weights=fw,normed=0)
+   (nhist,edges) = np.histogram(Ekin,bins=EkinBinEdges,weights=fw)
 
    if (bindifferential): # finish differential flux per d(eV)
       nhist = np.divide(nhist,dE)
@@ -187,15 +184,13 @@ def get_spectrum_alongaxis_vel(vlsvReader,
       fMin = vlsvReader.read_variable(population+'/vg_effectivesparsitythreshold',cid)
 
    #logging.info('Cell ' + str(cid).zfill(9))
-   velcells = vlsvReader.read_velocity_cells(cid, population)
-   V = vlsvReader.get_velocity_cell_coordinates(list(velcells.keys()), pop=population)
+   velblocks, f, V = vlsvReader.read_velocity_cells_array(cid, population)
    V2 = np.sum(np.square(V),1)
    Vproj = np.dot(V,vector) # safe because "vector" is a 1-D array
-   f = list(velcells.values())
 
    # check that velocity space has cells - still return a zero histogram in the same shape
-   if(len(f) > 0):
-      f = np.asarray(f)
+   if(len(velblocks) > 0):
+      f = f.ravel()
    else:
       return (False,np.zeros(nBins), VBinEdges)
    ii_f = np.where(f >= fMin)
@@ -229,7 +224,7 @@ def get_spectrum_alongaxis_vel(vlsvReader,
       latex=r'$f(\vec{r},v)$'
       weight = 'particles'
 
-   (nhist,edges) = np.histogram(Vproj,bins=VBinEdges,weights=fw,normed=0)
+   (nhist,edges) = np.histogram(Vproj,bins=VBinEdges,weights=fw)
    # normalization
    dv = abs(VBinEdges[1:] - VBinEdges[:-1])
    if (differential): # differential flux per [m/s]
@@ -25,6 +25,7 @@
 
 import numpy as np
 import logging
+import pytools as pt
 
 def cell_time_evolution( vlsvReader_list, variables, cellids, units="" ):
    ''' Returns variable data from a time evolution of some certain cell ids
@@ -67,30 +68,19 @@ def cell_time_evolution( vlsvReader_list, variables, cellids, units="" ):
       units=[ "" for i in range(len(variables))]
    #construct data 
    data = [[] for i in range(len(parameters)+len(cellids)*len(variables))]
-   for t in range(len(vlsvReader_list)):
-      # Get the vlsv reader
-      vlsvReader = vlsvReader_list[t]
-      # Open the vlsv reader's file:
-      vlsvReader.optimize_open_file()
-      #go through parameters
-      for j in range(len(parameters)):
-         # Read the parameter
-         # Save the data into the right slot in the data array:
-         data[j].append(vlsvReader.read_parameter( parameters[j]))
-
-      # Go through variables:
-      for j in range(len(variables)):
-         variable = variables[j]
-         # Read the variable for all cell ids
-         #variables_for_cellids = vlsvReader.read_variables_for_cellids( variable, cellids )
-         # Save the data into the right slot in the data array:
-         for i in range(len(cellids)):
-            data[len(parameters)+i*len(variables)+j].append(vlsvReader.read_variable( variable, cellids[i] ))
-      # For optimization purposes we are now freeing vlsvReader's memory
-      # Note: Upon reading data vlsvReader created an internal hash map that takes a lot of memory
+   # Read each variable once per file for all cell ids, files with unchanged CellIDs share one CellID index
+   series = pt.vlsvfile.VlsvTimeSeries(vlsvReader_list)
+   for j in range(len(parameters)):
+      data[j] = list(series.read_parameter(parameters[j]))
+   values = series.read_variables(variables, cellids)
+   for j in range(len(variables)):
+      for i in range(len(cellids)):
+         cell_values = values[j][:,i,:]
+         data[len(parameters)+i*len(variables)+j] = list(cell_values[:,0] if cell_values.shape[1] == 1 else cell_values)
+   # For optimization purposes we are now freeing vlsvReader's memory
+   # Note: Upon reading data vlsvReader created an internal hash map that takes a lot of memory
+   for vlsvReader in vlsvReader_list:
       vlsvReader.optimize_clear_fileindex_for_cellid()
-      # Close the vlsv reader's file:
-      vlsvReader.optimize_close_file()
    from output import output_1d
    return output_1d( data, 
                      parameters +  [variables[(int)(i)%(int)(len(variables))] for i in range(len(data)-len(parameters))], 
@@ -242,18 +242,13 @@ class MayaviGrid(HasTraits):
       cells = np.array([self.vlsvReader.read_parameter("xcells_ini"), self.vlsvReader.read_parameter("ycells_ini"), self.vlsvReader.read_parameter("zcells_ini")])
       maxs = np.array([self.vlsvReader.read_parameter("xmax"), self.vlsvReader.read_parameter("ymax"), self.vlsvReader.read_parameter("zmax")])
       # Get the variables:
-      index_for_cellid_dict = self.vlsvReader.get_cellid_locations()
+      cellid_index = self.vlsvReader.get_cellid_index()
       if isinstance(variable, str):
          variable_array = self.vlsvReader.read_variable( name=variable, operator=operator )
       else:
          variable_array = variable
-      # Sort the dictionary by cell id
-      import operator as oper
-      sorted_index_for_cellid_dict = sorted(index_for_cellid_dict.items(), key=oper.itemgetter(0))
-      # Add the variable values:
-      variable_array_sorted = []
-      for i in sorted_index_for_cellid_dict:
-         variable_array_sorted.append(variable_array[i[1]])
+      # Sort the variable values by cell id
+      variable_array_sorted = list(np.asarray(variable_array)[cellid_index.order])
       # Store the mins and maxs:
       self.__mins = mins
       self.__maxs = maxs
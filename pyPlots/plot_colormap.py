@@ -36,6 +36,7 @@ from matplotlib.ticker import LogLocator
 from matplotlib.patches import Circle, Wedge
 import matplotlib.ticker as mtick
 import colormaps as cmaps
+from timestepcache import timestep_cache
 from matplotlib.cbook import get_sample_data
 from mpl_toolkits.axes_grid1.inset_locator import inset_axes
 from packaging.version import Version
@@ -168,6 +169,8 @@ def plot_colormap(filename=None,
                             a dictionary of numpy arrays as for regular pass_vars. An additional dictionary entry is
                             added as 'dstep' which gives the timestep offset from the master frame.
                             Does not work if working from a vlsv-object.
+                            The maps of the timesteps are kept in pt.plot.timestep_cache, so plotting the next
+                            frame of a sequence only reads the file entering the time window.
         :kword pass_full:   Set to anything but None in order to pass the full arrays instead of a zoomed-in section
 
         :kword fluxfile:    Filename to plot fluxfunction from
@@ -637,24 +640,37 @@ def plot_colormap(filename=None,
             logging.info("Invalid value given to pass_times")
             return
         # Loop over requested times
+        filenamesteps = []
         for ds in dsteps:
             if diff:
                 if ds==0:
-                    filenamestep = filename
+                    filenamesteps.append(filename)
                 else:
-                    filenamestep = diff
+                    filenamesteps.append(diff)
             else:
                 # Construct using known filename.
-                filenamestep = filename[:-12]+str(currstep+ds).rjust(7,'0')+'.vlsv'
+                filenamesteps.append(filename[:-12]+str(currstep+ds).rjust(7,'0')+'.vlsv')
+        # Maps of the steps shared with the previous plot are taken from the cache,
+        # so only the files entering the time window are read
+        timestep_cache.slide(filenamesteps)
+        slicekey = (tuple(sizes), (MaskX[0], MaskX[-1], MaskY[0], MaskY[-1]) if np.ma.is_masked(maskgrid) else None)
+        for ds, filenamestep in zip(dsteps, filenamesteps):
+            if not diff:
                 logging.info(filenamestep)
-            fstep=pt.vlsvfile.VlsvReader(filenamestep)
-            step_cellids = fstep.read_variable("CellID")
+            fstep = None
             # Append new dictionary as new timestep
             pass_maps.append({})
             # Add relative step identifier to dictionary
             pass_maps[-1]['dstep'] = ds
             # Gather the required variable maps
             for mapval in pass_vars:
+                pass_map = timestep_cache.get(filenamestep, (mapval,)+slicekey)
+                if pass_map is not None:
+                    pass_maps[-1][mapval] = pass_map
+                    continue
+                if fstep is None:
+                    fstep=pt.vlsvfile.VlsvReader(filenamestep)
+                    step_cellids = fstep.read_variable("CellID")
                 if mapval.startswith('fg_'):
                     pass_map = fstep.read_fsgrid_variable(mapval)
                     pass_map = np.swapaxes(pass_map, 0,1)
@@ -686,6 +702,7 @@ def plot_colormap(filename=None,
                         pass_map = pass_map[:,MaskY[0]:MaskY[-1]+1,:,:]
                     else:
                         logging.info("Error in masking pass_maps!") 
+                timestep_cache.put(filenamestep, (mapval,)+slicekey, pass_map)
                 pass_maps[-1][mapval] = pass_map # add to the dictionary
 
     # colorbar title for diffs:
@@ -41,6 +41,7 @@ from mpl_toolkits.axes_grid1.inset_locator import inset_axes
 from packaging.version import Version
 
 import ids3d
+from timestepcache import timestep_cache
 from packaging.version import Version
 
 def plot_colormap3dslice(filename=None,
@@ -167,6 +168,8 @@ def plot_colormap3dslice(filename=None,
                             a dictionary of numpy arrays as for regular pass_vars. An additional dictionary entry is
                             added as 'dstep' which gives the timestep offset from the master frame.
                             Does not work if working from a vlsv-object.
+                            The maps of the timesteps are kept in pt.plot.timestep_cache, so plotting the next
+                            frame of a sequence only reads the file entering the time window.
         :kword pass_full:   Set to anything but None in order to pass the full arrays instead of a zoomed-in section
 
         :kword diff:        Instead of a regular plot, plot the difference between the selected plot type for
@@ -431,7 +434,6 @@ def plot_colormap3dslice(filename=None,
     zsize = int(zsize)    
     [xmin, ymin, zmin, xmax, ymax, zmax] = f.get_spatial_mesh_extent()
     cellsize = (xmax-xmin)/xsize
-    cellids = f.read_variable("CellID")
 
     # Read the FSgrid mesh
     try:
@@ -453,9 +455,10 @@ def plot_colormap3dslice(filename=None,
             logging.info("Found 2D DCCRG mesh without FSgrid data. Exiting.")
             return -1
 
-    # sort the cellid and the datamap list
-    indexids = cellids.argsort()
-    cellids = cellids[indexids]
+    # sort the cellid and the datamap list, with the sorting permutation of the CellID index shared by files of the same mesh
+    cellid_index = f.get_cellid_index()
+    indexids = cellid_index.order
+    cellids = cellid_index.sorted_cellids
 
     # find the highest refiment level
     reflevel = ids3d.refinement_level(xsize, ysize, zsize, cellids[-1])
@@ -485,7 +488,7 @@ def plot_colormap3dslice(filename=None,
         sliceoffset = abs(xmin) + cutpoint
         fgslice[0] = int(sliceoffset/cellsizefg)
         xyz = 0
-        idlist, indexlist = ids3d.ids3d(cellids, sliceoffset, reflevel, xsize, ysize, zsize, xmin=xmin, xmax=xmax)
+        plan = ids3d.get_slice_plan(f, xyz, sliceoffset, reflevel)
         axislabels = ['Y','Z']
         slicelabel = r"X={:4.1f}\,".format(cutpoint/Re)+pt.plot.rmstring('R')+'_'+pt.plot.rmstring('E')+r"$\qquad $"
         pt.plot.plot_helpers.PLANE = 'YZ'
@@ -495,7 +498,7 @@ def plot_colormap3dslice(filename=None,
         sliceoffset = abs(ymin) + cutpoint
         fgslice[1] = int(sliceoffset/cellsizefg)
         xyz = 1
-        idlist, indexlist = ids3d.ids3d(cellids, sliceoffset, reflevel, xsize, ysize, zsize, ymin=ymin, ymax=ymax)
+        plan = ids3d.get_slice_plan(f, xyz, sliceoffset, reflevel)
         axislabels = ['X','Z']
         slicelabel = r"Y={:4.1f}\,".format(cutpoint/Re)+pt.plot.rmstring('R')+'_'+pt.plot.rmstring('E')+r"$\qquad $"
         pt.plot.plot_helpers.PLANE = 'XZ'
@@ -505,7 +508,7 @@ def plot_colormap3dslice(filename=None,
         sliceoffset = abs(zmin) + cutpoint
         fgslice[2] = int(sliceoffset/cellsizefg)
         xyz = 2
-        idlist, indexlist = ids3d.ids3d(cellids, sliceoffset, reflevel, xsize, ysize, zsize, zmin=zmin, zmax=zmax)
+        plan = ids3d.get_slice_plan(f, xyz, sliceoffset, reflevel)
         axislabels = ['X','Y']
         slicelabel = r"Z={:4.1f}\,".format(cutpoint/Re)+pt.plot.rmstring('R')+'_'+pt.plot.rmstring('E')+r"$\qquad $"
         pt.plot.plot_helpers.PLANE = 'XY'
@@ -556,10 +559,8 @@ def plot_colormap3dslice(filename=None,
         # No rhomap found - do not perform any masking.
         nomask = True
     if not nomask:
-        rhomap = rhomap[indexids] # sort
-        rhomap = rhomap[indexlist] # find required cells
         # Create the plotting grid
-        rhomap = ids3d.idmesh3d(idlist, rhomap, reflevel, xsize, ysize, zsize, xyz, None)
+        rhomap = plan.rasterize(rhomap)
 
     ############################################
     # Read data and calculate required variables
@@ -615,18 +616,11 @@ def plot_colormap3dslice(filename=None,
 
         else:
             # vlasov grid, AMR
-            datamap = datamap[indexids] # sort
-            datamap = datamap[indexlist] # find required cells
-            # Create the plotting grid
-            if np.ndim(datamap)==1:
-                datamap = ids3d.idmesh3d(idlist, datamap, reflevel, xsize, ysize, zsize, xyz, None)
-            elif np.ndim(datamap)==2:
-                datamap = ids3d.idmesh3d(idlist, datamap, reflevel, xsize, ysize, zsize, xyz, datamap.shape[1])
-            elif np.ndim(datamap)==3:
-                datamap = ids3d.idmesh3d(idlist, datamap, reflevel, xsize, ysize, zsize, xyz, (datamap.shape[1],datamap.shape[2]))
-            else:
+            if np.ndim(datamap) > 3:
                 logging.info("Dimension error in constructing 2D AMR slice!")
                 return -1
+            # Create the plotting grid
+            datamap = plan.rasterize(datamap)
     else:
         # Expression set, use generated or provided colorbar title
         cb_title_use = expression.__name__ + operatorstr
@@ -742,8 +736,8 @@ def plot_colormap3dslice(filename=None,
                 else:
                     # vlasov grid, AMR
                     pass_map = f.read_variable(mapval)
-                    pass_map = pass_map[indexids] # sort
                     if pass3d:
+                        pass_map = pass_map[indexids] # sort
                         if np.ndim(pass_map)==1:
                             pass_shape = None
                         elif np.ndim(pass_map)==2: # vector variable
@@ -753,17 +747,12 @@ def plot_colormap3dslice(filename=None,
                         else:
                             logging.info("Error in reshaping pass_maps!")
                         pass_map = ids3d.idmesh3d2(cellids, pass_map, meshReflevel, xsize, ysize, zsize, pass_shape)
+                    elif meshReflevel == plan.reflevel:
+                        pass_map = plan.rasterize(pass_map)
                     else:
-                        pass_map = pass_map[indexlist] # find required cells
-                        if np.ndim(pass_map)==1:
-                            pass_shape = None
-                        elif np.ndim(pass_map)==2: # vector variable
-                            pass_shape = pass_map.shape[1]
-                        elif np.ndim(pass_map)==3:  # tensor variable
-                            pass_shape = (pass_map.shape[1], pass_map.shape[2])
-                        else:
-                            logging.info("Error in reshaping pass_maps!")
-                        pass_map = ids3d.idmesh3d(idlist, pass_map, meshReflevel, xsize, ysize, zsize, xyz, pass_shape)
+                        pass_map = pass_map[indexids][plan.indexlist] # find required cells
+                        pass_shape = None if np.ndim(pass_map)==1 else (pass_map.shape[1] if np.ndim(pass_map)==2 else pass_map.shape[1:])
+                        pass_map = ids3d.idmesh3d(plan.idlist, pass_map, meshReflevel, xsize, ysize, zsize, xyz, pass_shape)
                         
                 # At this point, the map has been ordered into a 2D or 3D image
                 if np.ma.is_masked(maskgrid) and not pass3d:
@@ -800,31 +789,25 @@ def plot_colormap3dslice(filename=None,
                 logging.info("Invalid value given to pass_times")
                 return
             # Loop over requested times
+            filenamesteps = []
             for ds in dsteps:
                 if diff:
                     if ds==0:
-                        filenamestep = filename
+                        filenamesteps.append(filename)
                     else:
-                        filenamestep = diff
+                        filenamesteps.append(diff)
                 else:
                     # Construct using known filename.
-                    filenamestep = filename[:-12]+str(currstep+ds).rjust(7,'0')+'.vlsv'
+                    filenamesteps.append(filename[:-12]+str(currstep+ds).rjust(7,'0')+'.vlsv')
+            # Maps of the steps shared with the previous plot are taken from the cache,
+            # so only the files entering the time window are read
+            timestep_cache.slide(filenamesteps)
+            slicekey = (xyz, sliceoffset, meshReflevel, pass3d, tuple(fgslice), xsize, ysize, zsize, xsizefg,
+                        (MaskX[0], MaskX[-1], MaskY[0], MaskY[-1]) if np.ma.is_masked(maskgrid) and not pass3d else None)
+            for ds, filenamestep in zip(dsteps, filenamesteps):
+                if not diff:
                     logging.info(filenamestep)
-                fstep=pt.vlsvfile.VlsvReader(filenamestep)
-                step_cellids = fstep.read_variable("CellID")
-                step_indexids = step_cellids.argsort()
-                step_cellids = step_cellids[step_indexids]
-                step_reflevel = ids3d.refinement_level(xsize, ysize, zsize, step_cellids[-1])
-                for i in range(5): # Check if Vlasov grid doesn't reach maximum (fsgrid) refinement
-                    if xsize*(2**(step_reflevel + i)) == xsizefg:
-                        step_reflevel += i
-                        break
-                if normal[0] != 0 and normal[1] == 0 and normal[2] == 0:
-                    step_idlist, step_indexlist = ids3d.ids3d(step_cellids, sliceoffset, step_reflevel, xsize, ysize, zsize, xmin=xmin, xmax=xmax)
-                if normal[1] != 0 and normal[0] == 0 and normal[2] == 0:
-                    step_idlist, step_indexlist = ids3d.ids3d(step_cellids, sliceoffset, step_reflevel, xsize, ysize, zsize, ymin=ymin, ymax=ymax)
-                if normal[2] != 0 and normal[0] == 0 and normal[1] == 0:
-                    step_idlist, step_indexlist = ids3d.ids3d(step_cellids, sliceoffset, step_reflevel, xsize, ysize, zsize, zmin=zmin, zmax=zmax)
+                fstep = None
 
                 # Append new dictionary as new timestep
                 pass_maps.append({})
@@ -832,6 +815,27 @@ def plot_colormap3dslice(filename=None,
                 pass_maps[-1]['dstep'] = ds
                 # Gather the required variable maps
                 for mapval in pass_vars:
+                    pass_map = timestep_cache.get(filenamestep, (mapval,)+slicekey)
+                    if pass_map is not None:
+                        pass_maps[-1][mapval] = pass_map
+                        continue
+                    if fstep is None:
+                        fstep=pt.vlsvfile.VlsvReader(filenamestep)
+                        step_cellid_index = fstep.get_cellid_index()
+                        step_indexids = step_cellid_index.order
+                        step_cellids = step_cellid_index.sorted_cellids
+                        step_reflevel = ids3d.refinement_level(xsize, ysize, zsize, step_cellids[-1])
+                        for i in range(5): # Check if Vlasov grid doesn't reach maximum (fsgrid) refinement
+                            if xsize*(2**(step_reflevel + i)) == xsizefg:
+                                step_reflevel += i
+                                break
+                        if normal[0] != 0 and normal[1] == 0 and normal[2] == 0:
+                            step_plan = ids3d.get_slice_plan(fstep, 0, sliceoffset, step_reflevel)
+                        if normal[1] != 0 and normal[0] == 0 and normal[2] == 0:
+                            step_plan = ids3d.get_slice_plan(fstep, 1, sliceoffset, step_reflevel)
+                        if normal[2] != 0 and normal[0] == 0 and normal[1] == 0:
+                            step_plan = ids3d.get_slice_plan(fstep, 2, sliceoffset, step_reflevel)
+
                     if mapval.startswith('fg_'):
                         # fsgrid reader returns array in correct shape but needs to be sliced and transposed
                         pass_map = fstep.read_fsgrid_variable(mapval)
@@ -864,8 +868,8 @@ def plot_colormap3dslice(filename=None,
                     else:
                         # vlasov grid, AMR
                         pass_map = fstep.read_variable(mapval)
-                        pass_map = pass_map[step_indexids] # sort
                         if pass3d:
+                            pass_map = pass_map[step_indexids] # sort
                             if np.ndim(pass_map)==1:
                                 pass_shape = None
                             elif np.ndim(pass_map)==2: # vector variable
@@ -875,17 +879,12 @@ def plot_colormap3dslice(filename=None,
                             else:
                                 logging.info("Error in reshaping pass_maps!")
                             pass_map = ids3d.idmesh3d2(step_cellids, pass_map, meshReflevel, xsize, ysize, zsize, pass_shape)
+                        elif meshReflevel == step_plan.reflevel:
+                            pass_map = step_plan.rasterize(pass_map)
                         else:
-                            pass_map = pass_map[step_indexlist] # find required cells
-                            if np.ndim(pass_map)==1:
-                                pass_shape = None
-                            elif np.ndim(pass_map)==2: # vector variable
-                                pass_shape = pass_map.shape[1]
-                            elif np.ndim(pass_map)==3:  # tensor variable
-                                pass_shape = (pass_map.shape[1], pass_map.shape[2])
-                            else:
-                                logging.info("Error in reshaping pass_maps!")
-                            pass_map = ids3d.idmesh3d(step_idlist, pass_map, meshReflevel, xsize, ysize, zsize, xyz, pass_shape)
+                            pass_map = pass_map[step_indexids][step_plan.indexlist] # find required cells
+                            pass_shape = None if np.ndim(pass_map)==1 else (pass_map.shape[1] if np.ndim(pass_map)==2 else pass_map.shape[1:])
+                            pass_map = ids3d.idmesh3d(step_plan.idlist, pass_map, meshReflevel, xsize, ysize, zsize, xyz, pass_shape)
 
                     if np.ma.is_masked(maskgrid) and not pass3d:
                         if np.ndim(pass_map)==2:
@@ -897,6 +896,7 @@ def plot_colormap3dslice(filename=None,
                         elif np.ndim(pass_map)==4:  # tensor variable
                             pass_map = pass_map[MaskX[0]:MaskX[-1]+1,:,:,:]
                             pass_map = pass_map[:,MaskY[0]:MaskY[-1]+1,:,:]
+                    timestep_cache.put(filenamestep, (mapval,)+slicekey, pass_map)
                     pass_maps[-1][mapval] = pass_map # add to the dictionary
 
     # colorbar title for diffs:
@@ -1198,9 +1198,7 @@ def plot_colormap3dslice(filename=None,
             fScolour = 'black'
         if f.check_variable("vg_f_saved"):
             fSmap = f.read_variable("vg_f_saved")
-            fSmap = fSmap[indexids] # sort
-            fSmap = fSmap[indexlist] # find required cells
-            fSmap = ids3d.idmesh3d(idlist, fSmap, reflevel, xsize, ysize, zsize, xyz, None)
+            fSmap = plan.rasterize(fSmap)
             if np.ma.is_masked(maskgrid):
                 fSmap = fSmap[MaskX[0]:MaskX[-1]+1,:]
                 fSmap = fSmap[:,MaskY[0]:MaskY[-1]+1]
@@ -1235,9 +1233,7 @@ def plot_colormap3dslice(filename=None,
         else:
             # vlasov grid, AMR
             vectmap = f.read_variable(vectors)
-            vectmap = vectmap[indexids] # sort
-            vectmap = vectmap[indexlist] # find required cells
-            vectmap = ids3d.idmesh3d(idlist, vectmap, reflevel, xsize, ysize, zsize, xyz, 3)
+            vectmap = plan.rasterize(vectmap)
 
         if np.ma.is_masked(maskgrid):
             vectmap = vectmap[MaskX[0]:MaskX[-1]+1,:,:]
@@ -1302,9 +1298,7 @@ def plot_colormap3dslice(filename=None,
         else:
             # vlasov grid, AMR
             slinemap = f.read_variable(streamlines)
-            slinemap = slinemap[indexids] # sort
-            slinemap = slinemap[indexlist] # find required cells
-            slinemap = ids3d.idmesh3d(idlist, slinemap, reflevel, xsize, ysize, zsize, xyz, 3)
+            slinemap = plan.rasterize(slinemap)
 
         if np.ma.is_masked(maskgrid):
             slinemap = slinemap[MaskX[0]:MaskX[-1]+1,:,:]
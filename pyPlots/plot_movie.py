@@ -0,0 +1,166 @@
+# This file is part of Analysator.
+# Copyright 2013-2016 Finnish Meteorological Institute
+# Copyright 2017-2024 University of Helsinki
+#
+# For details of usage, see the COPYING file and read the "Rules of the Road"
+# at http://www.physics.helsinki.fi/vlasiator/
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+import logging
+import os
+import re
+import matplotlib.pyplot as plt
+import pytools as pt
+from plot_colormap3dslice import plot_colormap3dslice
+
+def plot_movie(files, plot_function=plot_colormap3dslice,
+               outputdir='./', outputfile='frame_{:07d}.png',
+               processes=1, chunk_size=None,
+               figsize=[4.0,3.15], dpi=300,
+               axesrect=[0.14,0.12,0.62,0.78], cbaxesrect=[0.79,0.12,0.03,0.78],
+               nocb=False,
+               **kwargs):
+
+    ''' Renders the frames of a movie from a sequence of files with a fixed plot configuration.
+
+        Every worker process creates one figure with fixed plot and colourbar axes and renders its
+        frames into them, so the figure is not rebuilt for every frame and all frames have the same
+        size. Frames are given to the workers in contiguous blocks, so neighbouring steps of a block
+        share the CellID index and slice index lists of their mesh (see :mod:`meshregistry`). The mesh
+        registry retains the structures of the latest file while rendering, they are freed afterwards.
+
+        :param files:       List of .vlsv files, one per frame
+        :kword plot_function: plot_colormap3dslice (default) or plot_colormap, or any routine accepting the
+                            filename, axes, cbaxes and nocb keywords
+        :kword outputdir:   Directory of the frames
+        :kword outputfile:  Name of the frames, formatted with the step number of the file (the digits before
+                            .vlsv) or the frame index if the file name has none. Default 'frame_{:07d}.png'.
+        :kword processes:   Number of worker processes, default 1. None uses all cores.
+        :kword chunk_size:  Number of consecutive frames given to a worker at a time,
+                            default an even split over the workers
+        :kword figsize:     Size of the figure in inches
+        :kword dpi:         Resolution of the frames
+        :kword axesrect:    Position [left, bottom, width, height] of the plot axes in figure coordinates
+        :kword cbaxesrect:  Position of the colourbar axes in figure coordinates
+        :kword nocb:        Do not draw a colourbar
+        :kword kwargs:      The fixed plot configuration, passed on to plot_function for every frame.
+                            Give vmin and vmax to use the same colour scale in every frame. Functions given
+                            as expression or external must be importable (module-level) when processes > 1.
+
+        :returns: List of the written frames in the order of files, None for frames that failed.
+                  A frame fails if plot_function raises, returns a value or draws nothing
+                  into the axes. Failed frames are logged as warnings.
+
+        .. code-block:: python
+
+            # Example usage:
+            files = sorted(glob.glob("/proj/run/bulk/bulk.*.vlsv"))
+            frames = pt.plot.plot_movie(files, var="proton/vg_rho", normal="z", vmin=1e5, vmax=1e7,
+                                        boxre=[-20,20,-20,20], outputdir="movie/", processes=16)
+            # Then e.g. ffmpeg -framerate 25 -pattern_type glob -i 'movie/frame_*.png' movie.mp4
+    '''
+    files = list(files)
+    if len(outputdir) > 0 and not os.path.exists(outputdir):
+        try:
+            os.makedirs(outputdir)
+        except FileExistsError:
+            pass
+    outputfiles = [os.path.join(outputdir, outputfile.format(_frame_step(filename, i))) for i, filename in enumerate(files)]
+    frames = list(zip(files, outputfiles))
+    if len(frames) == 0:
+        return []
+    config = (plot_function, figsize, dpi, axesrect, None if nocb else cbaxesrect, kwargs)
+
+    if processes is None:
+        from multiprocessing import cpu_count
+        processes = cpu_count()
+    processes = max(1, min(processes, len(frames)))
+    if chunk_size is None:
+        chunk_size = -(-len(frames)//processes)
+    chunks = [frames[i:i+chunk_size] for i in range(0, len(frames), chunk_size)]
+
+    if processes == 1:
+        renderer = _FrameRenderer(*config)
+        # The plot routines open a new reader for every frame
+        retain = pt.vlsvfile.mesh_registry.retain
+        pt.vlsvfile.mesh_registry.retain = max(retain, 1)
+        try:
+            return [renderer.render(filename, output) for filename, output in frames]
+        finally:
+            pt.vlsvfile.mesh_registry.retain = retain
+            renderer.close()
+
+    from multiprocessing import Pool
+    rendered = []
+    with Pool(processes, initializer=_init_movie_worker, initargs=config) as pool:
+        # imap keeps the order of the chunks
+        for outputs in pool.imap(_render_frames, chunks):
+            rendered.extend(outputs)
+    return rendered
+
+def _frame_step(filename, index):
+    ''' The step number of a bulk file name, e.g. 1234 for bulk.0001234.vlsv, or index if there is none.
+    '''
+    match = re.search(r'(\d+)\.vlsv$', os.path.basename(filename))
+    return int(match.group(1)) if match else index
+
+class _FrameRenderer(object):
+    ''' A figure with fixed plot and colourbar axes into which frames are drawn one after another.
+    '''
+    def __init__(self, plot_function, figsize, dpi, axesrect, cbaxesrect, kwargs):
+        self.plot_function = plot_function
+        self.dpi = dpi
+        self.kwargs = kwargs
+        self.fig = plt.figure(figsize=figsize, dpi=dpi)
+        self.ax = self.fig.add_axes(axesrect)
+        self.cax = self.fig.add_axes(cbaxesrect) if cbaxesrect is not None else None
+
+    def render(self, filename, outputfile):
+        # The plot routines draw into the current figure
+        plt.figure(self.fig.number)
+        self.ax.cla()
+        if self.cax is not None:
+            self.cax.cla()
+        try:
+            result = self.plot_function(filename=filename, axes=self.ax, cbaxes=self.cax, nocb=self.cax is None, **self.kwargs)
+        except Exception as e:
+            logging.warning("Error plotting " + filename + ": " + repr(e))
+            return None
+        if result is not None:
+            logging.warning("Error plotting " + filename + ": " + getattr(self.plot_function, "__name__", "plot_function") + " returned " + str(result))
+            return None
+        # Most plot routines log their errors and return None, so check that something was drawn
+        if not (self.ax.images or self.ax.collections or self.ax.lines or self.ax.patches):
+            logging.warning("Error plotting " + filename + ": nothing was drawn, see the log above")
+            return None
+        self.fig.savefig(outputfile, dpi=self.dpi)
+        logging.info(outputfile)
+        return outputfile
+
+    def close(self):
+        plt.close(self.fig)
+
+_worker_renderer = None
+
+def _init_movie_worker(*config):
+    global _worker_renderer
+    plt.switch_backend('Agg')
+    pt.vlsvfile.mesh_registry.retain = max(pt.vlsvfile.mesh_registry.retain, 1)
+    _worker_renderer = _FrameRenderer(*config)
+
+def _render_frames(frames):
+    return [_worker_renderer.render(filename, outputfile) for filename, outputfile in frames]
@@ -864,7 +864,6 @@ def plot_threeslice(filename=None,
     zsize = int(zsize)
     [xmin, ymin, zmin, xmax, ymax, zmax] = f.get_spatial_mesh_extent()
     cellsize = (xmax-xmin)/xsize
-    cellids = f.read_variable("CellID")
     sizes = [xsize,ysize,zsize]
 
     # Read the FSgrid mesh
@@ -876,9 +875,8 @@ def plot_threeslice(filename=None,
     cellsizefg = (xmaxfg-xminfg)/xsizefg
     pt.plot.plot_helpers.CELLSIZE = cellsizefg
     
-    # sort the cellid and the datamap list
-    indexids = cellids.argsort()
-    cellids = cellids[indexids]
+    # sorted cellids, from the CellID index shared by files of the same mesh
+    cellids = f.get_cellid_index().sorted_cellids
 
     # find the highest refiment level
     reflevel = ids3d.refinement_level(xsize, ysize, zsize, cellids[-1])
@@ -998,17 +996,17 @@ def plot_threeslice(filename=None,
     # {X = x0} slice
     sliceoffset = abs(xmin) + cutpoint[0]
     fgslice_x = int(sliceoffset/cellsizefg)
-    if 'x' in slices: idlist_x, indexlist_x = ids3d.ids3d(cellids, sliceoffset, reflevel, xsize, ysize, zsize, xmin=xmin, xmax=xmax)
+    if 'x' in slices: plan_x = ids3d.get_slice_plan(f, 0, sliceoffset, reflevel)
 
     # {Y = y0} slice
     sliceoffset = abs(ymin) + cutpoint[1]
     fgslice_y = int(sliceoffset/cellsizefg)
-    if 'y' in slices: idlist_y, indexlist_y = ids3d.ids3d(cellids, sliceoffset, reflevel, xsize, ysize, zsize, ymin=ymin, ymax=ymax)
+    if 'y' in slices: plan_y = ids3d.get_slice_plan(f, 1, sliceoffset, reflevel)
 
     # {Z = z0} slice
     sliceoffset = abs(zmin) + cutpoint[2]
     fgslice_z = int(sliceoffset/cellsizefg)
-    if 'z' in slices: idlist_z, indexlist_z = ids3d.ids3d(cellids, sliceoffset, reflevel, xsize, ysize, zsize, zmin=zmin, zmax=zmax)
+    if 'z' in slices: plan_z = ids3d.get_slice_plan(f, 2, sliceoffset, reflevel)
 
     #################################################
     # Find rhom map for use in masking out ionosphere
@@ -1023,16 +1021,9 @@ def plot_threeslice(filename=None,
         # No rhomap found - do not perform any masking.
         nomask = True
     if not nomask:
-        rhomap = rhomap[indexids]  # sort
-        if 'x' in slices:
-            rhomap_x = rhomap[indexlist_x] # find required cells (X cut)
-            rhomap_x = ids3d.idmesh3d(idlist_x, rhomap_x, reflevel, xsize, ysize, zsize, 0, None)
-        if 'y' in slices:
-            rhomap_y = rhomap[indexlist_y] # find required cells (Y cut)
-            rhomap_y = ids3d.idmesh3d(idlist_y, rhomap_y, reflevel, xsize, ysize, zsize, 1, None)
-        if 'z' in slices:
-            rhomap_z = rhomap[indexlist_z] # find required cells (Z cut)
-            rhomap_z = ids3d.idmesh3d(idlist_z, rhomap_z, reflevel, xsize, ysize, zsize, 2, None)
+        if 'x' in slices: rhomap_x = plan_x.rasterize(rhomap) # X cut
+        if 'y' in slices: rhomap_y = plan_y.rasterize(rhomap) # Y cut
+        if 'z' in slices: rhomap_z = plan_z.rasterize(rhomap) # Z cut
 
     ############################################
     # Read data and calculate required variables
@@ -1087,23 +1078,11 @@ def plot_threeslice(filename=None,
 
         else:
             # vlasov grid, AMR
-            datamap = datamap[indexids]      # sort
-            if 'x' in slices: datamap_x = datamap[indexlist_x] # find required cells (X cut)
-            if 'y' in slices: datamap_y = datamap[indexlist_y] # find required cells (Y cut)
-            if 'z' in slices: datamap_z = datamap[indexlist_z] # find required cells (Z cut)
-            # Create the plotting grid
-            if np.ndim(datamap)==1:   # scalar variable
-                if 'x' in slices: datamap_x = ids3d.idmesh3d(idlist_x, datamap_x, reflevel, xsize, ysize, zsize, 0, None)
-                if 'y' in slices: datamap_y = ids3d.idmesh3d(idlist_y, datamap_y, reflevel, xsize, ysize, zsize, 1, None)
-                if 'z' in slices: datamap_z = ids3d.idmesh3d(idlist_z, datamap_z, reflevel, xsize, ysize, zsize, 2, None)
-            elif np.ndim(datamap)==2: # vector variable
-                if 'x' in slices: datamap_x = ids3d.idmesh3d(idlist_x, datamap_x, reflevel, xsize, ysize, zsize, 0, datamap.shape[1])
-                if 'y' in slices: datamap_y = ids3d.idmesh3d(idlist_y, datamap_y, reflevel, xsize, ysize, zsize, 1, datamap.shape[1])
-                if 'z' in slices: datamap_z = ids3d.idmesh3d(idlist_z, datamap_z, reflevel, xsize, ysize, zsize, 2, datamap.shape[1])
-            elif np.ndim(datamap)==3: # tensor variable
-                if 'x' in slices: datamap_x = ids3d.idmesh3d(idlist_x, datamap_x, reflevel, xsize, ysize, zsize, 0, (datamap.shape[1],datamap.shape[2]))
-                if 'y' in slices: datamap_y = ids3d.idmesh3d(idlist_y, datamap_y, reflevel, xsize, ysize, zsize, 1, (datamap.shape[1],datamap.shape[2]))
-                if 'z' in slices: datamap_z = ids3d.idmesh3d(idlist_z, datamap_z, reflevel, xsize, ysize, zsize, 2, (datamap.shape[1],datamap.shape[2]))
+            if np.ndim(datamap) <= 3:
+                # Create the plotting grid
+                if 'x' in slices: datamap_x = plan_x.rasterize(datamap) # X cut
+                if 'y' in slices: datamap_y = plan_y.rasterize(datamap) # Y cut
+                if 'z' in slices: datamap_z = plan_z.rasterize(datamap) # Z cut
             else:
                 logging.info("Dimension error in constructing 2D AMR slice!")
                 return -1
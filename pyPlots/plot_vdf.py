@@ -242,8 +242,7 @@ def vSpaceReducer(vlsvReader, cid, slicetype, normvect, VXBins, VYBins, pop="pro
     inputcellsize=(vxmax-vxmin)/vxsize
     logging.info("Input velocity grid cell size "+str(inputcellsize))
 
-    velcells = vlsvReader.read_velocity_cells(cid, pop=pop)
-    velcellslist = list(zip(*velcells.items()))
+    velblocks, f, V = vlsvReader.read_velocity_cells_array(cid, pop=pop)
 
     if slicethick is not None and slicethick !=0:
         if slicethick < 0:
@@ -254,11 +253,10 @@ def vSpaceReducer(vlsvReader, cid, slicetype, normvect, VXBins, VYBins, pop="pro
             warnings.warn("You seem to be averaging across some width of the VDF. Are you sure you don't want to integrate instead?")
 
     # check that velocity space has cells
-    if(len(velcellslist) <= 0):
+    if(len(velblocks) <= 0):
         return (False,0,0,0)
 
-    f = np.asarray(velcellslist[1])
-    V = vlsvReader.get_velocity_cell_coordinates(velcellslist[0], pop=pop)
+    f = f.ravel()
     logging.info("Found "+str(len(V))+" v-space cells")
 
     # center on highest f-value
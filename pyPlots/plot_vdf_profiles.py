@@ -119,15 +119,13 @@ def vSpaceReducer(vlsvReader, cid, slicetype, normvect, pop="proton",
     inputcellsize=(vxmax-vxmin)/vxsize
     logging.info("Input velocity grid cell size "+str(inputcellsize))
 
-    velcells = vlsvReader.read_velocity_cells(cid, pop=pop)
-    velcellslist = list(zip(*velcells.items()))
+    velblocks, f, V = vlsvReader.read_velocity_cells_array(cid, pop=pop)
     
     # check that velocity space has cells
-    if(len(velcellslist) <= 0):
+    if(len(velblocks) <= 0):
         return (False,0,0,0)
     
-    f = np.asarray(velcellslist[1])
-    V = vlsvReader.get_velocity_cell_coordinates(velcellslist[0], pop=pop)
+    f = f.ravel()
     logging.info("Found "+str(len(V))+" v-space cells")
 
     # center on highest f-value
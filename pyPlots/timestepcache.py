@@ -0,0 +1,102 @@
+#
+# This file is part of Analysator.
+# Copyright 2013-2016 Finnish Meteorological Institute
+# Copyright 2017-2024 University of Helsinki
+#
+# For details of usage, see the COPYING file and read the "Rules of the Road"
+# at http://www.physics.helsinki.fi/vlasiator/
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+''' Sliding window of the sliced pass_vars maps of neighbouring time steps.
+
+With pass_times, plot_colormap and plot_colormap3dslice pass the maps of the 2N+1 steps around
+the plotted one to the expression or external function. The maps are kept here per file, so that
+when the next frame of a movie is plotted only the file entering the window is read, and the 2N
+other steps come from the cache. Every plot slides the window to its own steps and drops the maps
+of files outside it.
+
+.. code-block:: python
+
+    # Example: free the cached maps after plotting
+    pt.plot.timestep_cache.clear()
+'''
+
+import os
+from collections import OrderedDict
+
+class TimestepCache(object):
+    ''' Sliced maps of the files of the current time window, keyed by file and by variable and slice.
+    '''
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.__files = OrderedDict() # file key : {map key : map}
+
+    def __len__(self):
+        return len(self.__files)
+
+    @staticmethod
+    def file_key(filename):
+        ''' Identifies a file by its absolute path, modification time and size, so that rewritten files are read again.
+        '''
+        path = os.path.abspath(filename)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return (path, None, None)
+        return (path, stat.st_mtime_ns, stat.st_size)
+
+    def slide(self, filenames):
+        ''' Moves the window to the given files, dropping the maps of all other files.
+
+            :param filenames: The files of the time steps of the current plot
+        '''
+        keys = [self.file_key(filename) for filename in filenames]
+        for key in list(self.__files):
+            if key not in keys:
+                del self.__files[key]
+        for key in keys:
+            self.__files.setdefault(key, {})
+
+    def get(self, filename, key):
+        ''' Returns a copy of the map stored under key for the file, or None if there is none.
+
+            :param filename: Name of the .vlsv file
+            :param key:      Hashable key of the map, e.g. the variable name and the slice parameters
+        '''
+        pass_map = self.__files.get(self.file_key(filename), {}).get(key)
+        if pass_map is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        # Expressions may modify their input in place
+        return pass_map.copy()
+
+    def put(self, filename, key, pass_map):
+        ''' Stores a copy of the map under key for the file, if the file is in the window.
+        '''
+        entry = self.__files.get(self.file_key(filename))
+        if entry is not None:
+            entry[key] = pass_map.copy()
+
+    def clear(self):
+        ''' Drops all maps.
+        '''
+        self.__files.clear()
+
+# The cache used by the plotting routines
+timestep_cache = TimestepCache()
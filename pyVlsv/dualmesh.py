@@ -0,0 +1,172 @@
+#
+# This file is part of Analysator.
+# Copyright 2013-2016 Finnish Meteorological Institute
+# Copyright 2017-2024 University of Helsinki
+#
+# For details of usage, see the COPYING file and read the "Rules of the Road"
+# at http://www.physics.helsinki.fi/vlasiator/
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+''' Array tables of the dual mesh of the vg grid, used for interpolation across refinement interfaces.
+
+Vertices of the grid are indexed by integer triples at the finest refinement level, and encoded
+into int64 keys. All tables are kept sorted by their key so that lookups are vectorized binary
+searches, and new entries are inserted in bulk without re-sorting the tables:
+
+   dual cells        vertex key : the 8 cells around the vertex and their bounding box
+   corner vertices   cellid : the keys of the 8 corners of the cell
+   cell vertices     cellid : keys of the corners and hanging nodes on the surface of the cell
+   cell neighbours   cellid : cellids of the cells sharing a vertex with the cell
+
+The variable-length tables are stored as (owner, value) pairs sorted by owner. The tables only
+depend on the mesh, so a DualMesh can be saved and reused for all files of a run with a static mesh.
+'''
+
+import numpy as np
+
+def _find(sorted_keys, keys):
+   ''' Returns the positions of keys in sorted_keys and a mask of the keys that were found.
+   '''
+   keys = np.asarray(keys, dtype=np.int64)
+   if len(sorted_keys) == 0:
+      return np.zeros(keys.shape, dtype=np.int64), np.zeros(keys.shape, dtype=bool)
+   positions = np.searchsorted(sorted_keys, keys)
+   positions[positions == len(sorted_keys)] = 0
+   return positions, sorted_keys[positions] == keys
+
+def _merge(sorted_keys, new_keys, *columns):
+   ''' Merges new_keys and their rows into a sorted table. columns are (old, new) pairs of row arrays.
+       The merge is stable, so rows with equal keys keep their order.
+   '''
+   new_keys = np.asarray(new_keys, dtype=np.int64)
+   # Only the new rows are sorted, they are inserted after the existing rows with equal keys
+   order = np.argsort(new_keys, kind="stable")
+   positions = np.searchsorted(sorted_keys, new_keys[order], side="right")
+   return (np.insert(sorted_keys, positions, new_keys[order]),) + \
+          tuple(np.insert(old, positions, np.asarray(new)[order], axis=0) for old, new in columns)
+
+def _gather(owners, values, keys):
+   ''' Gathers the values of every key from an (owner, value) table sorted by owner.
+
+       :returns: (index of the key for every value, values)
+   '''
+   keys = np.asarray(keys, dtype=np.int64)
+   starts = np.searchsorted(owners, keys, side="left")
+   counts = np.searchsorted(owners, keys, side="right") - starts
+   key_index = np.repeat(np.arange(len(keys)), counts)
+   positions = np.arange(np.sum(counts)) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(starts, counts)
+   return key_index, values[positions]
+
+class DualMesh(object):
+   ''' Dual mesh tables of a vg grid.
+
+       :param vertex_shape: Number of vertices of the grid in each dimension at the finest refinement level
+       :param fingerprint:  Fingerprint of the mesh the tables are built for, see :func:`VlsvReader.get_mesh_fingerprint`
+   '''
+   def __init__(self, vertex_shape, fingerprint=None):
+      # Vertex indices from -1 to vertex_shape are encodable
+      self.vertex_shape = np.asarray(vertex_shape, dtype=np.int64)
+      self.fingerprint = fingerprint
+      self.__strides = np.array([(self.vertex_shape[1]+2)*(self.vertex_shape[2]+2), self.vertex_shape[2]+2, 1], dtype=np.int64)
+
+      self.dual_keys = np.empty(0, dtype=np.int64)
+      self.dual_cells = np.empty((0,8), dtype=np.int64)
+      self.dual_bboxes = np.empty((0,6))
+      self.corner_cellids = np.empty(0, dtype=np.int64)
+      self.corner_keys = np.empty((0,8), dtype=np.int64)
+      self.vertex_owners = np.empty(0, dtype=np.int64)
+      self.vertex_keys = np.empty(0, dtype=np.int64)
+      self.neighbor_owners = np.empty(0, dtype=np.int64)
+      self.neighbor_cellids = np.empty(0, dtype=np.int64)
+      self.dual_complete_cellids = np.empty(0, dtype=np.int64) # cells whose vertices all have their duals built
+
+   def encode(self, indices):
+      ''' Encodes vertex indices, shape (..., 3), into int64 keys.
+      '''
+      return np.dot(np.asarray(indices, dtype=np.int64) + 1, self.__strides)
+
+   def decode(self, keys):
+      ''' Decodes int64 vertex keys into vertex indices, shape (..., 3).
+      '''
+      keys = np.asarray(keys, dtype=np.int64)
+      remainder = keys % self.__strides[0]
+      return np.stack((keys // self.__strides[0], remainder // self.__strides[1], remainder % self.__strides[1]), axis=-1) - 1
+
+   def find_duals(self, keys):
+      return _find(self.dual_keys, keys)
+
+   def add_duals(self, keys, cells, bboxes):
+      self.dual_keys, self.dual_cells, self.dual_bboxes = _merge(self.dual_keys, keys, (self.dual_cells, cells), (self.dual_bboxes, bboxes))
+
+   def find_corners(self, cellids):
+      return _find(self.corner_cellids, cellids)
+
+   def add_corners(self, cellids, keys):
+      self.corner_cellids, self.corner_keys = _merge(self.corner_cellids, cellids, (self.corner_keys, keys))
+
+   def has_vertices(self, cellids):
+      return _find(self.vertex_owners, cellids)[1]
+
+   def get_vertices(self, cellids):
+      return _gather(self.vertex_owners, self.vertex_keys, cellids)
+
+   def add_vertices(self, owners, keys):
+      self.vertex_owners, self.vertex_keys = _merge(self.vertex_owners, owners, (self.vertex_keys, keys))
+
+   def has_neighbors(self, cellids):
+      return _find(self.neighbor_owners, cellids)[1]
+
+   def get_neighbors(self, cellids):
+      return _gather(self.neighbor_owners, self.neighbor_cellids, cellids)
+
+   def add_neighbors(self, owners, cellids):
+      self.neighbor_owners, self.neighbor_cellids = _merge(self.neighbor_owners, owners, (self.neighbor_cellids, cellids))
+
+   def has_complete_duals(self, cellids):
+      return _find(self.dual_complete_cellids, cellids)[1]
+
+   def add_complete_duals(self, cellids):
+      self.dual_complete_cellids = _merge(self.dual_complete_cellids, cellids)[0]
+
+   def __tables(self):
+      return {"vertex_shape":self.vertex_shape,
+              "dual_keys":self.dual_keys, "dual_cells":self.dual_cells, "dual_bboxes":self.dual_bboxes,
+              "corner_cellids":self.corner_cellids, "corner_keys":self.corner_keys,
+              "vertex_owners":self.vertex_owners, "vertex_keys":self.vertex_keys,
+              "neighbor_owners":self.neighbor_owners, "neighbor_cellids":self.neighbor_cellids,
+              "dual_complete_cellids":self.dual_complete_cellids}
+
+   def save(self, file):
+      ''' Saves the tables into a numpy archive.
+
+          :param file: File name or file object
+      '''
+      np.savez(file, fingerprint=np.str_(self.fingerprint if self.fingerprint is not None else ""), **self.__tables())
+
+   @classmethod
+   def load(cls, file):
+      ''' Loads tables saved with :func:`save`.
+
+          :param file: File name or file object
+          :returns: DualMesh
+      '''
+      with np.load(file, allow_pickle=False) as archive:
+         fingerprint = str(archive["fingerprint"])
+         dual_mesh = cls(archive["vertex_shape"], fingerprint if fingerprint != "" else None)
+         for name in dual_mesh.__tables().keys():
+            setattr(dual_mesh, name, archive[name])
+      return dual_mesh
@@ -0,0 +1,133 @@
+#
+# This file is part of Analysator.
+# Copyright 2013-2016 Finnish Meteorological Institute
+# Copyright 2017-2024 University of Helsinki
+#
+# For details of usage, see the COPYING file and read the "Rules of the Road"
+# at http://www.physics.helsinki.fi/vlasiator/
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+''' Reusable interpolation stencils for vg variables.
+
+Interpolating at a set of coordinates needs the cells around each point, the trilinear
+weights of the point within them and, at refinement interfaces, the dual cell containing
+the point. An :class:`InterpolationPlan` computes these once, after which interpolating
+any variable is a single read of the stencil cells and a weighted sum. The plan can also
+be applied to other files with the same cells, in any order, e.g. successive bulk files of
+a run with a static mesh, see :func:`VlsvReader.get_mesh_fingerprint`.
+'''
+
+import warnings
+import numpy as np
+from variable import get_data
+
+class InterpolationPlan(object):
+   ''' Interpolation stencil of a set of coordinates on the vg grid of a file.
+
+       :param reader:   VlsvReader whose mesh the plan is built on
+       :param coords:   Coordinates to interpolate at, shape (3,) or (n, 3)
+       :param periodic: Periodicity of the system. Default is periodic in all dimension
+       :param method:   Interpolation method, "linear" or "nearest"
+
+       .. code-block:: python
+
+          # Example:
+          plan = pt.vlsvfile.InterpolationPlan(f, points)
+          B = plan.apply("vg_b_vol")
+          rho = plan.apply("vg_rho")
+          rho_next = plan.apply("vg_rho", reader=f_next)
+
+       .. seealso:: :func:`VlsvReader.read_interpolated_variable` :func:`VlsvReader.get_interpolation_stencil`
+   '''
+   def __init__(self, reader, coords, periodic=[True, True, True], method="linear"):
+      coordinates = np.array(get_data(coords))
+      self.stack = coordinates.ndim != 1
+      self.coordinates = np.atleast_2d(coordinates)
+      self.method = method.lower()
+
+      closest_cellids, stencil_cellids, self.weights = reader.get_interpolation_stencil(self.coordinates, periodic, self.method)
+      self.closest_cellids = closest_cellids
+      # Stencil as indices into the unique cellids, -1 for corners outside of the domain
+      inside = stencil_cellids != 0
+      self.cellids, indices = np.unique(stencil_cellids[inside], return_inverse=True)
+      self.stencil = np.full(stencil_cellids.shape, -1, dtype=np.int64)
+      self.stencil[inside] = np.reshape(indices, -1)
+      self.out_of_domain = not np.all(inside)
+
+      self.__reader = reader
+
+   def __len__(self):
+      return len(self.coordinates)
+
+   def is_compatible(self, reader):
+      ''' Checks if the plan can be applied to the variables of another file, i.e. if the file
+          has the same spatial mesh and CellIDs as the file the plan was built on.
+
+          :param reader: VlsvReader
+          :returns: bool
+      '''
+      return reader is self.__reader or reader.get_mesh_fingerprint() == self.__reader.get_mesh_fingerprint()
+
+   def apply(self, name, operator="pass", reader=None):
+      ''' Interpolates a vg variable at the coordinates of the plan.
+
+          :param name:     Name of the variable
+          :param operator: Datareduction operator. "pass" does no operation on data
+          :param reader:   VlsvReader to read the variable from, defaults to the file the plan was built on.
+                           Any file with the same cells can be used, whatever their order in the file.
+          :returns: numpy array with the data, shaped as the output of :func:`VlsvReader.read_interpolated_variable`
+          :raises ValueError: if the variable is not a vg variable or the file has a different mesh
+      '''
+      if reader is None:
+         reader = self.__reader
+      if name[0:3] == 'fg_' or name[0:3] == 'ig_':
+         raise ValueError("Interpolation plans only apply to vg variables, got " + name)
+      if not self.is_compatible(reader):
+         raise ValueError("The mesh of " + reader.file_name + " differs from the mesh the interpolation plan was built on")
+
+      if len(self.cellids) > 0:
+         values = reader.read_variable(name, cellids=self.cellids, operator=operator)
+      else:
+         # Only read the shape of the variable
+         values = np.reshape(reader.read_variable(name, cellids=[1], operator=operator), (1,-1))[:0]
+      return self.interpolate(values)
+
+   def interpolate(self, values):
+      ''' Interpolates values given at the stencil cells of the plan.
+
+          :param values: Values at the cells plan.cellids, shape (len(plan.cellids),) or (len(plan.cellids), m)
+          :returns: numpy array with the interpolated values
+      '''
+      values = np.asarray(values, dtype=float)
+      if values.ndim != 2 or values.shape[0] != len(self.cellids):
+         values = np.reshape(values, (len(self.cellids), -1))
+      value_length = values.shape[1]
+      # Append a nan row for the corners outside of the domain
+      padded = np.full((len(self.cellids)+1, value_length), np.nan)
+      padded[:-1] = values
+      final_values = np.einsum('nk,nkm->nm', self.weights, padded[self.stencil])
+
+      if self.out_of_domain and self.method != "nearest":
+         warnings.warn("Coordinate in interpolation out of domain, output contains nans",UserWarning)
+
+      if self.stack:
+         return final_values.squeeze()
+      else:
+         if value_length == 1:
+            return final_values.squeeze()[()] # The only special case to return a scalar instead of an array
+         else:
+            return final_values.squeeze()
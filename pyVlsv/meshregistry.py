@@ -0,0 +1,152 @@
+#
+# This file is part of Analysator.
+# Copyright 2013-2016 Finnish Meteorological Institute
+# Copyright 2017-2024 University of Helsinki
+#
+# For details of usage, see the COPYING file and read the "Rules of the Road"
+# at http://www.physics.helsinki.fi/vlasiator/
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+''' Process-wide registry of structures derived from vg meshes.
+
+Successive files of a run often have the same cells. Readers register the structures they build on
+their mesh (CellID index, point locator, dual mesh, neighbour caches, slice plans) under a fingerprint
+of the mesh, and readers of other files with the same fingerprint use them instead of building their
+own. Structures that only depend on the set of cells are keyed by :func:`VlsvReader.get_mesh_fingerprint`,
+which does not change when load balancing reorders the cells in the file. Structures that depend on
+the order of the cells in the file (CellID index, slice plans) are keyed by
+:func:`VlsvReader.get_mesh_layout_fingerprint`.
+
+The registry only references the structures weakly: a structure is freed together with the last
+reader using it, or when the readers drop it with :func:`VlsvReader.optimize_clear_fileindex_for_cellid`.
+If every file is opened by its own short-lived reader, as in plot routines called frame by frame,
+set retain to keep the structures of the latest readers alive for the next file.
+
+.. code-block:: python
+
+   # Example: keep the structures of the latest reader for the next file
+   pt.vlsvfile.mesh_registry.retain = 1
+   # ... and free them again
+   pt.vlsvfile.mesh_registry.retain = 0
+   pt.vlsvfile.mesh_registry.clear()
+   # Disable sharing for one reader
+   f.mesh_registry = None
+'''
+
+import threading
+import weakref
+from collections import OrderedDict
+
+class MeshStructure(object):
+   ''' Holder of a structure. Readers keep the holders of the structures they use, the registry only
+       references them weakly.
+   '''
+   __slots__ = ("value", "__weakref__")
+
+   def __init__(self, value):
+      self.value = value
+
+class MeshRegistry(object):
+   ''' Structures derived from vg meshes, keyed by mesh fingerprint and structure key.
+
+       :param retain: Number of most recent readers whose structures are kept alive after the readers are gone
+   '''
+   def __init__(self, retain=0):
+      self.hits = 0
+      self.misses = 0
+      self.__entries = weakref.WeakValueDictionary() # (fingerprint, key) : MeshStructure
+      self.__retained = OrderedDict() # id(owner) : owner, the structure dictionaries of the latest readers
+      self.__lock = threading.Lock()
+      self.retain = retain
+
+   @property
+   def retain(self):
+      ''' Number of most recent readers whose structures are kept alive after the readers are gone.
+          Lowering it releases the structures of the older readers.
+      '''
+      return self.__retain_count
+
+   @retain.setter
+   def retain(self, retain):
+      with self.__lock:
+         self.__retain_count = max(0, int(retain))
+         self.__retain(None)
+
+   def __len__(self):
+      return len(self.__entries)
+
+   def __contains__(self, fingerprint):
+      return any(key[0] == fingerprint for key in list(self.__entries.keys()))
+
+   def __retain(self, owner):
+      if owner is not None and self.__retain_count > 0:
+         self.__retained[id(owner)] = owner
+         self.__retained.move_to_end(id(owner))
+      while len(self.__retained) > self.__retain_count:
+         self.__retained.popitem(last=False)
+
+   def get(self, fingerprint, key, build, owner=None):
+      ''' Returns the holder of the structure stored under key for the mesh, building the structure with
+          build() first if needed.
+
+          :param fingerprint: Fingerprint of the mesh
+          :param key:         Hashable key of the structure
+          :param build:       Function without arguments that builds the structure
+          :param owner:       Dictionary in which the calling reader keeps its holders, kept alive if retain > 0
+          :returns: :class:`MeshStructure`
+      '''
+      with self.__lock:
+         holder = self.__entries.get((fingerprint, key))
+         if holder is not None:
+            self.hits += 1
+            self.__retain(owner)
+            return holder
+         self.misses += 1
+      holder = MeshStructure(build())
+      with self.__lock:
+         holder = self.__entries.setdefault((fingerprint, key), holder)
+         self.__retain(owner)
+         return holder
+
+   def put(self, fingerprint, key, structure, owner=None):
+      ''' Stores a structure under key for the mesh, replacing a previous one.
+
+          :returns: :class:`MeshStructure`
+      '''
+      holder = MeshStructure(structure)
+      with self.__lock:
+         self.__entries[(fingerprint, key)] = holder
+         self.__retain(owner)
+      return holder
+
+   def discard(self, fingerprint):
+      ''' Stops sharing the structures of the mesh. Readers keep the structures they already use.
+      '''
+      with self.__lock:
+         for key in [key for key in list(self.__entries.keys()) if key[0] == fingerprint]:
+            self.__entries.pop(key, None)
+
+   def clear(self):
+      ''' Stops sharing the structures of all meshes and releases the retained structures.
+          Readers keep the structures they already use.
+      '''
+      with self.__lock:
+         self.__entries.clear()
+         self.__retained.clear()
+
+# The registry used by all readers by default
+mesh_registry = MeshRegistry()
@@ -32,8 +32,9 @@ class DataReducerVariable:
    latexunits = ""
    useVspace = False
    useReader = False
+   elementwise = True
    vector_size=1
-   def __init__(self, variables, operation, units, vector_size, latex="", latexunits="",useVspace=False,useReader=False):
+   def __init__(self, variables, operation, units, vector_size, latex="", latexunits="",useVspace=False,useReader=False,elementwise=None):
       ''' Constructor for the class
           :param variables          List of variables for doing calculations with
           :param operation          The operation (function) that operates on the variables
@@ -41,7 +42,12 @@ class DataReducerVariable:
           :param latex              Name of the variable in LaTeX markup
           :param latexunits         Units of the variable in LaTeX markup
           :param vector_size       Length of vector for reducer to return (scalars 1, vectors 3, tensors 9)
-          :param useVspace          Flag to determine whether the reducer will use velocity space data
+          :param useVspace          Flag to determine whether the reducer will use velocity space data. The operation
+                                    is then called per cell as operation(variables, values, coordinates) with the
+                                    velocity cell values and their (n, 3) coordinates, see :mod:`vspacereducer`
+          :param elementwise        Flag telling that the output of every cell only depends on the inputs of the same cell,
+                                    so that whole-grid reads can be evaluated in chunks of cells. Defaults to True unless
+                                    useVspace or useReader is set
           Example:
           def plus( array ):
              return array[0]+array[1]
@@ -56,4 +62,7 @@ class DataReducerVariable:
       self.latexunits = latexunits
       self.useVspace = useVspace
       self.useReader = useReader
+      if elementwise is None:
+         elementwise = not (useVspace or useReader)
+      self.elementwise = elementwise
 
@@ -25,7 +25,6 @@
 '''
 import logging
 import numpy as np
-import matplotlib.pyplot as plt
 from reducer import DataReducerVariable
 from rotation import rotateTensorToVector, rotateArrayTensorToVector
 from gyrophaseangle import gyrophase_angles
@@ -77,7 +76,6 @@ def sumv( variable ):
       return np.sum(np.array(variable),axis=0)
 
 def condition_matrix_array( condition, matrices ):
-   # This routine is still very slow due to for-loops
    ''' Repeats condition n times and forms an array of it
        :param: condition    Some matrix of conditions
        :param: matrices     An array of matrices on which to apply the condition
@@ -103,20 +101,13 @@ def condition_matrix_array( condition, matrices ):
           # array([[3,3,3], [5,5,5]])
 
    '''
+   condition = np.asarray(condition, dtype=bool)
+   matrices = np.asarray(matrices)
    # Make sure the matrices is in the correct shape
    if np.ndim(matrices) == np.ndim(condition):
-      matrices = np.reshape(matrices, tuple(np.concatenate(([1],[x for x in matrices.shape]))) )
-   # Repeat the condition array n times
-   condition_array = condition*np.reshape(np.ones(np.product(matrices.shape)), matrices.shape)
-   # Get the number of true hits in the condition:
-   num_of_true = 0
-   for i in np.ravel(condition):
-      if i == True:
-         num_of_true = num_of_true + 1
-   # Extract the elements that fill the condition:
-   extracted = np.extract( condition_array, matrices )
-   # Reshape the matrices:
-   extracted = np.reshape(extracted, (len(matrices), num_of_true))
+      matrices = matrices[np.newaxis]
+   # Boolean indexing over the trailing matrix axes picks the conditioned elements of every matrix in row-major order
+   extracted = matrices[..., condition]
    if len(extracted) == 1:
       extracted = extracted[0]
    # Return the extracted elements
@@ -428,6 +419,28 @@ def FullTensor( variables ):
       result[:,2,2] = TensorDiagonal[:,2]
       return result
 
+def TensorFieldAlignedComponents( TensorDiagonal, TensorOffDiagonal, vector ):
+   ''' Parallel and perpendicular components of symmetric tensors with respect to a vector field,
+       computed directly from the diagonal (xx, yy, zz) and off-diagonal (yz, xz, xy) components
+       without forming or rotating the full tensors. Works for a single cell or an array of cells.
+
+       :param TensorDiagonal:    diagonal components, shape (3,) or (n, 3)
+       :param TensorOffDiagonal: off-diagonal components, shape (3,) or (n, 3)
+       :param vector:            vectors defining the parallel direction, e.g. the magnetic field
+       :returns: (parallel, perpendicular) components, masked where the vector is zero
+   '''
+   d = np.asarray(TensorDiagonal)
+   o = np.asarray(TensorOffDiagonal)
+   v = np.asarray(vector)
+   vnorm2 = np.ma.masked_less_equal(np.sum(v*v, axis=-1), 0)
+   # b.T b without normalizing b first
+   parallel = (v[...,0]*v[...,0]*d[...,0] + v[...,1]*v[...,1]*d[...,1] + v[...,2]*v[...,2]*d[...,2] +
+               2*(v[...,1]*v[...,2]*o[...,0] + v[...,0]*v[...,2]*o[...,1] + v[...,0]*v[...,1]*o[...,2]))
+   parallel = np.ma.divide(parallel, vnorm2)
+   # The trace is invariant under rotation, so the perpendicular plane holds the rest of it
+   perpendicular = 0.5*(d[...,0] + d[...,1] + d[...,2] - parallel)
+   return parallel, perpendicular
+
 def RotatedTensor( variables ):
    ''' Data reducer for rotating e.g. the pressure tensor to align the z-component 
        with a vector, e.g. the magnetic field
@@ -442,8 +455,11 @@ def RotatedTensor( variables ):
       return rotateArrayTensorToVector(Tensor, B)
 
 def ParallelTensorComponent( variables ):
-   ''' Data reducer for finding the parallel component from a rotated field-aligned tensor
+   ''' Data reducer for finding the parallel component from a rotated field-aligned tensor,
+       or from the diagonal and off-diagonal components of a tensor and a vector
    '''
+   if len(variables) == 3:
+      return TensorFieldAlignedComponents(*variables)[0]
    RotatedTensor = variables[0]
    if( np.ndim(RotatedTensor)==2 ):
       return RotatedTensor[2,2]
@@ -452,8 +468,10 @@ def ParallelTensorComponent( variables ):
 
 def PerpendicularTensorComponent( variables ):
    ''' Data reducer for finding the perpendicular component from a rotated field-aligned tensor
-       e.g. perpendicular pressure
+       e.g. perpendicular pressure, or from the diagonal and off-diagonal components of a tensor and a vector
    '''
+   if len(variables) == 3:
+      return TensorFieldAlignedComponents(*variables)[1]
    RotatedTensor = variables[0]
    if( np.ndim(RotatedTensor)==2 ):
       return 0.5*(RotatedTensor[0,0] + RotatedTensor[1,1])
@@ -499,8 +517,13 @@ def TensorFromScalars(variables):
 
 
 def Anisotropy( variables ):
-   ''' Data reducer for finding the ratio of perpendicular to parallel components of a tensor
+   ''' Data reducer for finding the ratio of perpendicular to parallel components of a tensor,
+       given either as a rotated field-aligned tensor or as diagonal and off-diagonal components and a vector
    '''
+   if len(variables) == 3:
+      parallel, perpendicular = TensorFieldAlignedComponents(*variables)
+      divisor = np.ma.masked_equal(np.ma.masked_invalid(parallel),0)
+      return np.ma.divide(perpendicular, divisor)
    RotatedTensor = variables[0]
    if( np.ndim(RotatedTensor)==2 ):
       divisor = np.ma.masked_equal(np.ma.masked_invalid(RotatedTensor[2,2]),0)
@@ -581,31 +604,13 @@ def gyrotropy(variables):
 # see Appendix in Swisdak 2016: https://doi.org/10.1002/2015GL066980  
     
     Pdiag, Poffdiag, B = variables
-    
-    if(np.ndim(B)==2):
-        Pxx=Pdiag[:,0]
-        Pyy=Pdiag[:,1]
-        Pzz=Pdiag[:,2]
-        Pxy = Poffdiag[:,0]
-        Pxz = Poffdiag[:,1]
-        Pyz = Poffdiag[:,2]
-        B_norm = B / np.sqrt(np.sum(np.asarray(B)**2,axis=-1)[:, np.newaxis])
-        bx,by,bz = B_norm[:,0],B_norm[:,1],B_norm[:,2]
-
-    elif(np.ndim(B)==1): 
-        Pxx=Pdiag[0]
-        Pyy=Pdiag[1]
-        Pzz=Pdiag[2]
-        Pxy = Poffdiag[0]
-        Pxz = Poffdiag[1]
-        Pyz = Poffdiag[2]
-        B_norm = B / np.sqrt( B[0]**2 + B[1]**2+ B[2]**2 )        
-        bx,by,bz = B_norm[0],B_norm[1],B_norm[2]
+    Pdiag = np.asarray(Pdiag)
+    Poffdiag = np.asarray(Poffdiag)
 
+    Pxx, Pyy, Pzz = Pdiag[...,0], Pdiag[...,1], Pdiag[...,2]
     I1 = Pxx + Pyy + Pzz
-    I2 = Pxx * Pyy + Pyy * Pzz + Pxx * Pzz  - (Pxy**2 + Pxz**2 + Pyz**2)
-    Ppar = (  bx**2 * Pxx + by**2 * Pyy + bz**2 * Pzz +     
-           2 * (bx * by * Pxy + bx * bz * Pxz + by * bz * Pyz ) )    
+    I2 = Pxx * Pyy + Pyy * Pzz + Pxx * Pzz  - np.sum(Poffdiag**2, axis=-1)
+    Ppar = TensorFieldAlignedComponents(Pdiag, Poffdiag, B)[0]
     Q = 1 - 4 * I2 / (  (I1 - Ppar)*(I1 + 3* Ppar)  )
     return Q
 
@@ -636,9 +641,11 @@ def rMirror( variables ):
    # More efficient file access, now just takes PTensor and B
    PT = variables[0]
    B = variables[1]
-   PTRotated =  RotatedTensor([PT,B])
-   TAniso = Anisotropy([PTRotated]) # PAniso == TAniso
-   PPerp = PerpendicularTensorComponent([PTRotated])
+   PT = np.asarray(PT).reshape(np.shape(B)[:-1] + (3,3))
+   PDiagonal = np.stack((PT[...,0,0], PT[...,1,1], PT[...,2,2]), axis=-1)
+   POffDiagonal = np.stack((PT[...,1,2], PT[...,0,2], PT[...,0,1]), axis=-1)
+   TAniso = Anisotropy([PDiagonal, POffDiagonal, B]) # PAniso == TAniso
+   PPerp = PerpendicularTensorComponent([PDiagonal, POffDiagonal, B])
    betaPerp = beta([PPerp,B])
    return betaPerp * (TAniso - 1)   
 
@@ -698,7 +705,7 @@ def gyrophase_relstddev( variables, velocity_cell_data, velocity_coordinates ):
    B_unit = B / np.linalg.norm(B)
    
    gyrophase_data = gyrophase_angles(bulk_velocity, B_unit, velocity_cell_data, velocity_coordinates)
-   histo = plt.hist(gyrophase_data[0].data, weights=gyrophase_data[1].data, bins=36, range=[-180.0,180.0], log=False, normed=1)
+   histo = np.histogram(gyrophase_data[0].data, weights=gyrophase_data[1].data, bins=36, range=[-180.0,180.0], density=True)
    return np.std(histo[0])/np.mean(histo[0])
 
 def Dng( variables ):
@@ -953,26 +960,26 @@ datareducers["restart_rhoq"] =           DataReducerVariable(["moments"], restar
 datareducers["pressure"] =               DataReducerVariable(["ptensordiagonal"], Pressure, "Pa", 1, latex=r"$P$", latexunits=r"$\mathrm{Pa}$")
 datareducers["ptensor"] =                DataReducerVariable(["ptensordiagonal", "ptensoroffdiagonal"], FullTensor, "Pa", 9, latex=r"$\mathcal{P}$", latexunits=r"$\mathrm{Pa}$")
 datareducers["ptensorrotated"] =         DataReducerVariable(["ptensor", "b"], RotatedTensor, "Pa", 9, latex=r"$\mathcal{P}^\mathrm{R}$", latexunits=r"$\mathrm{Pa}$")
-datareducers["pparallel"] =              DataReducerVariable(["ptensorrotated"], ParallelTensorComponent, "Pa", 1, latex=r"$P_\parallel$", latexunits=r"$\mathrm{Pa}$")
-datareducers["pperpendicular"] =         DataReducerVariable(["ptensorrotated"], PerpendicularTensorComponent, "Pa", 1, latex=r"$P_\perp$", latexunits=r"$\mathrm{Pa}$")
-datareducers["pperpoverpar"] =           DataReducerVariable(["ptensorrotated"], Anisotropy, "", 1, latex=r"$P_\perp P_\parallel^{-1}$", latexunits=r"")
-datareducers["panisotropy"] =           DataReducerVariable(["ptensorrotated"], Anisotropy, "", 1, latex=r"$P_\perp P_\parallel^{-1}$", latexunits=r"")
+datareducers["pparallel"] =              DataReducerVariable(["ptensordiagonal", "ptensoroffdiagonal", "b"], ParallelTensorComponent, "Pa", 1, latex=r"$P_\parallel$", latexunits=r"$\mathrm{Pa}$")
+datareducers["pperpendicular"] =         DataReducerVariable(["ptensordiagonal", "ptensoroffdiagonal", "b"], PerpendicularTensorComponent, "Pa", 1, latex=r"$P_\perp$", latexunits=r"$\mathrm{Pa}$")
+datareducers["pperpoverpar"] =           DataReducerVariable(["ptensordiagonal", "ptensoroffdiagonal", "b"], Anisotropy, "", 1, latex=r"$P_\perp P_\parallel^{-1}$", latexunits=r"")
+datareducers["panisotropy"] =           DataReducerVariable(["ptensordiagonal", "ptensoroffdiagonal", "b"], Anisotropy, "", 1, latex=r"$P_\perp P_\parallel^{-1}$", latexunits=r"")
 datareducers["gyrotropy"] =             DataReducerVariable(["ptensordiagonal","ptensoroffdiagonal","b"], gyrotropy, "", 1, latex=r"$Q$", latexunits=r"")
 
 datareducers["pbackstream"] =                 DataReducerVariable(["ptensorbackstreamdiagonal"], Pressure, "Pa", 1, latex=r"$P_\mathrm{st}$", latexunits=r"$\mathrm{Pa}$")
 datareducers["ptensorbackstream"] =           DataReducerVariable(["ptensorbackstreamdiagonal", "ptensorbackstreamoffdiagonal"], FullTensor, "Pa", 9, latex=r"$\mathcal{P}_\mathrm{st}$", latexunits=r"$\mathrm{Pa}$")
 datareducers["ptensorrotatedbackstream"] =    DataReducerVariable(["ptensorbackstream", "b"], RotatedTensor, "Pa", 9, latex=r"$\mathcal{P}_\mathrm{st}^\mathrm{R}$", latexunits=r"$\mathrm{Pa}$")
-datareducers["pparallelbackstream"] =         DataReducerVariable(["ptensorrotatedbackstream"], ParallelTensorComponent, "Pa", 1, latex=r"$P_{\parallel,\mathrm{st}}$", latexunits=r"$\mathrm{Pa}$")
-datareducers["pperpendicularbackstream"] =    DataReducerVariable(["ptensorrotatedbackstream"], PerpendicularTensorComponent, "Pa", 1, latex=r"$P_{\perp,\mathrm{st}}$", latexunits=r"$\mathrm{Pa}$")
-datareducers["pperpoverparbackstream"] =      DataReducerVariable(["ptensorrotatedbackstream"], Anisotropy, "", 1, latex=r"$P_{\perp,\mathrm{st}} P_{\parallel,\mathrm{st}}^{-1}$", latexunits=r"")
+datareducers["pparallelbackstream"] =         DataReducerVariable(["ptensorbackstreamdiagonal", "ptensorbackstreamoffdiagonal", "b"], ParallelTensorComponent, "Pa", 1, latex=r"$P_{\parallel,\mathrm{st}}$", latexunits=r"$\mathrm{Pa}$")
+datareducers["pperpendicularbackstream"] =    DataReducerVariable(["ptensorbackstreamdiagonal", "ptensorbackstreamoffdiagonal", "b"], PerpendicularTensorComponent, "Pa", 1, latex=r"$P_{\perp,\mathrm{st}}$", latexunits=r"$\mathrm{Pa}$")
+datareducers["pperpoverparbackstream"] =      DataReducerVariable(["ptensorbackstreamdiagonal", "ptensorbackstreamoffdiagonal", "b"], Anisotropy, "", 1, latex=r"$P_{\perp,\mathrm{st}} P_{\parallel,\mathrm{st}}^{-1}$", latexunits=r"")
 datareducers["gyrotropybackstream"] =        DataReducerVariable(["ptensorbackstreamdiagonal", "ptensorbackstreamoffdiagonal","b"], gyrotropy, "", 1, latex=r"$Q_\mathrm{st}$", latexunits=r"")
 
 datareducers["pnonbackstream"] =              DataReducerVariable(["ptensornonbackstreamdiagonal"], Pressure, "Pa", 1, latex=r"$P_\mathrm{th}$", latexunits=r"$\mathrm{Pa}$")
 datareducers["ptensornonbackstream"] =        DataReducerVariable(["ptensornonbackstreamdiagonal", "ptensornonbackstreamoffdiagonal"], FullTensor, "Pa", 9, latex=r"$\mathcal{P}_\mathrm{th}$", latexunits=r"$\mathrm{Pa}$")
 datareducers["ptensorrotatednonbackstream"] = DataReducerVariable(["ptensornonbackstream", "b"], RotatedTensor, "Pa", 9, latex=r"$\mathcal{P}_\mathrm{th}^\mathrm{R}$", latexunits=r"$\mathrm{Pa}$")
-datareducers["pparallelnonbackstream"] =      DataReducerVariable(["ptensorrotatednonbackstream"], ParallelTensorComponent, "Pa", 1, latex=r"$P_{\parallel,\mathrm{th}}$", latexunits=r"$\mathrm{Pa}$")
-datareducers["pperpendicularnonbackstream"] = DataReducerVariable(["ptensorrotatednonbackstream"], PerpendicularTensorComponent, "Pa", 1, latex=r"$P_{\perp,\mathrm{th}}$", latexunits=r"$\mathrm{Pa}$")
-datareducers["pperpoverparnonbackstream"] =   DataReducerVariable(["ptensorrotatednonbackstream"], Anisotropy, "", 1, latex=r"$P_{\perp,\mathrm{th}} P_{\parallel,\mathrm{th}}^{-1}$", latexunits=r"")
+datareducers["pparallelnonbackstream"] =      DataReducerVariable(["ptensornonbackstreamdiagonal", "ptensornonbackstreamoffdiagonal", "b"], ParallelTensorComponent, "Pa", 1, latex=r"$P_{\parallel,\mathrm{th}}$", latexunits=r"$\mathrm{Pa}$")
+datareducers["pperpendicularnonbackstream"] = DataReducerVariable(["ptensornonbackstreamdiagonal", "ptensornonbackstreamoffdiagonal", "b"], PerpendicularTensorComponent, "Pa", 1, latex=r"$P_{\perp,\mathrm{th}}$", latexunits=r"$\mathrm{Pa}$")
+datareducers["pperpoverparnonbackstream"] =   DataReducerVariable(["ptensornonbackstreamdiagonal", "ptensornonbackstreamoffdiagonal", "b"], Anisotropy, "", 1, latex=r"$P_{\perp,\mathrm{th}} P_{\parallel,\mathrm{th}}^{-1}$", latexunits=r"")
 datareducers["gyrotropynonbackstream"] =     DataReducerVariable(["ptensorbackstreamdiagonal", "ptensorbackstreamoffdiagonal","b"], gyrotropy, "", 1, latex=r"$Q_\mathrm{th}$", latexunits=r"")
 
 # Note: Temperature summing over multipop works only if only one population exists in simulation.
@@ -997,14 +1004,14 @@ datareducers["tparallelnonbackstream"] =      DataReducerVariable(["pparallelnon
 datareducers["tperpendicularnonbackstream"] = DataReducerVariable(["pperpendicularnonbackstream", "rhononbackstream"], Temperature, "K", 1, latex=r"$T_{\perp,\mathrm{th}}$", latexunits=r"$\mathrm{K}$")
 
 # These ratios are identical to the pressure ratios
-datareducers["tperpoverpar"] =                DataReducerVariable(["ptensorrotated"], Anisotropy, "", 1, latex=r"$T_\perp T_\parallel^{-1}$", latexunits=r"")
-datareducers["tperpoverparbackstream"] =      DataReducerVariable(["ptensorrotatedbackstream"], Anisotropy, "", 1, latex=r"$T_{\perp,\mathrm{st}} T_{\parallel,\mathrm{st}}^{-1}$", latexunits=r"")
-datareducers["tperpoverparnonbackstream"] =   DataReducerVariable(["ptensorrotatednonbackstream"], Anisotropy, "", 1, latex=r"$T_{\perp,\mathrm{th}} T_{\parallel,\mathrm{th}}^{-1}$", latexunits=r"")
+datareducers["tperpoverpar"] =                DataReducerVariable(["ptensordiagonal", "ptensoroffdiagonal", "b"], Anisotropy, "", 1, latex=r"$T_\perp T_\parallel^{-1}$", latexunits=r"")
+datareducers["tperpoverparbackstream"] =      DataReducerVariable(["ptensorbackstreamdiagonal", "ptensorbackstreamoffdiagonal", "b"], Anisotropy, "", 1, latex=r"$T_{\perp,\mathrm{st}} T_{\parallel,\mathrm{st}}^{-1}$", latexunits=r"")
+datareducers["tperpoverparnonbackstream"] =   DataReducerVariable(["ptensornonbackstreamdiagonal", "ptensornonbackstreamoffdiagonal", "b"], Anisotropy, "", 1, latex=r"$T_{\perp,\mathrm{th}} T_{\parallel,\mathrm{th}}^{-1}$", latexunits=r"")
 
 # These ratios are identical to the pressure ratiosd
-datareducers["betaperpoverpar"] =             DataReducerVariable(["ptensorrotated"], Anisotropy, "", 1, latex=r"$\beta_\perp \beta_\parallel^{-1}$", latexunits=r"")
-datareducers["betaperpoverparbackstream"] =   DataReducerVariable(["ptensorrotatedbackstream"], Anisotropy, "", 1, latex=r"$\beta_{\perp,\mathrm{st}} \beta_{\parallel,\mathrm{st}}^{-1}$", latexunits=r"")
-datareducers["betaperpoverparnonbackstream"] =DataReducerVariable(["ptensorrotatednonbackstream"], Anisotropy, "", 1, latex=r"$\beta_{\perp,\mathrm{th}} \beta_{\parallel,\mathrm{th}}^{-1}$", latexunits=r"")
+datareducers["betaperpoverpar"] =             DataReducerVariable(["ptensordiagonal", "ptensoroffdiagonal", "b"], Anisotropy, "", 1, latex=r"$\beta_\perp \beta_\parallel^{-1}$", latexunits=r"")
+datareducers["betaperpoverparbackstream"] =   DataReducerVariable(["ptensorbackstreamdiagonal", "ptensorbackstreamoffdiagonal", "b"], Anisotropy, "", 1, latex=r"$\beta_{\perp,\mathrm{st}} \beta_{\parallel,\mathrm{st}}^{-1}$", latexunits=r"")
+datareducers["betaperpoverparnonbackstream"] =DataReducerVariable(["ptensornonbackstreamdiagonal", "ptensornonbackstreamoffdiagonal", "b"], Anisotropy, "", 1, latex=r"$\beta_{\perp,\mathrm{th}} \beta_{\parallel,\mathrm{th}}^{-1}$", latexunits=r"")
 
 datareducers["beta"] =                   DataReducerVariable(["pressure", "b"], beta ,"", 1, latex=r"$\beta$", latexunits=r"")
 datareducers["betaparallel"] =           DataReducerVariable(["pparallel", "b"], beta ,"", 1, latex=r"$\beta_\parallel$", latexunits=r"")
@@ -1050,25 +1057,25 @@ multipopdatareducers["pop/vperpendicularnonbackstream"] =         DataReducerVar
 multipopdatareducers["pop/pressure"] =               DataReducerVariable(["pop/ptensordiagonal"], Pressure, "Pa", 1, latex=r"$P_\mathrm{REPLACEPOP}$", latexunits=r"$\mathrm{Pa}$")
 multipopdatareducers["pop/ptensor"] =                DataReducerVariable(["pop/ptensordiagonal", "pop/ptensoroffdiagonal"], FullTensor, "Pa", 9, latex=r"$\mathcal{P}_\mathrm{REPLACEPOP}$", latexunits=r"$\mathrm{Pa}$")
 multipopdatareducers["pop/ptensorrotated"] =         DataReducerVariable(["pop/ptensor", "b"], RotatedTensor, "Pa", 9, latex=r"$\mathcal{P}^\mathrm{R}_\mathrm{REPLACEPOP}$", latexunits=r"$\mathrm{Pa}$")
-multipopdatareducers["pop/pparallel"] =              DataReducerVariable(["pop/ptensorrotated"], ParallelTensorComponent, "Pa", 1, latex=r"$P_{\parallel,\mathrm{REPLACEPOP}}$", latexunits=r"$\mathrm{Pa}$")
-multipopdatareducers["pop/pperpendicular"] =         DataReducerVariable(["pop/ptensorrotated"], PerpendicularTensorComponent, "Pa", 1, latex=r"$P_{\perp,\mathrm{REPLACEPOP}}$", latexunits=r"$\mathrm{Pa}$")
-multipopdatareducers["pop/pperpoverpar"] =           DataReducerVariable(["pop/ptensorrotated"], Anisotropy, "", 1, latex=r"$P_{\perp,\mathrm{REPLACEPOP}} P_{\parallel,\mathrm{REPLACEPOP}}^{-1}$", latexunits=r"")
+multipopdatareducers["pop/pparallel"] =              DataReducerVariable(["pop/ptensordiagonal", "pop/ptensoroffdiagonal", "b"], ParallelTensorComponent, "Pa", 1, latex=r"$P_{\parallel,\mathrm{REPLACEPOP}}$", latexunits=r"$\mathrm{Pa}$")
+multipopdatareducers["pop/pperpendicular"] =         DataReducerVariable(["pop/ptensordiagonal", "pop/ptensoroffdiagonal", "b"], PerpendicularTensorComponent, "Pa", 1, latex=r"$P_{\perp,\mathrm{REPLACEPOP}}$", latexunits=r"$\mathrm{Pa}$")
+multipopdatareducers["pop/pperpoverpar"] =           DataReducerVariable(["pop/ptensordiagonal", "pop/ptensoroffdiagonal", "b"], Anisotropy, "", 1, latex=r"$P_{\perp,\mathrm{REPLACEPOP}} P_{\parallel,\mathrm{REPLACEPOP}}^{-1}$", latexunits=r"")
 multipopdatareducers["pop/gyrotropy"] =              DataReducerVariable(["pop/ptensordiagonal", "pop/ptensoroffdiagonal","b"], gyrotropy, "", 1, latex=r"$Q_\mathrm{REPLACEPOP}$", latexunits=r"")
 
 multipopdatareducers["pop/pbackstream"] =            DataReducerVariable(["pop/ptensorbackstreamdiagonal"], Pressure, "Pa", 1, latex=r"$P_\mathrm{REPLACEPOP,st}$", latexunits=r"$\mathrm{Pa}$")
 multipopdatareducers["pop/ptensorbackstream"] =      DataReducerVariable(["pop/ptensorbackstreamdiagonal", "pop/ptensorbackstreamoffdiagonal"], FullTensor, "Pa", 9, latex=r"$\mathcal{P}_\mathrm{REPLACEPOP,st}$", latexunits=r"$\mathrm{Pa}$")
 multipopdatareducers["pop/ptensorrotatedbackstream"]=DataReducerVariable(["pop/ptensorbackstream", "b"], RotatedTensor, "Pa", 9, latex=r"$\mathcal{P}^\mathrm{R}_\mathrm{REPLACEPOP,st}$", latexunits=r"$\mathrm{Pa}$")
-multipopdatareducers["pop/pparallelbackstream"] =    DataReducerVariable(["pop/ptensorrotatedbackstream"], ParallelTensorComponent, "Pa", 1, latex=r"$P_{\parallel,\mathrm{REPLACEPOP,st}}$", latexunits=r"$\mathrm{Pa}$")
-multipopdatareducers["pop/pperpendicularbackstream"]=DataReducerVariable(["pop/ptensorrotatedbackstream"], PerpendicularTensorComponent, "Pa", 1, latex=r"$P_{\perp,\mathrm{REPLACEPOP,st}}$", latexunits=r"$\mathrm{Pa}$")
-multipopdatareducers["pop/pperpoverparbackstream"] = DataReducerVariable(["pop/ptensorrotatedbackstream"], Anisotropy, "", 1, latex=r"$P_{\perp,\mathrm{REPLACEPOP,st}} P_{\parallel,\mathrm{REPLACEPOP,st}}^{-1}$", latexunits=r"")
-multipopdatareducers["pop/gyrotropybackstream"] =   DataReducerVariable(["pop/ptensorrotatedbackstream"], gyrotropy, "", 1, latex=r"$Q_\mathrm{REPLACEPOP,st}$", latexunits=r"")
+multipopdatareducers["pop/pparallelbackstream"] =    DataReducerVariable(["pop/ptensorbackstreamdiagonal", "pop/ptensorbackstreamoffdiagonal", "b"], ParallelTensorComponent, "Pa", 1, latex=r"$P_{\parallel,\mathrm{REPLACEPOP,st}}$", latexunits=r"$\mathrm{Pa}$")
+multipopdatareducers["pop/pperpendicularbackstream"]=DataReducerVariable(["pop/ptensorbackstreamdiagonal", "pop/ptensorbackstreamoffdiagonal", "b"], PerpendicularTensorComponent, "Pa", 1, latex=r"$P_{\perp,\mathrm{REPLACEPOP,st}}$", latexunits=r"$\mathrm{Pa}$")
+multipopdatareducers["pop/pperpoverparbackstream"] = DataReducerVariable(["pop/ptensorbackstreamdiagonal", "pop/ptensorbackstreamoffdiagonal", "b"], Anisotropy, "", 1, latex=r"$P_{\perp,\mathrm{REPLACEPOP,st}} P_{\parallel,\mathrm{REPLACEPOP,st}}^{-1}$", latexunits=r"")
+multipopdatareducers["pop/gyrotropybackstream"] =   DataReducerVariable(["pop/ptensorbackstreamdiagonal", "pop/ptensorbackstreamoffdiagonal","b"], gyrotropy, "", 1, latex=r"$Q_\mathrm{REPLACEPOP,st}$", latexunits=r"")
 
 multipopdatareducers["pop/pnonbackstream"] =              DataReducerVariable(["pop/ptensornonbackstreamdiagonal"], Pressure, "Pa", 1, latex=r"$P_\mathrm{REPLACEPOP,th}$", latexunits=r"$\mathrm{Pa}$")
 multipopdatareducers["pop/ptensornonbackstream"] =        DataReducerVariable(["pop/ptensornonbackstreamdiagonal", "pop/ptensornonbackstreamoffdiagonal"], FullTensor, "Pa", 9, latex=r"$\mathcal{P}_\mathrm{REPLACEPOP,th}$", latexunits=r"$\mathrm{Pa}$")
 multipopdatareducers["pop/ptensorrotatednonbackstream"] = DataReducerVariable(["pop/ptensornonbackstream", "b"], RotatedTensor, "Pa", 9, latex=r"$\mathcal{P}^\mathrm{R}_\mathrm{REPLACEPOP,th}$", latexunits=r"$\mathrm{Pa}$")
-multipopdatareducers["pop/pparallelnonbackstream"] =      DataReducerVariable(["pop/ptensorrotatednonbackstream"], ParallelTensorComponent, "Pa", 1, latex=r"$P_{\parallel,\mathrm{REPLACEPOP,th}}$", latexunits=r"$\mathrm{Pa}$")
-multipopdatareducers["pop/pperpendicularnonbackstream"] = DataReducerVariable(["pop/ptensorrotatednonbackstream"], PerpendicularTensorComponent, "Pa", 1, latex=r"$P_{\perp,\mathrm{REPLACEPOP,th}}$", latexunits=r"$\mathrm{Pa}$")
-multipopdatareducers["pop/pperpoverparnonbackstream"] =   DataReducerVariable(["pop/ptensorrotatednonbackstream"], Anisotropy, "", 1, latex=r"$P_{\perp,\mathrm{REPLACEPOP,th}} P_{\parallel,\mathrm{REPLACEPOP,th}}^{-1}$", latexunits=r"")
+multipopdatareducers["pop/pparallelnonbackstream"] =      DataReducerVariable(["pop/ptensornonbackstreamdiagonal", "pop/ptensornonbackstreamoffdiagonal", "b"], ParallelTensorComponent, "Pa", 1, latex=r"$P_{\parallel,\mathrm{REPLACEPOP,th}}$", latexunits=r"$\mathrm{Pa}$")
+multipopdatareducers["pop/pperpendicularnonbackstream"] = DataReducerVariable(["pop/ptensornonbackstreamdiagonal", "pop/ptensornonbackstreamoffdiagonal", "b"], PerpendicularTensorComponent, "Pa", 1, latex=r"$P_{\perp,\mathrm{REPLACEPOP,th}}$", latexunits=r"$\mathrm{Pa}$")
+multipopdatareducers["pop/pperpoverparnonbackstream"] =   DataReducerVariable(["pop/ptensornonbackstreamdiagonal", "pop/ptensornonbackstreamoffdiagonal", "b"], Anisotropy, "", 1, latex=r"$P_{\perp,\mathrm{REPLACEPOP,th}} P_{\parallel,\mathrm{REPLACEPOP,th}}^{-1}$", latexunits=r"")
 multipopdatareducers["pop/gyrotropynonbackstream"] =     DataReducerVariable(["pop/ptensornonbackstreamdiagonal", "pop/ptensornonbackstreamoffdiagonal","b"], gyrotropy, "", 1, latex=r"$Q_\mathrm{REPLACEPOP,th}$", latexunits=r"")
 
 multipopdatareducers["pop/temperature"] =            DataReducerVariable(["pop/pressure", "pop/rho"], Temperature, "K", 1, latex=r"$T_\mathrm{REPLACEPOP}$", latexunits=r"$\mathrm{K}$")
@@ -1090,14 +1097,14 @@ multipopdatareducers["pop/tparallelnonbackstream"] =      DataReducerVariable(["
 multipopdatareducers["pop/tperpendicularnonbackstream"] = DataReducerVariable(["pop/pperpendicularnonbackstream", "pop/rhononbackstream"], Temperature, "K", 1, latex=r"$T_{\perp,\mathrm{REPLACEPOP,th}}$", latexunits=r"$\mathrm{K}$")
 
 # These ratios are identical to the pressure ratios
-multipopdatareducers["pop/tperpoverpar"] =                 DataReducerVariable(["pop/ptensorrotated"], Anisotropy, "", 1, latex=r"$T_{\perp,\mathrm{REPLACEPOP}} T_{\parallel,\mathrm{REPLACEPOP}}^{-1}$", latexunits=r"")
-multipopdatareducers["pop/tperpoverparbackstream"] =       DataReducerVariable(["pop/ptensorrotatedbackstream"], Anisotropy, "", 1, latex=r"$T_{\perp,\mathrm{REPLACEPOP,st}} T_{\parallel,\mathrm{REPLACEPOP,st}}^{-1}$", latexunits=r"")
-multipopdatareducers["pop/tperpoverparnonbackstream"] =    DataReducerVariable(["pop/ptensorrotatednonbackstream"], Anisotropy, "", 1, latex=r"$T_{\perp,\mathrm{REPLACEPOP,th}} T_{\parallel,\mathrm{REPLACEPOP,th}}^{-1}$", latexunits=r"")
+multipopdatareducers["pop/tperpoverpar"] =                 DataReducerVariable(["pop/ptensordiagonal", "pop/ptensoroffdiagonal", "b"], Anisotropy, "", 1, latex=r"$T_{\perp,\mathrm{REPLACEPOP}} T_{\parallel,\mathrm{REPLACEPOP}}^{-1}$", latexunits=r"")
+multipopdatareducers["pop/tperpoverparbackstream"] =       DataReducerVariable(["pop/ptensorbackstreamdiagonal", "pop/ptensorbackstreamoffdiagonal", "b"], Anisotropy, "", 1, latex=r"$T_{\perp,\mathrm{REPLACEPOP,st}} T_{\parallel,\mathrm{REPLACEPOP,st}}^{-1}$", latexunits=r"")
+multipopdatareducers["pop/tperpoverparnonbackstream"] =    DataReducerVariable(["pop/ptensornonbackstreamdiagonal", "pop/ptensornonbackstreamoffdiagonal", "b"], Anisotropy, "", 1, latex=r"$T_{\perp,\mathrm{REPLACEPOP,th}} T_{\parallel,\mathrm{REPLACEPOP,th}}^{-1}$", latexunits=r"")
 
 # These ratios are identical to the pressure ratios
-multipopdatareducers["pop/betaperpoverpar"] =              DataReducerVariable(["pop/ptensorrotated"], Anisotropy, "", 1, latex=r"$\beta_{\perp,\mathrm{REPLACEPOP}} \beta_{\parallel,\mathrm{REPLACEPOP}}^{-1}$", latexunits=r"")
-multipopdatareducers["pop/betaperpoverparbackstream"] =    DataReducerVariable(["pop/ptensorrotatedbackstream"], Anisotropy, "", 1, latex=r"$\beta_{\perp,\mathrm{REPLACEPOP,st}} \beta_{\parallel,\mathrm{REPLACEPOP,st}}^{-1}$", latexunits=r"")
-multipopdatareducers["pop/betaperpoverparnonbackstream"] = DataReducerVariable(["pop/ptensorrotatednonbackstream"], Anisotropy, "", 1, latex=r"$\beta_{\perp,\mathrm{REPLACEPOP,th}} \beta_{\parallel,\mathrm{REPLACEPOP,th}}^{-1}$", latexunits=r"")
+multipopdatareducers["pop/betaperpoverpar"] =              DataReducerVariable(["pop/ptensordiagonal", "pop/ptensoroffdiagonal", "b"], Anisotropy, "", 1, latex=r"$\beta_{\perp,\mathrm{REPLACEPOP}} \beta_{\parallel,\mathrm{REPLACEPOP}}^{-1}$", latexunits=r"")
+multipopdatareducers["pop/betaperpoverparbackstream"] =    DataReducerVariable(["pop/ptensorbackstreamdiagonal", "pop/ptensorbackstreamoffdiagonal", "b"], Anisotropy, "", 1, latex=r"$\beta_{\perp,\mathrm{REPLACEPOP,st}} \beta_{\parallel,\mathrm{REPLACEPOP,st}}^{-1}$", latexunits=r"")
+multipopdatareducers["pop/betaperpoverparnonbackstream"] = DataReducerVariable(["pop/ptensornonbackstreamdiagonal", "pop/ptensornonbackstreamoffdiagonal", "b"], Anisotropy, "", 1, latex=r"$\beta_{\perp,\mathrm{REPLACEPOP,th}} \beta_{\parallel,\mathrm{REPLACEPOP,th}}^{-1}$", latexunits=r"")
 
 multipopdatareducers["pop/thermalvelocity"] =               DataReducerVariable(["pop/temperature"], thermalvelocity, "m/s", 1, latex=r"$v_\mathrm{th,REPLACEPOP}$", latexunits=r"$\mathrm{m}\,\mathrm{s}^{-1}$")
 multipopdatareducers["pop/larmor"] =              DataReducerVariable(["b","pop/thermalvelocity"], larmor, "m", 1, latex=r"$r_\mathrm{L,REPLACEPOP}$",latexunits=r"$\mathrm{m}$")
@@ -1156,25 +1163,25 @@ v5reducers["vg_di"] =              DataReducerVariable(["proton/vg_rho"], ion_in
 v5reducers["vg_pressure"] =               DataReducerVariable(["vg_ptensor_diagonal"], Pressure, "Pa", 1, latex=r"$P$", latexunits=r"$\mathrm{Pa}$")
 v5reducers["vg_ptensor"] =                DataReducerVariable(["vg_ptensor_diagonal", "vg_ptensor_offdiagonal"], FullTensor, "Pa", 9, latex=r"$\mathcal{P}$", latexunits=r"$\mathrm{Pa}$")
 v5reducers["vg_ptensor_rotated"] =         DataReducerVariable(["vg_ptensor", "vg_b_vol"], RotatedTensor, "Pa", 9, latex=r"$\mathcal{P}^\mathrm{R}$", latexunits=r"$\mathrm{Pa}$")
-v5reducers["vg_p_parallel"] =              DataReducerVariable(["vg_ptensor_rotated"], ParallelTensorComponent, "Pa", 1, latex=r"$P_\parallel$", latexunits=r"$\mathrm{Pa}$")
-v5reducers["vg_p_perpendicular"] =         DataReducerVariable(["vg_ptensor_rotated"], PerpendicularTensorComponent, "Pa", 1, latex=r"$P_\perp$", latexunits=r"$\mathrm{Pa}$")
-v5reducers["vg_p_anisotropy"] =           DataReducerVariable(["vg_ptensor_rotated"], Anisotropy, "", 1, latex=r"$P_\perp P_\parallel^{-1}$", latexunits=r"")
+v5reducers["vg_p_parallel"] =              DataReducerVariable(["vg_ptensor_diagonal", "vg_ptensor_offdiagonal", "vg_b_vol"], ParallelTensorComponent, "Pa", 1, latex=r"$P_\parallel$", latexunits=r"$\mathrm{Pa}$")
+v5reducers["vg_p_perpendicular"] =         DataReducerVariable(["vg_ptensor_diagonal", "vg_ptensor_offdiagonal", "vg_b_vol"], PerpendicularTensorComponent, "Pa", 1, latex=r"$P_\perp$", latexunits=r"$\mathrm{Pa}$")
+v5reducers["vg_p_anisotropy"] =           DataReducerVariable(["vg_ptensor_diagonal", "vg_ptensor_offdiagonal", "vg_b_vol"], Anisotropy, "", 1, latex=r"$P_\perp P_\parallel^{-1}$", latexunits=r"")
 v5reducers["vg_gyrotropy"] =             DataReducerVariable(["vg_ptensor_diagonal", "vg_ptensor_offdiagonal","vg_b_vol"], gyrotropy, "", 1, latex=r"$Q$", latexunits=r"")
 
 v5reducers["vg_p_nonthermal"] =                 DataReducerVariable(["vg_ptensor_nonthermal_diagonal"], Pressure, "Pa", 1, latex=r"$P_\mathrm{st}$", latexunits=r"$\mathrm{Pa}$")
 v5reducers["vg_ptensor_nonthermal"] =           DataReducerVariable(["vg_ptensor_nonthermal_diagonal", "vg_ptensor_nonthermal_offdiagonal"], FullTensor, "Pa", 9, latex=r"$\mathcal{P}_\mathrm{st}$", latexunits=r"$\mathrm{Pa}$")
 v5reducers["vg_ptensor_rotated_nonthermal"] =    DataReducerVariable(["vg_ptensor_nonthermal", "vg_b_vol"], RotatedTensor, "Pa", 9, latex=r"$\mathcal{P}_\mathrm{st}^\mathrm{R}$", latexunits=r"$\mathrm{Pa}$")
-v5reducers["vg_p_parallel_nonthermal"] =         DataReducerVariable(["vg_ptensor_rotated_nonthermal"], ParallelTensorComponent, "Pa", 1, latex=r"$P_{\parallel,\mathrm{st}}$", latexunits=r"$\mathrm{Pa}$")
-v5reducers["vg_p_perpendicular_nonthermal"] =    DataReducerVariable(["vg_ptensor_rotated_nonthermal"], PerpendicularTensorComponent, "Pa", 1, latex=r"$P_{\perp,\mathrm{st}}$", latexunits=r"$\mathrm{Pa}$")
-v5reducers["vg_p_anisotropy_nonthermal"] =       DataReducerVariable(["vg_ptensor_rotated_nonthermal"], Anisotropy, "", 1, latex=r"$P_{\perp,\mathrm{st}} P_{\parallel,\mathrm{st}}^{-1}$", latexunits=r"")
+v5reducers["vg_p_parallel_nonthermal"] =         DataReducerVariable(["vg_ptensor_nonthermal_diagonal", "vg_ptensor_nonthermal_offdiagonal", "vg_b_vol"], ParallelTensorComponent, "Pa", 1, latex=r"$P_{\parallel,\mathrm{st}}$", latexunits=r"$\mathrm{Pa}$")
+v5reducers["vg_p_perpendicular_nonthermal"] =    DataReducerVariable(["vg_ptensor_nonthermal_diagonal", "vg_ptensor_nonthermal_offdiagonal", "vg_b_vol"], PerpendicularTensorComponent, "Pa", 1, latex=r"$P_{\perp,\mathrm{st}}$", latexunits=r"$\mathrm{Pa}$")
+v5reducers["vg_p_anisotropy_nonthermal"] =       DataReducerVariable(["vg_ptensor_nonthermal_diagonal", "vg_ptensor_nonthermal_offdiagonal", "vg_b_vol"], Anisotropy, "", 1, latex=r"$P_{\perp,\mathrm{st}} P_{\parallel,\mathrm{st}}^{-1}$", latexunits=r"")
 v5reducers["vg_gyrotropy_nonthermal"] =          DataReducerVariable(["vg_ptensor_nonthermal_diagonal", "vg_ptensor_nonthermal_offdiagonal","vg_b_vol"], gyrotropy, "", 1, latex=r"$Q_\mathrm{st}$", latexunits=r"")
 
 v5reducers["vg_p_thermal"] =              DataReducerVariable(["vg_ptensor_thermal_diagonal"], Pressure, "Pa", 1, latex=r"$P_\mathrm{th}$", latexunits=r"$\mathrm{Pa}$")
 v5reducers["vg_ptensor_thermal"] =        DataReducerVariable(["vg_ptensor_thermal_diagonal", "vg_ptensor_thermal_offdiagonal"], FullTensor, "Pa", 9, latex=r"$\mathcal{P}_\mathrm{th}$", latexunits=r"$\mathrm{Pa}$")
 v5reducers["vg_ptensor_rotated_thermal"] = DataReducerVariable(["vg_ptensor_thermal", "vg_b_vol"], RotatedTensor, "Pa", 9, latex=r"$\mathcal{P}_\mathrm{th}^\mathrm{R}$", latexunits=r"$\mathrm{Pa}$")
-v5reducers["vg_p_parallel_thermal"] =      DataReducerVariable(["vg_ptensor_rotated_thermal"], ParallelTensorComponent, "Pa", 1, latex=r"$P_{\parallel,\mathrm{th}}$", latexunits=r"$\mathrm{Pa}$")
-v5reducers["vg_p_perpendicular_thermal"] = DataReducerVariable(["vg_ptensor_rotated_thermal"], PerpendicularTensorComponent, "Pa", 1, latex=r"$P_{\perp,\mathrm{th}}$", latexunits=r"$\mathrm{Pa}$")
-v5reducers["vg_p_anisotropy_thermal"] =   DataReducerVariable(["vg_ptensor_rotated_thermal"], Anisotropy, "", 1, latex=r"$P_{\perp,\mathrm{th}} P_{\parallel,\mathrm{th}}^{-1}$", latexunits=r"")
+v5reducers["vg_p_parallel_thermal"] =      DataReducerVariable(["vg_ptensor_thermal_diagonal", "vg_ptensor_thermal_offdiagonal", "vg_b_vol"], ParallelTensorComponent, "Pa", 1, latex=r"$P_{\parallel,\mathrm{th}}$", latexunits=r"$\mathrm{Pa}$")
+v5reducers["vg_p_perpendicular_thermal"] = DataReducerVariable(["vg_ptensor_thermal_diagonal", "vg_ptensor_thermal_offdiagonal", "vg_b_vol"], PerpendicularTensorComponent, "Pa", 1, latex=r"$P_{\perp,\mathrm{th}}$", latexunits=r"$\mathrm{Pa}$")
+v5reducers["vg_p_anisotropy_thermal"] =   DataReducerVariable(["vg_ptensor_thermal_diagonal", "vg_ptensor_thermal_offdiagonal", "vg_b_vol"], Anisotropy, "", 1, latex=r"$P_{\perp,\mathrm{th}} P_{\parallel,\mathrm{th}}^{-1}$", latexunits=r"")
 v5reducers["vg_gyrotropy_thermal"] =     DataReducerVariable(["vg_ptensor_thermal_diagonal", "vg_ptensor_thermal_offdiagonal","vg_b_vol"], gyrotropy, "", 1, latex=r"$Q_\mathrm{th}$", latexunits=r"")
 
 # Note: Temperature summing over multipop works only if only one population exists in simulation.
@@ -1187,13 +1194,13 @@ v5reducers["vg_t_parallel"] =              DataReducerVariable(["vg_p_parallel",
 v5reducers["vg_t_perpendicular"] =         DataReducerVariable(["vg_p_perpendicular", "vg_rho"], Temperature, "K", 1, latex=r"$T_\perp$", latexunits=r"$\mathrm{K}$")
 
  # These ratios are identical to the pressure ratios
-v5reducers["vg_t_anisotropy"] =                DataReducerVariable(["vg_ptensor_rotated"], Anisotropy, "", 1, latex=r"$T_\perp T_\parallel^{-1}$", latexunits=r"")
-v5reducers["vg_t_anisotropy_nonthermal"] =      DataReducerVariable(["vg_ptensor_rotated_nonthermal"], Anisotropy, "", 1, latex=r"$T_{\perp,\mathrm{st}} T_{\parallel,\mathrm{st}}^{-1}$", latexunits=r"")
-v5reducers["vg_t_anisotropy_thermal"] =   DataReducerVariable(["vg_ptensor_rotated_thermal"], Anisotropy, "", 1, latex=r"$T_{\perp,\mathrm{th}} T_{\parallel,\mathrm{th}}^{-1}$", latexunits=r"")
+v5reducers["vg_t_anisotropy"] =                DataReducerVariable(["vg_ptensor_diagonal", "vg_ptensor_offdiagonal", "vg_b_vol"], Anisotropy, "", 1, latex=r"$T_\perp T_\parallel^{-1}$", latexunits=r"")
+v5reducers["vg_t_anisotropy_nonthermal"] =      DataReducerVariable(["vg_ptensor_nonthermal_diagonal", "vg_ptensor_nonthermal_offdiagonal", "vg_b_vol"], Anisotropy, "", 1, latex=r"$T_{\perp,\mathrm{st}} T_{\parallel,\mathrm{st}}^{-1}$", latexunits=r"")
+v5reducers["vg_t_anisotropy_thermal"] =   DataReducerVariable(["vg_ptensor_thermal_diagonal", "vg_ptensor_thermal_offdiagonal", "vg_b_vol"], Anisotropy, "", 1, latex=r"$T_{\perp,\mathrm{th}} T_{\parallel,\mathrm{th}}^{-1}$", latexunits=r"")
  # These ratios are identical to the pressure ratios
-v5reducers["vg_beta_anisotropy"] =             DataReducerVariable(["vg_ptensor_rotated"], Anisotropy, "", 1, latex=r"$\beta_\perp \beta_\parallel^{-1}$", latexunits=r"")
-v5reducers["vg_beta_anisotropy_nonthermal"] =   DataReducerVariable(["vg_ptensor_rotated_nonthermal"], Anisotropy, "", 1, latex=r"$\beta_{\perp,\mathrm{st}} \beta_{\parallel,\mathrm{st}}^{-1}$", latexunits=r"")
-v5reducers["vg_beta_anisotropy_thermal"] =DataReducerVariable(["vg_ptensor_rotated_thermal"], Anisotropy, "", 1, latex=r"$\beta_{\perp,\mathrm{th}} \beta_{\parallel,\mathrm{th}}^{-1}$", latexunits=r"")
+v5reducers["vg_beta_anisotropy"] =             DataReducerVariable(["vg_ptensor_diagonal", "vg_ptensor_offdiagonal", "vg_b_vol"], Anisotropy, "", 1, latex=r"$\beta_\perp \beta_\parallel^{-1}$", latexunits=r"")
+v5reducers["vg_beta_anisotropy_nonthermal"] =   DataReducerVariable(["vg_ptensor_nonthermal_diagonal", "vg_ptensor_nonthermal_offdiagonal", "vg_b_vol"], Anisotropy, "", 1, latex=r"$\beta_{\perp,\mathrm{st}} \beta_{\parallel,\mathrm{st}}^{-1}$", latexunits=r"")
+v5reducers["vg_beta_anisotropy_thermal"] =DataReducerVariable(["vg_ptensor_thermal_diagonal", "vg_ptensor_thermal_offdiagonal", "vg_b_vol"], Anisotropy, "", 1, latex=r"$\beta_{\perp,\mathrm{th}} \beta_{\parallel,\mathrm{th}}^{-1}$", latexunits=r"")
 
 v5reducers["vg_beta"] =                   DataReducerVariable(["vg_pressure", "vg_b_vol"], beta ,"", 1, latex=r"$\beta$", latexunits=r"")
 v5reducers["vg_beta_parallel"] =           DataReducerVariable(["vg_p_parallel", "vg_b_vol"], beta ,"", 1, latex=r"$\beta_\parallel$", latexunits=r"")
@@ -1238,26 +1245,26 @@ multipopv5reducers["pop/vg_v_perpendicular_nonthermal"] =         DataReducerVar
 multipopv5reducers["pop/vg_pressure"] =               DataReducerVariable(["pop/vg_ptensor_diagonal"], Pressure, "Pa", 1, latex=r"$P_\mathrm{REPLACEPOP}$", latexunits=r"$\mathrm{Pa}$")
 multipopv5reducers["pop/vg_ptensor"] =                DataReducerVariable(["pop/vg_ptensor_diagonal", "pop/vg_ptensor_offdiagonal"], FullTensor, "Pa", 9, latex=r"$\mathcal{P}_\mathrm{REPLACEPOP}$", latexunits=r"$\mathrm{Pa}$")
 multipopv5reducers["pop/vg_ptensor_rotated"] =         DataReducerVariable(["pop/vg_ptensor", "vg_b_vol"], RotatedTensor, "Pa", 9, latex=r"$\mathcal{P}^\mathrm{R}_\mathrm{REPLACEPOP}$", latexunits=r"$\mathrm{Pa}$")
-multipopv5reducers["pop/vg_p_parallel"] =              DataReducerVariable(["pop/vg_ptensor_rotated"], ParallelTensorComponent, "Pa", 1, latex=r"$P_{\parallel,\mathrm{REPLACEPOP}}$", latexunits=r"$\mathrm{Pa}$")
-multipopv5reducers["pop/vg_p_perpendicular"] =         DataReducerVariable(["pop/vg_ptensor_rotated"], PerpendicularTensorComponent, "Pa", 1, latex=r"$P_{\perp,\mathrm{REPLACEPOP}}$", latexunits=r"$\mathrm{Pa}$")
-multipopv5reducers["pop/vg_p_anisotropy"] =           DataReducerVariable(["pop/vg_ptensor_rotated"], Anisotropy, "", 1, latex=r"$P_{\perp,\mathrm{REPLACEPOP}} P_{\parallel,\mathrm{REPLACEPOP}}^{-1}$", latexunits=r"")
+multipopv5reducers["pop/vg_p_parallel"] =              DataReducerVariable(["pop/vg_ptensor_diagonal", "pop/vg_ptensor_offdiagonal", "vg_b_vol"], ParallelTensorComponent, "Pa", 1, latex=r"$P_{\parallel,\mathrm{REPLACEPOP}}$", latexunits=r"$\mathrm{Pa}$")
+multipopv5reducers["pop/vg_p_perpendicular"] =         DataReducerVariable(["pop/vg_ptensor_diagonal", "pop/vg_ptensor_offdiagonal", "vg_b_vol"], PerpendicularTensorComponent, "Pa", 1, latex=r"$P_{\perp,\mathrm{REPLACEPOP}}$", latexunits=r"$\mathrm{Pa}$")
+multipopv5reducers["pop/vg_p_anisotropy"] =           DataReducerVariable(["pop/vg_ptensor_diagonal", "pop/vg_ptensor_offdiagonal", "vg_b_vol"], Anisotropy, "", 1, latex=r"$P_{\perp,\mathrm{REPLACEPOP}} P_{\parallel,\mathrm{REPLACEPOP}}^{-1}$", latexunits=r"")
 multipopv5reducers["pop/vg_gyrotropy"] =              DataReducerVariable(["pop/vg_ptensor_diagonal", "pop/vg_ptensor_offdiagonal","vg_b_vol"], gyrotropy, "", 1, latex=r"$Q_\mathrm{REPLACEPOP}$", latexunits=r"")
 
 
 multipopv5reducers["pop/vg_p_nonthermal"] =            DataReducerVariable(["pop/vg_ptensor_nonthermal_diagonal"], Pressure, "Pa", 1, latex=r"$P_\mathrm{REPLACEPOP,st}$", latexunits=r"$\mathrm{Pa}$")
 multipopv5reducers["pop/vg_ptensor_nonthermal"] =      DataReducerVariable(["pop/vg_ptensor_nonthermal_diagonal", "pop/vg_ptensor_nonthermal_offdiagonal"], FullTensor, "Pa", 9, latex=r"$\mathcal{P}_\mathrm{REPLACEPOP,st}$", latexunits=r"$\mathrm{Pa}$")
 multipopv5reducers["pop/vg_ptensor_rotated_nonthermal"]=DataReducerVariable(["pop/vg_ptensor_nonthermal", "vg_b_vol"], RotatedTensor, "Pa", 9, latex=r"$\mathcal{P}^\mathrm{R}_\mathrm{REPLACEPOP,st}$", latexunits=r"$\mathrm{Pa}$")
-multipopv5reducers["pop/vg_p_parallel_nonthermal"] =    DataReducerVariable(["pop/vg_ptensor_rotated_nonthermal"], ParallelTensorComponent, "Pa", 1, latex=r"$P_{\parallel,\mathrm{REPLACEPOP,st}}$", latexunits=r"$\mathrm{Pa}$")
-multipopv5reducers["pop/vg_p_perpendicular_nonthermal"]=DataReducerVariable(["pop/vg_ptensor_rotated_nonthermal"], PerpendicularTensorComponent, "Pa", 1, latex=r"$P_{\perp,\mathrm{REPLACEPOP,st}}$", latexunits=r"$\mathrm{Pa}$")
-multipopv5reducers["pop/vg_p_anisotropy_nonthermal"] = DataReducerVariable(["pop/vg_ptensor_rotated_nonthermal"], Anisotropy, "", 1, latex=r"$P_{\perp,\mathrm{REPLACEPOP,st}} P_{\parallel,\mathrm{REPLACEPOP,st}}^{-1}$", latexunits=r"")
+multipopv5reducers["pop/vg_p_parallel_nonthermal"] =    DataReducerVariable(["pop/vg_ptensor_nonthermal_diagonal", "pop/vg_ptensor_nonthermal_offdiagonal", "vg_b_vol"], ParallelTensorComponent, "Pa", 1, latex=r"$P_{\parallel,\mathrm{REPLACEPOP,st}}$", latexunits=r"$\mathrm{Pa}$")
+multipopv5reducers["pop/vg_p_perpendicular_nonthermal"]=DataReducerVariable(["pop/vg_ptensor_nonthermal_diagonal", "pop/vg_ptensor_nonthermal_offdiagonal", "vg_b_vol"], PerpendicularTensorComponent, "Pa", 1, latex=r"$P_{\perp,\mathrm{REPLACEPOP,st}}$", latexunits=r"$\mathrm{Pa}$")
+multipopv5reducers["pop/vg_p_anisotropy_nonthermal"] = DataReducerVariable(["pop/vg_ptensor_nonthermal_diagonal", "pop/vg_ptensor_nonthermal_offdiagonal", "vg_b_vol"], Anisotropy, "", 1, latex=r"$P_{\perp,\mathrm{REPLACEPOP,st}} P_{\parallel,\mathrm{REPLACEPOP,st}}^{-1}$", latexunits=r"")
 multipopv5reducers["pop/vg_gyrotropy_nonthermal"] =    DataReducerVariable(["pop/vg_ptensor_nonthermal_diagonal", "pop/vg_ptensor_nonthermal_offdiagonal","vg_b_vol"], gyrotropy, "", 1, latex=r"$Q_\mathrm{st}$", latexunits=r"")
 
 multipopv5reducers["pop/vg_p_thermal"] =              DataReducerVariable(["pop/vg_ptensor_thermal_diagonal"], Pressure, "Pa", 1, latex=r"$P_\mathrm{REPLACEPOP,th}$", latexunits=r"$\mathrm{Pa}$")
 multipopv5reducers["pop/vg_ptensor_thermal"] =        DataReducerVariable(["pop/vg_ptensor_thermal_diagonal", "pop/vg_ptensor_thermal_offdiagonal"], FullTensor, "Pa", 9, latex=r"$\mathcal{P}_\mathrm{REPLACEPOP,th}$", latexunits=r"$\mathrm{Pa}$")
 multipopv5reducers["pop/vg_ptensor_rotated_thermal"] = DataReducerVariable(["pop/vg_ptensor_thermal", "vg_b_vol"], RotatedTensor, "Pa", 9, latex=r"$\mathcal{P}^\mathrm{R}_\mathrm{REPLACEPOP,th}$", latexunits=r"$\mathrm{Pa}$")
-multipopv5reducers["pop/vg_p_parallel_thermal"] =      DataReducerVariable(["pop/vg_ptensor_rotated_thermal"], ParallelTensorComponent, "Pa", 1, latex=r"$P_{\parallel,\mathrm{REPLACEPOP,th}}$", latexunits=r"$\mathrm{Pa}$")
-multipopv5reducers["pop/vg_p_perpendicular_thermal"] = DataReducerVariable(["pop/vg_ptensor_rotated_thermal"], PerpendicularTensorComponent, "Pa", 1, latex=r"$P_{\perp,\mathrm{REPLACEPOP,th}}$", latexunits=r"$\mathrm{Pa}$")
-multipopv5reducers["pop/vg_p_anisotropy_thermal"] =   DataReducerVariable(["pop/vg_ptensor_rotated_thermal"], Anisotropy, "", 1, latex=r"$P_{\perp,\mathrm{REPLACEPOP,th}} P_{\parallel,\mathrm{REPLACEPOP,th}}^{-1}$", latexunits=r"")
+multipopv5reducers["pop/vg_p_parallel_thermal"] =      DataReducerVariable(["pop/vg_ptensor_thermal_diagonal", "pop/vg_ptensor_thermal_offdiagonal", "vg_b_vol"], ParallelTensorComponent, "Pa", 1, latex=r"$P_{\parallel,\mathrm{REPLACEPOP,th}}$", latexunits=r"$\mathrm{Pa}$")
+multipopv5reducers["pop/vg_p_perpendicular_thermal"] = DataReducerVariable(["pop/vg_ptensor_thermal_diagonal", "pop/vg_ptensor_thermal_offdiagonal", "vg_b_vol"], PerpendicularTensorComponent, "Pa", 1, latex=r"$P_{\perp,\mathrm{REPLACEPOP,th}}$", latexunits=r"$\mathrm{Pa}$")
+multipopv5reducers["pop/vg_p_anisotropy_thermal"] =   DataReducerVariable(["pop/vg_ptensor_thermal_diagonal", "pop/vg_ptensor_thermal_offdiagonal", "vg_b_vol"], Anisotropy, "", 1, latex=r"$P_{\perp,\mathrm{REPLACEPOP,th}} P_{\parallel,\mathrm{REPLACEPOP,th}}^{-1}$", latexunits=r"")
 multipopv5reducers["pop/vg_gyrotropy_thermal"] =     DataReducerVariable(["pop/vg_ptensor_thermal_diagonal", "pop/vg_ptensor_thermal_offdiagonal","vg_b_vol"], gyrotropy, "", 1, latex=r"$Q_\mathrm{REPLACEPOP,th}$", latexunits=r"")
 
 multipopv5reducers["pop/vg_temperature"] =            DataReducerVariable(["pop/vg_pressure", "pop/vg_rho"], Temperature, "K", 1, latex=r"$T_\mathrm{REPLACEPOP}$", latexunits=r"$\mathrm{K}$")
@@ -1279,12 +1286,12 @@ multipopv5reducers["pop/vg_t_parallel_thermal"] =      DataReducerVariable(["pop
 multipopv5reducers["pop/vg_t_perpendicular_thermal"] = DataReducerVariable(["pop/vg_p_perpendicular_thermal", "pop/vg_rho_thermal"], Temperature, "K", 1, latex=r"$T_{\perp,\mathrm{REPLACEPOP,th}}$", latexunits=r"$\mathrm{K}$")
 
  # These ratios are identical to the pressure ratios
-multipopv5reducers["pop/vg_t_anisotropy"] =                 DataReducerVariable(["pop/vg_ptensor_rotated"], Anisotropy, "", 1, latex=r"$T_{\perp,\mathrm{REPLACEPOP}} T_{\parallel,\mathrm{REPLACEPOP}}^{-1}$", latexunits=r"")
-multipopv5reducers["pop/vg_t_anisotropy_nonthermal"] =       DataReducerVariable(["pop/vg_ptensor_rotated_nonthermal"], Anisotropy, "", 1, latex=r"$T_{\perp,\mathrm{REPLACEPOP,st}} T_{\parallel,\mathrm{REPLACEPOP,st}}^{-1}$", latexunits=r"")
-multipopv5reducers["pop/vg_t_anisotropy_thermal"] =    DataReducerVariable(["pop/vg_ptensor_rotated_thermal"], Anisotropy, "", 1, latex=r"$T_{\perp,\mathrm{REPLACEPOP,th}} T_{\parallel,\mathrm{REPLACEPOP,th}}^{-1}$", latexunits=r"")
-multipopv5reducers["pop/vg_beta_anisotropy"] =              DataReducerVariable(["pop/vg_ptensor_rotated"], Anisotropy, "", 1, latex=r"$\beta_{\perp,\mathrm{REPLACEPOP}} \beta_{\parallel,\mathrm{REPLACEPOP}}^{-1}$", latexunits=r"")
-multipopv5reducers["pop/vg_beta_anisotropy_nonthermal"] =    DataReducerVariable(["pop/vg_ptensor_rotated_nonthermal"], Anisotropy, "", 1, latex=r"$\beta_{\perp,\mathrm{REPLACEPOP,st}} \beta_{\parallel,\mathrm{REPLACEPOP,st}}^{-1}$", latexunits=r"")
-multipopv5reducers["pop/vg_beta_anisotropy_thermal"] = DataReducerVariable(["pop/vg_ptensor_rotated_thermal"], Anisotropy, "", 1, latex=r"$\beta_{\perp,\mathrm{REPLACEPOP,th}} \beta_{\parallel,\mathrm{REPLACEPOP,th}}^{-1}$", latexunits=r"")
+multipopv5reducers["pop/vg_t_anisotropy"] =                 DataReducerVariable(["pop/vg_ptensor_diagonal", "pop/vg_ptensor_offdiagonal", "vg_b_vol"], Anisotropy, "", 1, latex=r"$T_{\perp,\mathrm{REPLACEPOP}} T_{\parallel,\mathrm{REPLACEPOP}}^{-1}$", latexunits=r"")
+multipopv5reducers["pop/vg_t_anisotropy_nonthermal"] =       DataReducerVariable(["pop/vg_ptensor_nonthermal_diagonal", "pop/vg_ptensor_nonthermal_offdiagonal", "vg_b_vol"], Anisotropy, "", 1, latex=r"$T_{\perp,\mathrm{REPLACEPOP,st}} T_{\parallel,\mathrm{REPLACEPOP,st}}^{-1}$", latexunits=r"")
+multipopv5reducers["pop/vg_t_anisotropy_thermal"] =    DataReducerVariable(["pop/vg_ptensor_thermal_diagonal", "pop/vg_ptensor_thermal_offdiagonal", "vg_b_vol"], Anisotropy, "", 1, latex=r"$T_{\perp,\mathrm{REPLACEPOP,th}} T_{\parallel,\mathrm{REPLACEPOP,th}}^{-1}$", latexunits=r"")
+multipopv5reducers["pop/vg_beta_anisotropy"] =              DataReducerVariable(["pop/vg_ptensor_diagonal", "pop/vg_ptensor_offdiagonal", "vg_b_vol"], Anisotropy, "", 1, latex=r"$\beta_{\perp,\mathrm{REPLACEPOP}} \beta_{\parallel,\mathrm{REPLACEPOP}}^{-1}$", latexunits=r"")
+multipopv5reducers["pop/vg_beta_anisotropy_nonthermal"] =    DataReducerVariable(["pop/vg_ptensor_nonthermal_diagonal", "pop/vg_ptensor_nonthermal_offdiagonal", "vg_b_vol"], Anisotropy, "", 1, latex=r"$\beta_{\perp,\mathrm{REPLACEPOP,st}} \beta_{\parallel,\mathrm{REPLACEPOP,st}}^{-1}$", latexunits=r"")
+multipopv5reducers["pop/vg_beta_anisotropy_thermal"] = DataReducerVariable(["pop/vg_ptensor_thermal_diagonal", "pop/vg_ptensor_thermal_offdiagonal", "vg_b_vol"], Anisotropy, "", 1, latex=r"$\beta_{\perp,\mathrm{REPLACEPOP,th}} \beta_{\parallel,\mathrm{REPLACEPOP,th}}^{-1}$", latexunits=r"")
 
 multipopv5reducers["pop/vg_thermalvelocity"] =               DataReducerVariable(["pop/vg_temperature"], thermalvelocity, "m/s", 1, latex=r"$v_\mathrm{th,REPLACEPOP}$", latexunits=r"$\mathrm{m}\,\mathrm{s}^{-1}$")
 multipopv5reducers["pop/vg_larmor"] =                        DataReducerVariable(["vg_b_vol","pop/vg_thermalvelocity"], larmor, "m", 1, latex=r"$r_\mathrm{L,REPLACEPOP}$",latexunits=r"$\mathrm{m}$")
@@ -34,7 +34,11 @@
 '''
 
 import logging
-from vlsvreader import VlsvReader
+from vlsvreader import VlsvReader, CellIdIndex, CellLocator
+from interpolationplan import InterpolationPlan
+from dualmesh import DualMesh
+from vlsvtimeseries import VlsvTimeSeries
+from meshregistry import MeshRegistry, mesh_registry
 from vlsvreader import fsDecompositionFromGlobalIds,fsReadGlobalIdsPerRank,fsGlobalIdToGlobalIndex
 from vlsvwriter import VlsvWriter
 from vlasiatorreader import VlasiatorReader
@@ -0,0 +1,107 @@
+#
+# This file is part of Analysator.
+# Copyright 2013-2016 Finnish Meteorological Institute
+# Copyright 2017-2024 University of Helsinki
+#
+# For details of usage, see the COPYING file and read the "Rules of the Road"
+# at http://www.physics.helsinki.fi/vlasiator/
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+''' Sidecar index cache for VLSV files.
+
+The sidecars store the metadata a VlsvReader otherwise rebuilds every time a file is
+opened (resolved XML footer table, CellID index, velocity block tables, max refinement level) as binary
+numpy archives in a cache directory. Each of these entries has its own sidecar, written
+once when the reader first builds it, so building one entry never rewrites the others.
+Sidecars are keyed by the absolute path of the VLSV file and the entry name, and are
+only used if the size and modification time of the file match.
+
+The cache directory is given to VlsvReader with the index_cache_dir argument or through
+the PTINDEXCACHE environment variable.
+'''
+
+import logging
+import hashlib
+import os
+import numpy as np
+
+# Bump this whenever the contents of the sidecar change
+index_cache_version = 3
+
+def index_cache_path(cache_dir, file_name, entry):
+   ''' Returns the path of the sidecar of an entry of a VLSV file in cache_dir.
+
+       :param cache_dir: Directory for the sidecar files
+       :param file_name: Absolute path of the VLSV file
+       :param entry:     Name of the entry, e.g. "footer" or "blocks.proton"
+   '''
+   key = hashlib.sha1(file_name.encode("utf-8")).hexdigest()
+   return os.path.join(cache_dir, os.path.basename(file_name) + "." + key + "." + entry + ".vlsvidx")
+
+def _file_key(file_name):
+   stat = os.stat(file_name)
+   return stat.st_size, stat.st_mtime_ns
+
+def load_index_cache(cache_dir, file_name, entry):
+   ''' Loads the sidecar of an entry of a VLSV file.
+
+       :param cache_dir: Directory for the sidecar files
+       :param file_name: Absolute path of the VLSV file
+       :param entry:     Name of the entry
+       :returns: dictionary of the stored numpy arrays, or None if there is no valid sidecar
+   '''
+   path = index_cache_path(cache_dir, file_name, entry)
+   if not os.path.isfile(path):
+      return None
+   try:
+      with np.load(path, allow_pickle=False) as archive:
+         entries = {key:archive[key] for key in archive.files}
+   except Exception as e:
+      logging.info("Could not read index cache " + path + ": " + str(e))
+      return None
+
+   file_size, file_mtime = _file_key(file_name)
+   if (int(entries.get("version", -1)) != index_cache_version or
+       str(entries.get("file_name", "")) != file_name or
+       int(entries.get("file_size", -1)) != file_size or
+       int(entries.get("file_mtime", -1)) != file_mtime):
+      logging.info("Index cache " + path + " is stale, ignoring it")
+      return None
+   return entries
+
+def save_index_cache(cache_dir, file_name, entry, entries):
+   ''' Writes the sidecar of an entry of a VLSV file. The file is written to a temporary name and
+       moved into place, so concurrent readers never see a partially written sidecar.
+
+       :param cache_dir: Directory for the sidecar files
+       :param file_name: Absolute path of the VLSV file
+       :param entry:     Name of the entry
+       :param entries:   dictionary of numpy arrays to store
+   '''
+   path = index_cache_path(cache_dir, file_name, entry)
+   file_size, file_mtime = _file_key(file_name)
+   tmp_path = path + "." + str(os.getpid()) + ".tmp"
+   try:
+      os.makedirs(cache_dir, exist_ok=True)
+      with open(tmp_path, "wb") as f:
+         np.savez(f, version=np.int64(index_cache_version), file_name=np.str_(file_name),
+                  file_size=np.int64(file_size), file_mtime=np.int64(file_mtime), **entries)
+      os.replace(tmp_path, path)
+   except OSError as e:
+      logging.info("Could not write index cache " + path + ": " + str(e))
+      if os.path.isfile(tmp_path):
+         os.remove(tmp_path)
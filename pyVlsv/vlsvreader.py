@@ -30,8 +30,12 @@ import os
 import sys
 import re
 import numbers
+import mmap
+import hashlib
 
 import vlsvvariables
+import vlsvindexcache
+from vspacereducer import evaluate_vspace_reducer
 from reduction import datareducers,multipopdatareducers,data_operators,v5reducers,multipopv5reducers,deprecated_datareducers
 try:
    from collections.abc import Iterable
@@ -43,11 +47,328 @@ from variable import get_data
 import warnings
 import time
 from interpolator_amr import AMRInterpolator, supported_amr_interpolators
+from interpolationplan import InterpolationPlan
+from dualmesh import DualMesh
+import meshregistry
 from operator import itemgetter
 
 
 interp_method_aliases = {"trilinear":"linear"}
 
+# When gathering a list of cells, requested rows closer than this many bytes apart are
+# read through in a single read instead of seeking past the gap
+read_gap_bytes = 65536
+
+# Map of VLSV (datatype, datasize) pairs to numpy dtypes
+vlsv_dtypes = {("float",4):np.dtype(np.float32),
+               ("float",8):np.dtype(np.float64),
+               ("int",4):np.dtype(np.int32),
+               ("int",8):np.dtype(np.int64),
+               ("uint",4):np.dtype(np.uint32),
+               ("uint",8):np.dtype(np.uint64)}
+
+class VlsvArrayInfo(object):
+   ''' Resolved description of a single array in the XML footer of a VLSV file:
+       tag, name, mesh, layout, numpy dtype and file offset.
+
+       :param tag:    Tag of the array
+       :param attrib: Dictionary of the XML attributes of the array
+       :param offset: Offset of the array in the file, None if the footer entry has none
+   '''
+   def __init__(self, tag, attrib, offset):
+      self.tag = tag
+      self.name = attrib.get("name", "")
+      self.mesh = attrib.get("mesh", "")
+      self.attrib = attrib
+      self.vector_size = int(attrib.get("vectorsize", 1))
+      self.array_size = int(attrib.get("arraysize", 0))
+      self.element_size = int(attrib.get("datasize", 0))
+      self.datatype = attrib.get("datatype", "")
+      self.dtype = vlsv_dtypes.get((self.datatype, self.element_size))
+      self.offset = offset
+
+   @classmethod
+   def from_element(cls, child):
+      ''' Resolves an element of the XML footer.
+      '''
+      try:
+         offset = int(child.text)
+      except (TypeError, ValueError):
+         offset = None
+      return cls(child.tag, child.attrib, offset)
+
+   @property
+   def shape(self):
+      if self.vector_size > 1:
+         return (self.array_size, self.vector_size)
+      return (self.array_size,)
+
+   @property
+   def nbytes(self):
+      return self.array_size*self.vector_size*self.element_size
+
+# Attributes of footer arrays stored as columns of the sidecar footer table, the others are stored as
+# (array, attribute, value) rows
+_array_table_strings = ("name", "mesh", "datatype")
+_array_table_ints = ("datasize", "vectorsize", "arraysize")
+
+def _array_table(arrays):
+   ''' Converts the resolved footer arrays into the plain numpy arrays of the sidecar footer entry:
+       the tag, name, mesh and datatype of every array, its datasize, vectorsize, arraysize and offset,
+       and the remaining attributes. Missing strings are stored as "" and missing integers as -1.
+   '''
+   strings = [(info.tag,) + tuple(info.attrib.get(key, "") for key in _array_table_strings) for info in arrays]
+   ints = [tuple(int(info.attrib.get(key, -1)) for key in _array_table_ints) + (info.offset if info.offset is not None else -1,)
+           for info in arrays]
+   extra = [(i, key, value) for i, info in enumerate(arrays) for key, value in info.attrib.items()
+            if key not in _array_table_strings + _array_table_ints]
+   return {"array_strings": np.array(strings, dtype=np.str_).reshape(-1, 4),
+           "array_ints": np.array(ints, dtype=np.int64).reshape(-1, 4),
+           "attrib_array": np.array([i for i, key, value in extra], dtype=np.int64),
+           "attrib_strings": np.array([(key, value) for i, key, value in extra], dtype=np.str_).reshape(-1, 2)}
+
+def _arrays_from_table(table):
+   ''' Rebuilds the resolved footer arrays from a sidecar footer entry, see :func:`_array_table`.
+   '''
+   strings = table["array_strings"].tolist()
+   ints = table["array_ints"].tolist()
+   attribs = [{} for i in range(len(strings))]
+   for i, (key, value) in zip(table["attrib_array"].tolist(), table["attrib_strings"].tolist()):
+      attribs[i][key] = value
+   arrays = []
+   for attrib, (tag, name, mesh, datatype), (datasize, vectorsize, arraysize, offset) in zip(attribs, strings, ints):
+      for key, value in (("name", name), ("mesh", mesh), ("datatype", datatype)):
+         if value != "":
+            attrib[key] = value
+      for key, value in (("datasize", datasize), ("vectorsize", vectorsize), ("arraysize", arraysize)):
+         if value >= 0:
+            attrib[key] = str(value)
+      arrays.append(VlsvArrayInfo(tag, attrib, offset if offset >= 0 else None))
+   return arrays
+
+class CellIdIndex(object):
+   ''' Maps CellIDs to their indices in the arrays of a VLSV file.
+
+       The CellIDs are stored sorted as int64 together with the permutation that sorts them,
+       so building the index is a single argsort and lookups are vectorized binary searches.
+
+       :param cellids: CellIDs in file order
+   '''
+   def __init__(self, cellids):
+      cellids = np.atleast_1d(np.asarray(cellids)).astype(np.int64)
+      self.order = np.argsort(cellids, kind="stable")
+      self.sorted_cellids = cellids[self.order]
+
+   @classmethod
+   def from_sorted(cls, sorted_cellids, order):
+      ''' Creates the index from already sorted CellIDs and their sorting permutation.
+      '''
+      index = cls.__new__(cls)
+      index.sorted_cellids = np.asarray(sorted_cellids, dtype=np.int64)
+      index.order = np.asarray(order, dtype=np.int64)
+      return index
+
+   def __len__(self):
+      return len(self.sorted_cellids)
+
+   def __lookup(self, cellids):
+      cellids = np.asarray(cellids).astype(np.int64)
+      if len(self.sorted_cellids) == 0:
+         return cellids, np.zeros(cellids.shape, dtype=np.int64), np.zeros(cellids.shape, dtype=bool)
+      positions = np.searchsorted(self.sorted_cellids, cellids)
+      positions = np.where(positions == len(self.sorted_cellids), 0, positions)
+      return cellids, positions, self.sorted_cellids[positions] == cellids
+
+   def contains(self, cellids):
+      ''' Checks which of the given CellIDs exist in the file.
+
+          :param cellids: CellID or array of CellIDs
+          :returns: bool, or numpy bool array with the shape of cellids
+      '''
+      cellids, positions, found = self.__lookup(cellids)
+      if found.ndim == 0:
+         return bool(found)
+      return found
+
+   def index_of(self, cellids):
+      ''' Returns the file indices of the given CellIDs.
+
+          :param cellids: CellID or array of CellIDs
+          :returns: int, or numpy int64 array with the shape of cellids
+          :raises KeyError: if some of the CellIDs are not in the file
+      '''
+      cellids, positions, found = self.__lookup(cellids)
+      if not np.all(found):
+         raise KeyError(cellids[~found])
+      indices = self.order[positions]
+      if indices.ndim == 0:
+         return int(indices)
+      return indices
+
+   def cellids(self):
+      ''' Returns the CellIDs in file order.
+      '''
+      cellids = np.empty_like(self.sorted_cellids)
+      cellids[self.order] = self.sorted_cellids
+      return cellids
+
+   def to_dict(self):
+      ''' Returns the index as a dictionary with the CellID as the key and the file index as the value.
+      '''
+      return dict(zip(self.sorted_cellids.tolist(), self.order.tolist()))
+
+class CellLocator(object):
+   ''' Point location index of the cells of an AMR mesh, stored as an octree of dense tables.
+
+       The base grid is a dense table with an entry per base cell, and every refined cell has a block
+       of 8 entries for its children in the table of the next level. Entries are the CellID of a leaf
+       cell, 0 where there is no cell, or -(n+1) for a cell refined into block n of the next level.
+       Locating a batch of points is then one vectorized table lookup per refinement level, done
+       only for the points that are in refined cells.
+
+       :param cellids:        CellIDs of the mesh
+       :param base_cells:     Number of cells of the base grid in each dimension
+       :param max_level:      Maximum refinement level of the mesh
+   '''
+   def __init__(self, cellids, base_cells, max_level):
+      self.base_cells = np.asarray(base_cells, dtype=np.int64)
+      self.max_level = int(max_level)
+      cellids = np.atleast_1d(np.asarray(cellids)).astype(np.int64)
+      nbase = np.prod(self.base_cells)
+
+      # Refinement level and indices within the level of every cell
+      level_starts = np.cumsum(nbase*8**np.arange(self.max_level+1, dtype=np.int64))
+      levels = np.searchsorted(level_starts, cellids - 1, side="right")
+      indices = cellids - 1 - np.concatenate(([0], level_starts))[levels]
+      sizes = self.base_cells[np.newaxis,:]*2**levels[:,np.newaxis]
+      ijk = np.stack((indices % sizes[:,0], (indices // sizes[:,0]) % sizes[:,1], indices // (sizes[:,0]*sizes[:,1])), axis=-1)
+
+      def linear(cell_ijk, level):
+         level_sizes = self.base_cells*2**level
+         return cell_ijk[:,0] + level_sizes[0]*(cell_ijk[:,1] + level_sizes[1]*cell_ijk[:,2])
+      def unlinear(indices, level):
+         level_sizes = self.base_cells*2**level
+         return np.stack((indices % level_sizes[0], (indices // level_sizes[0]) % level_sizes[1],
+                          indices // (level_sizes[0]*level_sizes[1])), axis=-1)
+
+      # Sorted linear indices of the refined cells of each level, the parents of the cells of the next level
+      refined = [np.zeros(0, dtype=np.int64) for level in range(self.max_level+1)]
+      for level in range(self.max_level-1, -1, -1):
+         children = np.concatenate((ijk[levels == level+1], unlinear(refined[level+1], level+1)))
+         refined[level] = np.unique(linear(children >> 1, level))
+
+      self.tables = []
+      for level in range(self.max_level+1):
+         leaves = levels == level
+         entries = [(ijk[leaves], cellids[leaves]),
+                    (unlinear(refined[level], level), -np.arange(len(refined[level]), dtype=np.int64)-1)]
+         if level == 0:
+            table = np.zeros(nbase, dtype=np.int64)
+            for cell_ijk, values in entries:
+               table[linear(cell_ijk, 0)] = values
+         else:
+            table = np.zeros(8*len(refined[level-1]), dtype=np.int64)
+            for cell_ijk, values in entries:
+               node = np.searchsorted(refined[level-1], linear(cell_ijk >> 1, level-1))
+               table[8*node + self.__slot(cell_ijk)] = values
+         self.tables.append(table)
+
+   @staticmethod
+   def __slot(cell_ijk):
+      return (cell_ijk[:,0] & 1) + 2*(cell_ijk[:,1] & 1) + 4*(cell_ijk[:,2] & 1)
+
+   def locate(self, finest_indices):
+      ''' Returns the CellIDs of the cells containing the given cell indices (N,3) at the finest refinement level,
+          0 where there is no cell.
+      '''
+      base_ijk = finest_indices >> self.max_level
+      values = self.tables[0][base_ijk[:,0] + self.base_cells[0]*(base_ijk[:,1] + self.base_cells[1]*base_ijk[:,2])]
+      for level in range(1, self.max_level+1):
+         refined = values < 0
+         if not np.any(refined):
+            break
+         cell_ijk = finest_indices[refined] >> (self.max_level - level)
+         values[refined] = self.tables[level][8*(-values[refined]-1) + self.__slot(cell_ijk)]
+      return values
+
+# Default byte budget of the automatic variable cache of each VlsvReader, 0 disables the cache
+default_cache_budget = 0
+
+# Whole-grid reads of elementwise datareducers on grids larger than this are evaluated
+# this many cells at a time, see VlsvReader.iter_variable
+default_chunk_cells = 1048576
+
+class VariableCache(object):
+   ''' Least recently used cache of whole-grid variable arrays with a byte budget.
+
+       Arrays are stored without copying and marked read-only, and are handed out read-only
+       unless a copy is requested, so a cached read costs no memory beyond the array itself.
+       Hits, misses and evictions are counted.
+
+       :param budget: Maximum number of bytes to hold, 0 disables the cache
+   '''
+   def __init__(self, budget=default_cache_budget):
+      self.budget = budget
+      self.nbytes = 0
+      self.hits = 0
+      self.misses = 0
+      self.evictions = 0
+      self.__data = OrderedDict()
+
+   def __len__(self):
+      return len(self.__data)
+
+   def __contains__(self, key):
+      return key in self.__data
+
+   def get(self, key, copy=False):
+      ''' Returns the array stored under key, or None on a miss.
+
+          :param copy: If True, return a writeable copy instead of the cached read-only array
+      '''
+      if key not in self.__data:
+         self.misses += 1
+         return None
+      self.hits += 1
+      self.__data.move_to_end(key)
+      if copy:
+         return self.__data[key].copy()
+      return self.__data[key]
+
+   def put(self, key, data):
+      ''' Stores data under key, evicting least recently used arrays to stay within the budget.
+          Arrays larger than the whole budget are not stored.
+
+          :returns: data, read-only if it was stored
+      '''
+      if not isinstance(data, np.ndarray) or data.nbytes > self.budget:
+         return data
+      self.pop(key)
+      data.flags.writeable = False
+      self.__data[key] = data
+      self.nbytes += data.nbytes
+      while self.nbytes > self.budget:
+         _, evicted = self.__data.popitem(last=False)
+         self.nbytes -= evicted.nbytes
+         self.evictions += 1
+      return data
+
+   def pop(self, key):
+      ''' Removes key from the cache if present.
+      '''
+      if key in self.__data:
+         self.nbytes -= self.__data.pop(key).nbytes
+
+   def clear(self):
+      self.__data.clear()
+      self.nbytes = 0
+
+   def stats(self):
+      ''' Returns a dictionary with the hit, miss and eviction counters, the number of cached arrays and their total size.
+      '''
+      return {"hits":self.hits, "misses":self.misses, "evictions":self.evictions,
+              "entries":len(self.__data), "bytes":self.nbytes, "budget":self.budget}
+
 class PicklableFile(object):
    def __init__(self, fileobj):
       self.fileobj = fileobj
@@ -140,6 +461,16 @@ def fsDecompositionFromGlobalIds(reader):
    zs = np.unique(lows[:,2])
    return [xs.size, ys.size, zs.size]
 
+# Start indices and sizes of the FsGrid chunks of ntasks tasks along one
+# dimension of globalCells cells (first tasks get the remainder cells)
+def fsLocalExtents(globalCells, ntasks):
+   tasks = np.arange(ntasks, dtype=np.int64)
+   n_per_task = np.int64(globalCells) // ntasks
+   remainder = np.int64(globalCells) % ntasks
+   sizes = n_per_task + (tasks < remainder)
+   starts = tasks*n_per_task + np.minimum(tasks, remainder)
+   return starts, sizes
+
 def map_vg_onto_fg_loop(arr, vg_cellids, refined_ids_start, refined_ids_end):
    #arr = np.zeros(sz, dtype=np.int64) + 1000000000 # big number to catch errors in the latter code, 0 is not good for that
 
@@ -165,12 +496,23 @@ class VlsvReader(object):
       if (hasattr(self, "__fptr")) and self.__fptr is not None:
          self.__fptr.close()
 
-   def __init__(self, file_name, fsGridDecomposition=None):
+   def __init__(self, file_name, fsGridDecomposition=None, mmap=False, index_cache_dir=None, cache_budget=None):
       ''' Initializes the vlsv file (opens the file, reads the file footer and reads in some parameters)
 
           :param file_name:     Name of the vlsv file
           :param fsGridDecomposition: Either None or a len-3 list of ints.
                                        List (length 3): Use this as the decomposition directly. Product needs to match numWritingRanks.
+          :param mmap:          If True, memory-map the whole file once and return read-only views into the mapping
+                                from read() and the velocity block readers instead of copying the data from a file handle.
+                                Arrays returned this way cannot be modified in place.
+          :param index_cache_dir: Directory for sidecar index caches, defaults to the PTINDEXCACHE environment variable.
+                                If set, the XML footer, CellID index, velocity block tables and max refinement level
+                                are loaded from sidecar files when first needed, each written once when it is built.
+                                See :mod:`vlsvindexcache`.
+          :param cache_budget:  Byte budget of the automatic least recently used cache of whole-grid variables,
+                                reducer outputs and reordered fsgrid arrays (see :class:`VariableCache`).
+                                Defaults to default_cache_budget, which is 0 (no cache). With a cache, whole-grid
+                                arrays are returned read-only, copy them before modifying them in place.
       '''
       # Make sure the path is set in file name: 
       file_name = os.path.abspath(file_name)
@@ -181,36 +523,59 @@ class VlsvReader(object):
       except FileNotFoundError as e:
          logging.info("File not found: " + self.file_name)
          raise e
-      
-      self.__xml_root = ET.fromstring("<VLSV></VLSV>")
-      self.__fileindex_for_cellid={}
+
+      self.__mmap = None
+      if mmap:
+         self.__map_file()
+
+      self.__xml_footer = None # parsed XML footer, see __xml_root
+      self.__arrays = [] # VlsvArrayInfo of every array of the footer, in file order
+      self.__xml_index = {} # (tag, lowercase name, mesh) : VlsvArrayInfo, "" matches any tag/name/mesh
+      self.__xml_index_last = {} # as __xml_index, but the last matching array in file order
+      self.__fileindex_for_cellid = None # CellIdIndex, built on first use
+      self.__cell_locator = None # CellLocator, built on first use of get_cellid
 
       self.__max_spatial_amr_level = -1
       self.__fsGridDecomposition = fsGridDecomposition
+      self.__fsgrid_layout = None # see __get_fsgrid_layout
 
       self.use_dict_for_blocks = False
       self.__fileindex_for_cellid_blocks={} # [0] is index, [1] is blockcount
       self.__cells_with_blocks = {} # per-pop
       self.__blocks_per_cell = {} # per-pop
       self.__blocks_per_cell_offsets = {} # per-pop
-      self.__order_for_cellid_blocks = {} # per-pop
+      self.__order_for_cellid_blocks = {} # per-pop CellIdIndex of the cells with blocks
       self.__vg_indexes_on_fg = np.array([]) # SEE: map_vg_onto_fg(self)
 
       self.variable_cache = {} # {(varname, operator):data}
 
+      self.chunk_cells = default_chunk_cells # cells per chunk of iter_variable and of chunked reducer evaluation
+
+      # Worker processes and VDF chunk size for datareducers that use velocity space data
+      self.vspace_reducer_workers = 1
+      self.vspace_reducer_chunk_cells = 1024
+
+      self.__read_memo = None # {read key:data} for the duration of a single top-level read(), see read()
+      self.__read_memo_cellids = (None, None) # (cellids, key) of the latest memoized cellid selection
+      self.lru_cache = VariableCache(cache_budget if cache_budget is not None else default_cache_budget) # {(varname, operator, mesh):data}
+
       self.__available_reducers = set() # Set of strings of datareducer names
       self.__unavailable_reducers = set() # Set of strings of datareducer names
       self.__current_reducer_tree_nodes = set() # Set of strings of datareducer names
 
-      self.__read_xml_footer()
-                              # vertex-indices is a 3-tuple of integers
-      self.__dual_cells = {(0,0,0):(1,1,1,1,1,1,1,1)} # vertex-indices : 8-tuple of cellids at each corner (for x for y for z)
-      self.__dual_bboxes = {} # vertex-indices : 6-list of (xmin, ymin, zmin, xmax, ymax, zmax) for the bounding box of each dual cell
-      self.__cell_vertices = {} # cellid : varying-length tuple of vertex-indices - includes hanging nodes!
-      self.__cell_corner_vertices = {} # cellid : varying-length tuple of vertex-indices - no hanging nodes!
-      self.__cell_neighbours = {} # cellid : set of cellids (all neighbors sharing a vertex)
-      self.__cell_duals = {} # cellid : tuple of vertex-indices that span this cell
-      self.__regular_neighbor_cache = {} # cellid-of-low-corner : (8,) np.array of cellids)
+      self.__index_cache_dir = index_cache_dir if index_cache_dir is not None else os.getenv('PTINDEXCACHE')
+      footer = self.__load_index_entry("footer")
+      if footer is not None:
+         self.__arrays = _arrays_from_table(footer)
+         self.__build_xml_index()
+      else:
+         self.__read_xml_footer()
+         self.__save_index_entry("footer", _array_table(self.__arrays))
+      self.__dual_mesh = None # DualMesh, tables of dual cells and cell vertices built as needed
+      self.__mesh_fingerprint = None # hash of the sorted CellIDs, see get_mesh_fingerprint
+      self.__layout_fingerprint = None # hash of the CellIDs in file order, see get_mesh_layout_fingerprint
+      self.__mesh_structures = {} # {(ordered, key):MeshStructure} of the structures derived from the mesh used by this reader
+      self.mesh_registry = meshregistry.mesh_registry # MeshRegistry shared with readers of other files with the same mesh, None to disable
 
       # Check if the file is using new or old vlsv format
       # Read parameters (Note: Reading the spatial cell locations and
@@ -277,7 +642,7 @@ class VlsvReader(object):
       # Iterate through the XML tree, find all populations
       # (identified by their BLOCKIDS tag)
       self.active_populations=[]
-      for child in self.__xml_root:
+      for child in self.__arrays:
           if child.tag == "BLOCKIDS":
               if "name" in child.attrib:
                   popname = child.attrib["name"] 
@@ -379,6 +744,49 @@ class VlsvReader(object):
       self.__fptr.close()
 
 
+   def __getstate__(self):
+      state = self.__dict__.copy()
+      # Memory maps cannot be pickled, remap on unpickling instead
+      state['_VlsvReader__mmap'] = self.__mmap is not None
+      state['lru_cache'] = VariableCache(self.lru_cache.budget)
+      # Registries hold a lock, use the registry of the unpickling process instead
+      state['mesh_registry'] = self.mesh_registry is not None
+      return state
+
+   def __setstate__(self, state):
+      use_mmap = state['_VlsvReader__mmap']
+      state['_VlsvReader__mmap'] = None
+      state['mesh_registry'] = meshregistry.mesh_registry if state['mesh_registry'] else None
+      self.__dict__.update(state)
+      if use_mmap:
+         self.__map_file()
+
+   def __map_file(self):
+      ''' Memory-maps the whole vlsv file for reading.
+      '''
+      with open(self.file_name,"rb") as f:
+         self.__mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+   def __get_fptr(self):
+      ''' Returns an open file handle for reading, or None if the file is memory-mapped.
+      '''
+      if self.__mmap is not None:
+         return None
+      if self.__fptr.closed:
+         return open(self.file_name,"rb")
+      return self.__fptr
+
+   def __read_raw(self, fptr, dtype, offset, count):
+      ''' Reads count elements of type dtype starting from byte offset offset of the file.
+
+          :returns: A read-only view into the memory-mapped file if the reader uses mmap,
+                    otherwise a new array read from fptr.
+      '''
+      if self.__mmap is not None:
+         return np.frombuffer(self.__mmap, dtype=dtype, count=int(count), offset=int(offset))
+      fptr.seek(int(offset))
+      return np.fromfile(fptr, dtype=dtype, count=int(count))
+
    def __read_xml_footer(self):
       ''' Reads in the XML footer of the VLSV file and store all the content
       ''' 
@@ -404,23 +812,214 @@ class VlsvReader(object):
       # Read the xml as string
       (xml_string,) = struct.unpack("%ds" % len(xml_data), xml_data)
       # Input the xml data into xml_root
-      self.__xml_root = ET.fromstring(xml_string)
+      self.__xml_footer = ET.fromstring(xml_string)
       fptr.close()
+      self.__arrays = [VlsvArrayInfo.from_element(child) for child in self.__xml_footer]
+      self.__build_xml_index()
+
+   @property
+   def __xml_root(self):
+      ''' The XML footer of the file. With the sidecar index cache the footer is not parsed, it is
+          rebuilt from the resolved arrays on first use.
+      '''
+      if self.__xml_footer is None:
+         self.__xml_footer = ET.Element("VLSV")
+         for info in self.__arrays:
+            ET.SubElement(self.__xml_footer, info.tag, info.attrib).text = str(info.offset) if info.offset is not None else None
+      return self.__xml_footer
+
+   def __load_index_entry(self, entry):
+      ''' Loads an entry (XML footer, CellID index, velocity block tables of a population or max
+          refinement level) from the sidecar index cache, see :mod:`vlsvindexcache`.
+
+          :returns: dictionary of numpy arrays, or None if no cache is in use or it has no valid entry
+      '''
+      if self.__index_cache_dir is None:
+         return None
+      return vlsvindexcache.load_index_cache(self.__index_cache_dir, self.file_name, entry)
+
+   def __save_index_entry(self, entry, entries):
+      ''' Writes an entry into its own sidecar, if a sidecar index cache is in use. Every entry is
+          written once when it is first built.
+      '''
+      if self.__index_cache_dir is not None:
+         vlsvindexcache.save_index_cache(self.__index_cache_dir, self.file_name, entry, entries)
+
+   def __build_xml_index(self):
+      ''' Resolves every array in the XML footer once into a lookup table keyed by
+          (tag, lowercase name, mesh). Each array is also registered with an empty tag, name and/or mesh
+          so that queries leaving those unspecified resolve to the first matching array in file order.
+          The last matching array of every key is kept as well.
+      '''
+      self.__xml_index = {}
+      self.__xml_index_last = {}
+      for info in self.__arrays:
+         name = info.name.lower()
+         for tag in (info.tag, ""):
+            for key in ((tag, name, info.mesh), (tag, name, ""), (tag, "", info.mesh), (tag, "", "")):
+               self.__xml_index.setdefault(key, info)
+               self.__xml_index_last[key] = info
+
+   def __find_array(self, tag, name="", mesh="", last=False):
+      ''' Looks up an array from the XML footer index.
+
+          :param tag:  Tag of the data array, "" matches any tag
+          :param name: Name of the data array (case insensitive), "" matches any name
+          :param mesh: Mesh of the data array, "" or None matches any mesh
+          :param last: Return the last matching array in file order instead of the first
+          :returns: VlsvArrayInfo of the matching array, or None if not found
+      '''
+      if mesh is None:
+         mesh = ""
+      index = self.__xml_index_last if last else self.__xml_index
+      return index.get((tag, name.lower(), mesh))
 
    def __read_fileindex_for_cellid(self):
-      """ Read in the cell ids and create an internal dictionary to give the index of an arbitrary cellID
+      """ Read in the cell ids and create an internal CellIdIndex to give the index of an arbitrary cellID
       """
-      if not self.__fileindex_for_cellid == {}:
+      if self.__fileindex_for_cellid is not None:
          return
-      
+
+      entry = self.__load_index_entry("cellid")
+      if entry is not None:
+         index = CellIdIndex.from_sorted(entry["sorted"], entry["order"])
+         cellids = np.empty_like(index.sorted_cellids)
+         cellids[index.order] = index.sorted_cellids
+         self.__set_layout_fingerprint(cellids)
+         self.__fileindex_for_cellid = self.get_mesh_structure("cellid_index", lambda: index, ordered=True)
+         return
+
       cellids=self.read(mesh="SpatialGrid",name="CellID", tag="VARIABLE")
+      self.__set_layout_fingerprint(cellids)
+      self.__fileindex_for_cellid = self.get_mesh_structure("cellid_index", lambda: CellIdIndex(cellids), ordered=True)
+      self.__save_index_entry("cellid", {"sorted": self.__fileindex_for_cellid.sorted_cellids,
+                                         "order": self.__fileindex_for_cellid.order})
+
+   def set_cellid_index(self, index):
+      ''' Uses a CellID index built for another file with identical CellIDs in the same order, e.g. the
+          previous file of a run with a static mesh, instead of building a new one.
+
+      :param index: :class:`CellIdIndex`, e.g. from :func:`get_cellid_index` of another reader
+      :raises ValueError: if the CellIDs of the file differ from the CellIDs of the index
+      '''
+      if index is self.__fileindex_for_cellid:
+         return
+      cellids = np.asarray(self.read(mesh="SpatialGrid",name="CellID", tag="VARIABLE"), dtype=np.int64)
+      if len(cellids) != len(index) or not np.array_equal(cellids[index.order], index.sorted_cellids):
+         raise ValueError("The CellIDs of " + self.file_name + " differ from the CellIDs of the index")
+      self.__set_layout_fingerprint(cellids)
+      self.__fileindex_for_cellid = index
+
+   def __fingerprint(self, cellids):
+      fingerprint = hashlib.sha1(np.ascontiguousarray(cellids, dtype=np.int64).tobytes())
+      fingerprint.update(np.asarray(self.get_spatial_mesh_extent(), dtype=float).tobytes())
+      fingerprint.update(np.asarray(self.get_spatial_mesh_size(), dtype=np.int64).tobytes())
+      return fingerprint.hexdigest()
+
+   def __set_layout_fingerprint(self, cellids):
+      if self.__layout_fingerprint is None:
+         self.__layout_fingerprint = "layout:" + self.__fingerprint(cellids)
+
+   def get_mesh_fingerprint(self):
+      ''' Returns a fingerprint of the vg mesh of the file: a hash of the sorted CellIDs and of the spatial
+          mesh extent and size. Files with equal fingerprints have the same cells, possibly stored in a
+          different order, so structures that only depend on the cells (interpolation plans, dual meshes,
+          point locators) can be shared between them.
+
+      :returns: str
+
+      .. seealso:: :func:`get_mesh_layout_fingerprint` :func:`get_mesh_structure`
+      '''
+      if self.__mesh_fingerprint is None:
+         self.__read_fileindex_for_cellid()
+         self.__mesh_fingerprint = self.__fingerprint(self.__fileindex_for_cellid.sorted_cellids)
+      return self.__mesh_fingerprint
 
-      #Check if it is not iterable. If it is a scale then make it a list
-      if(not isinstance(cellids, Iterable)):
-         cellids=[ cellids ]
-      # self.__fileindex_for_cellid = {cellid:index for index,cellid in enumerate(cellids)}
-      for index,cellid in enumerate(cellids):
-         self.__fileindex_for_cellid[cellid] = index
+   def get_mesh_layout_fingerprint(self):
+      ''' Returns a fingerprint of the vg mesh of the file and the order of its cells in the file: a hash of
+          the CellIDs in file order and of the spatial mesh extent and size. Structures that address the
+          arrays of the file (CellID index, slice plans) can be shared between files with equal layout
+          fingerprints.
+
+      :returns: str
+
+      .. seealso:: :func:`get_mesh_fingerprint`
+      '''
+      if self.__layout_fingerprint is None:
+         self.__set_layout_fingerprint(self.read(mesh="SpatialGrid",name="CellID", tag="VARIABLE"))
+      return self.__layout_fingerprint
+
+   def get_mesh_structure(self, key, build, ordered=False):
+      ''' Returns a structure derived from the vg mesh of the file, built with build() on first use.
+
+          With a mesh registry (see :mod:`meshregistry`) the structure is shared with the readers of all
+          files with the same mesh fingerprint, so e.g. successive files of a static-mesh run build it once.
+          The reader keeps the structure until it is garbage collected or
+          :func:`optimize_clear_fileindex_for_cellid` is called.
+
+      :param key:     Hashable key of the structure, e.g. a tuple of a name and the parameters of build
+      :param build:   Function without arguments that builds the structure
+      :param ordered: If True, the structure depends on the order of the cells in the file and is only shared
+                      between files with the same :func:`get_mesh_layout_fingerprint`, otherwise between files
+                      with the same :func:`get_mesh_fingerprint`
+      :returns: the structure
+
+      .. code-block:: python
+
+          # Example: slice index lists shared by all files of the run
+          idlist, indexlist = f.get_mesh_structure(("ids3d", sliceoffset, reflevel, "z"),
+                                                   lambda: ids3d.ids3d(cellids, sliceoffset, reflevel, xsize, ysize, zsize, zmin=zmin, zmax=zmax),
+                                                   ordered=True)
+      '''
+      holder = self.__mesh_structures.get((ordered, key))
+      if holder is None:
+         if self.mesh_registry is None:
+            holder = meshregistry.MeshStructure(build())
+         else:
+            fingerprint = self.get_mesh_layout_fingerprint() if ordered else self.get_mesh_fingerprint()
+            holder = self.mesh_registry.get(fingerprint, key, build, owner=self.__mesh_structures)
+         self.__mesh_structures[(ordered, key)] = holder
+      return holder.value
+
+   def __read_rows(self, fptr, array_info, indices):
+      ''' Gathers the rows at the given file indices from an array in the file.
+
+          The requested rows are sorted and coalesced into contiguous ranges, merging ranges
+          that are less than read_gap_bytes apart, and each range is read in one go.
+
+          :param fptr: Open file handle, or None if the reader uses mmap
+          :param array_info: VlsvArrayInfo of the array
+          :param indices: numpy array of file indices (rows) to read
+          :returns: numpy array of shape (len(indices), vector_size) in the order of indices
+      '''
+      vector_size = array_info.vector_size
+      if self.__mmap is not None:
+         data = self.__read_raw(fptr, array_info.dtype, array_info.offset, array_info.array_size*vector_size)
+         return data.reshape(-1, vector_size)[indices]
+
+      row_bytes = vector_size*array_info.element_size
+      unique_indices, inverse = np.unique(indices, return_inverse=True)
+      inverse = inverse.reshape(-1)
+      if len(unique_indices) == 0:
+         return np.zeros((0, vector_size), dtype=array_info.dtype)
+
+      # Start a new range wherever the gap to the previous requested row is too large
+      new_range = np.diff(unique_indices) > max(1, read_gap_bytes // row_bytes)
+      starts = unique_indices[np.concatenate(([True], new_range))]
+      ends = unique_indices[np.concatenate((new_range, [True]))] + 1
+      lengths = ends - starts
+      buffer_offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+
+      buffer = np.empty((np.sum(lengths), vector_size), dtype=array_info.dtype)
+      for start, length, buffer_offset in zip(starts, lengths, buffer_offsets):
+         buffer[buffer_offset:buffer_offset+length] = self.__read_raw(fptr, array_info.dtype,
+                                                                      array_info.offset + start*row_bytes,
+                                                                      length*vector_size).reshape(length, vector_size)
+
+      # Position of each unique row within the buffer, then back to the requested order
+      range_ids = np.searchsorted(starts, unique_indices, side="right") - 1
+      positions = buffer_offsets[range_ids] + (unique_indices - starts[range_ids])
+      return buffer[positions[inverse]]
 
    def __read_blocks(self, cellid, pop="proton"):
       ''' Read raw velocity block data from the open file.
@@ -443,7 +1042,7 @@ class VlsvReader(object):
             self.__set_cell_offset_and_blocks_nodict(pop) 
          # Check that cells has vspace
          try:
-            cells_with_blocks_index = self.__order_for_cellid_blocks[pop][cellid]
+            cells_with_blocks_index = self.__order_for_cellid_blocks[pop].index_of(cellid)
          except:
             logging.info("Cell does not have velocity distribution")
             return []
@@ -451,55 +1050,38 @@ class VlsvReader(object):
          num_of_blocks = self.__blocks_per_cell[pop][cells_with_blocks_index]
 
 
-      if self.__fptr.closed:
-         fptr = open(self.file_name,"rb")
-      else:
-         fptr = self.__fptr
+      fptr = self.__get_fptr()
 
       # Read in avgs and velocity cell ids:
-      for child in self.__xml_root:
-         # Read in block values
-         if ("name" in child.attrib) and (child.attrib["name"] == pop) and (child.tag == "BLOCKVARIABLE"):
-            vector_size = ast.literal_eval(child.attrib["vectorsize"])
-            #array_size = ast.literal_eval(child.attrib["arraysize"])
-            element_size = ast.literal_eval(child.attrib["datasize"])
-            datatype = child.attrib["datatype"]
-
-            # Navigate to the correct position
-            offset_avgs = int(offset * vector_size * element_size + ast.literal_eval(child.text))
-#            for i in range(0, cells_with_blocks_index[0]):
-#               offset_avgs += blocks_per_cell[i]*vector_size*element_size
-
-            fptr.seek(offset_avgs)
-            if datatype == "float" and element_size == 4:
-               data_avgs = np.fromfile(fptr, dtype = np.float32, count = vector_size*num_of_blocks)
-            if datatype == "float" and element_size == 8:
-               data_avgs = np.fromfile(fptr, dtype = np.float64, count = vector_size*num_of_blocks)
-            data_avgs = data_avgs.reshape(num_of_blocks, vector_size)
-
-         # Read in block coordinates:
-         # (note the special treatment in case the population is named 'avgs'
-         if (pop == 'avgs' or ("name" in child.attrib) and (child.attrib["name"] == pop)) and (child.tag == "BLOCKIDS"):
-            vector_size = ast.literal_eval(child.attrib["vectorsize"])
-            #array_size = ast.literal_eval(child.attrib["arraysize"])
-            element_size = ast.literal_eval(child.attrib["datasize"])
-            datatype = child.attrib["datatype"]
-
-            offset_block_ids = int(offset * vector_size * element_size + ast.literal_eval(child.text))
-
-            fptr.seek(offset_block_ids)
-            if datatype == "uint" and element_size == 4:
-               data_block_ids = np.fromfile(fptr, dtype = np.uint32, count = vector_size*num_of_blocks)
-            elif datatype == "uint" and element_size == 8:
-               data_block_ids = np.fromfile(fptr, dtype = np.uint64, count = vector_size*num_of_blocks)
-            else:
-               logging.info("Error! Bad block id data!")
-               logging.info("Data type: " + datatype + ", element size: " + str(element_size))
-               return
+      block_variable = self.__find_array("BLOCKVARIABLE", name=pop)
+      # (note the special treatment in case the population is named 'avgs': old files did not name their
+      # BLOCKIDS, and the last BLOCKIDS array of the file is used)
+      if pop == 'avgs':
+         block_ids = self.__find_array("BLOCKIDS", last=True)
+      else:
+         block_ids = self.__find_array("BLOCKIDS", name=pop)
+
+      # Read in block values
+      if block_variable is not None:
+         vector_size = block_variable.vector_size
+         # Navigate to the correct position
+         offset_avgs = int(offset * vector_size * block_variable.element_size + block_variable.offset)
+         data_avgs = self.__read_raw(fptr, block_variable.dtype, offset_avgs, vector_size*num_of_blocks)
+         data_avgs = data_avgs.reshape(num_of_blocks, vector_size)
+
+      # Read in block coordinates:
+      if block_ids is not None:
+         if block_ids.datatype != "uint" or block_ids.dtype is None:
+            logging.info("Error! Bad block id data!")
+            logging.info("Data type: " + block_ids.datatype + ", element size: " + str(block_ids.element_size))
+            return
+         vector_size = block_ids.vector_size
+         offset_block_ids = int(offset * vector_size * block_ids.element_size + block_ids.offset)
+         data_block_ids = self.__read_raw(fptr, block_ids.dtype, offset_block_ids, vector_size*num_of_blocks)
+         data_block_ids = np.reshape(data_block_ids, (len(data_block_ids),) )
 
-            data_block_ids = np.reshape(data_block_ids, (len(data_block_ids),) )
-
-      fptr.close()
+      if fptr is not None:
+         fptr.close()
 
       # Check to make sure the sizes match (just some extra debugging)
       logging.info("data_avgs = " + str(data_avgs) + ", data_block_ids = " + str(data_block_ids))
@@ -534,24 +1116,34 @@ class VlsvReader(object):
 
    def __set_cell_offset_and_blocks_nodict(self, pop="proton"):
       ''' Read blocks per cell and the offset in the velocity space arrays for every cell with blocks.
-          Stores them in arrays. Creates a private dictionary with addressing to the array.
+          Stores them in arrays. Creates a private CellIdIndex with addressing to the array.
           This method should be faster than the above function.
       '''
       if pop in self.__cells_with_blocks:
          # There's stuff already saved into the dictionary, don't save it again
          return
 
+      entry = self.__load_index_entry("blocks."+pop)
+      if entry is not None:
+         self.__cells_with_blocks[pop] = entry["cells_with_blocks"]
+         self.__blocks_per_cell[pop] = entry["blocks_per_cell"]
+         self.__blocks_per_cell_offsets[pop] = entry["offsets"]
+         self.__order_for_cellid_blocks[pop] = CellIdIndex.from_sorted(entry["sorted"], entry["order"])
+         return
+
       logging.info("Getting offsets for population " + pop)
 
       self.__cells_with_blocks[pop] = np.atleast_1d(self.read(mesh="SpatialGrid",tag="CELLSWITHBLOCKS", name=pop))
       self.__blocks_per_cell[pop] = np.atleast_1d(self.read(mesh="SpatialGrid",tag="BLOCKSPERCELL", name=pop))
 
-      self.__blocks_per_cell_offsets[pop] = np.empty(len(self.__cells_with_blocks[pop]))
-      self.__blocks_per_cell_offsets[pop][0] = 0.0
+      self.__blocks_per_cell_offsets[pop] = np.zeros(len(self.__cells_with_blocks[pop]), dtype=np.int64)
       self.__blocks_per_cell_offsets[pop][1:] = np.cumsum(self.__blocks_per_cell[pop][:-1])
-      self.__order_for_cellid_blocks[pop] = {}
-      for index,cellid in enumerate(self.__cells_with_blocks[pop]):
-         self.__order_for_cellid_blocks[pop][cellid]=index
+      self.__order_for_cellid_blocks[pop] = CellIdIndex(self.__cells_with_blocks[pop])
+      self.__save_index_entry("blocks."+pop, {"cells_with_blocks": self.__cells_with_blocks[pop],
+                                              "blocks_per_cell": self.__blocks_per_cell[pop],
+                                              "offsets": self.__blocks_per_cell_offsets[pop],
+                                              "sorted": self.__order_for_cellid_blocks[pop].sorted_cellids,
+                                              "order": self.__order_for_cellid_blocks[pop].order})
 
    def __check_datareducer(self, name, reducer):
 
@@ -615,7 +1207,7 @@ class VlsvReader(object):
 
       varlist = []
 
-      for child in self.__xml_root:
+      for child in self.__arrays:
          if child.tag == "VARIABLE" and "name" in child.attrib:
             name = child.attrib["name"]
             varlist.append(name)
@@ -662,17 +1254,17 @@ class VlsvReader(object):
       '''
       if parameter:
          print("tag = PARAMETER")
-         for child in self.__xml_root:
+         for child in self.__arrays:
             if child.tag == "PARAMETER" and "name" in child.attrib:
                print("   ", child.attrib["name"])
       if variable:
          print("tag = VARIABLE")
-         for child in self.__xml_root:
+         for child in self.__arrays:
             if child.tag == "VARIABLE" and "name" in child.attrib:
                print("   ", child.attrib["name"])
       if mesh:
          print("tag = MESH")
-         for child in self.__xml_root:
+         for child in self.__arrays:
             if child.tag == "MESH" and "name" in child.attrib:
                print("   ", child.attrib["name"])
       if datareducer:
@@ -700,7 +1292,7 @@ class VlsvReader(object):
                   print("   ",name)
       if other:
          print("Other:")
-         for child in self.__xml_root:
+         for child in self.__arrays:
             if child.tag != "PARAMETER" and child.tag != "VARIABLE" and child.tag != "MESH":
                print("    tag = ", child.tag, " mesh = ", child.attrib["mesh"])
 
@@ -723,11 +1315,7 @@ class VlsvReader(object):
              else:
                 time = None
       '''
-      for child in self.__xml_root:
-         if child.tag == "PARAMETER" and "name" in child.attrib:
-            if child.attrib["name"].lower() == name.lower():
-               return True
-      return False
+      return self.__find_array("PARAMETER", name=name) is not None
 
    def check_variable( self, name ):
       ''' Checks if a given variable is in the vlsv reader
@@ -748,11 +1336,7 @@ class VlsvReader(object):
                 # Variable not in the vlsv file
                 plot_B_vol()
       '''
-      for child in self.__xml_root:
-         if child.tag == "VARIABLE" and "name" in child.attrib:
-            if child.attrib["name"].lower() == name.lower():
-               return True
-      return False
+      return self.__find_array("VARIABLE", name=name) is not None
 
    def check_population( self, popname ):
       ''' Checks if a given population is in the vlsv file
@@ -773,7 +1357,7 @@ class VlsvReader(object):
       '''
       blockidsexist = False
       foundpop = False
-      for child in self.__xml_root:
+      for child in self.__arrays:
          if child.tag == "BLOCKIDS":
             if "name" in child.attrib:
                if popname.lower() == child.attrib["name"].lower():
@@ -781,7 +1365,7 @@ class VlsvReader(object):
             else:
                blockidsexist = True
       if blockidsexist:
-         for child in self.__xml_root:
+         for child in self.__arrays:
             if child.tag == "BLOCKVARIABLE":
                if "name" in child.attrib:
                   if popname.lower() == child.attrib["name"].lower(): # avgs
@@ -798,15 +1382,27 @@ class VlsvReader(object):
              vars = vlsvReader.get_variables()
       '''
       varlist = [];
-      for child in self.__xml_root:
+      for child in self.__arrays:
          if child.tag == "VARIABLE" and "name" in child.attrib:
             varlist.append(child.attrib["name"])
       return varlist
 
    def get_cellid_locations(self):
       ''' Returns a dictionary with cell id as the key and the index of the cell id as the value. The index is used to locate the cell id's values in the arrays that this reader returns
+
+      .. note:: The dictionary is built on every call, use :func:`get_cellid_index` for vectorized lookups.
+      '''
+      return self.get_cellid_index().to_dict()
+
+   def get_cellid_index(self):
+      ''' Returns the CellIdIndex of this file, used to locate the values of cell ids in the arrays that this reader returns
+
+      .. code-block:: python
+
+          index = vlsvReader.get_cellid_index()
+          mask = index.contains(cellids)
+          rho = vlsvReader.read_variable("rho")[index.index_of(cellids[mask])]
       '''
-      # if len( self.__fileindex_for_cellid ) == 0:
       self.__read_fileindex_for_cellid()
       return self.__fileindex_for_cellid
 
@@ -820,25 +1416,20 @@ class VlsvReader(object):
       import sys
       tag="VERSION"
       # Seek for requested data in VLSV file
-      for child in self.__xml_root:
-         if child.tag != tag:
-            continue
-         if child.tag == tag:
-            # Found the requested data entry in the file
-            array_size = ast.literal_eval(child.attrib["arraysize"])
-            variable_offset = ast.literal_eval(child.text)
+      array_info = self.__find_array(tag)
+      if array_info is not None:
+         # Found the requested data entry in the file
+         if self.__fptr.closed:
+            fptr = open(self.file_name,"rb")
+         else:
+            fptr = self.__fptr
 
-            if self.__fptr.closed:
-               fptr = open(self.file_name,"rb")
-            else:
-               fptr = self.__fptr
-         
-            fptr.seek(variable_offset)
-            info = fptr.read(array_size).decode("utf-8")
+         fptr.seek(array_info.offset)
+         info = fptr.read(array_info.array_size).decode("utf-8")
 
-            print("Version Info for " + self.file_name)
-            print(info)
-            return True
+         print("Version Info for " + self.file_name)
+         print(info)
+         return True
 
       #if we end up here the file does not contain any version info
       print("File ",self.file_name," contains no version information")
@@ -853,23 +1444,18 @@ class VlsvReader(object):
       '''
       tag="CONFIG"
       # Seek for requested data in VLSV file
-      for child in self.__xml_root:
-         if child.tag != tag:
-            continue
-         if child.tag == tag:
-            # Found the requested data entry in the file
-            array_size = ast.literal_eval(child.attrib["arraysize"])
-            variable_offset = ast.literal_eval(child.text)
-
-            if self.__fptr.closed:
-               fptr = open(self.file_name,"rb")
-            else:
-               fptr = self.__fptr
+      array_info = self.__find_array(tag)
+      if array_info is not None:
+         # Found the requested data entry in the file
+         if self.__fptr.closed:
+            fptr = open(self.file_name,"rb")
+         else:
+            fptr = self.__fptr
 
-            fptr.seek(variable_offset)
-            configuration = fptr.read(array_size).decode("utf-8")
+         fptr.seek(array_info.offset)
+         configuration = fptr.read(array_info.array_size).decode("utf-8")
 
-            return configuration
+         return configuration
 
       #if we end up here the file does not contain any config info
       return None
@@ -959,27 +1545,28 @@ class VlsvReader(object):
          logging.info("Bad (empty) arguments at VlsvReader.read")
          raise ValueError()
 
-      # Force lowercase name for internal checks
-      name = name.lower()       
-
       # Seek for requested data in VLSV file
-      for child in self.__xml_root:
-         if tag != "":
-            if child.tag != tag:
-               continue
-         if name != "":
-            if "name" in child.attrib and child.attrib["name"].lower() != name:
-               continue
-         if mesh != "":
-            if "mesh" in child.attrib and child.attrib["mesh"] != mesh:
-               continue
-         if child.tag == tag:
-            # Found the requested data entry in the file
-            return ast.literal_eval(child.attrib[attribute])
-         
+      array_info = self.__find_array(tag, name=name, mesh=mesh)
+      if array_info is not None:
+         # Found the requested data entry in the file
+         return ast.literal_eval(array_info.attrib[attribute])
+
       raise ValueError("Variable or attribute not found")
 
 
+   def __read_key(self, name, tag, mesh, operator, cellids):
+      ''' Returns a hashable key identifying a read() request.
+      '''
+      if np.ndim(cellids) == 0:
+         cellids_key = int(cellids)
+      elif self.__read_memo_cellids[0] is cellids:
+         # Reducers pass the same cellid selection on to all of their inputs
+         cellids_key = self.__read_memo_cellids[1]
+      else:
+         cellids_key = np.asarray(cellids).astype(np.int64).tobytes()
+         self.__read_memo_cellids = (cellids, cellids_key)
+      return (name.lower(), tag, mesh if mesh is not None else '', operator, cellids_key)
+
    def read(self, name="", tag="", mesh="", operator="pass", cellids=-1):
       ''' Read data from the open vlsv file. 
       
@@ -991,8 +1578,138 @@ class VlsvReader(object):
                        for the specified cell id or cellids is read
       :returns: numpy array with the data
 
+      Datareducers are evaluated as a DAG: every variable and intermediate reducer output is
+      read or computed once per request and shared between all the reducers that depend on it.
+      Whole-grid results of variables and reducers are also kept across requests in the
+      least recently used cache lru_cache, from which cellid selections are served as well.
+
       .. seealso:: :func:`read_variable` :func:`read_variable_info`
       '''
+      outermost = self.__read_memo is None
+      if outermost:
+         self.__read_memo = {}
+      try:
+         key = self.__read_key(name, tag, mesh, operator, cellids)
+         if key in self.__read_memo:
+            return self.__read_memo[key]
+
+         # Raw fsgrid arrays are cached in their reordered form by read_fsgrid_variable
+         use_lru_cache = tag == "VARIABLE" and key[2] != "fsgrid" and self.lru_cache.budget > 0
+         if use_lru_cache:
+            cache_key = (key[0], operator, key[2])
+            if key[4] == -1:
+               data = self.lru_cache.get(cache_key)
+            elif cache_key in self.lru_cache:
+               data = self.__select_cells(self.lru_cache.get(cache_key), cellids)
+               if isinstance(data, np.ndarray) and not data.flags.writeable:
+                  data = data.copy()
+            else:
+               data = None
+            if data is not None:
+               self.__read_memo[key] = data
+               return data
+
+         data = self.__read(name, tag, mesh, operator, cellids)
+         self.__read_memo[key] = data
+         if use_lru_cache and key[4] == -1:
+            data = self.lru_cache.put(cache_key, data)
+         return data
+      finally:
+         if outermost:
+            self.__read_memo = None
+            self.__read_memo_cellids = (None, None)
+
+   def __cell_chunks(self, chunk_cells):
+      ''' Yields (start, end) ranges of file indices of SpatialGrid cells, chunk_cells cells at a time.
+          A last chunk of a single cell is merged into the previous chunk, so that every chunk is
+          read as an array of cells.
+      '''
+      ncells = self.__find_array("VARIABLE", name="CellID", mesh="SpatialGrid").array_size
+      starts = list(range(0, ncells, max(1, chunk_cells)))
+      if len(starts) > 1 and ncells - starts[-1] == 1:
+         starts.pop()
+      for start, end in zip(starts, starts[1:] + [ncells]):
+         yield start, end
+
+   def __read_cellid_range(self, start, end):
+      ''' Reads the CellIDs at file indices start...end-1.
+      '''
+      array_info = self.__find_array("VARIABLE", name="CellID", mesh="SpatialGrid")
+      fptr = self.__get_fptr()
+      cellids = self.__read_raw(fptr, array_info.dtype, array_info.offset + start*array_info.element_size, end-start)
+      if fptr is not None:
+         fptr.close()
+      return cellids
+
+   def __read_chunk(self, name, tag, mesh, operator, cellids):
+      ''' Reads a chunk of cells as a separate request, so that the memoized reducer inputs of
+          the chunk are released once it has been read. Always returns one row per cell.
+      '''
+      outer_memo, outer_memo_cellids = self.__read_memo, self.__read_memo_cellids
+      self.__read_memo = None
+      try:
+         data = self.read(name=name, tag=tag, mesh=mesh, operator=operator, cellids=cellids)
+      finally:
+         self.__read_memo, self.__read_memo_cellids = outer_memo, outer_memo_cellids
+      if len(cellids) == 1:
+         data = np.asanyarray(data)[np.newaxis]
+      return data
+
+   def __read_in_chunks(self, cellids):
+      ''' True if a whole-grid read of an elementwise datareducer should be evaluated in chunks.
+      '''
+      if not (np.ndim(cellids) == 0 and cellids < 0) or self.chunk_cells <= 0:
+         return False
+      array_info = self.__find_array("VARIABLE", name="CellID", mesh="SpatialGrid")
+      return array_info is not None and array_info.array_size > self.chunk_cells
+
+   def __read_reducer_chunked(self, name, tag, mesh, operator):
+      ''' Evaluates a whole-grid elementwise datareducer chunk_cells cells at a time into a
+          preallocated output, so that the reducer inputs and temporaries are only ever
+          allocated for a single chunk.
+      '''
+      ncells = self.__find_array("VARIABLE", name="CellID", mesh="SpatialGrid").array_size
+      output = None
+      for start, end in self.__cell_chunks(self.chunk_cells):
+         cellids = self.__read_cellid_range(start, end)
+         data = np.asanyarray(self.__read_chunk(name, tag, mesh, operator, cellids))
+         if len(data) != len(cellids):
+            raise ValueError("Datareducer "+name+" is not elementwise, set elementwise=False for it")
+         if output is None:
+            output = np.empty((ncells,) + np.shape(data)[1:], dtype=np.result_type(data))
+         if np.ma.isMaskedArray(data) and not np.ma.isMaskedArray(output):
+            output = np.ma.masked_array(output, mask=np.zeros(output.shape, dtype=bool))
+         output[start:end] = data
+      return output
+
+   def iter_variable(self, name, operator="pass", chunk_cells=None):
+      ''' Iterates over a SpatialGrid variable or datareducer in chunks of cells, in file order.
+      Only a single chunk of the variable, and of the inputs of a datareducer, is held in memory
+      at a time.
+
+      :param name: Name of the variable
+      :param operator: Datareduction operator. "pass" does no operation on data
+      :param chunk_cells: Number of cells per chunk, defaults to the chunk_cells attribute of the reader
+      :returns: generator of (cellids, data) tuples, data holding one row per cell
+
+      .. code-block:: python
+
+         # Maximum of beta* without reading the whole grid at once
+         beta_max = max(np.max(data) for cellids, data in f.iter_variable("vg_beta_star", chunk_cells=100000))
+
+      .. seealso:: :func:`read_variable`
+      '''
+      if name.lower()[0:3] in ("fg_", "ig_"):
+         raise ValueError("iter_variable only supports SpatialGrid variables, got "+name)
+      if chunk_cells is None:
+         chunk_cells = self.chunk_cells
+      for start, end in self.__cell_chunks(chunk_cells):
+         cellids = self.__read_cellid_range(start, end)
+         yield cellids, self.__read_chunk(name, "VARIABLE", "SpatialGrid", operator, cellids)
+
+   def __read(self, name, tag, mesh, operator, cellids):
+      ''' Reads or reduces a single request, see :func:`read`.
+      '''
       if tag == "" and name == "":
          logging.info("Bad (empty) arguments at VlsvReader.read")
          raise ValueError()
@@ -1007,21 +1724,8 @@ class VlsvReader(object):
          if (name,operator) in self.variable_cache.keys():
             return self.read_variable_from_cache(name, cellids, operator)
 
-      if (len( self.__fileindex_for_cellid ) == 0):
-         # Do we need to construct the cellid index?
-         if isinstance(cellids, numbers.Number): # single or all cells
-            if cellids >= 0: # single cell
-               self.__read_fileindex_for_cellid()
-         else: # list of cellids
-            self.__read_fileindex_for_cellid()
-               
-      if self.__fptr.closed:
-         fptr = open(self.file_name,"rb")
-      else:
-         fptr = self.__fptr
-
+      fptr = self.__get_fptr()
 
-         
       # Get population and variable names from data array name 
       if '/' in name:
          popname = name.split('/')[0]
@@ -1034,101 +1738,41 @@ class VlsvReader(object):
          popname = 'pop'
          varname = name
 
-      # Seek for requested data in VLSV file
-      for child in self.__xml_root:
-         if tag != "":
-            if child.tag != tag:
-               continue
-         # Verify that any requested name or mesh matches those of the data
-         if name != "":
-            if not "name" in child.attrib:
-               continue
-            if child.attrib["name"].lower() != name:
-               continue
-         if mesh != "":
-            if not "mesh" in child.attrib:
-               continue
-            if child.attrib["mesh"] != mesh:
-               continue
-         if child.tag == tag:
-            # Found the requested data entry in the file
-            vector_size = ast.literal_eval(child.attrib["vectorsize"])
-            array_size = ast.literal_eval(child.attrib["arraysize"])
-            element_size = ast.literal_eval(child.attrib["datasize"])
-            datatype = child.attrib["datatype"]
-            variable_offset = ast.literal_eval(child.text)
-
-            # Define efficient method to read data in
-            try: # try-except to see how many cellids were given
-               lencellids=len(cellids) 
-               # Read multiple specified cells
-               # If we're reading a large amount of single cells, it'll be faster to just read all
-               # data from the file system and sort through it. For the CSC disk system, this
-               # becomes more efficient for over ca. 5000 cellids.
-               arraydata = []
-               if lencellids>5000: 
-                  result_size = len(cellids)
-                  read_size = array_size
-                  read_offsets = [0]
-               else: # Read multiple cell ids one-by-one
-                  result_size = len(cellids)
-                  read_size = 1
-                  read_offsets = [self.__fileindex_for_cellid[cid]*element_size*vector_size for cid in cellids]
-            except: # single cell or all cells
-               if cellids < 0: # -1, read all cells
-                  result_size = array_size
-                  read_size = array_size
-                  read_offsets = [0]
-               else: # single cell id
-                  result_size = 1
-                  read_size = 1
-                  read_offsets = [self.__fileindex_for_cellid[cellids]*element_size*vector_size]
-                  
-            for r_offset in read_offsets:
-               use_offset = int(variable_offset + r_offset)
-               fptr.seek(use_offset)
-               if datatype == "float" and element_size == 4:
-                  data = np.fromfile(fptr, dtype = np.float32, count=vector_size*read_size)
-               if datatype == "float" and element_size == 8:
-                  data = np.fromfile(fptr, dtype=np.float64, count=vector_size*read_size)
-               if datatype == "int" and element_size == 4:
-                  data = np.fromfile(fptr, dtype=np.int32, count=vector_size*read_size)
-               if datatype == "int" and element_size == 8:
-                  data = np.fromfile(fptr, dtype=np.int64, count=vector_size*read_size)
-               if datatype == "uint" and element_size == 4:
-                  data = np.fromfile(fptr, dtype=np.uint32, count=vector_size*read_size)
-               if datatype == "uint" and element_size == 8:
-                  data = np.fromfile(fptr, dtype=np.uint64, count=vector_size*read_size)
-               if len(read_offsets)!=1:
-                  arraydata.append(data)
-            
-            if len(read_offsets)==1 and result_size<read_size:
-               # Many single cell id's requested
-               # Pick the elements corresponding to the requested cells
-               for cid in cellids:
-                  append_offset = self.__fileindex_for_cellid[cid]*vector_size
-                  arraydata.append(data[append_offset:append_offset+vector_size])
-               data = np.squeeze(np.array(arraydata))
-
-            if len(read_offsets)!=1:
-               # Not-so-many single cell id's requested
-               data = np.squeeze(np.array(arraydata))
+      # Seek for requested data in VLSV file, only tagged requests are read from the file directly
+      array_info = self.__find_array(tag, name=name, mesh=mesh) if tag != "" else None
+      if array_info is not None:
+         # Found the requested data entry in the file
+         vector_size = array_info.vector_size
+         array_size = array_info.array_size
+         variable_offset = array_info.offset
+
+         if np.ndim(cellids) == 0 and cellids < 0: # -1, read all cells
+            result_size = array_size
+            data = self.__read_raw(fptr, array_info.dtype, variable_offset, vector_size*array_size)
+         else: # single cell id or a list of cell ids, gathered in file order
+            self.__read_fileindex_for_cellid()
+            indices = self.__fileindex_for_cellid.index_of(np.atleast_1d(cellids))
+            result_size = len(indices)
+            data = self.__read_rows(fptr, array_info, indices)
+            if vector_size == 1:
+               data = data.reshape(result_size)
 
+         if fptr is not None:
             fptr.close()
 
-            if vector_size > 1:
-               data=data.reshape(result_size, vector_size)
-            
-            # If variable vector size is 1, and requested magnitude, change it to "absolute"
-            if vector_size == 1 and operator=="magnitude":
-               logging.info("Data variable with vector size 1: Changed magnitude operation to absolute")
-               operator="absolute"
+         if vector_size > 1:
+            data=data.reshape(result_size, vector_size)
+         
+         # If variable vector size is 1, and requested magnitude, change it to "absolute"
+         if vector_size == 1 and operator=="magnitude":
+            logging.info("Data variable with vector size 1: Changed magnitude operation to absolute")
+            operator="absolute"
+
+         if result_size == 1:
+            return data_operators[operator](data[0])
+         else:
+            return data_operators[operator](data)
 
-            if result_size == 1:
-               return data_operators[operator](data[0])
-            else:
-               return data_operators[operator](data)
-      
       # Check which set of datareducers to use
       if '/' in name and popname in self.active_populations:
          checkname = 'pop/'+varname
@@ -1166,28 +1810,19 @@ class VlsvReader(object):
             operator="absolute"
 
          # Return the output of the datareducer
+         if reducer.elementwise and self.__read_in_chunks(cellids):
+            return self.__read_reducer_chunked(name, tag, mesh, operator)
          if reducer.useVspace and not reducer.useReader:
-            actualcellids = self.read(mesh="SpatialGrid", name="CellID", tag="VARIABLE", operator=operator, cellids=cellids)
-            output = np.zeros(len(actualcellids))
-            index = 0
-            for singlecellid in actualcellids:
-               velocity_cell_data = self.read_velocity_cells(singlecellid)
-               # Get cells:
-               vcellids = list(velocity_cell_data.keys())
-               # Get coordinates:
-               velocity_coordinates = self.get_velocity_cell_coordinates(vcellids)
-               tmp_vars = []
-               for i in np.atleast_1d(reducer.variables):
-                  tmp_vars.append( self.read( i, tag, mesh, "pass", singlecellid ) )
-               output[index] = reducer.operation( tmp_vars , velocity_cell_data, velocity_coordinates )
-               index+=1
-               logging.info(str(index)+"/"+str(len(actualcellids)))
-            
-            if reducer.useReader:
-               logging.info("Combined useVspace and useReader reducers not implemented!")
-               raise NotImplementedError()
-            else:
-               return data_operators[operator](output)
+            actualcellids = np.atleast_1d(self.read(mesh="SpatialGrid", name="CellID", tag="VARIABLE", operator="pass", cellids=cellids))
+            tmp_vars = []
+            for i in np.atleast_1d(reducer.variables):
+               tmp_vars.append( self.read( i, tag, mesh, "pass", cellids ) )
+            output = evaluate_vspace_reducer(self, name, reducer, actualcellids, tmp_vars,
+                                             workers=self.vspace_reducer_workers,
+                                             chunk_cells=self.vspace_reducer_chunk_cells)
+            if np.ndim(cellids) == 0 and cellids >= 0:
+               output = output[0]
+            return data_operators[operator](output)
          else:
             tmp_vars = []
             for i in np.atleast_1d(reducer.variables):
@@ -1210,6 +1845,9 @@ class VlsvReader(object):
             logging.info("Error: useVspace flag is not implemented for multipop datareducers!") 
             return
 
+         if reducer.elementwise and self.__read_in_chunks(cellids):
+            return self.__read_reducer_chunked(name, tag, mesh, operator)
+
          # sum over populations
          if popname=='pop':
             # Read the necessary variables:
@@ -1231,7 +1869,8 @@ class VlsvReader(object):
                tmp_vars.append( self.read( popname+'/'+tvar, tag, mesh, "pass", cellids ) )
          return data_operators[operator](reducer.operation( tmp_vars ))
 
-      fptr.close()
+      if fptr is not None:
+         fptr.close()
       if name!="":
          raise ValueError("Error: variable "+name+"/"+tag+"/"+mesh+"/"+operator+" not found in .vlsv file or in data reducers!") 
 
@@ -1262,35 +1901,13 @@ class VlsvReader(object):
       name = name.lower()
       
       # Seek for requested data in VLSV file
-      for child in self.__xml_root:         
-         if tag != "":
-            if child.tag != tag:
-               continue
-         if name != "":
-            if "name" in child.attrib and child.attrib["name"].lower() != name:
-               continue
-         if mesh != "":
-            if "mesh" in child.attrib and child.attrib["mesh"] != mesh:
-               continue
-         if not "name" in child.attrib:
-            continue
+      array_info = self.__find_array(tag, name=name, mesh=mesh)
+      if array_info is not None and array_info.name != "":
          # Found the requested data entry in the file
-         try:
-            unit = child.attrib["unit"]
-         except:
-            unit = ""
-         try:
-            unitLaTeX = child.attrib["unitLaTeX"]
-         except:
-            unitLaTeX = ""
-         try:
-            variableLaTeX = child.attrib["variableLaTeX"]
-         except:
-            variableLaTeX = ""
-         try:
-            unitConversion = child.attrib["unitConversion"] 
-         except:
-            unitConversion = ""
+         unit = array_info.attrib.get("unit", "")
+         unitLaTeX = array_info.attrib.get("unitLaTeX", "")
+         variableLaTeX = array_info.attrib.get("variableLaTeX", "")
+         unitConversion = array_info.attrib.get("unitConversion", "")
          return unit, unitLaTeX, variableLaTeX, unitConversion
             
       if name!="":
@@ -1323,8 +1940,7 @@ class VlsvReader(object):
       if (len(periodic)!=3):
          raise ValueError("Periodic must be a list of 3 booleans.")
 
-      #First off let's fetch the data and some meta
-      fg_data=self.read_fsgrid_variable( name,operator=operator)
+      #First off let's fetch some meta
       fg_size=self.get_fsgrid_mesh_size()
       nx,ny,nz=fg_size
       extents=self.get_fsgrid_mesh_extent()
@@ -1333,6 +1949,18 @@ class VlsvReader(object):
       dy=abs((ymax-ymin)/ny)
       dz=abs((zmax-zmin)/nz)
 
+      # Then the data: only the box spanned by the interpolation stencils, unless they wrap around the domain
+      stencil_low = np.floor((np.atleast_2d(coordinates) - extents[0:3])/np.array([dx,dy,dz])).astype(np.int64)
+      fg_offset = np.amin(stencil_low, axis=0)
+      stencil_up = np.amax(stencil_low, axis=0) + 1
+      if np.all(fg_offset >= 0) and np.all(stencil_up <= np.array(fg_size) - 1):
+         fg_data = self.read_fsgrid_variable(name, operator=operator,
+                                             lower=extents[0:3] + fg_offset*np.array([dx,dy,dz]),
+                                             upper=extents[0:3] + (stencil_up+1)*np.array([dx,dy,dz]))
+      else:
+         fg_data = self.read_fsgrid_variable(name, operator=operator)
+         fg_offset = np.zeros(3, dtype=np.int64)
+
       def getFsGridIndices(indices):
          ''' 
          Returns indices based on boundary conditions
@@ -1398,7 +2026,7 @@ class VlsvReader(object):
                for i in [0,1]:
                   retind=getFsGridIndices([xl+i,yl+j,zl+k])
                   if (not retind): retval.fill(np.nan) # outside of a non periodic domain
-                  retval += w[4*k+2*j+i]*fg_data[retind]
+                  else: retval += w[4*k+2*j+i]*fg_data[tuple(np.array(retind) - fg_offset)]
 
          return retval
 
@@ -1429,10 +2057,11 @@ class VlsvReader(object):
       len_cellids = np.atleast_1d(cellids).shape[0]
       cellid_neighbors = np.zeros((len_cellids, 8))
 
-      in_cache = dict_keys_exist(self.__regular_neighbor_cache, cellids)
+      regular_neighbor_cache = self.get_mesh_structure("regular_neighbors", dict) # cellid-of-low-corner : (8,) np.array of cellids
+      in_cache = dict_keys_exist(regular_neighbor_cache, cellids)
       
       if(np.any(in_cache)):
-         cellid_neighbors[in_cache,:] = np.array(itemgetter(*cellids[in_cache])(self.__regular_neighbor_cache), dtype=np.int64)
+         cellid_neighbors[in_cache,:] = np.array(itemgetter(*cellids[in_cache])(regular_neighbor_cache), dtype=np.int64)
       n_not_in_cache = np.sum(~in_cache)
 
       if n_not_in_cache > 0:
@@ -1448,7 +2077,7 @@ class VlsvReader(object):
          offsets = np.tile(offsets, (n_not_in_cache, 1))
          cellid_neighbors_new = self.get_cell_neighbor(cellids_rep, offsets, [True,True,True], prune_uniques=False)
          cellid_neighbors_new = cellid_neighbors_new.reshape((-1,8))
-         self.__regular_neighbor_cache.update( {c:cellid_neighbors_new[i,:] for i,c in enumerate(cellids[~in_cache])})
+         regular_neighbor_cache.update( {c:cellid_neighbors_new[i,:] for i,c in enumerate(cellids[~in_cache])})
          cellid_neighbors[~in_cache,:] = cellid_neighbors_new
       
       return cellid_neighbors
@@ -1464,10 +2093,12 @@ class VlsvReader(object):
                      
       :returns: numpy array with the data
 
-      .. seealso:: :func:`read` :func:`read_variable_info`
-      '''
-
+      .. note:: When reading several variables at the same coordinates, or the same coordinates from
+                several files of a run, build an :class:`InterpolationPlan` once with
+                :func:`get_interpolation_plan` and apply it to each variable instead.
 
+      .. seealso:: :func:`read` :func:`read_variable_info` :func:`get_interpolation_plan`
+      '''
 
       if (len(periodic)!=3):
             raise ValueError("Periodic must be a list of 3 booleans.")
@@ -1483,38 +2114,54 @@ class VlsvReader(object):
          return self.read_interpolated_ionosphere_variable(name, coords, operator, periodic, method)
 
       # case vg
+      return self.get_interpolation_plan(coords, periodic=periodic, method=method).apply(name, operator=operator)
 
-      coordinates = get_data(coords)
-      coordinates = np.array(coordinates)
-      
-      stack = True
-      if len(np.shape(coordinates)) == 1:
-         stack = False
-         coordinates = np.atleast_2d(coordinates)
+   def get_interpolation_plan(self, coords, periodic=[True, True, True], method="linear"):
+      ''' Builds an interpolation plan for reading vg variables at the given coordinates.
 
-      # Check one value for the length
-      test_variable = self.read_variable(name,cellids=[1],operator=operator)
-      if isinstance(test_variable,np.ma.core.MaskedConstant):
-         value_length=1
-      elif isinstance(test_variable, Iterable):
-         value_length=len(test_variable)
-      else:
-         value_length=1
+      :param coords: Coordinates at which the variables are interpolated
+      :param periodic: Periodicity of the system. Default is periodic in all dimension
+      :param method: Interpolation method, default "linear", options: ["nearest", "linear"]
+      :returns: :class:`InterpolationPlan`
 
-      ncoords = coordinates.shape[0]
+      .. code-block:: python
+
+         # Example:
+         plan = f.get_interpolation_plan(points)
+         B = plan.apply("vg_b_vol")
+         rho = plan.apply("vg_rho")
+         # Another file of the same run with an identical mesh
+         B_next = plan.apply("vg_b_vol", reader=f_next)
+
+      .. seealso:: :func:`read_interpolated_variable` :func:`get_interpolation_stencil`
+      '''
+      if method.lower() in interp_method_aliases.keys():
+         warnings.warn("Updated alias " +method+" -> "+interp_method_aliases[method.lower()])
+         method = interp_method_aliases[method.lower()]
+      return InterpolationPlan(self, coords, periodic=periodic, method=method)
+
+   def get_interpolation_stencil(self, coordinates, periodic=[True, True, True], method="linear"):
+      ''' Computes the cells and weights that interpolate vg variables at the given coordinates.
+      On regular parts of the grid the stencil of a point are the 8 cells around it, weighted trilinearly.
+      Points whose 8 cells are not on the same refinement level use the corners of the dual cell
+      containing them, weighted by the generalized trilinear coordinates of the point.
+
+      :param coordinates: numpy array of coordinates, shape (n, 3)
+      :param periodic: Periodicity of the system. Default is periodic in all dimension
+      :param method: Interpolation method, "nearest" or "linear"
+      :returns: (closest cellids (n,), stencil cellids (n, k), weights (n, k)), with k=1 for "nearest" and k=8
+                for "linear". Stencil cellids outside of the domain are 0.
+
+      .. seealso:: :class:`InterpolationPlan`
+      '''
+      if (len(periodic)!=3):
+            raise ValueError("Periodic must be a list of 3 booleans.")
       if(coordinates.shape[1] != 3):
          raise IndexError("Coordinates are required to be three-dimensional (coords.shape[1]==3 or convertible to such))")
-      closest_cell_ids = self.get_cellid(coordinates)
+      closest_cell_ids = np.atleast_1d(self.get_cellid(coordinates)).astype(np.int64)
 
       if method.lower() == "nearest":
-         final_values = self.read_variable(name, cellids=closest_cell_ids, operator=operator)
-         if stack:
-            return final_values.squeeze()
-         else:
-            if value_length == 1:
-               return final_values.squeeze()[()] # The only special case to return a scalar instead of an array
-            else:
-               return final_values.squeeze()
+         return closest_cell_ids, closest_cell_ids[:,np.newaxis], np.ones((len(closest_cell_ids),1))
       elif method.lower() != 'linear':
          raise NotImplementedError(method + ' is not a valid interpolation method')
 
@@ -1527,16 +2174,15 @@ class VlsvReader(object):
       lower_cell_ids = self.get_cell_neighbor(closest_cell_ids, offsets, periodic, prune_uniques=True)
 
       lower_cell_ids_unique, unique_cell_indices = np.unique(lower_cell_ids, return_inverse=True)
-      ngbrvalues=np.full((len(lower_cell_ids_unique)*2*2*2,value_length),np.nan)
+      unique_cell_indices = np.reshape(unique_cell_indices, -1)
 
-      cellid_neighbors = np.zeros((lower_cell_ids_unique.shape[0],8))
+      # The 8 cells around each lower corner, x slowest and z fastest
+      cellid_neighbors = np.zeros((lower_cell_ids_unique.shape[0],8), dtype=np.int64)
       cellid_neighbors[lower_cell_ids_unique != 0, :] = self.get_vg_regular_interp_neighbors(lower_cell_ids_unique[lower_cell_ids_unique != 0])
-      cellid_neighbors = cellid_neighbors.reshape((-1))
-   
 
       lower_cell_coordinatess=self.get_cell_coordinates(lower_cell_ids_unique)
 
-      upper_cell_ids = cellid_neighbors[7::8]
+      upper_cell_ids = cellid_neighbors[:,7]
       upper_cell_coordinatess=self.get_cell_coordinates(upper_cell_ids)
 
       scaled_coordinates = np.zeros_like(coordinates)
@@ -1544,44 +2190,34 @@ class VlsvReader(object):
       nonperiodic_all = nonperiodic[unique_cell_indices]
       scaled_coordinates[nonperiodic_all] = (coordinates[nonperiodic_all] - lower_cell_coordinatess[unique_cell_indices][nonperiodic_all])/(upper_cell_coordinatess[unique_cell_indices][nonperiodic_all] - lower_cell_coordinatess[unique_cell_indices][nonperiodic_all])
 
-      # neighbour tuples can also overlap, so choose only unique ones here as well for reading (should be moved to read_variable)
-      cellids_neighbors_unique, indices = np.unique(cellid_neighbors[cellid_neighbors!=0], return_inverse=True)
-
-      # Read the corner values for required cells and apply repeats to match the initial coordinates
-      if value_length > 1:
-         read_vals = self.read_variable(name, cellids=cellids_neighbors_unique, operator=operator)
-         ngbrvalues[cellid_neighbors!=0,:] = read_vals[indices,:]
-         # ngbrvalues[cellid_neighbors!=0,:] = self.read_variable(name, cellids=cellid_neighbors[cellid_neighbors!=0], operator=operator)
-      else:
-         read_vals = self.read_variable(name, cellids=cellids_neighbors_unique, operator=operator)[:,np.newaxis]
-         ngbrvalues[cellid_neighbors!=0,:] = read_vals[indices,:]
-         # ngbrvalues[cellid_neighbors!=0,:] = self.read_variable(name, cellids=cellid_neighbors[cellid_neighbors!=0], operator=operator)[:,np.newaxis]
-      # ngbrvalues = np.reshape(ngbrvalues, (ncoords,2,2,2,value_length))
-      ngbrvalues = np.reshape(ngbrvalues, (len(lower_cell_ids_unique),2,2,2,value_length))
-
-      ngbrvalues = ngbrvalues[unique_cell_indices,...]
-      
-      c2ds=ngbrvalues[:,0,:,:,:]* (1- scaled_coordinates[:,0][:,np.newaxis,np.newaxis,np.newaxis]) +  ngbrvalues[:,1,:,:,:]*scaled_coordinates[:,0][:,np.newaxis,np.newaxis,np.newaxis]
-      c1ds = c2ds[:,0,:,:]*(1 - scaled_coordinates[:,1][:,np.newaxis,np.newaxis]) + c2ds[:,1,:,:] * scaled_coordinates[:,1][:,np.newaxis,np.newaxis]
-      final_values=c1ds[:,0,:] * (1 - scaled_coordinates[:,2][:,np.newaxis]) + c1ds[:,1,:] * scaled_coordinates[:,2][:,np.newaxis]
+      stencil = cellid_neighbors[unique_cell_indices]
+      wx = np.stack((1-scaled_coordinates[:,0], scaled_coordinates[:,0]), axis=-1)
+      wy = np.stack((1-scaled_coordinates[:,1], scaled_coordinates[:,1]), axis=-1)
+      wz = np.stack((1-scaled_coordinates[:,2], scaled_coordinates[:,2]), axis=-1)
+      weights = np.reshape(wx[:,:,np.newaxis,np.newaxis]*wy[:,np.newaxis,:,np.newaxis]*wz[:,np.newaxis,np.newaxis,:], (-1,8))
 
-      if np.any(cellid_neighbors==0):
-         warnings.warn("Coordinate in interpolation out of domain, output contains nans",UserWarning)
+      refs0 = np.reshape(self.get_amr_level(cellid_neighbors.reshape(-1)),(-1,8))
+      irregs = np.any(refs0 != refs0[:,0][:,np.newaxis],axis =1)[unique_cell_indices]
+      if np.any(irregs):
+         stencil[irregs], weights[irregs] = self.__get_dual_stencil(coordinates[irregs], closest_cell_ids[irregs])
 
-      
-      refs0 = np.reshape(self.get_amr_level(cellid_neighbors),(-1,8))
-      if np.any(np.any(refs0 != refs0[:,0][:,np.newaxis],axis =1)):
-         irregs = np.any(refs0 != refs0[:,0][:,np.newaxis],axis =1)[unique_cell_indices]
-         final_values[irregs,:] = np.reshape(self.read_interpolated_variable_irregular(name, coordinates[irregs], operator, method=method.lower()),(-1,value_length))
-         # warnings.warn("Interpolation across refinement levels. Results are now better, but some discontinuitues might appear. If that bothers, try the read_interpolated_variable_irregular variant directly.",UserWarning)
+      return closest_cell_ids, stencil, weights
 
-      if stack:
-         return final_values.squeeze()
-      else:
-         if value_length == 1:
-            return final_values.squeeze()[()] # The only special case to return a scalar instead of an array
-         else:
-            return final_values.squeeze()
+   def __get_dual_stencil(self, coordinates, cellids):
+      ''' Corner cellids and generalized trilinear weights of the dual cells containing the coordinates,
+          used for interpolating across refinement interfaces. Weights are nan for points without a dual.
+      '''
+      self.build_duals(cellids)
+      keys, ksis = self.__find_duals(coordinates, cellids)
+      dual_mesh = self.get_dual_mesh()
+      positions, found = dual_mesh.find_duals(keys)
+      corners = np.where(found[:,np.newaxis], dual_mesh.dual_cells[positions], 0)
+      # Dual corners are ordered x fastest and z slowest, see interpolator_amr.f
+      wx = np.stack((1-ksis[:,0], ksis[:,0]), axis=-1)
+      wy = np.stack((1-ksis[:,1], ksis[:,1]), axis=-1)
+      wz = np.stack((1-ksis[:,2], ksis[:,2]), axis=-1)
+      weights = np.reshape(wz[:,:,np.newaxis,np.newaxis]*wy[:,np.newaxis,:,np.newaxis]*wx[:,np.newaxis,np.newaxis,:], (-1,8))
+      return corners, weights
 
    def get_duals(self,cids):
       ''' Get the union of dual cells that cover each of CellIDs in cids.
@@ -1589,11 +2225,11 @@ class VlsvReader(object):
 
       :returns: Dict of vertex-indices v (3-tuple) : 8-tuple of cellids (corners of dual cells indexed by v)
       '''
-
-      fo = {c: self.__cell_duals[c] for c in cids}
-      vset = set()
-      vset.union(*fo.values())
-      return {v: self.__dual_cells[v] for v in vset}
+      dual_mesh = self.get_dual_mesh()
+      owners, vertices = dual_mesh.get_vertices(np.unique(np.atleast_1d(np.asarray(cids, dtype=np.int64))))
+      vertices = np.unique(vertices)
+      cells = self.build_dual_from_vertices(vertices)
+      return {tuple(v): tuple(c) for v, c in zip(dual_mesh.decode(vertices).tolist(), cells.tolist())}
 
 
    def read_interpolated_variable_irregular(self, name, coords, operator="pass",periodic=[True, True, True],
@@ -1708,106 +2344,176 @@ class VlsvReader(object):
 
        ... seealso:: :func:`read_fsgrid_variable`
        '''
-      var = self.read_fsgrid_variable(name, operator=operator)
-      if cellids == -1:
-         return var
+      if np.ndim(cellids) == 0 and cellids == -1:
+         return self.read_fsgrid_variable(name, operator=operator)
       else:
-         return [self.downsample_fsgrid_subarray(cid, var) for cid in cellids]
+         # Read only the fsgrid box covering the requested cells
+         lows, ups = self.get_cell_bbox(np.atleast_1d(cellids))
+         lowi, upi = self.get_bbox_fsgrid_slicemap(np.amin(lows, axis=0), np.amax(ups, axis=0))
+         var = self.read_fsgrid_variable(name, operator=operator, lower=np.amin(lows, axis=0), upper=np.amax(ups, axis=0))
+         return [self.downsample_fsgrid_subarray(cid, var, offset=lowi) for cid in cellids]
 
-   def read_fsgrid_variable(self, name, operator="pass"):
+   def read_fsgrid_variable(self, name, operator="pass", lower=None, upper=None):
        ''' Reads fsgrid variables from the open vlsv file.
        Arguments:
        :param name: Name of the variable
        :param operator: Datareduction operator. "pass" does no operation on data
-       :returns: *ordered* numpy array with the data
+       :param lower: Optional lower corner [x,y,z] of a bounding box (in meters), defaults to the lower corner of the domain
+       :param upper: Optional upper corner [x,y,z] of a bounding box (in meters), defaults to the upper corner of the domain
+       :returns: *ordered* numpy array with the data. If lower or upper is given, only the fsgrid cells inside
+                 the box are returned, same as :func:`get_bbox_fsgrid_subarray` of the full array, and only the
+                 chunks of the writing ranks that intersect the box are read from the file.
 
        ... seealso:: :func:`read_variable`
        '''
 
-       # Get fsgrid domain size (this can differ from vlasov grid size if refined)
-       bbox = self.read(tag="MESH_BBOX", mesh="fsgrid")
-       bbox = np.int32(bbox)
+       if lower is not None or upper is not None:
+          extent = self.get_fsgrid_mesh_extent()
+          lower = extent[0:3] if lower is None else np.clip(lower, extent[0:3], extent[3:6])
+          upper = extent[3:6] if upper is None else np.clip(upper, extent[0:3], extent[3:6])
+          lowi, upi = self.get_bbox_fsgrid_slicemap(lower, upper)
+          return self.__read_fsgrid_box(name, operator, np.array(lowi), np.array(upi))
+
+       cache_key = (name.lower(), operator, "fsgrid")
+       if self.lru_cache.budget > 0:
+          cached = self.lru_cache.get(cache_key)
+          if cached is not None:
+             return cached
+
+       layout = self.__get_fsgrid_layout()
+       bbox = layout["bbox"]
+       decomposition = layout["decomposition"]
 
        # Read the raw array data
        rawData = self.read(mesh='fsgrid', name=name, tag="VARIABLE", operator=operator)
-
-       # Determine fsgrid domain decomposition
-       numWritingRanks = self.read_parameter("numWritingRanks")
-       if len(rawData.shape) > 1:
-         orderedData = np.zeros([bbox[0],bbox[1],bbox[2],rawData.shape[1]])
+       rawData = rawData.reshape(rawData.shape[0], -1)
+       vector_size = rawData.shape[1]
+
+       if layout["uniform"]:
+          # All ranks hold equally sized chunks: the raw data is a (ranks in x, y, z, chunk z, y, x)
+          # array (chunks are stored in Fortran order), reorder it in one go
+          chunk = layout["sizes"][0]
+          orderedData = rawData.reshape(decomposition[0], decomposition[1], decomposition[2],
+                                        chunk[2], chunk[1], chunk[0], vector_size)
+          orderedData = np.ascontiguousarray(orderedData.transpose(0,5,1,4,2,3,6)).reshape(bbox[0], bbox[1], bbox[2], vector_size)
+          if not orderedData.flags.writeable: # a single rank of a memory-mapped file
+             orderedData = orderedData.copy()
        else:
-         orderedData = np.zeros([bbox[0],bbox[1],bbox[2]])
-
-       def calcLocalStart(globalCells, ntasks, my_n):
-           n_per_task = globalCells//ntasks
-           remainder = globalCells%ntasks
-           if my_n < remainder:
-               return my_n * (n_per_task+1)
-           else:
-               return my_n * n_per_task + remainder
-       def calcLocalSize(globalCells, ntasks, my_n):
-           n_per_task = globalCells//ntasks
-           remainder = globalCells%ntasks
-           if my_n < remainder:
-               return n_per_task+1;
-           else:
-               return n_per_task
-
-       currentOffset = 0;
-       if self.__fsGridDecomposition is None:
+          # Copy every chunk straight into its place in the output
+          orderedData = np.zeros([bbox[0],bbox[1],bbox[2],vector_size], dtype=rawData.dtype)
+          for start, size, offset in zip(layout["starts"], layout["sizes"], layout["offsets"]):
+             totalSize = size[0]*size[1]*size[2]
+             if totalSize == 0:
+                continue
+             orderedData[start[0]:start[0]+size[0],start[1]:start[1]+size[1],start[2]:start[2]+size[2],:] = \
+                rawData[offset:offset+totalSize,:].reshape(size[2],size[1],size[0],vector_size).transpose(2,1,0,3)
+
+       orderedData = np.squeeze(orderedData)
+       if self.lru_cache.budget > 0:
+          orderedData = self.lru_cache.put(cache_key, orderedData)
+       return orderedData
+
+   def __read_fsgrid_box(self, name, operator, lowi, upi):
+      ''' Reads the fsgrid cells from index lowi to upi (inclusive) of a variable.
+
+          Chunks are stored in Fortran order, so the part of a chunk between two z indices is a single
+          contiguous range in the file. Only those ranges of the chunks that intersect the box are read.
+      '''
+      layout = self.__get_fsgrid_layout()
+      bbox = layout["bbox"]
+      box_size = upi - lowi + 1
+      cache_key = (name.lower(), operator, "fsgrid")
+      array_info = self.__find_array("VARIABLE", name=name, mesh="fsgrid")
+
+      if cache_key in self.lru_cache or array_info is None:
+         # Already cached, or a datareducer that has to be evaluated on the whole grid
+         full = self.read_fsgrid_variable(name, operator=operator).reshape(bbox[0], bbox[1], bbox[2], -1)
+         data = full[lowi[0]:upi[0]+1, lowi[1]:upi[1]+1, lowi[2]:upi[2]+1, :].copy()
+      else:
+         vector_size = array_info.vector_size
+         row_bytes = vector_size*array_info.element_size
+         data = np.zeros([box_size[0], box_size[1], box_size[2], vector_size], dtype=array_info.dtype)
+
+         starts = layout["starts"]
+         ends = starts + layout["sizes"]
+         intersecting = np.all((starts <= upi) & (ends > lowi), axis=1)
+         fptr = self.__get_fptr()
+         for rank in np.flatnonzero(intersecting):
+            start, size, offset = starts[rank], layout["sizes"][rank], layout["offsets"][rank]
+            lo = np.maximum(lowi, start)
+            hi = np.minimum(upi + 1, start + size)
+            slab = size[0]*size[1]
+            rows = self.__read_raw(fptr, array_info.dtype, array_info.offset + (offset + (lo[2]-start[2])*slab)*row_bytes,
+                                   (hi[2]-lo[2])*slab*vector_size)
+            chunk = rows.reshape(hi[2]-lo[2], size[1], size[0], vector_size).transpose(2,1,0,3)
+            data[lo[0]-lowi[0]:hi[0]-lowi[0], lo[1]-lowi[1]:hi[1]-lowi[1], lo[2]-lowi[2]:hi[2]-lowi[2], :] = \
+               chunk[lo[0]-start[0]:hi[0]-start[0], lo[1]-start[1]:hi[1]-start[1], :, :]
+         if fptr is not None:
+            fptr.close()
+
+         if vector_size == 1 and operator == "magnitude":
+            operator = "absolute"
+         if operator != "pass":
+            data = data_operators[operator](data.reshape(-1, vector_size) if vector_size > 1 else data.reshape(-1))
+            data = np.asarray(data).reshape(box_size[0], box_size[1], box_size[2], -1)
+
+      # Drop the same singleton dimensions as read_fsgrid_variable does for the whole grid
+      axes = [d for d in range(3) if bbox[d] == 1]
+      if data.shape[3] == 1:
+         axes.append(3)
+      return np.squeeze(data, axis=tuple(axes))
+
+   def __get_fsgrid_layout(self):
+      ''' Determines the FsGrid domain decomposition and the chunk of every writing rank once per reader.
+
+          :returns: dictionary with the fsgrid size "bbox", the "decomposition", per-rank chunk "starts" and "sizes"
+                    as (numWritingRanks, 3) arrays, the "offsets" of the chunks in the raw arrays and
+                    whether all chunks are equally sized ("uniform")
+      '''
+      if self.__fsgrid_layout is not None:
+         return self.__fsgrid_layout
+
+      # Get fsgrid domain size (this can differ from vlasov grid size if refined)
+      bbox = np.int64(self.read(tag="MESH_BBOX", mesh="fsgrid"))
+      numWritingRanks = self.read_parameter("numWritingRanks")
+
+      if self.__fsGridDecomposition is None:
          self.__fsGridDecomposition = self.read(tag="MESH_DECOMPOSITION",mesh='fsgrid')
          if self.__fsGridDecomposition is not None:
             logging.info("Found FsGrid decomposition from vlsv file: " + str(self.__fsGridDecomposition))
          else:
             logging.info("Did not find FsGrid decomposition from vlsv file.")
-       
-       # If decomposition is None even after reading, we need to calculate it:
-       if self.__fsGridDecomposition is None:
-          logging.info("Calculating fsGrid decomposition from the file")
-          self.__fsGridDecomposition = fsDecompositionFromGlobalIds(self)
-          logging.info("Computed FsGrid decomposition to be: " + str(self.__fsGridDecomposition))
-       else:
-          # Decomposition is a list (or fail assertions below) - use it instead
-          pass
-          
-       assert len(self.__fsGridDecomposition) == 3, "Manual FSGRID decomposition should have three elements, but is "+str(self.__fsGridDecomposition)
-       assert np.prod(self.__fsGridDecomposition) == numWritingRanks, "Manual FSGRID decomposition should have a product of numWritingRanks ("+str(numWritingRanks)+"), but is " + str(np.prod(self.__fsGridDecomposition)) + " for decomposition "+str(self.__fsGridDecomposition)
-               
-          
-
-       for i in range(0,numWritingRanks):
-           x = (i // self.__fsGridDecomposition[2]) // self.__fsGridDecomposition[1]
-           y = (i // self.__fsGridDecomposition[2]) % self.__fsGridDecomposition[1]
-           z = i % self.__fsGridDecomposition[2]
- 	   
-           thatTasksSize = [calcLocalSize(bbox[0], self.__fsGridDecomposition[0], x), \
-                            calcLocalSize(bbox[1], self.__fsGridDecomposition[1], y), \
-                            calcLocalSize(bbox[2], self.__fsGridDecomposition[2], z)]
-           thatTasksStart = [calcLocalStart(bbox[0], self.__fsGridDecomposition[0], x), \
-                             calcLocalStart(bbox[1], self.__fsGridDecomposition[1], y), \
-                             calcLocalStart(bbox[2], self.__fsGridDecomposition[2], z)]
-           
-           thatTasksEnd = np.array(thatTasksStart) + np.array(thatTasksSize)
-           totalSize = int(thatTasksSize[0]*thatTasksSize[1]*thatTasksSize[2])
-           # Extract datacube of that task... 
-           if len(rawData.shape) > 1:
-               thatTasksData = rawData[currentOffset:currentOffset+totalSize,:]
-               thatTasksData = thatTasksData.reshape([thatTasksSize[0],thatTasksSize[1],thatTasksSize[2],rawData.shape[1]],order='F')
-
-               # ... and put it into place 
-               orderedData[thatTasksStart[0]:thatTasksEnd[0],thatTasksStart[1]:thatTasksEnd[1],thatTasksStart[2]:thatTasksEnd[2],:] = thatTasksData
-           else:
-               # Special case for scalar data
-               thatTasksData = rawData[currentOffset:currentOffset+totalSize]
-               if (len(thatTasksData)>0):
-                  thatTasksData = thatTasksData.reshape([thatTasksSize[0],thatTasksSize[1],thatTasksSize[2]], order='F')
-
-                  # ... and put it into place
-                  orderedData[thatTasksStart[0]:thatTasksEnd[0],thatTasksStart[1]:thatTasksEnd[1],thatTasksStart[2]:thatTasksEnd[2]] = thatTasksData
-
-           currentOffset += totalSize
-
-       return np.squeeze(orderedData)
+      
+      # If decomposition is None even after reading, we need to calculate it:
+      if self.__fsGridDecomposition is None:
+         logging.info("Calculating fsGrid decomposition from the file")
+         self.__fsGridDecomposition = fsDecompositionFromGlobalIds(self)
+         logging.info("Computed FsGrid decomposition to be: " + str(self.__fsGridDecomposition))
+      else:
+         # Decomposition is a list (or fail assertions below) - use it instead
+         pass
+         
+      assert len(self.__fsGridDecomposition) == 3, "Manual FSGRID decomposition should have three elements, but is "+str(self.__fsGridDecomposition)
+      assert np.prod(self.__fsGridDecomposition) == numWritingRanks, "Manual FSGRID decomposition should have a product of numWritingRanks ("+str(numWritingRanks)+"), but is " + str(np.prod(self.__fsGridDecomposition)) + " for decomposition "+str(self.__fsGridDecomposition)
+
+      decomposition = [int(d) for d in self.__fsGridDecomposition]
+      ranks = np.arange(numWritingRanks, dtype=np.int64)
+      rank_indices = [(ranks // decomposition[2]) // decomposition[1],
+                      (ranks // decomposition[2]) % decomposition[1],
+                      ranks % decomposition[2]]
+      starts = np.zeros((numWritingRanks,3), dtype=np.int64)
+      sizes = np.zeros((numWritingRanks,3), dtype=np.int64)
+      for d in range(3):
+         dim_starts, dim_sizes = fsLocalExtents(bbox[d], decomposition[d])
+         starts[:,d] = dim_starts[rank_indices[d]]
+         sizes[:,d] = dim_sizes[rank_indices[d]]
+      totalSizes = np.prod(sizes, axis=1)
+      offsets = np.zeros(numWritingRanks, dtype=np.int64)
+      offsets[1:] = np.cumsum(totalSizes)[:-1]
+
+      self.__fsgrid_layout = {"bbox":bbox, "decomposition":decomposition, "starts":starts, "sizes":sizes,
+                              "offsets":offsets, "uniform":bool(np.all(sizes == sizes[0]))}
+      return self.__fsgrid_layout
 
    def read_fg_variable_as_volumetric(self, name, centering=None, operator="pass"):
       fgdata = self.read_fsgrid_variable(name, operator)
@@ -1874,7 +2580,15 @@ class VlsvReader(object):
          .. seealso:: :func:`read_variable`
       '''
 
-      var_data = self.variable_cache[(name,operator)]
+      return self.__select_cells(self.variable_cache[(name,operator)], cellids)
+
+   def __select_cells(self, var_data, cellids):
+      ''' Picks the values of the given cellids from a whole-grid array in file order.
+
+         :param var_data: numpy array with the data of all cells
+         :param cellids: a value of -1 returns all data
+         :returns: numpy array with the data, same format as read_variable
+      '''
       if var_data.ndim == 2:
          value_len = var_data.shape[1]
       else:
@@ -1884,12 +2598,13 @@ class VlsvReader(object):
          if cellids == -1:
             return var_data
          else:
-            return var_data[self.__fileindex_for_cellid[cellids]]
+            self.__read_fileindex_for_cellid()
+            return var_data[self.__fileindex_for_cellid.index_of(cellids)]
       else:
-         if(len(cellids) > 0):
-            indices = np.array(itemgetter(*cellids)(self.__fileindex_for_cellid),dtype=np.int64)
-         else:
-            indices = np.array([],dtype=np.int64)
+         self.__read_fileindex_for_cellid()
+         indices = self.__fileindex_for_cellid.index_of(np.atleast_1d(np.asarray(cellids, dtype=np.int64)))
+         if len(indices) == 1: # a single cell id in a list is returned as a single cell
+            return var_data[indices[0]]
          if value_len == 1:
             return var_data[indices]
          else:
@@ -2030,6 +2745,10 @@ class VlsvReader(object):
       ''' Returns the maximum refinement level of the AMR
       '''
       if self.__max_spatial_amr_level < 0:
+         entry = self.__load_index_entry("max_refinement_level")
+         if entry is not None:
+            self.__max_spatial_amr_level = int(entry["max_refinement_level"])
+            return self.__max_spatial_amr_level
          # Read the file index for cellid
          cellids=self.read(mesh="SpatialGrid",name="CellID", tag="VARIABLE")
          maxcellid = np.int64(np.amax([cellids]))
@@ -2040,6 +2759,7 @@ class VlsvReader(object):
             AMR_count += 1
             
          self.__max_spatial_amr_level = AMR_count - 1
+         self.__save_index_entry("max_refinement_level", {"max_refinement_level": np.int64(self.__max_spatial_amr_level)})
       return self.__max_spatial_amr_level
 
    def get_amr_level(self,cellid):
@@ -2125,11 +2845,15 @@ class VlsvReader(object):
       lowi, upi = self.get_fsgrid_slice_indices(low, up)
       return lowi, upi
 
-   def get_cell_fsgrid_subarray(self, cellid, array):
+   def get_cell_fsgrid_subarray(self, cellid, array, offset=(0,0,0)):
       '''Returns a subarray of the fsgrid array, corresponding to the fsgrid
       covered by the SpatialGrid cellid.
+
+      :param offset: fsgrid index of array[0,0,0], if array only covers a part of the fsgrid
       '''
       lowi, upi = self.get_cell_fsgrid_slicemap(cellid)
+      lowi = np.array(lowi) - offset
+      upi = np.array(upi) - offset
       if array.ndim == 4:
          return array[lowi[0]:upi[0]+1, lowi[1]:upi[1]+1, lowi[2]:upi[2]+1, :]
       else:
@@ -2137,6 +2861,8 @@ class VlsvReader(object):
 
    def get_bbox_fsgrid_subarray(self, low, up, array):
       '''Returns a subarray of the fsgrid array, corresponding to the (low, up) bounding box.
+
+      .. seealso:: :func:`read_fsgrid_variable` with lower and upper, which reads only the box from the file
       '''
       lowi, upi = self.get_bbox_fsgrid_slicemap(low,up)
       if array.ndim == 4:
@@ -2145,10 +2871,12 @@ class VlsvReader(object):
          return array[lowi[0]:upi[0]+1, lowi[1]:upi[1]+1, lowi[2]:upi[2]+1]
 
 
-   def downsample_fsgrid_subarray(self, cellid, array):
+   def downsample_fsgrid_subarray(self, cellid, array, offset=(0,0,0)):
       '''Returns a mean value of fsgrid values underlying the SpatialGrid cellid.
+
+      :param offset: fsgrid index of array[0,0,0], if array only covers a part of the fsgrid
       '''
-      fsarr = self.get_cell_fsgrid_subarray(cellid, array)
+      fsarr = self.get_cell_fsgrid_subarray(cellid, array, offset=offset)
       n = fsarr.size
       if fsarr.ndim == 4:
          n = n/3
@@ -2272,6 +3000,20 @@ class VlsvReader(object):
       cidsout = np.array(list(OrderedDict.fromkeys(cids)))
       return cidsout
    
+   def get_cell_locator(self):
+      ''' Returns the point location index of the cells of the file, built on first use.
+
+      :returns: :class:`CellLocator`
+
+      .. seealso:: :func:`get_cellid`
+      '''
+      if self.__cell_locator is None:
+         self.__read_fileindex_for_cellid()
+         base_cells = (self.__xcells, self.__ycells, self.__zcells)
+         self.__cell_locator = self.get_mesh_structure("cell_locator",
+            lambda: CellLocator(self.__fileindex_for_cellid.sorted_cellids, base_cells, self.get_max_refinement_level()))
+      return self.__cell_locator
+
    def get_cellid(self, coords):
       ''' Returns the cell ids at given coordinates
 
@@ -2290,13 +3032,6 @@ class VlsvReader(object):
       if coordinates.shape[1] != 3:
          raise IndexError("Coordinates are required to be 3-dimensional (coords were %d-dimensional)" % coordinates.shape[1])
 
-      # If needed, read the file index for cellid
-      # if len(self.__fileindex_for_cellid) == 0:
-      self.__read_fileindex_for_cellid()
-      #good_ids = self.read_variable("CellID")
-      # good_ids = np.array(list(self.__fileindex_for_cellid.keys()))
-      # good_ids.sort()
-
       cellids = np.zeros((coordinates.shape[0]), dtype=np.int64)
 
       # mask for cells that are unresolved - out-of-bounds coordinates stay at zero
@@ -2306,46 +3041,14 @@ class VlsvReader(object):
                (self.__zmax > coordinates[:,2]) & (self.__zmin < coordinates[:,2])
       )
 
-      # Get cell lengths:
-      cell_lengths = np.array([self.__dx, self.__dy, self.__dz])
-
-      cellindices = np.zeros(coordinates.shape, dtype=np.int64)
-      
-      
-
-      # Get cell indices:
-      cellindices[mask,0] = (coordinates[mask,0] - self.__xmin)/cell_lengths[0]
-      cellindices[mask,1] = (coordinates[mask,1] - self.__ymin)/cell_lengths[1]
-      cellindices[mask,2] = (coordinates[mask,2] - self.__zmin)/cell_lengths[2]
-      # Get the cell id:
-      cellids[mask] = cellindices[mask,0] + cellindices[mask,1] * self.__xcells + cellindices[mask,2] * self.__xcells * self.__ycells + 1
-
-      # Going through AMR levels as needed
-      AMR_count = 0
-      ncells_lowerlevel = 0
+      # Cell indices at the finest refinement level, resolved to the leaf cells by the locator
       refmax = self.get_max_refinement_level()
-
-
-      while AMR_count < refmax +1:
-         drop = ~dict_keys_exist(self.__fileindex_for_cellid, cellids[mask])
-
-         mask[mask] = mask[mask] & drop
-         
-         ncells_lowerlevel += 2**(3*AMR_count)*(self.__xcells*self.__ycells*self.__zcells) # Increment of cellID from lower lvl             
-         AMR_count += 1
-         # Get cell lengths:
-         cell_lengths = np.array([self.__dx, self.__dy, self.__dz]) / 2**AMR_count # Check next AMR level
-
-         # Get cell indices:
-         cellindices[mask,0] = (coordinates[mask,0] - self.__xmin)/cell_lengths[0]
-         cellindices[mask,1] = (coordinates[mask,1] - self.__ymin)/cell_lengths[1]
-         cellindices[mask,2] = (coordinates[mask,2] - self.__zmin)/cell_lengths[2]
-         # Get the cell id:
-         cellids[mask] = ncells_lowerlevel + cellindices[mask,0] + 2**(AMR_count)*cellindices[mask,1] * self.__xcells + 4**(AMR_count) * cellindices[mask,2] * self.__xcells * self.__ycells + 1
-
-      drop = ~dict_keys_exist(self.__fileindex_for_cellid, cellids[mask])
-      mask[mask] = mask[mask] & drop
-      cellids[mask] = 0 # set missing cells to null cell
+      cell_lengths = np.array([self.__dx, self.__dy, self.__dz]) / 2**refmax
+      mins = np.array([self.__xmin, self.__ymin, self.__zmin])
+      finest_cells = np.array([self.__xcells, self.__ycells, self.__zcells], dtype=np.int64) * 2**refmax
+      cellindices = ((coordinates[mask] - mins[np.newaxis,:])/cell_lengths[np.newaxis,:]).astype(np.int64)
+      cellindices = np.minimum(cellindices, finest_cells - 1)
+      cellids[mask] = self.get_cell_locator().locate(cellindices)
       if stack:
          return cellids
       else:
@@ -2379,7 +3082,7 @@ class VlsvReader(object):
 
       # Boolean array flag_empty_in indicates if queried points (coords_in) don't already lie within vdf-containing cells, 
       output = self.get_cellid(coords_in)
-      flag_empty_in = np.array( [cid not in self.__order_for_cellid_blocks[pop] for cid in output] )
+      flag_empty_in = ~self.__order_for_cellid_blocks[pop].contains(np.atleast_1d(output))
       N_empty_in = sum(flag_empty_in)
 
       if N_empty_in == 0:   # every element of coords_in already within a vdf-containing cell
@@ -2420,6 +3123,17 @@ class VlsvReader(object):
       cid_w_vdf = self.__cells_with_blocks[pop]
       return cid in cid_w_vdf
 
+   def __get_vertex_index_array(self, coordinates):
+      ''' Vertex indices (N,3) of coordinates (N,3), by truncation at fsgrid resolution.
+      '''
+      cell_lengths = np.array([self.__dx, self.__dy, self.__dz]) / 2**self.get_max_refinement_level()
+      extents = self.get_fsgrid_mesh_extent()
+      mins = extents[0:3]
+      eps = np.mean(cell_lengths)/1000
+      crds = coordinates - mins[np.newaxis,:] + eps
+      indices = crds/cell_lengths[np.newaxis,:]
+      return indices.astype(int)
+
    def get_vertex_indices(self, coordinates):
       ''' Get dual grid vertex indices for all coordinates.
       
@@ -2431,20 +3145,20 @@ class VlsvReader(object):
       if(len(coordinates.shape) == 1):
          stack = False
          coordinates = coordinates[np.newaxis,:]
-      cell_lengths = np.array([self.__dx, self.__dy, self.__dz]) / 2**self.get_max_refinement_level()
-      extents = self.get_fsgrid_mesh_extent()
-      mins = extents[0:3]
-      maxs = extents[3:5]
-      eps = np.mean(cell_lengths)/1000
-      crds = coordinates - mins[np.newaxis,:] + eps
-      indices = crds/cell_lengths[np.newaxis,:]
-      indices = indices.astype(int)
+      indices = self.__get_vertex_index_array(coordinates)
 
       if stack:
          return [tuple(inds) for inds in indices]
       else:
-         coordinates = coordinates[0,:]
          return tuple(indices[0,:])
+
+   def get_vertex_keys(self, coordinates):
+      ''' Get the int64 keys of the dual grid vertices of coordinates, as used by the tables of :func:`get_dual_mesh`.
+
+      :param coordinates: np.array of coordinates, shaped (N,3)
+      :returns: numpy int64 array of N vertex keys
+      '''
+      return self.get_dual_mesh().encode(self.__get_vertex_index_array(np.atleast_2d(coordinates)))
       
    def get_vertex_coordinates_from_indices(self, indices):
       ''' Convert vertex indices to physical coordinates.
@@ -2468,6 +3182,42 @@ class VlsvReader(object):
       else:
          return crds[0,:]
 
+   def get_dual_mesh(self):
+      ''' Returns the dual mesh tables of the file (see :mod:`dualmesh`), built as needed by the AMR
+      interpolation routines. The tables only depend on the mesh and are shared with the readers of other
+      files with the same mesh through the mesh registry (see :func:`get_mesh_structure`), or can be
+      passed on with :func:`set_dual_mesh` and saved with :func:`DualMesh.save`.
+
+      :returns: :class:`DualMesh`
+      '''
+      if self.__dual_mesh is None:
+         vertex_shape = np.array(self.get_spatial_mesh_size(), dtype=np.int64)*2**self.get_max_refinement_level() + 1
+         self.__dual_mesh = self.get_mesh_structure("dual_mesh", lambda: DualMesh(vertex_shape, self.get_mesh_fingerprint()))
+      return self.__dual_mesh
+
+   def set_dual_mesh(self, dual_mesh):
+      ''' Uses dual mesh tables built for another file with the same mesh.
+
+      :param dual_mesh: :class:`DualMesh`, e.g. from :func:`get_dual_mesh` of another reader or :func:`DualMesh.load`
+      :raises ValueError: if the tables were built for a different mesh
+      '''
+      if dual_mesh.fingerprint != self.get_mesh_fingerprint():
+         raise ValueError("The dual mesh was built for a different mesh than the mesh of " + self.file_name)
+      self.__dual_mesh = dual_mesh
+      if self.mesh_registry is not None:
+         self.__mesh_structures[(False, "dual_mesh")] = self.mesh_registry.put(self.get_mesh_fingerprint(), "dual_mesh", dual_mesh,
+                                                                               owner=self.__mesh_structures)
+      else:
+         self.__mesh_structures[(False, "dual_mesh")] = meshregistry.MeshStructure(dual_mesh)
+
+   def __as_vertex_keys(self, vertices):
+      ''' Vertex keys from either keys or an (N,3) array / list of 3-tuples of vertex indices.
+      '''
+      vertices = np.asarray(vertices, dtype=np.int64)
+      if vertices.ndim == 2 and vertices.shape[1] == 3:
+         return self.get_dual_mesh().encode(vertices)
+      return np.atleast_1d(vertices)
+
    # this should then do the proper search instead of intp for in which dual of the cell the point lies
    def get_dual(self, pts, cellids=None):
       ''' Find the duals that contain the coordinate points pts. This will call the iterative find_ksi function
@@ -2475,29 +3225,55 @@ class VlsvReader(object):
       through neighbouring duals until a dual is found.
       :parameter pts: numpy array of coordinates (N,3)
 
-      :returns: duals (numpy array of N 3-tuples), ksis (numpy array of interpolation weights (N, 8))
+      :returns: duals (numpy array of N 3-tuples of vertex indices, (0,0,0) where no dual was found),
+                ksis (numpy array of interpolation weights (N, 3))
+      '''
+      pts = np.atleast_2d(pts)
+      keys, ksis = self.__find_duals(pts, cellids)
+      indices = self.get_dual_mesh().decode(keys)
+      indices[keys < 0] = 0
+      duals = np.empty((pts.shape[0],), dtype=object)
+      for i, inds in enumerate(indices.tolist()):
+         duals[i] = tuple(inds)
+      return duals, ksis
+
+   def get_dual_cells(self, duals):
+      ''' Returns the cellids at the corners of dual cells.
+
+      :param duals: Vertex indices of the duals, as returned by :func:`get_dual`, or vertex keys
+      :returns: numpy int64 array (N, 8) of cellids, 1 for duals that have not been built
+      '''
+      if isinstance(duals, np.ndarray) and duals.dtype == object:
+         duals = list(duals)
+      keys = self.__as_vertex_keys(duals)
+      dual_mesh = self.get_dual_mesh()
+      positions, found = dual_mesh.find_duals(keys)
+      return np.where(found[:,np.newaxis], dual_mesh.dual_cells[positions], 1)
+
+   def __find_duals(self, pts, cellids=None):
+      ''' Vertex keys of the duals containing the points and the trilinear coordinates of the points in them.
+      Keys are -1 and coordinates nan for points for which no dual was found.
       '''
-
       from pyCalculations.interpolator_amr import find_ksi
 
       # start the search from the vertices 
       if cellids is None:
-         cid = self.get_cellid(np.atleast_2d(pts))
+         cid = self.get_cellid(pts)
       else:
          cid = cellids
-
-      self.build_cell_vertices(np.atleast_1d(cid),prune_unique=True)
-      
-      vverts = [self.__cell_vertices[c] for c in cid]
-      set_of_verts = set()
-      # Loops over duals indexed by vertex tuple
-      self.build_dual_from_vertices(list(set_of_verts.union(*vverts)))
-
-      for i,verts in enumerate(vverts):
-         bboxes = np.array(itemgetter(*verts)(self.__dual_bboxes))
-         vmask = np.all(pts[i,:] >= bboxes[:,0:3],axis=1) & np.all(pts[i,:] <= bboxes[:,3:6],axis=1)
-         okverts = [verts[ind] for ind, val in enumerate(vmask) if val]
-         vverts[i] = okverts
+      cid = np.atleast_1d(np.asarray(cid, dtype=np.int64))
+
+      dual_mesh = self.get_dual_mesh()
+      self.build_cell_vertices(cid, prune_unique=True)
+      # Candidate duals are the ones at the vertices of the cell of each point
+      pinds, candidates = dual_mesh.get_vertices(cid)
+      self.build_dual_from_vertices(np.unique(candidates))
+      positions = dual_mesh.find_duals(candidates)[0]
+      bboxes = dual_mesh.dual_bboxes[positions]
+      vmask = np.all(pts[pinds,:] >= bboxes[:,0:3],axis=1) & np.all(pts[pinds,:] <= bboxes[:,3:6],axis=1)
+      pinds = pinds[vmask]
+      candidates = candidates[vmask]
+      positions = positions[vmask]
 
       # Breaks degeneracies by expanding the dual cells vertices along
       #  main-grid diagonals
@@ -2512,251 +3288,180 @@ class VlsvReader(object):
                            [ 1.0,  1.0,  1.0],
                         ]) * offset_eps
 
-      verts_per_pt = [len(verts) for verts in vverts]
-      ppts = pts.repeat(verts_per_pt, axis=0)
-      pinds = np.indices((pts.shape[0],)).repeat(verts_per_pt)
-
-      all_verts = [v for vs in vverts for v in vs]
-
-      all_vcoords = self.get_cell_coordinates(np.array(itemgetter(*all_verts)(self.__dual_cells))[np.newaxis,:].reshape(-1))
+      keys = np.full((pts.shape[0],), -1, dtype=np.int64)
+      ksis = np.full_like(pts, np.nan, dtype=float)
+      if len(candidates) == 0:
+         return keys, ksis
 
+      all_vcoords = self.get_cell_coordinates(dual_mesh.dual_cells[positions].reshape(-1))
       all_vcoords = offsets[np.newaxis,:,:]+all_vcoords.reshape(-1,8,3)
-      all_vksis = find_ksi(ppts, all_vcoords)
+      all_vksis = find_ksi(pts[pinds,:], all_vcoords)
 
       foundmask = np.all(all_vksis <=1, axis=1) & np.all(all_vksis >= 0, axis=1)
 
       ind = np.nonzero(foundmask)[0]
-      all_vksis = all_vksis[ind,:]
-
-      found_pts = pinds[ind]
-      found_pts, inds = np.unique(found_pts, return_index = True)
-
-
-
-      ksis = np.full_like(pts, np.nan)
-      duals = np.empty((pts.shape[0],),dtype="i,i,i")
-      duals[:] = (0,0,0)
-      dduals = np.array(np.array(all_verts,dtype="i,i,i")[ind], dtype="i,i,i")
-
-      ksis[found_pts,:] = all_vksis[inds,:]
-      duals[found_pts] = dduals[inds]
-
-      return duals.astype(object), ksis
+      # The first dual found for each point
+      found_pts, inds = np.unique(pinds[ind], return_index = True)
+      keys[found_pts] = candidates[ind[inds]]
+      ksis[found_pts,:] = all_vksis[ind[inds],:]
+      return keys, ksis
       
    # For now, combined caching accessor and builder
    def build_cell_vertices(self, cid, prune_unique=False):
-      ''' Builds, caches and returns the vertices that lie on the surfaces of CellIDs cid.
+      ''' Builds, caches and returns the vertices that lie on the surfaces of CellIDs cid, i.e. the corners
+      of the cells and the hanging nodes of their finer neighbours.
       
       :parameter cid: numpy array of CellIDs
-      :parameter prune_unique: bool [False], if you suspect you might be calling the function many times with the 
-                               same CellID in the list, it might be beneficial to enable this and not repeat the operation for duplicate entries.
+      :parameter prune_unique: kept for backwards compatibility, the vertices are always built once per unique CellID
 
-      :returns: Dictionary of cell c (int) : set of vertex indices (3-tuple) that touch the cell c.
+      :returns: (cellids, vertex keys), one entry per vertex of each unique CellID of cid, the corners of each cell first.
 
       '''
-      if prune_unique:
-         cid = np.unique(cid)
-
-      mask = ~dict_keys_exist(self.__cell_vertices,cid,prune_unique=False)
-      # {cid : 8-tuple of vertex_inds}
-      
-      cell_neighbors = self.build_cell_neighborhoods(cid[mask])
-      corner_vertices = self.get_cell_corner_vertices(cid[mask])
-
-      levels = self.get_amr_level(cid[mask])
-
-      # find irregular cells
-      # irregular_mask = np.array([np.any(levels[i] != self.get_amr_level(np.array(list(cell_neighbors[c])))) for i,c in enumerate(cid[mask])],dtype=bool)
-      mask[mask] = mask[mask] #& irregular_mask # beautiful
-      
-      cell_hanging_nodes = {c: () for c in cid[mask]}
-
-      if(len(cid[mask])==1):
-         self.get_cell_corner_vertices(np.array(list(set().union(itemgetter(*cid[mask])(cell_neighbors)))))
-      elif(len(cid[mask])>=1):
-         self.get_cell_corner_vertices(np.array(list(set().union(*itemgetter(*cid[mask])(cell_neighbors)))))
-      # Loop over all the irregular cells (with finer neighbours) that may have hanging nodes
-      # for i,c in enumerate(irregular_cells):
-      for i,c in enumerate(cid[mask]):
-         corners = np.array(self.__cell_corner_vertices[c], dtype=np.int64)
-         # finer_neighbors = [n for n in cell_neighbors[c] if self.get_amr_level(n) > levels[i]]
-         hanging_set = set()
-         # ncorners = self.get_cell_corner_vertices(np.array(finer_neighbors))
-         ncorners = itemgetter(*cell_neighbors[c])(self.__cell_corner_vertices) #self.get_cell_corner_vertices(np.array(list(cell_neighbors[c])))
-
-         # Possible hanging nodes are those that are the vertices of finer neighbours.
-         for vertex_inds_set in ncorners:#.values():
-            hanging_set.update(set(vertex_inds_set) - set(corner_vertices[c])) # no need to add current corners
-         
-         cmin = np.min(corners,axis=0)
-         cmax = np.max(corners,axis=0)
-
-         pruned_hangers = {v for v in hanging_set if np.all(np.array(v,dtype=np.int64) <= cmax) and np.all(np.array(v,dtype=np.int64) >= cmin)}
-         cell_hanging_nodes[c] = tuple(pruned_hangers)
-
-      vertices = {c: corner_vertices[c]+cell_hanging_nodes[c] for c in cid[mask]}
-      self.__cell_vertices.update(vertices)
-      
-      for c in cid[~mask]:
-         vertices[c] = self.__cell_vertices[c]
-      
-      return vertices
+      cid = np.unique(np.atleast_1d(np.asarray(cid, dtype=np.int64)))
+      dual_mesh = self.get_dual_mesh()
+      todo = cid[~dual_mesh.has_vertices(cid)]
+
+      if len(todo) > 0:
+         owners, neighbors = self.build_cell_neighborhoods(todo)
+         inside = neighbors != 0
+         owners, neighbors = owners[inside], neighbors[inside]
+         corners = self.get_cell_corner_vertices(todo)
+         neighbor_corners = self.get_cell_corner_vertices(neighbors)
+
+         # Possible hanging nodes are those that are the vertices of the neighbours, on the surface of the cell
+         candidate_owners = np.repeat(np.searchsorted(todo, owners), 8)
+         candidates = neighbor_corners.reshape(-1)
+         corner_indices = dual_mesh.decode(corners)
+         cmin = np.min(corner_indices, axis=1)[candidate_owners]
+         cmax = np.max(corner_indices, axis=1)[candidate_owners]
+         candidate_indices = dual_mesh.decode(candidates)
+         hanging = (np.all(candidate_indices <= cmax, axis=1) & np.all(candidate_indices >= cmin, axis=1) &
+                    ~np.any(candidates[:,np.newaxis] == corners[candidate_owners], axis=1)) # no need to add current corners
+         candidate_owners, candidates = candidate_owners[hanging], candidates[hanging]
+         order = np.lexsort((candidates, candidate_owners))
+         candidate_owners, candidates = candidate_owners[order], candidates[order]
+         first = np.ones(len(candidates), dtype=bool)
+         first[1:] = (candidates[1:] != candidates[:-1]) | (candidate_owners[1:] != candidate_owners[:-1])
+
+         vertex_owners = np.concatenate((np.repeat(np.arange(len(todo)), 8), candidate_owners[first]))
+         vertex_keys = np.concatenate((corners.reshape(-1), candidates[first]))
+         order = np.argsort(vertex_owners, kind="stable")
+         dual_mesh.add_vertices(todo[vertex_owners[order]], vertex_keys[order])
+
+      pinds, keys = dual_mesh.get_vertices(cid)
+      return cid[pinds], keys
 
    def get_cell_corner_vertices(self, cids):
       ''' Builds, caches and returns the vertices that lie on the corners of CellIDs cid.
       :parameter cid: numpy array of CellIDs
 
-      :returns: Dictionary of cell c (int) : 8-tuple of vertex indices (3-tuples).
+      :returns: numpy int64 array (N, 8) of the vertex keys of the corners of each CellID
 
       '''
-
-      mask = ~dict_keys_exist(self.__cell_vertices,cids,prune_unique=False)
-      coords = self.get_cell_coordinates(cids[mask])
-      vertices = np.zeros((len(cids[mask]), 8, 3),dtype=int)
-      cell_vertex_sets = {}
-
-      if(len(cids[mask]) > 0): 
+      cids = np.atleast_1d(np.asarray(cids, dtype=np.int64))
+      dual_mesh = self.get_dual_mesh()
+      positions, found = dual_mesh.find_corners(cids)
+
+      if not np.all(found):
+         new_cids = np.unique(cids[~found])
+         coords = self.get_cell_coordinates(new_cids)
+         half_dx = self.get_cell_dx(new_cids)/2
+         vertices = np.zeros((len(new_cids), 8), dtype=np.int64)
          ii = 0
          for x in [-1,1]:
             for y in [-1,1]:
                for z  in [-1,1]:
-                  if x == 0 and y == 0 and z == 0:
-                     continue
-                  vertices[:,ii,:] = np.array(self.get_vertex_indices(coords + np.array((x,y,z))[np.newaxis,:]*self.get_cell_dx(cids[mask])/2))
+                  vertices[:,ii] = dual_mesh.encode(self.__get_vertex_index_array(coords + np.array((x,y,z))[np.newaxis,:]*half_dx))
                   ii += 1
+         dual_mesh.add_corners(new_cids, vertices)
+         positions, found = dual_mesh.find_corners(cids)
 
-         for i, c in enumerate(cids[mask]):
-            vlist = vertices[i,:,:]
-            vtuple = tuple([tuple(inds) for inds in vlist])
-            cell_vertex_sets[c] = vtuple
-            
-         self.__cell_corner_vertices.update(cell_vertex_sets)
-
-      for i, c in enumerate(cids[~mask]):
-         cell_vertex_sets[c] = self.__cell_corner_vertices[c]
-
-      return cell_vertex_sets
+      return dual_mesh.corner_keys[positions]
 
 
    # again, combined getter and builder..
    def build_cell_neighborhoods(self, cids):
+      ''' Builds, caches and returns the cells that share a vertex with each of CellIDs cids, including the cell itself.
+      The CellID 0 marks neighbours outside of the domain.
 
-      mask = ~dict_keys_exist(self.__cell_neighbours, cids, prune_unique=False)
-      cell_vertex_sets = self.get_cell_corner_vertices(cids[mask]) # these are enough to fetch the neighbours
-
-      cell_neighbor_sets = {c: set() for c in cell_vertex_sets.keys()}
-      vertices_todo = set().union(*cell_vertex_sets.values())
-      neighbor_tuples_dict = self.build_dual_from_vertices(list(vertices_todo))
-      for c,verts in cell_vertex_sets.items():
-         # neighbor_tuples = self.build_dual_from_vertices(verts)
-         # cell_neighbor_sets[c].update(set().union(*neighbor_tuples.values()))
-         cell_neighbor_sets[c].update(set().union(*itemgetter(*cell_vertex_sets[c])(neighbor_tuples_dict)))
-      
-      self.__cell_neighbours.update(cell_neighbor_sets)
-
-      for c in cids[~mask]:
-         cell_neighbor_sets[c] = self.__cell_neighbors[c]
-
-      return cell_neighbor_sets
+      :parameter cids: numpy array of CellIDs
+      :returns: (cellids, neighbour cellids), one entry per neighbour of each unique CellID of cids
+      '''
+      cids = np.unique(np.atleast_1d(np.asarray(cids, dtype=np.int64)))
+      dual_mesh = self.get_dual_mesh()
+      todo = cids[~dual_mesh.has_neighbors(cids)]
 
+      if len(todo) > 0:
+         # the duals of the corners are enough to fetch the neighbours
+         corners = self.get_cell_corner_vertices(todo)
+         neighbors = np.sort(self.build_dual_from_vertices(corners.reshape(-1)).reshape(len(todo), 64), axis=1)
+         first = np.ones(neighbors.shape, dtype=bool)
+         first[:,1:] = neighbors[:,1:] != neighbors[:,:-1]
+         dual_mesh.add_neighbors(np.repeat(todo, 64)[first.reshape(-1)], neighbors[first])
 
+      pinds, neighbors = dual_mesh.get_neighbors(cids)
+      return cids[pinds], neighbors
 
    def build_dual_from_vertices(self, vertices):
+      ''' Builds, caches and returns the dual cells of vertices: the 8 cells around each vertex, ordered x slowest and z fastest.
 
-      vertices = list(set(vertices))
-
-      # I don't like this, but alternatives seem worse.
-      done = []
-      todo = []
-      # mask = dict_keys_exist(self.__dual_cells, vertices)
-      # mask = np.array([v not in self.__dual_cells.keys() for v in vertices],dtype=bool)
-      for i,v in enumerate(vertices):
-         if v in self.__dual_cells.keys():
-            done.append(v)
-         else:
-            todo.append(v)
-      # vertices=np.array(vertices,dtype="i,i,i")
-      # done = [tuple(v) for v in vertices[mask]]
-      # todo = [tuple(v) for v in vertices[~mask]]
-
-      dual_sets_done   = {v : self.__dual_cells[v] for v in done}
-      
-      dual_sets = {}
-
-      len_todo = len(todo)
+      :parameter vertices: vertex keys, or (N,3) array / list of 3-tuples of vertex indices
+      :returns: numpy int64 array (N, 8) of cellids, 0 for cells outside of the domain
+      '''
+      keys = self.__as_vertex_keys(vertices)
+      dual_mesh = self.get_dual_mesh()
+      positions, found = dual_mesh.find_duals(keys)
 
-      if len_todo > 0:#np.sum(mask) > 0:
-         
-         dual_bboxes = {}
+      if not np.all(found):
+         todo = np.unique(keys[~found])
          eps = 1
-         v_cells = np.zeros((len_todo, 8),dtype=int)
-         v_cellcoords = np.zeros((len_todo, 8,3))
-         ii = 0
-         vcoords = self.get_vertex_coordinates_from_indices(todo)
+         vcoords = self.get_vertex_coordinates_from_indices(dual_mesh.decode(todo))
 
-         # TODO get rid of the loop
          offsets = []
          for x in [-1,1]:
             for y in [-1,1]:
                for z  in [-1,1]:
                   offsets.append([x,y,z])
-                  v_cellcoords[:,ii,:] = eps*np.array((x,y,z))[np.newaxis,:] + vcoords
-                  v_cells[:,ii] = self.get_cellid(v_cellcoords[:,ii])
-                  ii += 1
-
+         v_cellcoords = vcoords[:,np.newaxis,:] + eps*np.array(offsets)[np.newaxis,:,:]
+         v_cells = np.reshape(self.get_cellid(v_cellcoords.reshape(-1,3)), (-1,8)).astype(np.int64)
          v_cellcoords = self.get_cell_coordinates(v_cells.reshape((-1))).reshape((-1,8,3))
 
-         dual_sets.update({vinds: tuple(v_cells[i,:]) for i,vinds in enumerate(todo)})
          mins = np.min(v_cellcoords, axis=1)
          maxs = np.max(v_cellcoords, axis=1)
-         dual_bboxes.update({vinds: np.hstack((mins[i,:],maxs[i,:])) for i,vinds in enumerate(todo)})
+         dual_mesh.add_duals(todo, v_cells, np.hstack((mins, maxs)))
+         positions, found = dual_mesh.find_duals(keys)
 
-         self.__dual_cells.update(dual_sets)
-         self.__dual_bboxes.update(dual_bboxes)
-      dual_sets_done.update(dual_sets)
-
-      return dual_sets_done
+      return dual_mesh.dual_cells[positions]
 
    # build a dual coverage to enable interpolation to each coordinate
    def build_duals_from_coordinates(self, coordinates):
-      
+      ''' Builds the duals at the vertices of the cells containing the coordinates.
+
+      :returns: (vertex keys, numpy int64 array (N, 8) of the cellids of each dual)
+      '''
       coordinates = np.atleast_2d(coordinates)
       cid = self.get_unique_cellids(coordinates)
-      coords = self.get_cell_coordinates(cid)
-      
-      ncoords = coords.shape[0]
-      if(coords.shape[1] != 3):
+      if(coordinates.shape[1] != 3):
          raise IndexError("Coordinates are required to be three-dimensional (coords.shape[1]==3 or convertible to such))")
       
-      vertices = set()
-      vsets = self.build_cell_vertices(cid,prune_unique=False)
-      vertices = vertices.union(*vsets.values())
-      
-      return self.build_dual_from_vertices(list(vertices))
+      owners, vertices = self.build_cell_vertices(cid)
+      vertices = np.unique(vertices)
+      return vertices, self.build_dual_from_vertices(vertices)
 
    # build a dual coverage to enable interpolation to each coordinate
    def build_duals(self, cid):
-      
-      cid = np.atleast_1d(cid)
-
-      mask = ~dict_keys_exist(self.__cell_duals, cid, prune_unique=False)
-
-      if(np.sum(mask) > 0):
-         coords = self.get_cell_coordinates(cid[mask])
-         
-         ncoords = coords.shape[0]
-         if(coords.shape[1] != 3):
-            raise IndexError("Coordinates are required to be three-dimensional (coords.shape[1]==3 or convertible to such))")
-         
-         vertices = set()
-         vsets = self.build_cell_vertices(cid[mask])
-         vertices = vertices.union(*vsets.values())
-         for c in cid[mask]:
-            self.__cell_duals[c] = vsets[c]
-         
-         self.build_dual_from_vertices(list(vertices))
+      ''' Builds the duals at all the vertices of CellIDs cid, for the whole region in one go.
 
+      :parameter cid: CellID or numpy array of CellIDs
+      '''
+      cid = np.unique(np.atleast_1d(np.asarray(cid, dtype=np.int64)))
+      dual_mesh = self.get_dual_mesh()
+      todo = cid[~dual_mesh.has_complete_duals(cid)]
 
+      if len(todo) > 0:
+         owners, vertices = self.build_cell_vertices(todo)
+         self.build_dual_from_vertices(np.unique(vertices))
+         dual_mesh.add_complete_duals(todo)
 
    def get_cell_coordinates(self, cellids):
       ''' Returns a given cell's coordinates as a numpy array
@@ -3206,6 +3911,84 @@ class VlsvReader(object):
       return self.read(name=name, tag="PARAMETER")
 
 
+   def read_velocity_cells_array(self, cellids, pop="proton"):
+      ''' Read the velocity blocks of one or more spatial cells into numpy arrays
+
+      The block rows of all requested cells are gathered with coalesced reads, so reading many
+      cells at once is much faster than calling :func:`read_velocity_cells` for each of them.
+
+      :param cellids: Cell ID or a list of cell IDs
+      :param pop:     Population to read
+      :returns: For a single cell ID a tuple (block_ids, values, coordinates), where block_ids has
+                shape (nblocks,), values has shape (nblocks, WID3) and coordinates has shape
+                (nblocks*WID3, 3) and is ordered like values.ravel(). For a list of cell IDs a list
+                of such tuples. Cells without a velocity distribution give empty arrays.
+
+      #Example:
+
+      block_ids, f, v = vlsvReader.read_velocity_cells_array(1111)
+      # Velocity cell ids in the same order as f.ravel() and v
+      vcellids = (block_ids[:,np.newaxis]*f.shape[1] + np.arange(f.shape[1])).ravel()
+
+      .. seealso:: :func:`read_velocity_cells` :func:`get_velocity_cell_coordinates`
+      '''
+      if not pop in self.__cells_with_blocks:
+         self.__set_cell_offset_and_blocks_nodict(pop)
+
+      WID=self.get_WID()
+      WID3=WID*WID*WID
+      single = np.ndim(cellids) == 0
+      cellids = np.atleast_1d(cellids)
+
+      # Look up the block rows of every cell that has a velocity distribution
+      block_index = self.__order_for_cellid_blocks[pop]
+      has_blocks = np.atleast_1d(block_index.contains(cellids))
+      if not np.all(has_blocks):
+         warnings.warn("Cell(s) does not have velocity distribution")
+      num_of_blocks = np.zeros(len(cellids), dtype=np.int64)
+      offsets = np.zeros(len(cellids), dtype=np.int64)
+      if np.any(has_blocks):
+         cells_with_blocks_index = np.atleast_1d(block_index.index_of(cellids[has_blocks]))
+         num_of_blocks[has_blocks] = self.__blocks_per_cell[pop][cells_with_blocks_index]
+         offsets[has_blocks] = self.__blocks_per_cell_offsets[pop][cells_with_blocks_index]
+      cell_starts = np.zeros(len(cellids)+1, dtype=np.int64)
+      cell_starts[1:] = np.cumsum(num_of_blocks)
+      rows = np.repeat(offsets - cell_starts[:-1], num_of_blocks) + np.arange(cell_starts[-1], dtype=np.int64)
+
+      block_variable = self.__find_array("BLOCKVARIABLE", name=pop)
+      if pop == "avgs": # Old avgs files did not have the name set for BLOCKIDS, the last BLOCKIDS is used
+         block_ids = self.__find_array("BLOCKIDS", last=True)
+      else:
+         block_ids = self.__find_array("BLOCKIDS", name=pop)
+      if block_variable is None or block_ids is None:
+         raise ValueError("Velocity space data of population " + pop + " not found in " + self.file_name)
+      if block_ids.datatype != "uint" or block_ids.dtype is None:
+         raise TypeError("Error! Bad data type in blocks! datatype found was "+block_ids.datatype)
+
+      fptr = self.__get_fptr()
+      data_avgs = self.__read_rows(fptr, block_variable, rows)
+      data_block_ids = self.__read_rows(fptr, block_ids, rows)[:,0]
+      if fptr is not None:
+         fptr.close()
+
+      # Velocity cell coordinates: block corner plus the cell centre offsets within a block,
+      # in the same (kv, jv, iv) order as the block values
+      mesh = self.__meshes[pop]
+      dv = np.array([mesh.__dvx, mesh.__dvy, mesh.__dvz])
+      kv, jv, iv = np.meshgrid(np.arange(WID), np.arange(WID), np.arange(WID), indexing="ij")
+      cell_offsets = (np.stack((iv.ravel(), jv.ravel(), kv.ravel()), axis=-1) + 0.5) * dv
+      block_coordinates = self.get_velocity_block_coordinates(data_block_ids, pop=pop).reshape(-1, 3)
+      coordinates = (block_coordinates[:,np.newaxis,:] + cell_offsets[np.newaxis,:,:]).reshape(-1, 3)
+
+      result = []
+      for i in range(len(cellids)):
+         start, end = cell_starts[i], cell_starts[i+1]
+         result.append((data_block_ids[start:end], data_avgs[start:end],
+                        coordinates[start*WID3:end*WID3]))
+      if single:
+         return result[0]
+      return result
+
    def read_velocity_cells(self, cellid, pop="proton"):
       ''' Read velocity cells from a spatial cell
       
@@ -3233,117 +4016,13 @@ class VlsvReader(object):
 
       .. seealso:: :func:`read_blocks`
       '''
-      
-      if self.use_dict_for_blocks: # old deprecated version, uses dict for blocks data
-         if not pop in self.__fileindex_for_cellid_blocks:
-            self.__set_cell_offset_and_blocks(pop) 
-         # Check that cells has vspace
-         if not cellid in self.__fileindex_for_cellid_blocks[pop]:
-            warnings.warn("Cell(s) does not have velocity distribution")
-            return {}
-         # Navigate to the correct position:
-         offset = self.__fileindex_for_cellid_blocks[pop][cellid][0]
-         num_of_blocks = self.__fileindex_for_cellid_blocks[pop][cellid][1]
-
-      else:  # Uses arrays (much faster to initialize)
-         if not pop in self.__cells_with_blocks:
-            self.__set_cell_offset_and_blocks_nodict(pop) 
-         # Check that cells has vspace
-         try:
-            cells_with_blocks_index = self.__order_for_cellid_blocks[pop][cellid]
-         except:
-            warnings.warn("Cell(s) does not have velocity distribution")
-            return {}
-         # Navigate to the correct position:
-         offset = self.__blocks_per_cell_offsets[pop][cells_with_blocks_index]
-         num_of_blocks = self.__blocks_per_cell[pop][cells_with_blocks_index]
-
-      if self.__fptr.closed:
-         fptr = open(self.file_name,"rb")
-      else:
-         fptr = self.__fptr
-
-      # Read in avgs and velocity cell ids:
-      for child in self.__xml_root:
-         # Read in avgs
-         if "name" in child.attrib and (child.attrib["name"] == pop) and (child.tag == "BLOCKVARIABLE"):
-            vector_size = ast.literal_eval(child.attrib["vectorsize"])
-            #array_size = ast.literal_eval(child.attrib["arraysize"])
-            element_size = ast.literal_eval(child.attrib["datasize"])
-            datatype = child.attrib["datatype"]
-
-            # Navigate to the correct position
-            offset_avgs = int(offset * vector_size * element_size + ast.literal_eval(child.text))
-            fptr.seek(offset_avgs)
-
-            if datatype == "float" and element_size == 4:
-               data_avgs = np.fromfile(fptr, dtype = np.float32, count = vector_size*num_of_blocks) 
-            if datatype == "float" and element_size == 8:
-               data_avgs = np.fromfile(fptr, dtype = np.float64, count = vector_size*num_of_blocks) 
-            data_avgs = data_avgs.reshape(num_of_blocks, vector_size)
-         # Read in block coordinates:
-         if ("name" in child.attrib) and (child.attrib["name"] == pop) and (child.tag == "BLOCKIDS"):
-            vector_size = ast.literal_eval(child.attrib["vectorsize"])
-            #array_size = ast.literal_eval(child.attrib["arraysize"])
-            element_size = ast.literal_eval(child.attrib["datasize"])
-            datatype = child.attrib["datatype"]
-
-            offset_block_ids = int(offset * vector_size * element_size + ast.literal_eval(child.text))
-            fptr.seek(offset_block_ids)
-
-            if datatype == "uint" and element_size == 4:
-               data_block_ids = np.fromfile(fptr, dtype = np.uint32, count = vector_size*num_of_blocks)
-            elif datatype == "uint" and element_size == 8:
-               data_block_ids = np.fromfile(fptr, dtype = np.uint64, count = vector_size*num_of_blocks)
-            else:
-               raise TypeError("Error! Bad data type in blocks! datatype found was "+datatype)
-
-         if (pop=="avgs") and (child.tag == "BLOCKIDS"): # Old avgs files did not have the name set for BLOCKIDS
-            vector_size = ast.literal_eval(child.attrib["vectorsize"])
-            #array_size = ast.literal_eval(child.attrib["arraysize"])
-            element_size = ast.literal_eval(child.attrib["datasize"])
-            datatype = child.attrib["datatype"]
-
-            offset_block_ids = int(offset * vector_size * element_size + ast.literal_eval(child.text))
-            fptr.seek(offset_block_ids)
-
-            if datatype == "uint" and element_size == 4:
-               data_block_ids = np.fromfile(fptr, dtype = np.uint32, count = vector_size*num_of_blocks)
-            elif datatype == "uint" and element_size == 8:
-               data_block_ids = np.fromfile(fptr, dtype = np.uint64, count = vector_size*num_of_blocks)
-            else:
-               raise TypeError("Error! Bad data type in blocks! datatype found was "+datatype)
-
-            data_block_ids = data_block_ids.reshape(num_of_blocks, vector_size)
-
-      fptr.close()
-
-      # Check to make sure the sizes match (just some extra debugging)
-      if len(data_avgs) != len(data_block_ids):
-         raise ValueError("BAD DATA SIZES")
+      block_ids, values, _ = self.read_velocity_cells_array(cellid, pop=pop)
+      if len(block_ids) == 0:
+         return {}
       # Make a dictionary (hash map) out of velocity cell ids and avgs:
-      velocity_cells = {}
-      array_size = len(data_avgs)
-
-      # Construct velocity cells:
-      WID=self.get_WID()
-      WID2=WID*WID
-      WID3=WID2*WID
-      velocity_cell_ids = []
-      for kv in range(WID):
-         for jv in range(WID):
-            for iv in range(WID):
-               velocity_cell_ids.append(kv*WID2 + jv*WID + iv)
-
-      for i in range(array_size):
-         velocity_block_id = data_block_ids[i]
-         avgIndex = 0
-         avgs = data_avgs[i]
-
-         for j in velocity_cell_ids + WID3*velocity_block_id:
-            velocity_cells[(int)(j)] = avgs[avgIndex]
-            avgIndex = avgIndex + 1
-      return velocity_cells
+      WID3 = values.shape[1]
+      vcellids = (block_ids.astype(np.int64)[:,np.newaxis]*WID3 + np.arange(WID3)).ravel()
+      return dict(zip(vcellids.tolist(), values.ravel()))
 
    def get_spatial_mesh_size(self):
       ''' Read spatial mesh size
@@ -3637,6 +4316,20 @@ class VlsvReader(object):
       self.__blocks_per_cell_offsets = {}
       self.__order_for_cellid_blocks = {}
 
+   def get_cache_stats(self):
+      ''' Returns the hit, miss and eviction counters and the size of the automatic variable cache.
+
+      .. seealso:: :class:`VariableCache`
+      '''
+      return self.lru_cache.stats()
+
+   def optimize_clear_variable_cache(self):
+      ''' Empties the automatic variable cache of this reader, keeping its counters.
+
+         .. note:: This should only be used for optimization purposes.
+      '''
+      self.lru_cache.clear()
+
    def optimize_clear_fileindex_for_cellid(self):
       ''' Clears a private variable containing cell ids and their locations
 
@@ -3654,8 +4347,11 @@ class VlsvReader(object):
                 # Upon reading from vlsvReader a private variable that contains info on cells that have blocks has been saved -- now clear it to save memory
                 vlsvReader.optimize_clear_fileindex_for_cellid()
 
-         .. note:: This should only be used for optimization purposes.
+         .. note:: This should only be used for optimization purposes. Structures shared through the mesh
+                   registry are freed once no reader uses them, unless the registry retains them (see :mod:`meshregistry`).
       '''
-      self.__fileindex_for_cellid = {}
+      self.__fileindex_for_cellid = None
+      self.__cell_locator = None
+      self.__mesh_structures.clear()
 
 
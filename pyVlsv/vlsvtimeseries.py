@@ -0,0 +1,176 @@
+#
+# This file is part of Analysator.
+# Copyright 2013-2016 Finnish Meteorological Institute
+# Copyright 2017-2024 University of Helsinki
+#
+# For details of usage, see the COPYING file and read the "Rules of the Road"
+# at http://www.physics.helsinki.fi/vlasiator/
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+''' Reading vg variables of a set of cells from the files of a run.
+
+Each file is read with one gather of the requested cells per variable. Files with the same
+CellIDs as the previous file share its CellID index instead of building their own, and the
+next files are read on background threads while the current one is being processed.
+'''
+
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from vlsvreader import VlsvReader
+
+class VlsvTimeSeries(object):
+   ''' Time series of the bulk files of a run.
+
+       :param files:    List of file names or VlsvReaders, in time order
+       :param prefetch: Number of files read ahead on background threads, 0 reads the files one at a time
+       :param kwargs:   Keyword arguments for the VlsvReaders opened from file names
+
+       .. code-block:: python
+
+          # Example:
+          series = pt.vlsvfile.VlsvTimeSeries(sorted(glob.glob("bulk/bulk.*.vlsv")))
+          t = series.read_parameter("time")
+          rho, B = series.read_variables(["proton/vg_rho", "vg_b_vol"], cellids=[1, 2, 3])
+          # rho.shape == (len(series), 3, 1), B.shape == (len(series), 3, 3)
+   '''
+   def __init__(self, files, prefetch=2, **kwargs):
+      self.__files = list(files)
+      self.__readers = [f if isinstance(f, VlsvReader) else None for f in self.__files]
+      self.__reader_kwargs = kwargs
+      self.prefetch = prefetch
+      self.__lock = threading.Lock()
+      self.__cellid_index = None # CellIdIndex of the latest file read, shared with the following files of the same layout
+
+   def __len__(self):
+      return len(self.__files)
+
+   def __getitem__(self, i):
+      return self.get_reader(i)
+
+   @property
+   def file_names(self):
+      return [f.file_name if isinstance(f, VlsvReader) else f for f in self.__files]
+
+   def get_reader(self, i):
+      ''' Returns the VlsvReader of the i'th file, opened on first use.
+      '''
+      with self.__lock:
+         if self.__readers[i] is None:
+            self.__readers[i] = VlsvReader(self.__files[i], **self.__reader_kwargs)
+         return self.__readers[i]
+
+   def __share_cellid_index(self, reader):
+      ''' Gives the reader the CellID index of the previous file if the CellIDs are unchanged.
+      '''
+      with self.__lock:
+         index = self.__cellid_index
+      if index is not None:
+         try:
+            reader.set_cellid_index(index)
+            return index
+         except ValueError:
+            logging.info("CellIDs of " + reader.file_name + " differ from the previous file, building a new index")
+      index = reader.get_cellid_index()
+      with self.__lock:
+         self.__cellid_index = index
+      return index
+
+   def __map_files(self, function):
+      ''' Yields function(reader) for all files in order, with the next files processed on background threads.
+      '''
+      if self.prefetch <= 0:
+         for i in range(len(self)):
+            yield function(self.get_reader(i))
+         return
+      with ThreadPoolExecutor(self.prefetch) as executor:
+         pending = deque()
+         for i in range(len(self)):
+            pending.append(executor.submit(lambda i: function(self.get_reader(i)), i))
+            if len(pending) > self.prefetch:
+               yield pending.popleft().result()
+         while pending:
+            yield pending.popleft().result()
+
+   def read_parameter(self, name):
+      ''' Reads a parameter from every file.
+
+          :param name: Name of the parameter
+          :returns: numpy array with the value of the parameter in each file
+      '''
+      return np.array(list(self.__map_files(lambda reader: reader.read_parameter(name))))
+
+   def read_variables(self, names, cellids, operator="pass"):
+      ''' Reads vg variables at the given cells from every file.
+
+          :param names:    List of variable names
+          :param cellids:  CellIDs to read
+          :param operator: Datareduction operator. "pass" does no operation on data
+          :returns: list with an array (number of files, number of cellids, number of components) per variable.
+                    Values of cells missing from a file are nan.
+      '''
+      cellids = np.atleast_1d(np.asarray(cellids, dtype=np.int64))
+
+      def read_file(reader):
+         index = self.__share_cellid_index(reader)
+         present = index.contains(cellids)
+         values = []
+         for name in names:
+            if not np.any(present):
+               values.append((present, None))
+               continue
+            if np.all(present):
+               data = reader.read_variable(name, cellids=cellids, operator=operator)
+            else:
+               data = reader.read_variable(name, cellids=cellids[present], operator=operator)
+            values.append((present, np.reshape(data, (np.count_nonzero(present), -1))))
+         return values
+
+      def empty_series(data):
+         return np.full((len(self), len(cellids), data.shape[1]), np.nan, dtype=np.promote_types(data.dtype, np.float64))
+
+      output = [None]*len(names)
+      for t, values in enumerate(self.__map_files(read_file)):
+         for i, (present, data) in enumerate(values):
+            if data is None:
+               continue
+            if output[i] is None:
+               output[i] = empty_series(data)
+            output[i][t, present, :] = data
+      if len(self) > 0:
+         for i, name in enumerate(names):
+            if output[i] is None:
+               # None of the cells is in any of the files, read one cell for the number of components
+               reader = self.get_reader(0)
+               data = reader.read_variable(name, cellids=reader.get_cellid_index().sorted_cellids[:1], operator=operator)
+               output[i] = empty_series(np.reshape(data, (1, -1)))
+      return output
+
+   def read_variable(self, name, cellids, operator="pass"):
+      ''' Reads a vg variable at the given cells from every file.
+
+          :param name:     Name of the variable
+          :param cellids:  CellIDs to read
+          :param operator: Datareduction operator. "pass" does no operation on data
+          :returns: numpy array (number of files, number of cellids, number of components). Values of cells
+                    missing from a file are nan.
+
+          .. seealso:: :func:`read_variables`
+      '''
+      return self.read_variables([name], cellids, operator)[0]
@@ -124,8 +124,6 @@ class vtkVlsvHyperTreeGrid(vtk.vtkHyperTreeGrid):
          zcells[r] = zc*2**(r)
       mins = np.array([f._VlsvReader__xmin,f._VlsvReader__ymin,f._VlsvReader__zmin])
 
-      f._VlsvReader__read_fileindex_for_cellid()
-
       # cidArray = vtk.vtkDoubleArray()
       # cidArray.SetName('CellID')
       # cidArray.SetNumberOfValues(0)
@@ -139,7 +137,7 @@ class vtkVlsvHyperTreeGrid(vtk.vtkHyperTreeGrid):
 
       xmin,xmax,ymin,ymax,zmin,zmax = f._VlsvReader__xmin,f._VlsvReader__xmax,f._VlsvReader__ymin,f._VlsvReader__ymax,f._VlsvReader__zmin,f._VlsvReader__zmax,
       
-      fileindex_for_cellid = f._VlsvReader__fileindex_for_cellid
+      fileindex_for_cellid = f.get_cellid_index()
       delta = np.array([[0,0,0],[1,0,0],[0,1,0],[1,1,0],
                [0,0,1],[1,0,1],[0,1,1],[1,1,1]],dtype=np.int32)
       
@@ -212,6 +210,7 @@ class vtkVlsvHyperTreeGrid(vtk.vtkHyperTreeGrid):
          # cellind = np.array(np.divide((cellcoordinates - mins),cell_lengths_levels[level+1]), dtype = np.int32)
 
          childs = children(cid,level)
+         childs_found = fileindex_for_cellid.contains(childs)
          for c,cellid in enumerate(childs):
                # print(c)
                cursor.ToChild(c)  # cell 0/0
@@ -220,7 +219,7 @@ class vtkVlsvHyperTreeGrid(vtk.vtkHyperTreeGrid):
                # print(ci)
                # cellid = int(cid_offsets[level+1] + ci[0] + xcells[level+1]*ci[1] + ci[2]*xcells[level+1]*ycells[level+1] + 1)
                # print(f.get_cell_indices(cid, reflevels = level))
-               if (cellid in fileindex_for_cellid.keys()):
+               if childs_found[c]:
                   # Assigns an index for the value of the cell pointed to by the current cursor state 
                   idx = cursor.GetGlobalNodeIndex()
                   # print(idx, cellid)
@@ -229,7 +228,7 @@ class vtkVlsvHyperTreeGrid(vtk.vtkHyperTreeGrid):
                   # self.GetCellData().SetActiveScalars('fileIndex')
                   # self.fileIndexArray.InsertTuple1(idx, fileindex_for_cellid[cellid])
                   # numvalues += 1
-                  self.idxToFileIndex[idx] = fileindex_for_cellid[cellid]
+                  self.idxToFileIndex[idx] = fileindex_for_cellid.index_of(cellid)
                   # ave += np.array([var_x(cellid, 'proton/vg_v'),*var(cellid, 'vg_b_vol')])
                else:
                   # print(cellid)
@@ -251,7 +250,7 @@ class vtkVlsvHyperTreeGrid(vtk.vtkHyperTreeGrid):
 
       def handle_cell(cellid):
          # Leaf cell, just add
-         if (cellid in fileindex_for_cellid.keys()):
+         if fileindex_for_cellid.contains(cellid):
                # Assigns an index for the value of the cell pointed to by the current cursor state 
                idx = cursor.GetGlobalNodeIndex()
                # self.GetCellData().SetActiveScalars('CellID')
@@ -260,7 +259,7 @@ class vtkVlsvHyperTreeGrid(vtk.vtkHyperTreeGrid):
                # self.GetCellData().SetActiveScalars('fileIndex')
                # self.fileIndexArray.InsertTuple1(idx, fileindex_for_cellid[cellid])
                # numvalues += 1
-               self.idxToFileIndex[idx] = fileindex_for_cellid[cellid]
+               self.idxToFileIndex[idx] = fileindex_for_cellid.index_of(cellid)
          # Cell not in list -> must be refined (assume cid is in basegrid)
          else:
                idx = cursor.GetGlobalNodeIndex()
@@ -360,34 +359,21 @@ class vtkVlsvHyperTreeGrid(vtk.vtkHyperTreeGrid):
          subdivided = [[] for l in range(max_ref_level+1)]
          idx = 0
          # with cProfile.Profile() as pr:
-         for c in range(1,int(np.prod(basegridsize))+1):
-            if c in fileindex_for_cellid.keys():
-               # self.__descriptor += "."
-               descr.write(".")
-               self.idxToFileIndex[idx] = fileindex_for_cellid[c]
-               self.idxToCellID[idx] = c
+         for l in range(max_ref_level+1):
+            if l == 0:
+               cids = np.arange(1,int(np.prod(basegridsize))+1, dtype=np.int64)
+               parents = cids
             else:
-               # self.__descriptor += "R"
-               descr.write("R")
-               subdivided[0].append(c)
-            idx += 1
-
-         # self.__descriptor += "|"
-         descr.write("|")
-         for l in range(1,max_ref_level+1):
-            for c in subdivided[l-1]:
-               for child in children(c, l-1):
-                  if child in fileindex_for_cellid.keys():
-                     # self.__descriptor += "."
-                     descr.write(".")
-                     self.idxToFileIndex[idx] = fileindex_for_cellid[child]
-                     self.idxToCellID[idx] = c
-                  else:
-                     # self.__descriptor += "R"
-                     descr.write("R")
-                     subdivided[l].append(child)
-                  idx += 1
-            if l < max_ref_level:
+               cids = np.array([children(c, l-1) for c in subdivided[l-1]], dtype=np.int64).reshape(-1)
+               parents = np.repeat(np.array(subdivided[l-1], dtype=np.int64), 8)
+            found = fileindex_for_cellid.contains(cids)
+            descr.write("".join(np.where(found, ".", "R")))
+            found_idx = (idx + np.flatnonzero(found)).tolist()
+            self.idxToFileIndex.update(zip(found_idx, fileindex_for_cellid.index_of(cids[found]).tolist()))
+            self.idxToCellID.update(zip(found_idx, parents[found].tolist()))
+            subdivided[l] = cids[~found].tolist()
+            idx += len(cids)
+            if l == 0 or l < max_ref_level:
                # self.__descriptor += "|"
                descr.write("|")
          self.__descriptor = descr.getvalue()
@@ -644,8 +630,7 @@ class VlsvVtkReader(VTKPythonAlgorithmBase):
 
    def buildDescriptor(self):
       f = self.__reader
-      f._VlsvReader__read_fileindex_for_cellid()
-      fileindex_for_cellid = f._VlsvReader__fileindex_for_cellid
+      fileindex_for_cellid = f.get_cellid_index()
       xc = f._VlsvReader__xcells
       yc = f._VlsvReader__ycells
       zc = f._VlsvReader__zcells
@@ -675,14 +660,12 @@ class VlsvVtkReader(VTKPythonAlgorithmBase):
       print("Building descriptor")
       subdivided = [[] for l in range(max_ref_level+1)]
       idx = 0
-      for c in range(1,int(np.prod(f.get_spatial_mesh_size()))+1):
-         if c in fileindex_for_cellid.keys():
-            descr.write(".")
-            idxToFileIndex[idx] = fileindex_for_cellid[c]
-         else:
-            descr.write("R")
-            subdivided[0].append(c)
-         idx += 1
+      cids = np.arange(1,int(np.prod(f.get_spatial_mesh_size()))+1, dtype=np.int64)
+      found = fileindex_for_cellid.contains(cids)
+      descr.write("".join(np.where(found, ".", "R")))
+      idxToFileIndex.update(zip((idx + np.flatnonzero(found)).tolist(), fileindex_for_cellid.index_of(cids[found]).tolist()))
+      subdivided[0] = cids[~found].tolist()
+      idx += len(cids)
 
       # @jit(nopython=True)
       def children(cid, level):
@@ -701,15 +684,12 @@ class VlsvVtkReader(VTKPythonAlgorithmBase):
       
       descr.write("|")
       for l in range(1,max_ref_level+1):
-         for c in subdivided[l-1]:
-            for child in children(c, l-1):
-               if child in fileindex_for_cellid.keys():
-                  descr.write(".")
-                  idxToFileIndex[idx] = fileindex_for_cellid[child]
-               else:
-                  descr.write("R")
-                  subdivided[l].append(child)
-               idx += 1
+         cids = np.array([children(c, l-1) for c in subdivided[l-1]], dtype=np.int64).reshape(-1)
+         found = fileindex_for_cellid.contains(cids)
+         descr.write("".join(np.where(found, ".", "R")))
+         idxToFileIndex.update(zip((idx + np.flatnonzero(found)).tolist(), fileindex_for_cellid.index_of(cids[found]).tolist()))
+         subdivided[l] = cids[~found].tolist()
+         idx += len(cids)
          if l < max_ref_level:
             descr.write("|")
 
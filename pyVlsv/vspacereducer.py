@@ -0,0 +1,109 @@
+#
+# This file is part of Analysator.
+# Copyright 2013-2016 Finnish Meteorological Institute
+# Copyright 2017-2024 University of Helsinki
+#
+# For details of usage, see the COPYING file and read the "Rules of the Road"
+# at http://www.physics.helsinki.fi/vlasiator/
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+
+''' Evaluation engine for datareducers that use velocity space data (useVspace=True).
+
+The VDFs of the requested cells are read chunk_cells cells at a time with
+:func:`VlsvReader.read_velocity_cells_array`, and the reducer operation is called for
+every cell either in this process or in a pool of worker processes. The operation of a
+useVspace reducer is called as
+
+   operation(variables, velocity_cell_data, velocity_coordinates)
+
+where variables holds the reducer inputs of the cell, velocity_cell_data the values of the
+velocity cells and velocity_coordinates the (n, 3) coordinates of the same cells.
+'''
+
+import logging
+import warnings
+from collections import deque
+import numpy as np
+
+def evaluate_vspace_reducer(reader, name, reducer, cellids, inputs, pop="proton", workers=1, chunk_cells=1024):
+   ''' Evaluates a useVspace datareducer for many cells.
+
+       :param reader:      VlsvReader of the file
+       :param name:        Name of the reducer, used for progress reports
+       :param reducer:     The DataReducerVariable to evaluate
+       :param cellids:     numpy array of cell ids
+       :param inputs:      list of the reducer input variables, read for all cellids at once
+       :param pop:         Population whose velocity space is used
+       :param workers:     Number of worker processes, 1 evaluates in this process
+       :param chunk_cells: Number of cells whose VDFs are read at once
+       :returns: numpy array with the reducer output of every cell, nan for cells without a VDF
+   '''
+   ncells = len(cellids)
+   inputs = [np.reshape(np.asarray(values), (ncells, -1)) for values in inputs]
+   if reducer.vector_size == 1:
+      output = np.full(ncells, np.nan)
+   else:
+      output = np.full((ncells, reducer.vector_size), np.nan)
+
+   def chunks():
+      for start in range(0, ncells, chunk_cells):
+         end = min(start+chunk_cells, ncells)
+         with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            vdfs = reader.read_velocity_cells_array(cellids[start:end], pop=pop)
+         variables = [[values[i,0] if values.shape[1] == 1 else values[i] for values in inputs]
+                      for i in range(start, end)]
+         yield start, (reducer.operation, variables, [(values.ravel(), coordinates) for _, values, coordinates in vdfs])
+
+   done = 0
+   def collect(start, chunk_output):
+      nonlocal done
+      for i, value in enumerate(chunk_output):
+         output[start+i] = value
+      done += len(chunk_output)
+      logging.info(name + ": evaluated " + str(done) + "/" + str(ncells) + " cells")
+
+   if workers is None or workers > 1:
+      from multiprocessing import Pool, cpu_count
+      max_pending = 2*(workers if workers is not None else cpu_count())
+      with Pool(workers) as pool:
+         # Keep a bounded number of chunks in flight, so that VDFs are streamed from the file
+         # instead of all being read into memory up front
+         pending = deque()
+         for start, task in chunks():
+            pending.append((start, pool.apply_async(_evaluate_chunk, task)))
+            if len(pending) >= max_pending:
+               start, result = pending.popleft()
+               collect(start, result.get())
+         while pending:
+            start, result = pending.popleft()
+            collect(start, result.get())
+   else:
+      for start, task in chunks():
+         collect(start, _evaluate_chunk(*task))
+   return output
+
+def _evaluate_chunk(operation, variables, vdfs):
+   ''' Calls the reducer operation for every cell of a chunk.
+   '''
+   chunk_output = []
+   for cell_variables, (values, coordinates) in zip(variables, vdfs):
+      if len(values) == 0:
+         chunk_output.append(np.nan)
+      else:
+         chunk_output.append(operation(cell_variables, values, coordinates))
+   return chunk_output
@@ -0,0 +1,96 @@
+''' Benchmark of the batch field line tracer (fieldtracer.trace_field_lines).
+
+The previous fg tracer (RegularGridInterpolator on every seed on every iteration, with the
+field normalization fixed) and the previous vg tracer (read_interpolated_variable on every
+seed on every iteration) are timed against the batch engine with the Euler, RK4 and RK45
+integrators. Seeds are uniformly distributed in the domain and stopped when they leave it,
+so a part of the lines finish early as in connectivity maps.
+
+Usage: python benchmark_field_tracer.py bulk.vlsv [nseeds] [max_iterations]
+'''
+
+import sys
+import time
+import numpy as np
+import pytools as pt
+from scipy import interpolate
+import fieldtracer
+from fieldtracer import trace_field_lines, default_stopping_condition
+
+def old_fg_trace(vlsvReader, fg, seed_coords, max_iterations, dx, multiplier, stop_condition):
+   extent = vlsvReader.get_fsgrid_mesh_extent()
+   sizes = np.array(fg.shape[0:3])
+   mins = np.array(extent[0:3])
+   maxs = np.array(extent[3:6])
+   dcell = (maxs - mins)/(sizes.astype('float'))
+   x = np.arange(mins[0], maxs[0], dcell[0]) + 0.5*dcell[0]
+   y = np.arange(mins[1], maxs[1], dcell[1]) + 0.5*dcell[1]
+   z = np.arange(mins[2], maxs[2], dcell[2]) + 0.5*dcell[2]
+   interpolators = [interpolate.RegularGridInterpolator((x-0.5*dcell[0], y, z), fg[:,:,:,0], bounds_error = False, fill_value = np.nan),
+                    interpolate.RegularGridInterpolator((x, y-0.5*dcell[1], z), fg[:,:,:,1], bounds_error = False, fill_value = np.nan),
+                    interpolate.RegularGridInterpolator((x, y, z-0.5*dcell[2]), fg[:,:,:,2], bounds_error = False, fill_value = np.nan)]
+   points = seed_coords
+   points_traced = np.full((seed_coords.shape[0], max_iterations, 3), np.nan)
+   points_traced[:, 0,:] = seed_coords
+   mask_update = np.ones(seed_coords.shape[0], dtype = bool)
+   V_unit = np.zeros([seed_coords.shape[0], 3])
+   for i in range(1, max_iterations):
+      for c in range(3):
+         V_unit[:, c] = interpolators[c](points)
+      V_unit = V_unit / np.linalg.norm(V_unit, axis=1)[:,np.newaxis]
+      new_points = points + multiplier*V_unit * dx
+      points_traced[mask_update,i,:] = new_points[mask_update,:]
+      mask_update[stop_condition(vlsvReader, new_points)] = False
+      points = new_points
+   return points_traced
+
+def old_vg_trace(vlsvReader, vg, seed_coords, max_iterations, dx, multiplier, stop_condition):
+   points_traced = np.full((seed_coords.shape[0], max_iterations, 3), np.nan)
+   points_traced[:, 0, :] = seed_coords
+   mask_update = np.ones(seed_coords.shape[0], dtype = bool)
+   for i in range(1, max_iterations):
+      val = np.atleast_2d(vlsvReader.read_interpolated_variable(vg, points_traced[:, i-1, :]))
+      next_points = points_traced[:, i-1, :] + multiplier * dx * val/np.linalg.norm(val, axis=1, keepdims=True)
+      points_traced[mask_update,i,:] = next_points[mask_update,:]
+      mask_update[stop_condition(vlsvReader, points_traced[:,i,:])] = False
+   return points_traced
+
+def timed(label, function, *args, **kwargs):
+   start = time.perf_counter()
+   result = function(*args, **kwargs)
+   print("   %-36s %8.3f s" % (label, time.perf_counter() - start))
+   return result
+
+def benchmark(file_name, nseeds, max_iterations):
+   f = pt.vlsvfile.VlsvReader(file_name)
+   extent = f.get_spatial_mesh_extent()
+   rng = np.random.default_rng(3)
+   seeds = extent[0:3] + rng.uniform(0, 1, (nseeds,3))*(extent[3:6]-extent[0:3])
+   dx = np.amin(f.get_fsgrid_cell_size())/2
+   print(str(nseeds) + " seeds, " + str(max_iterations) + " iterations, dx = %.3e m" % dx)
+
+   fg = f.read_variable("fg_b")
+   reference = timed("fg, previous Euler", old_fg_trace, f, fg, seeds, max_iterations, dx, 1, default_stopping_condition)
+   for method in ("euler", "rk4", "rk45"):
+      lines = timed("fg, batch " + method, trace_field_lines, f, seeds, max_iterations, dx, grid_var=fg,
+                    centering="face", method=method, stop_condition=default_stopping_condition)
+      if method == "euler":
+         print("   max difference to previous %.3e m" % np.nanmax(np.abs(lines.to_array(max_iterations) - reference)))
+   print("   points traced per line %.1f, terminations %s" % (np.mean(lines.npoints), np.bincount(lines.termination)))
+
+   vg_seeds = seeds[:max(1, nseeds//100)]
+   vg_iterations = max(2, max_iterations//10)
+   f.read_variable_to_cache("vg_b_vol")
+   print(str(len(vg_seeds)) + " vg seeds, " + str(vg_iterations) + " iterations")
+   reference = timed("vg, previous Euler", old_vg_trace, f, "vg_b_vol", vg_seeds, vg_iterations, dx, 1, default_stopping_condition)
+   for method in ("euler", "rk4"):
+      lines = timed("vg, batch " + method, trace_field_lines, f, vg_seeds, vg_iterations, dx, grid_var="vg_b_vol",
+                    method=method, stop_condition=default_stopping_condition)
+      if method == "euler":
+         print("   max difference to previous %.3e m" % np.nanmax(np.abs(lines.to_array(vg_iterations) - reference)))
+
+if __name__ == "__main__":
+   if len(sys.argv) < 2:
+      print(__doc__)
+      sys.exit(1)
+   benchmark(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 100000, int(sys.argv[3]) if len(sys.argv) > 3 else 100)
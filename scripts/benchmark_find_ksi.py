@@ -0,0 +1,121 @@
+''' Benchmark of the Newton solver for generalized trilinear coordinates (interpolator_amr.find_ksi).
+
+The default point cloud mimics the dual cells at a refinement interface: the lower corners of
+each dual are centers of coarse cells and the upper corners centers of fine cells, so the duals
+are distorted or collapsed hexahedra, expanded by 1 m along the diagonals as in VlsvReader.get_dual.
+The points are sampled in the bounding boxes of the duals, so part of them lie outside of the dual
+like the candidate duals tested by get_dual.
+
+The previous solver (masked fancy indexing and np.linalg.solve on every iteration) is timed
+against the current vectorized solver and, if Numba is installed, the compiled one.
+
+Usage: python benchmark_find_ksi.py [npoints] [--file bulk.vlsv]
+   --file additionally times VlsvReader.get_dual on points sampled around the refinement
+   interfaces of the given file with the previous and the current solver.
+'''
+
+import sys
+import time
+import numpy as np
+import pytools as pt
+import interpolator_amr
+from interpolator_amr import f, df, find_ksi, numba_available
+
+def old_find_ksi(p, v_coords, tol= .1, maxiters = 200):
+   # As before, with the solve call fixed for numpy >= 2
+   p = np.atleast_2d(p)
+   v_coords = np.atleast_3d(v_coords)
+   ksi0 = np.full_like(p, 0.5)
+   J = df(ksi0, v_coords)
+   ksi_n = ksi0
+   ksi_n1 = np.full_like(ksi0, np.nan)
+   f_n = f(ksi_n,v_coords) - p
+   resolved = np.full((p.shape[0],),False, dtype=bool)
+   for i in range(maxiters):
+      J[~resolved,:,:] = df(ksi_n[~resolved,:], v_coords[~resolved,:,:])
+      f_n[~resolved,:] = f(ksi_n[~resolved,:],v_coords[~resolved,:,:])-p[~resolved,:]
+      step = np.linalg.solve(J[~resolved,:,:], -f_n[~resolved,:][...,np.newaxis])[...,0]
+      ksi_n1[~resolved,:] = step + ksi_n[~resolved,:]
+      ksi_n[~resolved,:] = ksi_n1[~resolved,:]
+      resolved[~resolved] = (np.linalg.norm(f(ksi_n1[~resolved,:],v_coords[~resolved,:,:]) - p[~resolved,:],axis=1) < tol)
+      resolved[~resolved] = np.linalg.norm(ksi_n1[~resolved,:],axis=1) > 1e2
+      if np.all(resolved):
+         break
+   diverged = np.linalg.norm(ksi_n1,axis=1) > 1e2
+   ksi_n1[diverged,:] = np.nan
+   ksi_n1[~resolved,:] = np.nan
+   return ksi_n1
+
+def interface_duals(npoints, h=1e6, seed=1):
+   ''' Duals around vertices of the fine grid on a refinement interface at z=0, fine cells above
+       and coarse cells (size 2h) below, and points sampled in their bounding boxes.
+   '''
+   rng = np.random.default_rng(seed)
+   vertices = rng.integers(-50, 50, (npoints,2)).astype(float)*h
+   corners = np.array([[i,j,k] for k in (0,1) for j in (0,1) for i in (0,1)], dtype=float)
+   centers = vertices[:,np.newaxis,:] + (corners[np.newaxis,:,0:2]-0.5)*h
+   coarse = (np.floor(centers/(2*h)) + 0.5)*2*h
+   v_coords = np.empty((npoints,8,3))
+   v_coords[:,:,0:2] = np.where(corners[np.newaxis,:,2:3] == 0, coarse, centers)
+   v_coords[:,:,2] = np.where(corners[np.newaxis,:,2] == 0, -h, 0.5*h)
+   v_coords += (2*corners-1)[np.newaxis,:,:]
+   lower = np.amin(v_coords, axis=1)
+   upper = np.amax(v_coords, axis=1)
+   points = lower + rng.uniform(0, 1, (npoints,3))*(upper-lower)
+   return points, v_coords
+
+def timed(label, function, *args, **kwargs):
+   start = time.perf_counter()
+   result = function(*args, **kwargs)
+   print("   %-36s %8.3f s" % (label, time.perf_counter() - start))
+   return result
+
+def compare(reference, result):
+   inside = np.all((reference >= 0) & (reference <= 1), axis=1)
+   inside_new = np.all((result >= 0) & (result <= 1), axis=1)
+   print("   %d/%d points inside their dual, %d classified differently, max difference %.3e" %
+         (np.sum(inside), len(inside), np.sum(inside != inside_new), np.max(np.abs(reference[inside]-result[inside]), initial=0)))
+
+def benchmark_synthetic(npoints):
+   points, v_coords = interface_duals(npoints)
+   print(str(npoints) + " interface duals")
+   reference = timed("previous solver", old_find_ksi, points, v_coords)
+   compare(reference, timed("vectorized solver", find_ksi, points, v_coords, use_numba=False))
+   if numba_available:
+      find_ksi(points[:10], v_coords[:10], use_numba=True) # compile
+      compare(reference, timed("numba solver", find_ksi, points, v_coords, use_numba=True))
+
+def benchmark_file(file_name, npoints):
+   ''' Times VlsvReader.get_dual for points in cells at refinement interfaces.
+   '''
+   import pyCalculations.interpolator_amr as amr_module # the module get_dual imports find_ksi from
+   f = pt.vlsvfile.VlsvReader(file_name)
+   cellids = f.read_variable("CellID")
+   levels = f.get_amr_level(cellids)
+   # cells with a neighbour on another refinement level
+   neighbors = f.get_cell_neighbor(np.repeat(cellids, 6), np.tile(np.vstack((np.eye(3,dtype=int),-np.eye(3,dtype=int))), (len(cellids),1)), [True,True,True])
+   interface = np.any(f.get_amr_level(neighbors).reshape(-1,6) != levels[:,np.newaxis], axis=1)
+   rng = np.random.default_rng(2)
+   chosen = rng.choice(cellids[interface], npoints)
+   lows, ups = f.get_cell_bbox(chosen)
+   points = lows + rng.uniform(0, 1, (npoints,3))*(ups-lows)
+   print(str(npoints) + " points in " + str(np.sum(interface)) + " interface cells of " + file_name)
+   solver = amr_module.find_ksi
+   try:
+      amr_module.find_ksi = old_find_ksi
+      timed("get_dual, previous solver", f.get_dual, points)
+      amr_module.find_ksi = solver
+      timed("get_dual, current solver", f.get_dual, points)
+   finally:
+      amr_module.find_ksi = solver
+
+if __name__ == "__main__":
+   args = sys.argv[1:]
+   file_name = None
+   if "--file" in args:
+      file_name = args[args.index("--file")+1]
+      del args[args.index("--file"):args.index("--file")+2]
+   npoints = int(args[0]) if args else 100000
+   benchmark_synthetic(npoints)
+   if file_name is not None:
+      benchmark_file(file_name, min(npoints, 10000))
@@ -0,0 +1,68 @@
+''' Benchmark of point location on AMR meshes (VlsvReader.get_cellid).
+
+A synthetic octree mesh is refined randomly down to max_level, and random points are located
+with the previous algorithm (compute the CellID of the point on each refinement level in turn
+and check whether it exists with CellIdIndex.contains) and with the CellLocator used by get_cellid.
+
+Usage: python benchmark_get_cellid.py [npoints] [max_level]   (default 1000000 points, 3 levels)
+'''
+
+import sys
+import time
+import numpy as np
+import pytools as pt
+from vlsvreader import CellIdIndex, CellLocator
+
+def refined_mesh(base_cells, max_level, fraction=0.3, seed=1):
+   ''' CellIDs of a mesh where a fraction of the cells of each level is refined.
+   '''
+   rng = np.random.default_rng(seed)
+   nbase = np.prod(base_cells)
+   leaves = []
+   cells = np.arange(1, nbase+1, dtype=np.int64)
+   offset = 0
+   for level in range(max_level+1):
+      refine = rng.random(len(cells)) < fraction if level < max_level else np.zeros(len(cells), dtype=bool)
+      leaves.append(cells[~refine])
+      sizes = np.array(base_cells, dtype=np.int64)*2**level
+      indices = cells[refine] - 1 - offset
+      i, j, k = indices % sizes[0], (indices // sizes[0]) % sizes[1], indices // (sizes[0]*sizes[1])
+      offset += nbase*8**level
+      children = [offset + 1 + (2*i+a) + (2*j+b)*2*sizes[0] + (2*k+c)*4*sizes[0]*sizes[1]
+                  for c in (0,1) for b in (0,1) for a in (0,1)]
+      cells = np.concatenate(children)
+   return np.concatenate(leaves)
+
+def old_locate(index, base_cells, max_level, finest_indices):
+   cellids = np.zeros(len(finest_indices), dtype=np.int64)
+   mask = np.ones(len(finest_indices), dtype=bool)
+   offset = 0
+   for level in range(max_level+1):
+      sizes = np.array(base_cells, dtype=np.int64)*2**level
+      indices = finest_indices[mask] >> (max_level - level)
+      cellids[mask] = offset + 1 + indices[:,0] + indices[:,1]*sizes[0] + indices[:,2]*sizes[0]*sizes[1]
+      mask[mask] = ~index.contains(cellids[mask])
+      offset += np.prod(base_cells)*8**level
+   cellids[mask] = 0
+   return cellids
+
+def timed(label, function, *args):
+   start = time.perf_counter()
+   result = function(*args)
+   print("   %-36s %8.3f s" % (label, time.perf_counter() - start))
+   return result
+
+def benchmark(npoints, max_level, base_cells=(50, 40, 40)):
+   cellids = refined_mesh(base_cells, max_level)
+   print(str(len(cellids)) + " cells, " + str(max_level) + " refinement levels, " + str(npoints) + " points")
+   index = CellIdIndex(cellids)
+   locator = timed("CellLocator construction", CellLocator, cellids, base_cells, max_level)
+   rng = np.random.default_rng(2)
+   finest = np.array(base_cells)*2**max_level
+   points = np.stack([rng.integers(0, finest[d], npoints) for d in range(3)], axis=1)
+   reference = timed("per-level contains", old_locate, index, base_cells, max_level, points)
+   result = timed("CellLocator.locate", locator.locate, points)
+   print("   identical: " + str(np.array_equal(reference, result)))
+
+if __name__ == "__main__":
+   benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000, int(sys.argv[2]) if len(sys.argv) > 2 else 3)
@@ -0,0 +1,47 @@
+''' Benchmark of rasterizing vg variables onto 2D slices of AMR meshes (ids3d.SlicePlan).
+
+A synthetic octree mesh is refined randomly down to max_level, and a scalar, a vector and a
+tensor variable are rasterized onto a z cut as in plot_colormap3dslice: by sorting the data,
+picking the cells of the cut with ids3d and filling the plotting grid with idmesh3d, and with a
+SlicePlan built once, after which every variable is a single gather.
+
+Usage: python benchmark_slice_plan.py [max_level]   (default 3 levels)
+'''
+
+import sys
+import time
+import numpy as np
+import pytools as pt
+import ids3d
+from benchmark_get_cellid import refined_mesh
+
+def timed(label, function, *args, **kwargs):
+   start = time.perf_counter()
+   result = function(*args, **kwargs)
+   print("   %-36s %8.3f s" % (label, time.perf_counter() - start))
+   return result
+
+def rasterize_per_call(cellids, variables, depth, reflevel, sizes, extent):
+   indexids = cellids.argsort()
+   sorted_cellids = cellids[indexids]
+   idlist, indexlist = ids3d.ids3d(sorted_cellids, depth, reflevel, *sizes, zmin=extent[0], zmax=extent[1])
+   return [ids3d.idmesh3d(idlist, data[indexids][indexlist], reflevel, *sizes, 2, data.shape[1:] if data.ndim == 3 else (data.shape[1] if data.ndim == 2 else None))
+           for data in variables]
+
+def benchmark(max_level, base_cells=(50, 40, 40)):
+   rng = np.random.default_rng(4)
+   cellids = rng.permutation(refined_mesh(base_cells, max_level))
+   print(str(len(cellids)) + " cells, " + str(max_level) + " refinement levels")
+   variables = [rng.random(len(cellids)), rng.random((len(cellids), 3)), rng.random((len(cellids), 3, 3))]
+   extent = (-1.0, 1.0)
+   depth = 0.37*(extent[1]-extent[0])
+
+   reference = timed("ids3d + idmesh3d, 3 variables", rasterize_per_call, cellids, variables, depth, max_level, base_cells, extent)
+   index = pt.vlsvfile.CellIdIndex(cellids)
+   plan = timed("SlicePlan construction", ids3d.SlicePlan, index.sorted_cellids, depth, max_level, *base_cells,
+                zmin=extent[0], zmax=extent[1], order=index.order)
+   result = timed("SlicePlan.rasterize, 3 variables", lambda: [plan.rasterize(data) for data in variables])
+   print("   identical: " + str(all(np.array_equal(a, b) for a, b in zip(reference, result))))
+
+if __name__ == "__main__":
+   benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 3)
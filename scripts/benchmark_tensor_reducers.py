@@ -0,0 +1,73 @@
+''' Micro-benchmark of the tensor datareducers on synthetic data.
+
+Compares the previous implementations (full 3x3 tensor, rotation built with arccos and the
+Rodrigues formula, loop-based condition_matrix_array) against the current ones working on
+the diagonal / off-diagonal storage directly.
+
+Usage: python benchmark_tensor_reducers.py [ncells ...]   (default 1000000)
+'''
+
+import sys
+import time
+import numpy as np
+import pytools as pt
+from rotation import rotation_array_matrix
+from reduction import (FullTensor, RotatedTensor, ParallelTensorComponent, PerpendicularTensorComponent,
+                       Anisotropy, condition_matrix_array, gyrotropy)
+
+def old_rotateArrayTensorToVector(Tensor, vector):
+   vector_u = np.cross(vector, np.array([0.,0.,1.])[np.newaxis,:])
+   vector_u_len = np.ma.masked_less_equal(np.linalg.norm(vector_u, axis=-1), 0)
+   vector_u = np.ma.divide(vector_u, vector_u_len[:,np.newaxis])
+   vector_len = np.ma.masked_less_equal(np.linalg.norm(vector, axis=-1), 0)
+   vector_n = np.ma.divide(vector,vector_len[:,np.newaxis])
+   angle = np.arccos(vector_n[:,2])
+   R = rotation_array_matrix(vector_u, angle)
+   return np.einsum('...ij,...jk', np.einsum('...ij,...jk',R,Tensor),np.transpose(R,(0,2,1)))
+
+def old_condition_matrix_array(condition, matrices):
+   if np.ndim(matrices) == np.ndim(condition):
+      matrices = np.reshape(matrices, tuple(np.concatenate(([1],[x for x in matrices.shape]))))
+   condition_array = condition*np.reshape(np.ones(np.prod(matrices.shape)), matrices.shape)
+   num_of_true = 0
+   for i in np.ravel(condition):
+      if i == True:
+         num_of_true = num_of_true + 1
+   extracted = np.extract(condition_array, matrices)
+   return np.reshape(extracted, (len(matrices), num_of_true))
+
+def old_anisotropy(diagonal, offdiagonal, B):
+   rotated = old_rotateArrayTensorToVector(FullTensor([diagonal, offdiagonal]), B)
+   return ParallelTensorComponent([rotated]), PerpendicularTensorComponent([rotated])
+
+def timed(label, function, *args):
+   start = time.perf_counter()
+   result = function(*args)
+   print("   %-40s %8.3f s" % (label, time.perf_counter() - start))
+   return result
+
+def benchmark(ncells):
+   rng = np.random.default_rng(1)
+   diagonal = rng.uniform(1e-12, 1e-9, (ncells,3))
+   offdiagonal = rng.uniform(-1e-11, 1e-11, (ncells,3))
+   B = rng.normal(0, 5e-9, (ncells,3))
+   print(str(ncells) + " cells")
+
+   full = timed("FullTensor", FullTensor, [diagonal, offdiagonal])
+   timed("rotation, old (arccos + einsum)", old_rotateArrayTensorToVector, full, B)
+   timed("rotation, new (closed form + matmul)", RotatedTensor, [full, B])
+   old = timed("parallel + perpendicular, old", old_anisotropy, diagonal, offdiagonal, B)
+   new = timed("parallel + perpendicular, new",
+               lambda *args: (ParallelTensorComponent(args), PerpendicularTensorComponent(args)),
+               diagonal, offdiagonal, B)
+   timed("anisotropy, new", Anisotropy, [diagonal, offdiagonal, B])
+   timed("gyrotropy, new", gyrotropy, [diagonal, offdiagonal, B])
+   condition = np.array([[True,False,False],[False,True,False],[False,False,True]])
+   timed("condition_matrix_array, old", old_condition_matrix_array, condition, full)
+   timed("condition_matrix_array, new", condition_matrix_array, condition, full)
+   for o, n in zip(old, new):
+      print("   max relative difference %.3e" % np.max(np.abs(o - n)/np.abs(o)))
+
+if __name__ == "__main__":
+   for ncells in (sys.argv[1:] or [1000000]):
+      benchmark(int(ncells))
@@ -284,13 +284,14 @@ def fac_map(f, vg_x, vg_y, vg_z, dx, f_J_sidecar = None, r_C = 5 * 6.371e6, mag_
         ind_fin, = np.where(np.isfinite(lat_up[inner]))
         coords_temp = np.array([x_up[ind_fin],y_up[ind_fin],z_up[ind_fin]]).T.reshape([ind_fin.size,3])
 
-        vg_b_vol_fin = f_J_sidecar.read_interpolated_variable("vg_b_vol", coords_temp)
+        intp_plan = f_J_sidecar.get_interpolation_plan(coords_temp)   # shared by vg_b_vol and vg_J
+        vg_b_vol_fin = intp_plan.apply("vg_b_vol")
 
         B_up = vec_len_2d(vg_b_vol_fin)
         B_down = np.array([b_dip_magnitude(vg_theta[inner[ind_fin]], vg_r[inner[ind_fin]], mag_mom = 8e22)] * 3).transpose()
         scale_factor = B_down / B_up    # J \propto B
 
-        vg_J = f_J_sidecar.read_interpolated_variable("vg_J", coords_temp)
+        vg_J = intp_plan.apply("vg_J")
 
         J_signed_up = np.array([np.sum(vg_J * vg_b_vol_fin, axis = 1) ] * 3).transpose() / B_up    # magnitude and sign of J   (projection J dot B / |B|)
         b_dir = b_dip_direction(vg_x[inner[ind_fin]], vg_y[inner[ind_fin]], vg_z[inner[ind_fin]])
@@ -75,7 +75,6 @@ import matplotlib.pyplot as plt
 import matplotlib.colors as colors
 import pytools as pt
 import numpy as np
-import operator as oper
 import logging
 
 # constants
@@ -218,14 +217,12 @@ def vSpaceReducer(vlsvReader,cid):
  if vlsvReader.check_variable('MinValue') == True:
   fMin = vlsvReader.read_variable('MinValue',cid)
  logging.info('Cell ' + str(cid).zfill(9))
- velcells = vlsvReader.read_velocity_cells(cid)
- V = vlsvReader.get_velocity_cell_coordinates(list(velcells.keys()))
+ velblocks, f, V = vlsvReader.read_velocity_cells_array(cid)
  V2 = np.sum(np.square(V),1)
  Ekin = 0.5*mp*V2/qe
- f = list(zip(*velcells.items()))
  # check that velocity space has cells
- if(len(f) > 0):
-  f = np.asarray(f[1])
+ if(len(velblocks) > 0):
+  f = f.ravel()
  else:
   return (False,0,0)
  ii_f = np.where(f >= fMin)
@@ -260,11 +257,6 @@ def doSpectra(vlsvFile):
  if vlsvReader.check_variable('fSaved') == False:
   logging.info('ERROR: variable fSaved not found')
   return
- # cell id - index  dict
- locs = vlsvReader.get_cellid_locations()
- cellids = list(locs.keys())
- # sort variable array according to cell ids
- locs_sorted = sorted(locs.items(), key=oper.itemgetter(0))
  fileNameStr = os.path.basename(vlsvFile)
  spectraStr = [] # spectra file contents
  bulkStr = [] # bulk parameter file contents
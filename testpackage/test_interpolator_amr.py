@@ -0,0 +1,51 @@
+''' Checks the point-by-point Newton solver of find_ksi against the vectorized numpy solver.
+
+Run with: python -m pytest testpackage/test_interpolator_amr.py
+'''
+import numpy as np
+import pytest
+import pytools as pt
+import interpolator_amr
+
+# Corners of the unit cube in the vertex order of find_ksi, bit 0 is x, bit 1 y and bit 2 z
+unit_cube = np.array([[k & 1, (k >> 1) & 1, (k >> 2) & 1] for k in range(8)], dtype=float)
+
+def hexahedra():
+    ''' Distorted hexahedra with points inside, near and far outside, and degenerate hexahedra.
+    '''
+    rng = np.random.default_rng(5)
+    n = 400
+    scale = 10.0**rng.uniform(-1, 1, (n,1,1))
+    v_coords = scale*(unit_cube + 0.2*rng.uniform(-1, 1, (n,8,3))) + rng.uniform(-5, 5, (n,1,3))
+    ksi = rng.uniform(-0.5, 1.5, (n,3))
+    ksi[:50] = rng.uniform(-300, 300, (50,3)) # diverging
+    v_coords[50:60] = v_coords[50:60,:1] # all corners equal, singular
+    w = np.stack([np.where(unit_cube[k] == 1, ksi, 1-ksi).prod(axis=-1) for k in range(8)], axis=-1)
+    p = np.einsum('nk,nkd->nd', w, v_coords)
+    return p, v_coords
+
+def point_solver(p, v_coords, tol, maxiters, kernel):
+    ksi = np.full_like(p, np.nan)
+    kernel(np.ascontiguousarray(p), np.ascontiguousarray(v_coords), float(tol), int(maxiters), ksi)
+    return ksi
+
+@pytest.mark.parametrize("tol", [1e-1, 1e-6, 1e-10])
+@pytest.mark.parametrize("maxiters", [0, 1, 3, 200])
+def test_point_kernel_matches_numpy(tol, maxiters):
+    p, v_coords = hexahedra()
+    reference = interpolator_amr.find_ksi(p, v_coords, tol=tol, maxiters=maxiters, use_numba=False)
+    # The Python source of the kernel, also run without Numba
+    kernel = getattr(interpolator_amr._find_ksi_points, "py_func", interpolator_amr._find_ksi_points)
+    np.testing.assert_allclose(point_solver(p, v_coords, tol, maxiters, kernel), reference, rtol=1e-9, atol=1e-12)
+    if maxiters == 200:
+        assert np.all(np.isnan(reference[:60])) and not np.any(np.isnan(reference[60:]))
+
+@pytest.mark.parametrize("tol", [1e-1, 1e-6, 1e-10])
+@pytest.mark.parametrize("maxiters", [0, 1, 3, 200])
+def test_numba_matches_numpy(tol, maxiters):
+    pytest.importorskip("numba")
+    assert interpolator_amr.numba_available
+    p, v_coords = hexahedra()
+    reference = interpolator_amr.find_ksi(p, v_coords, tol=tol, maxiters=maxiters, use_numba=False)
+    np.testing.assert_allclose(interpolator_amr.find_ksi(p, v_coords, tol=tol, maxiters=maxiters, use_numba=True),
+                               reference, rtol=1e-9, atol=1e-12)
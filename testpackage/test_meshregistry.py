@@ -0,0 +1,66 @@
+''' Checks that readers of files with the same cells share mesh structures, and free them when they are gone.
+
+Run with: python -m pytest testpackage/test_meshregistry.py
+'''
+import gc
+import numpy as np
+import pytest
+import pytools as pt
+from test_vlsvtimeseries import write_vlsv
+
+@pytest.fixture
+def reordered_files(tmp_path):
+    # the same cells, stored in a different order in the second file
+    cellids = np.arange(1, 65)
+    files = []
+    for t, order in enumerate([cellids, np.random.default_rng(1).permutation(cellids)]):
+        files.append(str(tmp_path / ("bulk.%07d.vlsv" % t)))
+        write_vlsv(files[-1], order, {"vg_rho": 10.0*t + order}, time=0.5*t)
+    return files
+
+@pytest.fixture
+def registry():
+    registry = pt.vlsvfile.MeshRegistry()
+    yield registry
+    registry.clear()
+
+def open_files(files, registry):
+    readers = [pt.vlsvfile.VlsvReader(name) for name in files]
+    for reader in readers:
+        reader.mesh_registry = registry
+    return readers
+
+def test_reordered_cells(reordered_files, registry):
+    f0, f1 = open_files(reordered_files, registry)
+    assert f0.get_mesh_fingerprint() == f1.get_mesh_fingerprint()
+    assert f0.get_mesh_layout_fingerprint() != f1.get_mesh_layout_fingerprint()
+    # the CellID index depends on the order of the cells, the point locator does not
+    assert f0.get_cellid_index() is not f1.get_cellid_index()
+    cellids = [1, 20, 64]
+    np.testing.assert_array_equal(f1.read_variable("vg_rho", cellids=cellids), 10.0 + np.array(cellids))
+    points = np.array([[-0.6, -0.1, 0.3], [0.2, 0.55, -0.8]])
+    plan = f0.get_interpolation_plan(points)
+    assert plan.is_compatible(f1)
+    np.testing.assert_allclose(plan.apply("vg_rho", reader=f1), plan.apply("vg_rho") + 10.0)
+    np.testing.assert_allclose(plan.apply("vg_rho", reader=f1), f1.read_interpolated_variable("vg_rho", points))
+
+def test_structures_freed_with_readers(reordered_files, registry):
+    f0, f1 = open_files(reordered_files, registry)
+    index = f0.get_cellid_index()
+    assert len(registry) > 0 and f0.get_mesh_layout_fingerprint() in registry
+    del f0, f1, index
+    gc.collect()
+    assert len(registry) == 0
+
+def test_retain(reordered_files, registry):
+    registry.retain = 1
+    reader, = open_files(reordered_files[:1], registry)
+    index = reader.get_cellid_index()
+    del reader
+    gc.collect()
+    reader, = open_files(reordered_files[:1], registry)
+    assert reader.get_cellid_index() is index
+    del reader, index
+    registry.retain = 0
+    gc.collect()
+    assert len(registry) == 0
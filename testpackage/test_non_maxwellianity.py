@@ -0,0 +1,55 @@
+''' Checks the stored-block evaluation of the non-Maxwellianity against a sum over the whole velocity mesh.
+
+Run with: python -m pytest testpackage/test_non_maxwellianity.py
+'''
+import numpy as np
+import pytest
+import pytools as pt
+import non_maxwellianity as nm
+from scipy.constants import m_p
+
+WID = 4
+
+def velocity_mesh(nblocks, vmax):
+    ''' Velocity mesh geometry and the centres of all velocity cells, ordered as in a VLSV file.
+    '''
+    ncells = np.full(3, nblocks*WID, dtype=np.int64)
+    vmin = np.full(3, -vmax)
+    dv = np.full(3, 2*vmax/ncells[0])
+    block = np.arange(nblocks**3)
+    cell = np.arange(WID**3)
+    bi = np.stack((block % nblocks, block // nblocks % nblocks, block // nblocks**2), axis=-1)
+    ci = np.stack((cell % WID, cell // WID % WID, cell // WID**2), axis=-1)
+    index = (bi[:,np.newaxis,:]*WID + ci[np.newaxis,:,:]).reshape(-1,3)
+    return (vmin, dv, WID, ncells), vmin + (index + 0.5)*dv
+
+@pytest.mark.parametrize("model", ["maxwellian", "bimaxwellian"])
+@pytest.mark.parametrize("normorder", [1, 2])
+@pytest.mark.parametrize("vmax", [3e6, 3e5])
+def test_sparse_matches_full_mesh(model, normorder, vmax):
+    rng = np.random.default_rng(3)
+    nblocks = 12
+    mesh, v_all = velocity_mesh(nblocks, vmax)
+    dV = np.prod(mesh[1])
+    B = np.array([[1e-9, 2e-9, 0.5e-9], [0, 0, 3e-9]])
+    # two cells, each with a drifting Maxwellian-like VDF stored in a random subset of the blocks
+    D_cells, vs_cells, full_cells = [], [], []
+    for shift in (1e5, -5e4):
+        full = 1e-12*np.exp(-np.sum((v_all - [shift, 0, 2e4])**2, axis=-1)/(2*2e5**2)) * (1 + 0.3*rng.random(len(v_all)))
+        blocks = np.sort(rng.choice(nblocks**3, size=nblocks**3//3, replace=False))
+        stored = (blocks[:,np.newaxis]*WID**3 + np.arange(WID**3)).ravel()
+        D_cells.append(full[stored])
+        vs_cells.append(v_all[stored])
+        sparse_full = np.zeros(len(v_all))
+        sparse_full[stored] = full[stored]
+        full_cells.append(sparse_full)
+    D_vals = np.concatenate(D_cells)
+    vs = np.concatenate(vs_cells)
+    starts = np.array([0, len(D_cells[0])])
+    params = nm._model_parameters(D_vals, vs, starts, dV, B, None, m_p)
+
+    epsilon = nm._epsilon_M_sparse(D_vals, vs, starts, dV, params, m_p, model, normorder, 2, 0, mesh)
+    for i, full in enumerate(full_cells):
+        model_f = nm._model_f(v_all, np.full(len(v_all), i), params, m_p, model)
+        reference = np.linalg.norm(full - model_f, ord=normorder) * dV / (2 * params[0][i])
+        assert epsilon[i] == pytest.approx(reference, rel=1e-12)
@@ -0,0 +1,31 @@
+''' Checks that plot_movie reports frames whose plot routine fails as failed instead of writing them.
+
+Run with: python -m pytest testpackage/test_plot_movie.py
+'''
+import logging
+import os
+import matplotlib
+import numpy as np
+import pytools as pt
+from test_vlsvtimeseries import write_vlsv
+
+def test_failed_frame(tmp_path, caplog, monkeypatch):
+    # Render without LaTeX
+    monkeypatch.setenv("PTNOLATEX", "1")
+    monkeypatch.setitem(matplotlib.rcParams, "text.usetex", False)
+    files = []
+    for t in range(2):
+        files.append(str(tmp_path / ("bulk.%07d.vlsv" % t)))
+        cellids = np.arange(1, 65)
+        write_vlsv(files[-1], cellids, {"vg_rho": 1.0e6 + 1.0e3*t + cellids}, time=0.5*t)
+    outputdir = str(tmp_path / "frames") + "/"
+    with caplog.at_level(logging.WARNING):
+        # plot_colormap logs an error and returns on the 3-D mesh of the files
+        frames = pt.plot.plot_movie(files, plot_function=pt.plot.plot_colormap, var="vg_rho", outputdir=outputdir)
+    assert frames == [None, None]
+    assert not any(name.endswith(".png") for name in os.listdir(outputdir))
+    assert sum("Error plotting" in record.getMessage() for record in caplog.records) == 2
+
+    frames = pt.plot.plot_movie(files, var="vg_rho", normal="z", outputdir=outputdir)
+    assert frames == [os.path.join(outputdir, "frame_%07d.png" % t) for t in range(2)]
+    assert all(os.path.getsize(frame) > 0 for frame in frames)
@@ -0,0 +1,30 @@
+''' Checks that the sidecar index cache restores the footer arrays of a file without parsing the XML footer.
+
+Run with: python -m pytest testpackage/test_vlsvindexcache.py
+'''
+import os
+import xml.etree.ElementTree as ET
+import numpy as np
+import pytools as pt
+from test_vlsvtimeseries import write_vlsv
+
+def test_footer_from_sidecar(tmp_path, monkeypatch):
+    name = str(tmp_path / "bulk.0000000.vlsv")
+    cellids = np.array([5, 2, 9, 1])
+    write_vlsv(name, cellids, {"vg_rho": 1.0*cellids, "vg_b_vol": np.stack((cellids, 2*cellids, 3*cellids), axis=-1)})
+    cache_dir = str(tmp_path / "index")
+    parsed = pt.vlsvfile.VlsvReader(name, index_cache_dir=cache_dir)
+    assert any(entry.endswith(".footer.vlsvidx") for entry in os.listdir(cache_dir))
+
+    def fail(*args, **kwargs):
+        raise AssertionError("the XML footer was parsed")
+    monkeypatch.setattr(ET, "fromstring", fail)
+    cached = pt.vlsvfile.VlsvReader(name, index_cache_dir=cache_dir)
+    for a, b in zip(parsed._VlsvReader__arrays, cached._VlsvReader__arrays):
+        assert (a.tag, dict(a.attrib), a.offset) == (b.tag, b.attrib, b.offset)
+    assert cached.get_all_variables() == parsed.get_all_variables()
+    np.testing.assert_array_equal(cached.read_variable("vg_b_vol", cellids=[9, 5]), [[9, 18, 27], [5, 10, 15]])
+    np.testing.assert_array_equal(cached.read_parameter("time"), 0.0)
+    monkeypatch.undo()
+    # the writer uses the footer, it is rebuilt from the arrays
+    assert [child.tag for child in cached._VlsvReader__xml_root] == [child.tag for child in parsed._VlsvReader__xml_root]
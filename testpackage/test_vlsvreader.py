@@ -0,0 +1,103 @@
+''' Regression tests of VlsvReader on a small generated file: CellID gathers, fsgrid subvolumes,
+memory-mapped reads and chunked datareducers.
+
+Run with: python -m pytest testpackage/test_vlsvreader.py
+'''
+import numpy as np
+import pytest
+import pytools as pt
+from test_vlsvtimeseries import write_vlsv
+
+fsgrid_size = (4, 4, 4)
+
+def fsgrid_chunks(data, decomposition):
+    ''' Raw fsgrid array of the global array data (x, y, z, components): the chunks of the writing ranks,
+        each in Fortran order.
+    '''
+    chunks = []
+    for rank in range(int(np.prod(decomposition))):
+        index = [(rank // decomposition[2]) // decomposition[1], (rank // decomposition[2]) % decomposition[1],
+                 rank % decomposition[2]]
+        bounds = []
+        for d in range(3):
+            n, remainder = divmod(data.shape[d], decomposition[d])
+            start = index[d]*n + min(index[d], remainder)
+            bounds.append(slice(start, start + n + (index[d] < remainder)))
+        chunks.append(data[tuple(bounds)].transpose(2, 1, 0, 3).reshape(-1, data.shape[3]))
+    return np.concatenate(chunks)
+
+@pytest.fixture(params=[(2, 2, 1), (3, 1, 2)], ids=["uniform", "nonuniform"])
+def vlsv_file(tmp_path, request):
+    decomposition = request.param
+    rng = np.random.default_rng(7)
+    cellids = rng.permutation(np.arange(1, 65))
+    fg_b = np.stack(np.meshgrid(*[np.arange(n, dtype=float) for n in fsgrid_size], indexing="ij"), axis=-1)
+    fg_b = fg_b*[100.0, 10.0, 1.0] + rng.random(fg_b.shape)
+    variables = {"vg_rho": 1e6*(1 + rng.random(64)),
+                 "vg_rhom": 1.67e-21*(1 + rng.random(64)),
+                 "vg_v": 1e5*rng.normal(size=(64,3)),
+                 "vg_b_vol": 1e-8*rng.normal(size=(64,3)),
+                 "vg_ptensor_diagonal": 1e-10*(1 + rng.random((64,3))),
+                 "vg_ptensor_offdiagonal": 1e-11*rng.normal(size=(64,3))}
+    arrays = [("MESH_BBOX", np.array(fsgrid_size + (1, 1, 1), dtype=np.uint64), {"mesh": "fsgrid"}),
+              ("MESH_DECOMPOSITION", np.array(decomposition, dtype=np.uint32), {"mesh": "fsgrid"}),
+              ("VARIABLE", fsgrid_chunks(fg_b, decomposition), {"name": "fg_b", "mesh": "fsgrid"}),
+              ("PARAMETER", np.array([int(np.prod(decomposition))], dtype=np.int32), {"name": "numWritingRanks"})]
+    name = str(tmp_path / "bulk.0000000.vlsv")
+    write_vlsv(name, cellids, variables, arrays=arrays)
+    return name, cellids, variables, fg_b
+
+@pytest.mark.parametrize("mmap", [False, True])
+def test_read_variable_cellids(vlsv_file, mmap):
+    name, cellids, variables, fg_b = vlsv_file
+    f = pt.vlsvfile.VlsvReader(name, mmap=mmap)
+    row = {cellid: i for i, cellid in enumerate(cellids)}
+    for request in ([40, 3, 17, 64, 1], [5, 5, 9, 5], cellids[::-1]):
+        rows = [row[cellid] for cellid in request]
+        np.testing.assert_array_equal(f.read_variable("vg_rho", cellids=request), variables["vg_rho"][rows])
+        np.testing.assert_array_equal(f.read_variable("vg_b_vol", cellids=request), variables["vg_b_vol"][rows])
+    assert np.ndim(f.read_variable("vg_rho", cellids=12)) == 0
+    assert f.read_variable("vg_rho", cellids=12) == variables["vg_rho"][row[12]]
+    np.testing.assert_array_equal(f.read_variable("vg_b_vol", cellids=np.int64(12)), variables["vg_b_vol"][row[12]])
+    # a single-element list is read like a single cellid
+    np.testing.assert_array_equal(f.read_variable("vg_b_vol", cellids=[12]), variables["vg_b_vol"][row[12]])
+    np.testing.assert_array_equal(f.read_variable("vg_b_vol"), variables["vg_b_vol"])
+    np.testing.assert_array_equal(f.read_variable("CellID"), cellids)
+
+def test_mmap_matches_file_reads(vlsv_file):
+    name, cellids, variables, fg_b = vlsv_file
+    readers = [pt.vlsvfile.VlsvReader(name, mmap=mmap) for mmap in (False, True)]
+    for variable in ("vg_rho", "vg_b_vol", "vg_beta", "vg_ptensor"):
+        for request in (-1, [7, 2, 7], 33):
+            a, b = [reader.read_variable(variable, cellids=request) for reader in readers]
+            np.testing.assert_array_equal(a, b)
+    a, b = [reader.read_fsgrid_variable("fg_b") for reader in readers]
+    np.testing.assert_array_equal(a, b)
+
+@pytest.mark.parametrize("mmap", [False, True])
+def test_fsgrid_subvolume(vlsv_file, mmap):
+    name, cellids, variables, fg_b = vlsv_file
+    f = pt.vlsvfile.VlsvReader(name, mmap=mmap)
+    full = f.read_fsgrid_variable("fg_b")
+    np.testing.assert_array_equal(full, fg_b)
+    for lower, upper in (([-0.6, -1.0, 0.1], [0.3, 0.9, 1.0]), ([0.6, 0.6, -0.9], [0.9, 0.9, -0.6]),
+                         ([-1.0, -1.0, -1.0], [1.0, 1.0, 1.0])):
+        box = f.read_fsgrid_variable("fg_b", lower=lower, upper=upper)
+        np.testing.assert_array_equal(box, f.get_bbox_fsgrid_subarray(lower, upper, full))
+        np.testing.assert_array_equal(f.read_fsgrid_variable("fg_b", operator="x", lower=lower, upper=upper),
+                                      f.get_bbox_fsgrid_subarray(lower, upper, full[..., 0]))
+
+@pytest.mark.parametrize("variable", ["vg_beta", "vg_ptensor", "vg_v_parallel", "vg_pdyn"])
+def test_chunked_reducers(vlsv_file, variable):
+    name, cellids, variables, fg_b = vlsv_file
+    f = pt.vlsvfile.VlsvReader(name)
+    f.chunk_cells = 0 # whole grid at once
+    reference = f.read_variable(variable)
+    assert len(reference) == len(cellids)
+    for chunk_cells in (1, 5, 64):
+        f.chunk_cells = chunk_cells
+        # Vectorized operations may round differently on arrays of different length
+        np.testing.assert_allclose(f.read_variable(variable), reference, rtol=1e-13)
+        chunks = list(f.iter_variable(variable, chunk_cells=chunk_cells))
+        np.testing.assert_array_equal(np.concatenate([ids for ids, data in chunks]), cellids)
+        np.testing.assert_allclose(np.concatenate([data for ids, data in chunks]), reference, rtol=1e-13)
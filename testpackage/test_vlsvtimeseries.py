@@ -0,0 +1,69 @@
+''' Checks VlsvTimeSeries on small generated files whose cells change between files.
+
+Run with: python -m pytest testpackage/test_vlsvtimeseries.py
+'''
+import struct
+import xml.etree.ElementTree as ET
+import numpy as np
+import pytest
+import pytools as pt
+
+def write_vlsv(path, cellids, variables, time=0.0, size=(4,4,4), arrays=()):
+    ''' Writes a minimal VLSV file with a uniform vg mesh, the given cells and vg variables.
+        arrays are additional (tag, data, attributes) entries, e.g. fsgrid meshes and variables.
+    '''
+    root = ET.Element("VLSV")
+    with open(path, "wb") as f:
+        f.write(b"\0"*16)
+        def write(tag, data, **attribs):
+            data = np.ascontiguousarray(np.atleast_1d(data))
+            element = ET.SubElement(root, tag, arraysize=str(data.shape[0]),
+                                    vectorsize=str(data.shape[1] if data.ndim == 2 else 1),
+                                    datatype={"u":"uint", "i":"int", "f":"float"}[data.dtype.kind],
+                                    datasize=str(data.dtype.itemsize), **attribs)
+            element.text = str(f.tell())
+            f.write(data.tobytes())
+        write("MESH_BBOX", np.array(list(size)+[1,1,1], dtype=np.uint64), mesh="SpatialGrid")
+        for axis, n in zip("XYZ", size):
+            write("MESH_NODE_CRDS_"+axis, np.linspace(-1.0, 1.0, n+1), mesh="SpatialGrid")
+        write("VARIABLE", np.asarray(cellids, dtype=np.uint64), name="CellID", mesh="SpatialGrid")
+        for name, data in variables.items():
+            write("VARIABLE", data, name=name, mesh="SpatialGrid")
+        for tag, data, attribs in arrays:
+            write(tag, data, **attribs)
+        write("PARAMETER", np.array([time]), name="time")
+        footer = f.tell()
+        f.write(ET.tostring(root))
+        f.seek(8)
+        f.write(struct.pack("<Q", footer))
+
+@pytest.fixture
+def series_files(tmp_path):
+    # cell 7 is missing from the second file, the cells of the third file are in a different order
+    cellsets = [[3, 1, 7, 2], [2, 3, 1], [7, 2, 1, 3]]
+    files = []
+    for t, cellids in enumerate(cellsets):
+        cellids = np.array(cellids)
+        files.append(str(tmp_path / ("bulk.%07d.vlsv" % t)))
+        write_vlsv(files[-1], cellids, {"vg_rho": 10.0*t + cellids,
+                                        "vg_b_vol": np.stack((cellids, -cellids, 100.0*t + cellids), axis=-1)}, time=0.5*t)
+    return files
+
+@pytest.mark.parametrize("prefetch", [0, 2])
+def test_missing_cells_are_nan(series_files, prefetch):
+    series = pt.vlsvfile.VlsvTimeSeries(series_files, prefetch=prefetch)
+    rho, B = series.read_variables(["vg_rho", "vg_b_vol"], cellids=[7, 1])
+    assert rho.shape == (3, 2, 1) and B.shape == (3, 2, 3)
+    np.testing.assert_array_equal(rho[:,:,0], [[7, 1], [np.nan, 11], [27, 21]])
+    np.testing.assert_array_equal(B[:,0,:], [[7, -7, 7], [np.nan]*3, [7, -7, 207]])
+    # none of the requested cells is in the second file
+    np.testing.assert_array_equal(series.read_variable("vg_rho", cellids=7)[:,0,0], [7, np.nan, 27])
+    np.testing.assert_array_equal(series.read_parameter("time"), [0, 0.5, 1.0])
+
+def test_cells_in_no_file(series_files):
+    series = pt.vlsvfile.VlsvTimeSeries(series_files)
+    B = series.read_variable("vg_b_vol", cellids=[40, 41])
+    assert B.shape == (3, 2, 3) and np.all(np.isnan(B))
+    assert series.read_variable("vg_b_vol", cellids=[]).shape == (3, 0, 3)
+    rho = series.read_variable("vg_rho", cellids=[40, 7])
+    np.testing.assert_array_equal(rho[:,:,0], [[np.nan, 7], [np.nan, np.nan], [np.nan, 27]])